@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import uuid
+from typing import Callable
+from typing import Iterable
+from typing import Optional
+
+# Configuration (Ideally, load from .env or a config file)
+# Number of documents embedded per call of the embedding function
+TRAINING_EMBEDDING_BATCH_SIZE = int(os.getenv("TRAINING_EMBEDDING_BATCH_SIZE", "256"))
+# Number of records written per upsert, below ChromaDB's maximum batch size, so a few thousand pairs take one call
+TRAINING_UPSERT_BATCH_SIZE = 5000
+
+# Kinds of training records, with the suffix Vanna gives to their ids in the ChromaDB collections
+RECORD_ID_SUFFIXES = {"sql": "-sql", "ddl": "-ddl", "documentation": "-doc"}
+
+
+def content_id(content: str) -> str:
+    """
+    Same as Vanna's deterministic_uuid, so that records trained one by one with vn.train are recognized too.
+    Args:
+        content (str): The document stored in the vector store.
+    Returns:
+        str: The id of the document, derived from the SHA-256 of its content.
+    """
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(uuid.UUID(int=0), digest))
+
+
+def training_records(item: dict, is_valid_sql: Optional[Callable[[str], bool]] = None) -> list:
+    """
+    Converts a training item to the records Vanna stores for it.
+    Args:
+        item (dict): A dict with 'question' and 'sql', and optionally 'ddl' and 'documentation'.
+        is_valid_sql (callable): Function checking the SQL of the item, None to accept any SQL.
+    Returns:
+        list: (kind, id, document) tuples, the kind being a key of RECORD_ID_SUFFIXES.
+    Raises:
+        ValueError: If the item is not a valid training item.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("training item is not a dict")
+    question = item.get("question")
+    sql = item.get("sql")
+    if not isinstance(question, str) or not question.strip() or not isinstance(sql, str) or not sql.strip():
+        raise ValueError("training item needs a non-empty 'question' and 'sql'")
+    if is_valid_sql is not None and not is_valid_sql(sql):
+        raise ValueError(f"invalid SQL: {sql[:100]}")
+
+    # Documents are kept exactly as given, since Vanna hashes the raw text: the question/SQL document has the JSON
+    # format of add_question_sql, which Vanna reads back from its sql collection
+    documents = [("sql", json.dumps({"question": question, "sql": sql}, ensure_ascii=False))]
+    for kind in ("ddl", "documentation"):
+        text = item.get(kind)
+        if text is None:
+            continue
+        if not isinstance(text, str):
+            raise ValueError(f"'{kind}' is not a string")
+        if text.strip():
+            documents.append((kind, text))
+    return [(kind, content_id(document) + RECORD_ID_SUFFIXES[kind], document) for kind, document in documents]
+
+
+def stored_ids(collection, ids: list) -> set:
+    """
+    Args:
+        collection: A ChromaDB collection.
+        ids (list): Record ids.
+    Returns:
+        set: The ids among the given ones that are stored in the collection.
+    """
+    stored = set()
+    for start in range(0, len(ids), TRAINING_UPSERT_BATCH_SIZE):
+        stored.update(collection.get(ids=ids[start:start + TRAINING_UPSERT_BATCH_SIZE], include=[])["ids"])
+    return stored
+
+
+def add_records(collections: dict, item_records: list, embed_documents: Callable[[list], list],
+                batch_size: int = TRAINING_EMBEDDING_BATCH_SIZE) -> list:
+    """
+    Adds the records of training items to the vector store: records already stored or shared by several items are
+    kept once, the new ones are embedded in batches and written with one upsert per collection.
+    Args:
+        collections (dict): The ChromaDB collection of each kind of record, see RECORD_ID_SUFFIXES.
+        item_records (list): For each item, the list of its (kind, id, document) records.
+        embed_documents (callable): Function returning the embeddings of a list of documents.
+        batch_size (int): Number of documents per call of embed_documents.
+    Returns:
+        list: For each item, "added", "skipped" if all its records were already stored, or "failed".
+    """
+    # Maps the kind of each new record to {id: document}, records shared by several items being kept once
+    pending = {kind: {} for kind in RECORD_ID_SUFFIXES}
+    for records in item_records:
+        for kind, record_id, document in records:
+            pending[kind].setdefault(record_id, document)
+
+    added = set()
+    failed = set()
+    for kind, documents in pending.items():
+        if not documents:
+            continue
+        collection = collections[kind]
+        existing = stored_ids(collection, list(documents))
+        new_ids = [record_id for record_id in documents if record_id not in existing]
+
+        embedded_ids, embeddings = [], []
+        for start in range(0, len(new_ids), max(batch_size, 1)):
+            batch = new_ids[start:start + max(batch_size, 1)]
+            try:
+                vectors = embed_documents([documents[record_id] for record_id in batch])
+            except Exception as e:
+                print(f"Error embedding {len(batch)} {kind} training records: {e}")
+                failed.update(batch)
+                continue
+            embedded_ids.extend(batch)
+            embeddings.extend(vectors)
+
+        for start in range(0, len(embedded_ids), TRAINING_UPSERT_BATCH_SIZE):
+            batch = embedded_ids[start:start + TRAINING_UPSERT_BATCH_SIZE]
+            try:
+                collection.upsert(
+                    ids=batch,
+                    documents=[documents[record_id] for record_id in batch],
+                    embeddings=embeddings[start:start + TRAINING_UPSERT_BATCH_SIZE],
+                )
+            except Exception as e:
+                print(f"Error writing {len(batch)} {kind} training records: {e}")
+                failed.update(batch)
+                continue
+            added.update(batch)
+
+    outcomes = []
+    for records in item_records:
+        record_ids = {record_id for _, record_id, _ in records}
+        if record_ids & failed:
+            outcomes.append("failed")
+        elif record_ids & added:
+            outcomes.append("added")
+            # An item repeated in the input is added once, its repetitions are skipped
+            added.difference_update(record_ids)
+        else:
+            outcomes.append("skipped")
+    return outcomes
+
+
+def bulk_train(collections: dict, items: Iterable[dict], embed_documents: Callable[[list], list],
+               is_valid_sql: Optional[Callable[[str], bool]] = None,
+               batch_size: int = TRAINING_EMBEDDING_BATCH_SIZE) -> dict:
+    """
+    Adds training items to the vector store in bulk: the items are validated, deduplicated by content hash, among
+    themselves and against the records already stored, then the new records are embedded in batches and written
+    with one upsert per collection.
+    Args:
+        collections (dict): The ChromaDB collection of each kind of record, see RECORD_ID_SUFFIXES.
+        items (iterable): Dicts with 'question' and 'sql', and optionally 'ddl' and 'documentation'.
+        embed_documents (callable): Function returning the embeddings of a list of documents.
+        is_valid_sql (callable): Function checking the SQL of each item, None to accept any SQL.
+        batch_size (int): Number of documents per call of embed_documents.
+    Returns:
+        dict: The number of items 'added', 'skipped' as already stored and 'failed' as invalid or not written.
+    """
+    counts = {"added": 0, "skipped": 0, "failed": 0}
+    item_records = []
+    for item in items:
+        try:
+            item_records.append(training_records(item, is_valid_sql))
+        except ValueError as e:
+            print(f"Skipping invalid training item {item}: {e}")
+            counts["failed"] += 1
+    for outcome in add_records(collections, item_records, embed_documents, batch_size):
+        counts[outcome] += 1
+    return counts
@@ -0,0 +1,159 @@
+import json
+import os
+import re
+import uuid
+from typing import Callable
+
+from cctns_copilot.sql_generation_agent.bulk_training import RECORD_ID_SUFFIXES
+from cctns_copilot.sql_generation_agent.bulk_training import TRAINING_EMBEDDING_BATCH_SIZE
+from cctns_copilot.sql_generation_agent.bulk_training import add_records
+from cctns_copilot.sql_generation_agent.bulk_training import content_id
+from cctns_copilot.sql_generation_agent.bulk_training import stored_ids
+
+# Documentation of the whole schema trained as one record by earlier versions of train_from_information_schema:
+# every table block ends with a blank line, unlike the per-table documents of schema_documents()
+LEGACY_SCHEMA_DOCUMENT = re.compile(r"(?:Table [^\n]*:\n(?:  Column: [^\n]*, Type: [^\n]*\n)*\n)+")
+
+
+def schema_documents(df_information_schema) -> dict:
+    """
+    Builds the documentation of each table from the information schema, with vectorized pandas operations.
+    Args:
+        df_information_schema (pd.DataFrame): One row per column, with table_name, column_name and data_type,
+                                              and optionally column_id, in any case.
+    Returns:
+        dict: The documentation of each table, by table name.
+    """
+    df = df_information_schema.rename(columns=str.lower)
+    if df.empty:
+        return {}
+    if "column_id" in df.columns:
+        # Stable column order, so that the documentation of an unchanged table is the same on every run
+        df = df.sort_values(["table_name", "column_id"], kind="stable")
+    lines = "  Column: " + df["column_name"].astype(str) + ", Type: " + df["data_type"].astype(str)
+    columns = lines.groupby(df["table_name"].astype(str), sort=True).agg("\n".join)
+    documents = "Table " + columns.index.to_series() + ":\n" + columns + "\n"
+    return documents.to_dict()
+
+
+def legacy_schema_ids(collection) -> list:
+    """
+    Args:
+        collection: The ChromaDB documentation collection.
+    Returns:
+        list: The ids of the documentation of the whole schema trained as one record by earlier versions.
+    """
+    result = collection.get(where_document={"$contains": "  Column: "}, include=["documents"])
+    return [
+        record_id for record_id, document in zip(result["ids"], result["documents"])
+        if LEGACY_SCHEMA_DOCUMENT.fullmatch(document)
+    ]
+
+
+class SchemaFingerprint:
+    """
+    Fingerprint of the database schema trained as documentation: the id of the record trained for each table.
+    Record ids are content hashes, so a table whose documentation has the same id as last time is unchanged.
+    The fingerprint is kept in a JSON file next to the vector store.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path of the fingerprint file.
+        """
+        self.path = path
+
+    def exists(self) -> bool:
+        """
+        Returns:
+            bool: True if the schema was trained per table before.
+        """
+        return os.path.exists(self.path)
+
+    def load(self) -> dict:
+        """
+        Returns:
+            dict: The record id of each table trained, empty if the schema was never trained.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Could not read schema fingerprint {self.path}, training all tables: {e}")
+            return {}
+
+    def save(self, tables: dict):
+        """
+        Args:
+            tables (dict): The record id of each table trained.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(tables, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+
+def train_schema_documents(collections: dict, documents: dict, fingerprint: SchemaFingerprint,
+                           embed_documents: Callable[[list], list],
+                           batch_size: int = TRAINING_EMBEDDING_BATCH_SIZE) -> dict:
+    """
+    Trains the documentation of each table of the database schema as a separate record, so that retrieval picks
+    only the relevant tables. Only tables that changed since the last run, or whose record is missing from the
+    vector store, are embedded and written; the records of changed and dropped tables are deleted. When the
+    fingerprint is first created, the documentation of the whole schema trained as one record by earlier versions
+    is deleted too, so that retrieval does not keep returning it next to the per-table documentation.
+    Args:
+        collections (dict): The ChromaDB collection of each kind of record, see RECORD_ID_SUFFIXES.
+        documents (dict): The documentation of each table, by table name.
+        fingerprint (SchemaFingerprint): The fingerprint of the schema trained last time, updated.
+        embed_documents (callable): Function returning the embeddings of a list of documents.
+        batch_size (int): Number of documents per call of embed_documents.
+    Returns:
+        dict: The number of tables 'added', 'unchanged', 'removed' as dropped from the schema, and 'failed'.
+    """
+    collection = collections["documentation"]
+    legacy = [] if fingerprint.exists() else legacy_schema_ids(collection)
+    previous = fingerprint.load()
+    records = {
+        table: ("documentation", content_id(document) + RECORD_ID_SUFFIXES["documentation"], document)
+        for table, document in documents.items()
+    }
+    # Tables are unchanged if their record is the one trained last time and is still stored
+    stored = stored_ids(collection, sorted(set(previous.values())))
+    changed = [
+        table for table, (_, record_id, _) in records.items()
+        if previous.get(table) != record_id or record_id not in stored
+    ]
+    dropped = [table for table in previous if table not in records]
+    counts = {"added": 0, "unchanged": len(records) - len(changed), "removed": 0, "failed": 0}
+
+    current = {table: previous[table] for table in records if table in previous}
+    for table, outcome in zip(changed, add_records(collections, [[records[table]] for table in changed],
+                                                   embed_documents, batch_size)):
+        if outcome == "failed":
+            counts["failed"] += 1
+        else:
+            current[table] = records[table][1]
+            counts["added"] += 1
+
+    stale = set(previous.values()) - set(current.values())
+    if stale or legacy:
+        try:
+            collection.delete(ids=sorted(stale.union(legacy)))
+            counts["removed"] = len(dropped)
+            if legacy:
+                print(f"Deleted {len(legacy)} schema documents trained as one item by earlier versions.")
+        except Exception as e:
+            print(f"Error deleting {len(stale) + len(legacy)} outdated schema documents: {e}")
+            if legacy:
+                # Without a fingerprint, the next run retries deleting the documentation trained as one item
+                return counts
+            # Keeping their previous records in the fingerprint retries the deletion on the next run
+            current.update({table: record_id for table, record_id in previous.items() if record_id in stale})
+    if current != previous or not fingerprint.exists():
+        fingerprint.save(current)
+    return counts
@@ -0,0 +1,206 @@
+import os
+import re
+import threading
+import unicodedata
+import uuid
+from collections import OrderedDict
+from typing import Callable
+from typing import Optional
+
+import numpy as np
+
+# Configuration (Ideally, load from .env or a config file)
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "1024"))
+# Cosine similarity above which a rephrased question reuses the SQL of a cached one, 0 to match normalized text only
+SQL_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("SQL_CACHE_SIMILARITY_THRESHOLD", "0"))
+
+# Words whose presence or absence does not change the SQL of a question. Rephrasings that differ by any other
+# word (a district, an officer, a date, a crime type...) are never matched, however similar their embeddings.
+STOP_WORDS = frozenset(
+    "a all an and any are by can could display do does filed for from get give how i in is it list me of on "
+    "please show tell that the there this to was were what which with would you".split()
+)
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalizes a question so that questions differing only in case, spacing or final punctuation match.
+    Args:
+        question (str): The natural language question.
+    Returns:
+        str: The normalized question.
+    """
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?.!; ").strip()
+
+
+def content_words(question: str) -> frozenset:
+    """
+    Args:
+        question (str): A normalized question.
+    Returns:
+        frozenset: The words of the question that may change its SQL, that is all but the STOP_WORDS.
+    """
+    return frozenset(re.findall(r"[^\W_]+|\d+", question)) - STOP_WORDS
+
+
+class TrainingVersion:
+    """
+    Stamp of the training data, changed whenever training data is added, so that SQL generated with older training
+    data is not reused. The stamp is kept in a file next to the vector store, so that training done by another
+    process is noticed too; checking it costs a stat() of the file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path of the stamp file.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self._stat = None
+        self._stamp = ""
+
+    def current(self) -> str:
+        """
+        Returns:
+            str: The current stamp, "" if the training data never changed since stamping was introduced.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return ""
+        key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        with self.lock:
+            if key != self._stat:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._stamp = f.read().strip()
+                self._stat = key
+            return self._stamp
+
+    def bump(self) -> str:
+        """
+        Records that training data was added.
+        Returns:
+            str: The new stamp.
+        """
+        stamp = uuid.uuid4().hex
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{stamp}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(stamp)
+        os.replace(temp_path, self.path)
+        return stamp
+
+
+class SQLGenerationCache:
+    """
+    In-memory cache of the validated SQL generated for questions, keyed on the normalized question text and
+    the training data stamp, least recently used entries evicted first.
+
+    With a similarity threshold and an embedding function, a question missing from the cache reuses the SQL of
+    the most similar cached question of the same training stamp, if their cosine similarity reaches the threshold
+    and they have the same content words (see STOP_WORDS).
+    """
+
+    def __init__(self, max_entries: int = SQL_CACHE_MAX_ENTRIES,
+                 similarity_threshold: float = SQL_CACHE_SIMILARITY_THRESHOLD,
+                 embed: Optional[Callable[[str], list]] = None):
+        """
+        Args:
+            max_entries (int): Maximum number of cached questions.
+            similarity_threshold (float): Cosine similarity for matching rephrased questions, 0 to disable.
+            embed (callable): Function returning the embedding of a question, needed for similarity matching.
+        """
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.embed = embed
+        self.lock = threading.Lock()
+        # Maps (training stamp, normalized question) to (sql, normalized embedding or None, content words)
+        self.entries = OrderedDict()
+        self.counters = {"hits": 0, "similar_hits": 0, "misses": 0}
+
+    @property
+    def matches_similar(self) -> bool:
+        """
+        Returns:
+            bool: True if rephrased questions are matched by embedding similarity.
+        """
+        return self.similarity_threshold > 0 and self.embed is not None
+
+    def get(self, question: str, stamp: str) -> Optional[str]:
+        """
+        Args:
+            question (str): The natural language question.
+            stamp (str): The current training data stamp.
+        Returns:
+            str: The cached SQL for the question, or None.
+        """
+        key = (stamp, normalize_question(question))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[0]
+            if not self.matches_similar:
+                self.counters["misses"] += 1
+                return None
+        sql = self._get_similar(key)
+        with self.lock:
+            self.counters["similar_hits" if sql else "misses"] += 1
+        return sql
+
+    def put(self, question: str, stamp: str, sql: str):
+        """
+        Caches the validated SQL of a question.
+        Args:
+            question (str): The natural language question.
+            stamp (str): The training data stamp the SQL was generated with.
+            sql (str): The SQL query.
+        """
+        key = (stamp, normalize_question(question))
+        vector = self._embed(key[1]) if self.matches_similar else None
+        with self.lock:
+            self.entries[key] = (sql, vector, content_words(key[1]))
+            self.entries.move_to_end(key)
+            while len(self.entries) > max(self.max_entries, 0):
+                self.entries.popitem(last=False)
+
+    def invalidate(self):
+        """
+        Drops all cached SQL, as when training data is added.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: The number of cached questions, and of exact hits, similar hits and misses.
+        """
+        with self.lock:
+            return {"entries": len(self.entries), **self.counters}
+
+    def _get_similar(self, key) -> Optional[str]:
+        stamp, question = key
+        words = content_words(question)
+        with self.lock:
+            candidates = [
+                (other, entry) for (other_stamp, other), entry in self.entries.items()
+                if other_stamp == stamp and entry[1] is not None and entry[2] == words
+            ]
+        if not candidates:
+            return None
+        vector = self._embed(question)
+        scores = np.stack([entry[1] for _, entry in candidates]) @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        return candidates[best][1][0]
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embed(question), dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
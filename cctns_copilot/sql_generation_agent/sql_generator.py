@@ -3,10 +3,20 @@ import vanna
 from vanna.ollama import Ollama
 from vanna.chromadb import ChromaDBVectorStore
 
+from cctns_copilot.sql_generation_agent.bulk_training import TRAINING_EMBEDDING_BATCH_SIZE
+from cctns_copilot.sql_generation_agent.bulk_training import bulk_train
+from cctns_copilot.sql_generation_agent.schema_training import SchemaFingerprint
+from cctns_copilot.sql_generation_agent.schema_training import schema_documents
+from cctns_copilot.sql_generation_agent.schema_training import train_schema_documents
+from cctns_copilot.sql_generation_agent.sql_cache import SQLGenerationCache
+from cctns_copilot.sql_generation_agent.sql_cache import TrainingVersion
+
 # Configuration (Ideally, load from .env or a config file)
 # Ensure Ollama is running and the model is pulled (e.g., `ollama pull mistral`)
 OLLAMA_MODEL_NAME = os.getenv("OLLAMA_MODEL_NAME", "mistral") # Replace with your preferred Ollama model
 CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db_cctns") # Path to persist ChromaDB
+# Generated SQL is reused for repeated questions until training data is added; set to "false" to always generate
+SQL_CACHE_ENABLED = os.getenv("SQL_CACHE_ENABLED", "true").lower() == "true"
 
 # Oracle Connection Details - TO BE PROVIDED BY USER
 # These should be securely managed, e.g., via environment variables
@@ -32,6 +42,13 @@ class SQLGenerationAgent:
             vectorstore=self.chroma_vector_store
         )
 
+        # Generated SQL cache, invalidated by the training data stamp of the collection whenever train_* adds data
+        self.training_version = TrainingVersion(os.path.join(CHROMA_DB_PATH, f"{collection_name}.training_version"))
+        embed = getattr(self.chroma_vector_store, "generate_embedding", None)
+        self.sql_cache = SQLGenerationCache(embed=embed) if SQL_CACHE_ENABLED else None
+        # Record of the table documentation trained from the information schema, so unchanged tables are not re-trained
+        self.schema_fingerprint = SchemaFingerprint(os.path.join(CHROMA_DB_PATH, f"{collection_name}.schema_fingerprint.json"))
+
         self.oracle_connected = False
         self._connect_oracle()
 
@@ -62,6 +79,14 @@ class SQLGenerationAgent:
             print("Please ensure Oracle client libraries are installed and configured correctly, and credentials are valid.")
             self.oracle_connected = False
 
+    def _training_data_changed(self):
+        """
+        Records that training data was added, so that SQL generated with the previous training data is not reused.
+        """
+        self.training_version.bump()
+        if self.sql_cache is not None:
+            self.sql_cache.invalidate()
+
     def train_from_ddl_string(self, ddl_string: str):
         """
         Trains Vanna using DDL statements provided as a string.
@@ -74,6 +99,7 @@ class SQLGenerationAgent:
         print("Training Vanna from DDL string...")
         try:
             self.vn.train(ddl=ddl_string)
+            self._training_data_changed()
             print("Training from DDL string completed.")
         except Exception as e:
             print(f"Error during training from DDL string: {e}")
@@ -89,24 +115,28 @@ class SQLGenerationAgent:
             with open(file_path, 'r') as f:
                 ddl_content = f.read()
             self.vn.train(ddl=ddl_content)
+            self._training_data_changed()
             print(f"Training from DDL file {file_path} completed.")
         except FileNotFoundError:
             print(f"Error: DDL file not found at {file_path}")
         except Exception as e:
             print(f"Error during training from DDL file: {e}")
 
-    def train_from_sql_queries(self, queries_data: list[dict]):
+    def train_from_sql_queries(self, queries_data: list[dict]) -> dict:
         """
         Trains Vanna with sample SQL queries and their corresponding questions.
         Args:
             queries_data (list[dict]): A list of dictionaries, where each dict has
                                        'question' (natural language) and 'sql' (SQL query).
                                        Optionally, 'documentation' can be added.
+        Returns:
+            dict: The number of items 'added', 'skipped' (always 0 here) and 'failed'.
         """
         if not queries_data:
             print("No queries data provided. Nothing to train.")
-            return
+            return {"added": 0, "skipped": 0, "failed": 0}
         print(f"Training Vanna with {len(queries_data)} sample SQL queries...")
+        trained = 0
         for item in queries_data:
             try:
                 question = item.get('question')
@@ -114,12 +144,73 @@ class SQLGenerationAgent:
                 documentation = item.get('documentation') # Optional
                 if question and sql:
                     self.vn.train(question=question, sql=sql, ddl=item.get('ddl'), documentation=documentation)
+                    trained += 1
                     print(f"Trained with: Q: {question} -> SQL: {sql[:100]}...")
                 else:
                     print(f"Skipping invalid training item: {item}")
             except Exception as e:
                 print(f"Error training with item {item}: {e}")
+        if trained:
+            self._training_data_changed()
         print("Training with sample SQL queries completed.")
+        return {"added": trained, "skipped": 0, "failed": len(queries_data) - trained}
+
+    def bulk_train_from_sql_queries(self, queries_data: list[dict], batch_size: int = TRAINING_EMBEDDING_BATCH_SIZE) -> dict:
+        """
+        Trains Vanna with many sample SQL queries at once, such as a few thousand curated CCTNS question/SQL pairs.
+        Unlike train_from_sql_queries, which embeds and writes each item separately, the items are validated,
+        deduplicated by content hash against the training data already stored, embedded in batches and written
+        to ChromaDB in one batched upsert per collection.
+        Args:
+            queries_data (list[dict]): A list of dictionaries, where each dict has
+                                       'question' (natural language) and 'sql' (SQL query).
+                                       Optionally, 'ddl' and 'documentation' can be added.
+            batch_size (int): Number of documents embedded per call of the embedding function.
+        Returns:
+            dict: The number of items 'added', 'skipped' as already trained and 'failed' as invalid or not written.
+        """
+        if not queries_data:
+            print("No queries data provided. Nothing to train.")
+            return {"added": 0, "skipped": 0, "failed": 0}
+        collections = self._training_collections()
+        if collections is None:
+            print("Vector store does not expose its collections for bulk training, training item by item instead.")
+            return self.train_from_sql_queries(queries_data)
+
+        print(f"Bulk training Vanna with {len(queries_data)} sample SQL queries...")
+        try:
+            counts = bulk_train(collections, queries_data, self._embed_documents, self._is_valid_sql, batch_size)
+        except Exception as e:
+            print(f"Error during bulk training with sample SQL queries: {e}")
+            return {"added": 0, "skipped": 0, "failed": len(queries_data)}
+        if counts["added"]:
+            self._training_data_changed()
+        print(f"Bulk training completed: {counts['added']} added, {counts['skipped']} skipped, {counts['failed']} failed.")
+        return counts
+
+    def _training_collections(self) -> dict:
+        """
+        Returns:
+            dict: The ChromaDB collection of each kind of training record, or None if the vector store hides them.
+        """
+        collections = {
+            kind: getattr(self.chroma_vector_store, f"{kind}_collection", None)
+            for kind in ("sql", "ddl", "documentation")
+        }
+        return None if None in collections.values() else collections
+
+    def _embed_documents(self, documents: list) -> list:
+        """
+        Embeds documents with one call of the vector store's embedding function when available.
+        Args:
+            documents (list): The documents to embed.
+        Returns:
+            list: The embedding of each document.
+        """
+        embedding_function = getattr(self.chroma_vector_store, "embedding_function", None)
+        if embedding_function is not None:
+            return embedding_function(documents)
+        return [self.chroma_vector_store.generate_embedding(document) for document in documents]
 
     def train_from_documentation(self, documentation_text: str, data_type: str = "documentation"):
         """
@@ -134,6 +225,7 @@ class SQLGenerationAgent:
         print(f"Training Vanna from {data_type}...")
         try:
             self.vn.train(documentation=documentation_text) # Vanna's train method handles 'documentation' type
+            self._training_data_changed()
             print(f"Training from {data_type} completed.")
         except Exception as e:
             print(f"Error during training from {data_type}: {e}")
@@ -142,6 +234,10 @@ class SQLGenerationAgent:
         """
         Trains Vanna using the information schema from the connected database.
         This is a powerful way to get table names, column names, types, and relationships.
+        Each table is trained as a separate documentation item, so that retrieval picks only the relevant tables,
+        and tables unchanged since the last run are not trained again.
+        Returns:
+            bool: True if the documentation of every table is trained.
         """
         if not self.oracle_connected:
             print("Cannot train from information schema: Oracle database not connected.")
@@ -151,7 +247,7 @@ class SQLGenerationAgent:
         try:
             # This will extract DDL-like information (table names, columns, types)
             # The exact information extracted depends on Vanna's Oracle connector implementation
-            df_information_schema = self.vn.run_sql("SELECT table_name, column_name, data_type FROM all_tab_columns WHERE owner = SYS_CONTEXT('USERENV', 'CURRENT_SCHEMA')") # Example query, adjust for Oracle
+            df_information_schema = self.vn.run_sql("SELECT table_name, column_name, data_type, column_id FROM all_tab_columns WHERE owner = SYS_CONTEXT('USERENV', 'CURRENT_SCHEMA') ORDER BY table_name, column_id") # Example query, adjust for Oracle
 
             if df_information_schema is None or df_information_schema.empty:
                 print("Could not retrieve information schema, or it was empty.")
@@ -180,23 +276,29 @@ class SQLGenerationAgent:
                 print("Information schema training (DDL extraction part) for Oracle is complex; manual DDL training is often more reliable.")
                 return False # Indicate that full schema training might not have happened
 
-            # Reformat the schema info into a string that Vanna can understand as DDL or documentation
+            # Reformat the schema info into per-table documentation that Vanna can understand
             # This is a simplified representation.
-            schema_doc = ""
-            for table_name, group in df_information_schema.groupby('table_name'):
-                schema_doc += f"Table {table_name}:\n"
-                for _, row in group.iterrows():
-                    schema_doc += f"  Column: {row['column_name']}, Type: {row['data_type']}\n"
-                schema_doc += "\n"
-
-            if schema_doc:
-                self.vn.train(documentation=schema_doc) # Train this extracted info as documentation
-                print("Training from extracted schema information (as documentation) completed.")
-                return True
-            else:
+            documents = schema_documents(df_information_schema)
+            if not documents:
                 print("No schema information extracted to train as documentation.")
                 return False
 
+            collections = self._training_collections()
+            if collections is None:
+                print("Vector store does not expose its collections, training the documentation of every table.")
+                for document in documents.values():
+                    self.vn.train(documentation=document) # Train this extracted info as documentation
+                self._training_data_changed()
+                print(f"Training from extracted schema information of {len(documents)} tables completed.")
+                return True
+
+            counts = train_schema_documents(collections, documents, self.schema_fingerprint, self._embed_documents)
+            if counts["added"] or counts["removed"]:
+                self._training_data_changed()
+            print(f"Training from extracted schema information (as documentation) completed: {counts['added']} tables "
+                  f"trained, {counts['unchanged']} unchanged, {counts['removed']} removed, {counts['failed']} failed.")
+            return counts["failed"] == 0
+
         except Exception as e:
             print(f"Error during training from information schema: {e}")
             return False
@@ -204,16 +306,30 @@ class SQLGenerationAgent:
     def generate_sql(self, question: str) -> str:
         """
         Generates SQL query from a natural language question.
+        The validated SQL of a question asked before, with the same training data, is returned from the cache.
         Args:
             question (str): The natural language question.
         Returns:
             str: The generated SQL query, or None if generation fails.
         """
+        # Read before generating, so that SQL generated while training data is added is not cached as up to date
+        stamp = self.training_version.current()
+        if self.sql_cache is not None:
+            try:
+                sql_query = self.sql_cache.get(question, stamp)
+            except Exception as e:
+                print(f"Error reading the SQL cache: {e}")
+                sql_query = None
+            if sql_query:
+                print(f"Using cached SQL for question: '{question}'")
+                return sql_query
         print(f"Generating SQL for question: '{question}'")
         try:
             sql_query = self.vn.ask(question=question, print_results=False) # print_results=False to just get SQL
             if sql_query:
                 print(f"Generated SQL: {sql_query}")
+                if self.sql_cache is not None and self._is_valid_sql(sql_query):
+                    self.sql_cache.put(question, stamp, sql_query)
                 return sql_query
             else:
                 print("SQL generation returned no result.")
@@ -222,6 +338,23 @@ class SQLGenerationAgent:
             print(f"Error during SQL generation: {e}")
             return None
 
+    def _is_valid_sql(self, sql_query: str) -> bool:
+        """
+        Checks generated SQL before caching it, with Vanna's validation when available.
+        Args:
+            sql_query (str): The generated SQL query.
+        Returns:
+            bool: True if the SQL can be reused for the same question.
+        """
+        is_sql_valid = getattr(self.vn, "is_sql_valid", None)
+        if is_sql_valid is None:
+            return sql_query.lstrip().upper().startswith(("SELECT", "WITH"))
+        try:
+            return bool(is_sql_valid(sql_query))
+        except Exception as e:
+            print(f"Could not validate generated SQL: {e}")
+            return False
+
 # Example Usage (Illustrative - requires setup and data)
 if __name__ == '__main__':
     print("Starting SQLGenerationAgent example...")
@@ -235,17 +368,17 @@ if __name__ == '__main__':
 
     # Option 1: Train with DDL from a string
     # example_ddl_string = """
-    // CREATE TABLE EMPLOYEES (
-    //     ID INT PRIMARY KEY,
-    //     NAME VARCHAR(100),
-    //     DEPARTMENT_ID INT,
-    //     SALARY REAL
-    // );
-    // CREATE TABLE DEPARTMENTS (
-    //     ID INT PRIMARY KEY,
-    //     NAME VARCHAR(100)
-    // );
-    // """
+    # CREATE TABLE EMPLOYEES (
+    #     ID INT PRIMARY KEY,
+    #     NAME VARCHAR(100),
+    #     DEPARTMENT_ID INT,
+    #     SALARY REAL
+    # );
+    # CREATE TABLE DEPARTMENTS (
+    #     ID INT PRIMARY KEY,
+    #     NAME VARCHAR(100)
+    # );
+    # """
     # agent.train_from_ddl_string(example_ddl_string)
 
     # Option 2: Train with DDL from a .sql file
@@ -274,12 +407,14 @@ if __name__ == '__main__':
         # ... Add your other 6+ sample queries here ...
     ]
     # agent.train_from_sql_queries(sample_queries)
+    # For a large set of curated pairs, bulk training embeds and writes them in batches, skipping those already trained:
+    # counts = agent.bulk_train_from_sql_queries(sample_queries)
 
     # Option 4: Train with general documentation
     # crime_docs = """
-    // FIR stands for First Information Report. It is a written document prepared by police organizations.
-    // Arrest records contain details of individuals apprehended by the police.
-    // """
+    # FIR stands for First Information Report. It is a written document prepared by police organizations.
+    # Arrest records contain details of individuals apprehended by the police.
+    # """
     # agent.train_from_documentation(crime_docs, data_type="Crime Terminology")
 
     # Option 5: Train from connected DB's information schema (if connected and supported well)
@@ -11,20 +11,47 @@
 #
 # END COPYRIGHT
 
+import asyncio
+import os
+import tempfile
 from typing import Any
+from typing import AsyncIterator
 from typing import Dict
 from typing import List
 
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.vectorstores import InMemoryVectorStore
 from langchain_core.documents import Document
-from langchain_core.vectorstores.base import VectorStoreRetriever
 from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_text_splitters import TextSplitter
 from neuro_san.interfaces.coded_tool import CodedTool
 
+from coded_tools.rag_index.batch_embedder import BatchEmbedder
+from coded_tools.rag_index.chunking import chunking_settings
+from coded_tools.rag_index.chunking import make_text_splitter
+from coded_tools.rag_index.context_packing import DEFAULT_CONTEXT_TOKEN_BUDGET
+from coded_tools.rag_index.context_packing import PACKING_CANDIDATES_FACTOR
+from coded_tools.rag_index.context_packing import SPAN_SEPARATOR
+from coded_tools.rag_index.context_packing import pack_context
+from coded_tools.rag_index.hybrid_search import aretrieve
+from coded_tools.rag_index.hybrid_search import retrieval_kwargs
+from coded_tools.rag_index.incremental_index import IncrementalIndex
+from coded_tools.rag_index.index_cache import DEFAULT_INDEX_CACHE_DIR
+from coded_tools.rag_index.index_cache import content_key
+from coded_tools.rag_index.index_cache import read_source_bytes
+from coded_tools.rag_index.ingestion import IngestionPipeline
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+from coded_tools.rag_index.registry import VECTOR_STORE_REGISTRY
+from coded_tools.rag_index.registry import registry_key
+
 PDF_FILE_URL = "https://www.replicon.com/wp-content/uploads/2016/06/RFP-Template_Replicon.pdf"
 
+# Number of chunks retrieved per query
+RETRIEVAL_K = 4
+
+# Directory of the persisted indexes, which are updated only when the content of PDF_FILE_URL changes.
+# Each set of splitter settings and embedding model has its own index, see index_path().
+INDEX_DIR = os.path.join(DEFAULT_INDEX_CACHE_DIR, "agentic_rag")
+
 
 class Rag(CodedTool):
     """
@@ -55,7 +82,19 @@ class Rag(CodedTool):
         """
         Load a PDF from URL, build a vector store, and run a query against it.
 
-        :param args: Dictionary containing 'query' (search string)
+        :param args: Dictionary containing 'query' (search string) and optionally
+            'incremental_index' (default True) to re-embed the pdf only when its content changes,
+            'share_vector_store' (default True) to reuse the vector store built by any session of this process,
+            'chunking_profile' (default RAG_CHUNKING_PROFILE, or "default") to name the chunking profile, such as
+            "compact" or "structured", or to give chunk_size, chunk_overlap, splitter and structure settings,
+            'semantic_cache_threshold' (default RAG_SEMANTIC_CACHE_THRESHOLD) to reuse the results of a previous
+            query whose cosine similarity with this one is at least that high,
+            'retrieval_mode' (default RAG_RETRIEVAL_MODE, or "vector") to rank chunks by embedding similarity
+            ("vector"), by BM25 keyword score ("keyword") or by both fused by reciprocal rank ("hybrid"),
+            'ann_index' (default RAG_ANN_INDEX, or "exact") and 'ann_n_probe' (default RAG_ANN_N_PROBE, or 32)
+            to search large vector stores with an approximate nearest neighbour index such as "ivf", and
+            'context_token_budget' (default RAG_CONTEXT_TOKEN_BUDGET, or 0 for no limit) to cap the tokens of the
+            returned context, filled with the best merged and deduplicated chunks
         :param sly_data: A dictionary whose keys are defined by the agent
             hierarchy, but whose values are meant to be kept out of the
             chat stream.
@@ -78,51 +117,137 @@ class Rag(CodedTool):
         # Validate presence of required inputs
         if not query:
             return "Error: No query provided."
+        try:
+            retrieval_args: Dict[str, Any] = retrieval_kwargs(args)
+            # Settings for splitting documents into chunks. These are part of the index version of the pdf file.
+            splitter_settings: Dict[str, Any] = chunking_settings(args.get("chunking_profile"))
+        except ValueError as error:
+            return f"Error: {error}"
 
         # Build the vector store and run the query
-        vectorstore: InMemoryVectorStore = await self.generate_vector_store(PDF_FILE_URL)
-        return await self.query_vectorstore(vectorstore, query)
+        incremental_index: bool = args.get("incremental_index", True)
+        if args.get("share_vector_store", True):
+            key: str = registry_key(
+                "agentic_rag", PDF_FILE_URL, splitter_settings, OpenAIEmbeddings().model, incremental_index
+            )
+            vectorstore: NumpyVectorStore = await VECTOR_STORE_REGISTRY.get_or_build(
+                key, lambda: self.build_vector_store(incremental_index, splitter_settings)
+            )
+        else:
+            vectorstore: NumpyVectorStore = await self.build_vector_store(incremental_index, splitter_settings)
+        return await self.query_vectorstore(
+            vectorstore, query, retrieval_args, args.get("context_token_budget", DEFAULT_CONTEXT_TOKEN_BUDGET)
+        )
 
-    async def generate_vector_store(self, url: str) -> InMemoryVectorStore:
+    async def build_vector_store(self, incremental_index: bool, splitter_settings: Dict[str, Any]) -> NumpyVectorStore:
+        """
+        :param incremental_index: Whether to update the persisted index rather than embed the pdf from scratch
+        :param splitter_settings: Chunking settings as returned by chunking_settings()
+        :return: In-memory vector store containing the embedded document chunks
+        """
+        if incremental_index:
+            return await self.update_incremental_index(PDF_FILE_URL, splitter_settings)
+        return await self.generate_vector_store(PDF_FILE_URL, splitter_settings)
+
+    async def generate_vector_store(self, url: str, splitter_settings: Dict[str, Any]) -> NumpyVectorStore:
         """
         Asynchronously loads web documents from given URLs, split them into
         chunks, and build an in-memory vector store using OpenAI embeddings.
 
-        :param urls: List of URLs to fetch and embed
+        :param url: URL of the pdf file to fetch and embed
+        :param splitter_settings: Chunking settings as returned by chunking_settings()
         :return: In-memory vector store containing the embedded document chunks
         """
 
-        loader = PyPDFLoader(file_path=url)
-        docs: List[Document] = await loader.aload()
-
-        # Split documents into smaller chunks for better embedding and
-        # retrieval
-        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=100, chunk_overlap=50)
-        doc_chunks: List[Document] = text_splitter.split_documents(docs)
+        # Read through the fetch cache, which only downloads the file again once it changed
+        content: bytes = await asyncio.to_thread(read_source_bytes, url)
 
-        # Create an in-memory vector store with embeddings
-        vectorstore: InMemoryVectorStore = await InMemoryVectorStore.afrom_documents(
-            documents=doc_chunks,
-            collection_name="rag-in-memory",
-            embedding=OpenAIEmbeddings(),
-        )
+        # Split the pages into smaller chunks for better embedding and retrieval
+        # and embed them in batches as the pages are loaded
+        text_splitter: TextSplitter = make_text_splitter(splitter_settings)
+        vectorstore = NumpyVectorStore(embedding=BatchEmbedder(OpenAIEmbeddings()))
+        await IngestionPipeline(vectorstore, text_splitter).aingest(self.stream_pdf_content(url, content))
 
         return vectorstore
 
-    async def query_vectorstore(self, vectorstore: InMemoryVectorStore, query: str) -> str:
+    async def update_incremental_index(self, url: str, splitter_settings: Dict[str, Any]) -> NumpyVectorStore:
+        """
+        Load the persisted vector store of the pdf file and re-embed the file
+        only if its content changed since it was last indexed.
+
+        :param url: URL of the pdf file
+        :param splitter_settings: Chunking settings as returned by chunking_settings()
+        :return: In-memory vector store containing the embedded document chunks
+        """
+        embeddings = BatchEmbedder(OpenAIEmbeddings())
+        index = IncrementalIndex(self.index_path(url, splitter_settings, embeddings.model), embeddings)
+        index.load()
+
+        content: bytes = await asyncio.to_thread(read_source_bytes, url)
+        version: str = content_key(content, splitter_settings, embeddings.model)
+        diff: Dict[str, List[str]] = index.diff({url: version})
+        index.remove_sources(diff["removed"])
+
+        if diff["added"] or diff["changed"]:
+            text_splitter: TextSplitter = make_text_splitter(splitter_settings)
+            await index.aput_pages(self.stream_pdf_content(url, content), text_splitter, {url: version})
+
+        if diff["added"] or diff["changed"] or diff["removed"]:
+            index.save()
+
+        return index.vectorstore
+
+    @staticmethod
+    def index_path(url: str, splitter_settings: Dict[str, Any], model: str) -> str:
+        """
+        :param url: URL of the pdf file
+        :param splitter_settings: Chunking settings as returned by chunking_settings()
+        :param model: Name of the embedding model
+        :return: Path of the persisted index of the pdf file for these settings, so that
+            indexing with one chunking profile never replaces the index of another one
+        """
+        return os.path.join(INDEX_DIR, registry_key(url, splitter_settings, model))
+
+    async def stream_pdf_content(self, url: str, content: bytes) -> AsyncIterator[Document]:
+        """
+        Parse the bytes of a pdf file that were already downloaded,
+        rather than downloading the file a second time.
+
+        :param url: URL the pdf file was downloaded from
+        :param content: Raw bytes of the pdf file
+        :return: Async iterator of documents, one per page as it is parsed, with the URL as source
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_pdf: str = os.path.join(temp_dir, "source.pdf")
+            with open(temp_pdf, "wb") as file:
+                file.write(content)
+            loader = PyPDFLoader(file_path=temp_pdf)
+            async for doc in loader.alazy_load():
+                doc.metadata["source"] = url
+                yield doc
+
+    async def query_vectorstore(
+        self,
+        vectorstore: NumpyVectorStore,
+        query: str,
+        retrieval_args: Dict[str, Any] = None,
+        context_token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET,
+    ) -> str:
         """
         Query the given vector store using the provided query string
-        and return the combined content of retrieved documents.
+        and return the retrieved documents, with overlapping chunks merged and duplicates removed.
 
         :param vectorstore: The in-memory vector store to query
         :param query: The user query to search for relevant documents
+        :param retrieval_args: Retrieval mode, semantic cache threshold and approximate index settings,
+            as keyword arguments of aretrieve()
+        :param context_token_budget: Maximum number of tokens of the returned text, 0 for no limit
         :return: Concatenated text content of the retrieved documents
         """
-        # Create a retriever interface from the vector store
-        retriever: VectorStoreRetriever = vectorstore.as_retriever()
-
-        # Perform an asynchronous similarity search
-        results: List[Document] = await retriever.ainvoke(query)
+        # Perform an asynchronous search, reusing the embedding of a query asked before.
+        # With a budget, extra chunks fill the room freed by merging and deduplication.
+        k: int = RETRIEVAL_K * PACKING_CANDIDATES_FACTOR if context_token_budget > 0 else RETRIEVAL_K
+        results: List[Document] = await aretrieve(vectorstore, query, k=k, **(retrieval_args or {}))
 
-        # Concatenate the content of all retrieved documents
-        return "\n\n".join(doc.page_content for doc in results)
+        # Merge overlapping chunks, drop near-duplicates and keep the best spans within the budget
+        return SPAN_SEPARATOR.join(doc.page_content for doc in pack_context(results, context_token_budget))
@@ -11,25 +11,59 @@
 #
 # END COPYRIGHT
 
+import asyncio
 import inspect
+import json
 import os
-import re
 from typing import Any
+from typing import AsyncIterator
 from typing import Dict
 from typing import List
+from typing import Optional
+from typing import Tuple
 
 # pylint: disable=import-error
 from atlassian.errors import ApiPermissionError
 from langchain_community.document_loaders.confluence import ConfluenceLoader
-from langchain_community.vectorstores import InMemoryVectorStore
 from langchain_core.documents import Document
-from langchain_core.vectorstores.base import VectorStoreRetriever
 from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_text_splitters import TextSplitter
 from neuro_san.interfaces.coded_tool import CodedTool
 from requests.exceptions import HTTPError
 
-INVALID_PATH_PATTERN = r"[<>:\"|?*\x00-\x1F]"
+from coded_tools.rag_index.batch_embedder import EMBEDDING_ARGS
+from coded_tools.rag_index.batch_embedder import BatchEmbedder
+from coded_tools.rag_index.chunking import CHUNKING_PROFILES
+from coded_tools.rag_index.chunking import chunking_settings
+from coded_tools.rag_index.chunking import make_text_splitter
+from coded_tools.rag_index.confluence_crawler import CRAWL_ARGS
+from coded_tools.rag_index.confluence_crawler import PAGE_SELECTION_ARGS
+from coded_tools.rag_index.confluence_crawler import ConfluenceCrawler
+from coded_tools.rag_index.confluence_crawler import page_version
+from coded_tools.rag_index.context_packing import DEFAULT_CONTEXT_TOKEN_BUDGET
+from coded_tools.rag_index.context_packing import PACKING_CANDIDATES_FACTOR
+from coded_tools.rag_index.context_packing import SPAN_SEPARATOR
+from coded_tools.rag_index.context_packing import pack_context
+from coded_tools.rag_index.fetch_cache import OFFLINE_ERRORS
+from coded_tools.rag_index.hybrid_search import aretrieve
+from coded_tools.rag_index.hybrid_search import retrieval_kwargs
+from coded_tools.rag_index.incremental_index import IncrementalIndex
+from coded_tools.rag_index.index_cache import FETCH_CACHE
+from coded_tools.rag_index.index_store import DEFAULT_INDEX_NAMESPACE
+from coded_tools.rag_index.index_store import INDEX_STORE
+from coded_tools.rag_index.index_store import QuotaExceededError
+from coded_tools.rag_index.index_store import resolve_vector_store_path
+from coded_tools.rag_index.ingestion import IngestionPipeline
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+from coded_tools.rag_index.numpy_vector_store import load_vector_store
+from coded_tools.rag_index.registry import VECTOR_STORE_REGISTRY
+from coded_tools.rag_index.registry import registry_key
+
+# Number of chunks retrieved per query
+RETRIEVAL_K = 4
+
+# Number of pages requested per call when listing page versions of a space
+PAGE_VERSION_LIMIT = 100
 
 
 class ConfluenceRag(CodedTool):
@@ -40,6 +74,11 @@ class ConfluenceRag(CodedTool):
     def __init__(self):
         self.save_vector_store: bool = False
         self.abs_vector_store_path: str = None
+        self.index_namespace: str = DEFAULT_INDEX_NAMESPACE
+        self.incremental_index: bool = False
+        self.embedding_args: Dict[str, Any] = {}
+        self.crawl_args: Dict[str, Any] = {}
+        self.splitter_settings: Dict[str, Any] = chunking_settings()
 
     async def async_invoke(self, args: Dict[str, Any], sly_data: Dict[str, Any]) -> str:
         """
@@ -47,6 +86,33 @@ class ConfluenceRag(CodedTool):
 
         :param args: Dictionary containing:
           "query": search string
+          "incremental_index": keep the vector store at vector_store_path up to date
+            by re-embedding only pages whose version changed (default True for managed vector stores, else False)
+          "index_namespace": tenant or agent network whose namespace of the index store holds the vector store,
+            vector_store_path then naming it within the namespace, within the quotas of the namespace
+            (default RAG_INDEX_NAMESPACE, or "" for an unmanaged vector store)
+          "share_vector_store": reuse the vector store built for the same pages, credentials and settings
+            by any session of this process (default True)
+          "embedding_batch_size", "embedding_concurrency", "embedding_tokens_per_minute",
+          "embedding_checkpoint_dir": override the defaults of the batched embedding stage
+          "crawl_concurrency": maximum number of confluence requests in flight while fetching pages
+            and attachments (default RAG_CRAWL_CONCURRENCY, or 8)
+          "crawl_checkpoint_dir": directory of the checkpoints that let an interrupted crawl resume
+            (default RAG_CRAWL_CHECKPOINT_DIR)
+          "chunking_profile": name of a chunking profile ("default", "compact" or "structured"), or a dictionary
+            of "chunk_size", "chunk_overlap", "splitter" and "structure" settings overriding those of the profile
+            named under "profile". Defaults to RAG_CHUNKING_PROFILE, or "default".
+          "semantic_cache_threshold": cosine similarity above which the results of a previous, similar
+            query are reused (default RAG_SEMANTIC_CACHE_THRESHOLD, 0 to always search)
+          "retrieval_mode": rank chunks by embedding similarity ("vector"), by BM25 keyword score ("keyword")
+            or by both fused by reciprocal rank ("hybrid"). Defaults to RAG_RETRIEVAL_MODE, or "vector".
+          "ann_index": "ivf" to search vector stores of at least RAG_ANN_MIN_CHUNKS chunks with an approximate
+            nearest neighbour index, "exact" to scan all chunks (default RAG_ANN_INDEX, or "exact")
+          "ann_n_probe": number of index lists probed per query, trading latency for recall
+            (default RAG_ANN_N_PROBE, or 32)
+          "context_token_budget": maximum number of tokens of the returned context. Overlapping chunks of a page
+            are always merged and near-duplicates dropped; with a budget, the best spans that fit are returned.
+            Defaults to RAG_CONTEXT_TOKEN_BUDGET, or 0 for no limit.
 
         :param sly_data: A dictionary whose keys are defined by the agent
             hierarchy, but whose values are meant to be kept out of the
@@ -83,6 +149,12 @@ class ConfluenceRag(CodedTool):
         # Validate presence of required inputs
         if not query:
             return "❌ Missing required input: 'query'."
+        try:
+            retrieval_args: Dict[str, Any] = retrieval_kwargs(args)
+            # Settings for splitting pages into chunks
+            self.splitter_settings = chunking_settings(args.get("chunking_profile"))
+        except ValueError as error:
+            return f"❌ {error}."
         if not confluence_loader_args.get("url"):
             return (
                 "❌ Missing required input: 'url'.\n" "This should look like: https://your-domain.atlassian.net/wiki/"
@@ -97,33 +169,62 @@ class ConfluenceRag(CodedTool):
                 "https://your-domain.atlassian.net/wiki/spaces/<space_key>/pages/<page_id>/<title>"
             )
 
-        # Save the generated vector store as a JSON file if True
+        # Save the generated vector store to vector_store_path if True
         self.save_vector_store = args.get("save_vector_store", False)
 
         vector_store_path: str = args.get("vector_store_path", "")
 
-        if vector_store_path:
-            # Check for obviously invalid characters in filenames (basic check)
-            if re.search(INVALID_PATH_PATTERN, vector_store_path):
-                raise ValueError(f"Invalid vector_store_path: '{vector_store_path}'")
+        # Tenant or agent network owning the vector store. Its persisted vector stores are kept in the
+        # directory of the namespace in the index store, within its quotas.
+        self.index_namespace = args.get("index_namespace", DEFAULT_INDEX_NAMESPACE)
 
-            # Check file extension
-            if not vector_store_path.endswith(".json"):
-                raise ValueError(f"vector_store_path must be a .json file, got: '{vector_store_path}'")
+        # Update the vector store at vector_store_path in place instead of loading it as-is.
+        # Managed vector stores are kept up to date by default, since they are loaded again after eviction.
+        self.incremental_index = args.get("incremental_index", bool(self.index_namespace and vector_store_path))
 
-            if os.path.isabs(vector_store_path):
-                # It's already an absolute path — use it directly
-                self.abs_vector_store_path = vector_store_path
-            else:
-                # Combine to relative path to base path to make absolute path
-                base_path: str = os.path.dirname(__file__)
-                self.abs_vector_store_path = os.path.abspath(os.path.join(base_path, vector_store_path))
+        # Batch size, concurrency and rate limit of the embedding requests
+        self.embedding_args = {arg: value for arg, value in args.items() if arg in EMBEDDING_ARGS}
+
+        # Concurrency and checkpoint directory of the crawl of the pages
+        self.crawl_args = {arg: value for arg, value in args.items() if arg in CRAWL_ARGS}
 
-        # Build the vector store and run the query
-        vectorstore: InMemoryVectorStore = await self.generate_vector_store(confluence_loader_args)
-        return await self.query_vectorstore(vectorstore, query)
+        if vector_store_path:
+            self.abs_vector_store_path = resolve_vector_store_path(
+                vector_store_path, self.index_namespace, os.path.dirname(__file__)
+            )
 
-    async def generate_vector_store(self, confluence_loader_args: Dict[str, Any]) -> InMemoryVectorStore:
+        # Build the vector store, or share the one built by another session for the same pages and settings.
+        # The credentials are part of the key, since they determine which pages can be read.
+        try:
+            if args.get("share_vector_store", True):
+                key: str = registry_key(
+                    "confluence_rag",
+                    confluence_loader_args,
+                    self.splitter_settings,
+                    OpenAIEmbeddings().model,
+                    self.abs_vector_store_path,
+                    self.incremental_index,
+                    self.index_namespace,
+                )
+                vectorstore: NumpyVectorStore = await VECTOR_STORE_REGISTRY.get_or_build(
+                    key,
+                    lambda: self.generate_vector_store(confluence_loader_args),
+                    namespace=self.index_namespace or None,
+                    namespace_max_bytes=(
+                        INDEX_STORE.quota(self.index_namespace)["memory_bytes"] if self.index_namespace else 0
+                    ),
+                )
+            else:
+                vectorstore: NumpyVectorStore = await self.generate_vector_store(confluence_loader_args)
+        except QuotaExceededError as error:
+            return f"❌ {error}."
+        if self.index_namespace and self.abs_vector_store_path:
+            INDEX_STORE.record_access(self.abs_vector_store_path)
+        return await self.query_vectorstore(
+            vectorstore, query, retrieval_args, args.get("context_token_budget", DEFAULT_CONTEXT_TOKEN_BUDGET)
+        )
+
+    async def generate_vector_store(self, confluence_loader_args: Dict[str, Any]) -> NumpyVectorStore:
         """
         Asynchronously loads confluence documents from a given confluence URL, split them into
         chunks, and build an in-memory vector store using OpenAI embeddings
@@ -135,60 +236,279 @@ class ConfluenceRag(CodedTool):
 
         url = confluence_loader_args.get("url")
 
+        if self.incremental_index and self.abs_vector_store_path:
+            if confluence_loader_args.get("cql") or confluence_loader_args.get("label"):
+                print("Incremental index supports 'space_key' and 'page_ids' only. Rebuilding the full vector store.")
+            else:
+                return await self.update_incremental_index(confluence_loader_args)
+
         # If vector store file path is provided (abs_vector_store_path is not None), try to load vector store first.
-        if self.abs_vector_store_path:
+        if self.abs_vector_store_path and not self.incremental_index:
             try:
-                vectorstore = InMemoryVectorStore.load(path=self.abs_vector_store_path, embedding=OpenAIEmbeddings())
+                vectorstore = load_vector_store(self.abs_vector_store_path, OpenAIEmbeddings())
                 print(f"Loaded vector store from: {self.abs_vector_store_path}")
                 return vectorstore
             except FileNotFoundError:
                 print(f"Vector store not found. Creating from confluence pages: {url}")
 
-        docs: List[Document] = []
+        # Split pages into smaller chunks for better embedding and retrieval
+        # and embed them in batches as the pages are loaded
+        text_splitter: TextSplitter = make_text_splitter(self.splitter_settings)
+        vectorstore = NumpyVectorStore(embedding=BatchEmbedder.from_args(OpenAIEmbeddings(), self.embedding_args))
         try:
-            loader = ConfluenceLoader(**confluence_loader_args)
-            docs = await loader.aload()
-            print(f"Successfully load confluence pages from {url}")
+            if confluence_loader_args.get("cql") or confluence_loader_args.get("label"):
+                pages: AsyncIterator[Document] = ConfluenceLoader(**confluence_loader_args).alazy_load()
+            else:
+                pages = self.load_pages(confluence_loader_args)
+            pipeline = await IngestionPipeline(vectorstore, text_splitter).aingest(pages)
+            print(f"Successfully load {pipeline.page_count} confluence pages from {url}")
+        except OFFLINE_ERRORS as offline_error:
+            print(f"Cannot reach confluence: {offline_error}")
+            return NumpyVectorStore(embedding=vectorstore.embedding)
         except HTTPError as http_error:
             print(f"HTTP error: {http_error}")
+            return NumpyVectorStore(embedding=vectorstore.embedding)
         except ApiPermissionError as api_error:
             print(f"API Permission error: {api_error}")
-
-        # Split documents into smaller chunks for better embedding and retrieval
-        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=100, chunk_overlap=50)
-        doc_chunks: List[Document] = text_splitter.split_documents(docs)
-
-        # Create an in-memory vector store with embeddings
-        vectorstore: InMemoryVectorStore = await InMemoryVectorStore.afrom_documents(
-            documents=doc_chunks,
-            collection_name="rag-in-memory",
-            embedding=OpenAIEmbeddings(),
-        )
+            return NumpyVectorStore(embedding=vectorstore.embedding)
 
         if self.save_vector_store and self.abs_vector_store_path:
+            self.check_quota(vectorstore)
             os.makedirs(os.path.dirname(self.abs_vector_store_path), exist_ok=True)
-            vectorstore.dump(path=self.abs_vector_store_path)
+            vectorstore.dump(self.abs_vector_store_path)
             print(f"Vector store saved to: {self.abs_vector_store_path}")
 
         return vectorstore
 
-    async def query_vectorstore(self, vectorstore: InMemoryVectorStore, query: str) -> str:
+    def check_quota(self, vectorstore: NumpyVectorStore):
+        """
+        :param vectorstore: Vector store about to be saved to abs_vector_store_path
+        :raises QuotaExceededError: If saving it would take the namespace of a managed vector store over its quotas
+        """
+        if self.index_namespace:
+            INDEX_STORE.check_quota(
+                self.index_namespace, self.abs_vector_store_path, len(vectorstore), vectorstore.nbytes
+            )
+
+    async def update_incremental_index(self, confluence_loader_args: Dict[str, Any]) -> NumpyVectorStore:
+        """
+        Bring the persisted vector store at abs_vector_store_path up to date with the confluence pages.
+        Pages are versioned by their confluence version number and last-modified time,
+        so only pages that were added or edited are loaded and embedded again,
+        and the chunks of pages that no longer exist are deleted.
+
+        :param confluence_loader_args: Dictionary of arguments for ConfluenceLoader containing a confluence URL
+        :return: In-memory vector store containing the embedded document chunks
+        """
+        index = IncrementalIndex(
+            self.abs_vector_store_path, BatchEmbedder.from_args(OpenAIEmbeddings(), self.embedding_args)
+        )
+        if index.load():
+            print(f"Loaded vector store from: {self.abs_vector_store_path}")
+
+        try:
+            loader = ConfluenceLoader(**confluence_loader_args)
+            versions: Dict[str, str] = await asyncio.to_thread(self.get_page_versions, loader, confluence_loader_args)
+        except OFFLINE_ERRORS as offline_error:
+            print(f"Cannot reach confluence, using the saved vector store: {offline_error}")
+            return index.vectorstore
+        except HTTPError as http_error:
+            print(f"HTTP error: {http_error}")
+            return index.vectorstore
+        except ApiPermissionError as api_error:
+            print(f"API Permission error: {api_error}")
+            return index.vectorstore
+
+        if self.splitter_settings != CHUNKING_PROFILES["default"]:
+            # Pages are embedded again when the chunking settings change.
+            # Indexes built with the default settings keep the page versions they were saved with.
+            settings_key: str = registry_key(self.splitter_settings)[:16]
+            versions = {page_id: f"{version}#{settings_key}" for page_id, version in versions.items()}
+
+        diff: Dict[str, List[str]] = index.diff(versions)
+        stale_page_ids: List[str] = diff["added"] + diff["changed"]
+        index.remove_sources(diff["removed"])
+
+        if stale_page_ids:
+            # Load only the pages that need to be re-embedded
+            stale_versions: Dict[str, str] = {page_id: versions[page_id] for page_id in stale_page_ids}
+            # Split pages into smaller chunks for better embedding and retrieval
+            # and embed them in batches as the pages are loaded
+            text_splitter: TextSplitter = make_text_splitter(self.splitter_settings)
+            try:
+                crawler = ConfluenceCrawler.from_args(confluence_loader_args, self.crawl_args)
+                await index.aput_pages(
+                    crawler.acrawl(stale_versions),
+                    text_splitter,
+                    stale_versions,
+                    source_key="id",
+                )
+                print(
+                    f"Successfully load {len(stale_page_ids)} changed confluence pages from "
+                    f"{confluence_loader_args.get('url')}"
+                )
+            except HTTPError as http_error:
+                print(f"HTTP error: {http_error}")
+                return self.load_saved_index(index)
+            except ApiPermissionError as api_error:
+                print(f"API Permission error: {api_error}")
+                return self.load_saved_index(index)
+
+        print(
+            f"Incremental index update: {len(diff['added'])} added, {len(diff['changed'])} changed, "
+            f"{len(diff['removed'])} removed, {len(diff['unchanged'])} unchanged"
+        )
+
+        if stale_page_ids or diff["removed"]:
+            self.check_quota(index.vectorstore)
+            index.save()
+            print(f"Vector store saved to: {self.abs_vector_store_path}")
+
+        return index.vectorstore
+
+    def load_saved_index(self, index: IncrementalIndex) -> NumpyVectorStore:
+        """
+        Discard an index update that failed part way, since some pages may already have been replaced.
+
+        :param index: Incremental index whose update failed
+        :return: Vector store of the index as it was last saved
+        """
+        saved_index = IncrementalIndex(index.path, index.vectorstore.embedding)
+        saved_index.load()
+        return saved_index.vectorstore
+
+    async def load_pages(  # pylint: disable=too-many-locals
+        self, confluence_loader_args: Dict[str, Any]
+    ) -> AsyncIterator[Document]:
+        """
+        Load the pages selected by space_key and/or page_ids through FETCH_CACHE.
+        The page versions are listed first, and only the pages that are not cached at their current
+        version are fetched from confluence, concurrently by a ConfluenceCrawler. When confluence
+        cannot be reached, the cached pages of the last listing are returned.
+
+        :param confluence_loader_args: Dictionary of arguments for ConfluenceLoader containing a confluence URL
+        :return: Async iterator of the documents of the pages
+        """
+        listing_key: str = registry_key("confluence_rag.pages", confluence_loader_args)
+        offline: bool = False
+        try:
+            loader = ConfluenceLoader(**confluence_loader_args)
+            versions: Dict[str, str] = await asyncio.to_thread(self.get_page_versions, loader, confluence_loader_args)
+            FETCH_CACHE.save(listing_key, json.dumps(versions).encode("utf-8"), {})
+        except OFFLINE_ERRORS as offline_error:
+            cached_listing: Optional[Tuple[bytes, Dict[str, Any]]] = FETCH_CACHE.load(listing_key)
+            if cached_listing is None:
+                raise
+            print(f"Cannot reach confluence, using the cached pages: {offline_error}")
+            versions = json.loads(cached_listing[0])
+            offline = True
+
+        stale_page_ids: List[str] = []
+        cached_pages: int = 0
+        for page_id, version in versions.items():
+            cached_page: Optional[Tuple[bytes, Dict[str, Any]]] = FETCH_CACHE.load(
+                self.page_cache_key(confluence_loader_args, page_id)
+            )
+            if cached_page is not None and (offline or cached_page[1].get("version") == version):
+                for doc in json.loads(cached_page[0]):
+                    yield Document(page_content=doc["page_content"], metadata=doc["metadata"])
+                cached_pages += 1
+            elif offline:
+                print(f"Page {page_id} is not cached, skipping it while confluence cannot be reached")
+            else:
+                stale_page_ids.append(page_id)
+        print(f"Loaded {cached_pages} unchanged confluence pages from the cache")
+        if not stale_page_ids:
+            return
+
+        crawler = ConfluenceCrawler.from_args(confluence_loader_args, self.crawl_args)
+        loaded: Dict[str, List[Dict[str, Any]]] = {}
+        async for doc in crawler.acrawl({page_id: versions[page_id] for page_id in stale_page_ids}):
+            loaded.setdefault(str(doc.metadata.get("id")), []).append(
+                {"page_content": doc.page_content, "metadata": doc.metadata}
+            )
+            yield doc
+        # Pages are cached once all of them were loaded, so an interrupted load never caches part of a page
+        for page_id, docs in loaded.items():
+            if page_id in versions:
+                FETCH_CACHE.save(
+                    self.page_cache_key(confluence_loader_args, page_id),
+                    json.dumps(docs, default=str).encode("utf-8"),
+                    {"version": versions[page_id]},
+                )
+
+    @staticmethod
+    def page_cache_key(confluence_loader_args: Dict[str, Any], page_id: str) -> str:
+        """
+        :param confluence_loader_args: Dictionary of arguments for ConfluenceLoader
+        :param page_id: Id of a page
+        :return: FETCH_CACHE key of the documents of the page. The credentials are part of the key,
+            since they determine which pages can be read.
+        """
+        content_args: Dict[str, Any] = {
+            arg: value for arg, value in confluence_loader_args.items() if arg not in PAGE_SELECTION_ARGS
+        }
+        return registry_key("confluence_rag.page", content_args, page_id)
+
+    def get_page_versions(self, loader: ConfluenceLoader, confluence_loader_args: Dict[str, Any]) -> Dict[str, str]:
+        """
+        List the pages selected by space_key and/or page_ids together with their versions,
+        without fetching page bodies.
+
+        :param loader: ConfluenceLoader whose confluence client is used for the requests
+        :param confluence_loader_args: Dictionary of arguments for ConfluenceLoader
+        :return: Dictionary mapping page id to a version string made of the
+            confluence version number and its last-modified time
+        """
+        pages: List[Dict[str, Any]] = []
+
+        space_key: str = confluence_loader_args.get("space_key")
+        if space_key:
+            max_pages: int = confluence_loader_args.get("max_pages") or 1000
+            while len(pages) < max_pages:
+                batch: List[Dict[str, Any]] = loader.confluence.get_all_pages_from_space(
+                    space=space_key,
+                    start=len(pages),
+                    limit=min(PAGE_VERSION_LIMIT, max_pages - len(pages)),
+                    status="current",
+                    expand="version",
+                )
+                if not batch:
+                    break
+                pages.extend(batch)
+            # Like ConfluenceLoader, keep at most max_pages pages, even if the server returns more than the limit
+            pages = pages[:max_pages]
+
+        for page_id in confluence_loader_args.get("page_ids") or []:
+            pages.append(loader.confluence.get_page_by_id(page_id=page_id, expand="version"))
+
+        return {str(page["id"]): page_version(page) for page in pages}
+
+    async def query_vectorstore(
+        self,
+        vectorstore: NumpyVectorStore,
+        query: str,
+        retrieval_args: Dict[str, Any] = None,
+        context_token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET,
+    ) -> str:
         """
         Query the given vector store using the provided query string
-        and return the combined content of retrieved documents.
+        and return the retrieved documents, with overlapping chunks merged and duplicates removed.
 
         :param vectorstore: The in-memory vector store to query
         :param query: The user query to search for relevant documents
+        :param retrieval_args: Retrieval mode, semantic cache threshold and approximate index settings,
+            as keyword arguments of aretrieve()
+        :param context_token_budget: Maximum number of tokens of the returned text, 0 for no limit
         :return: Concatenated text content of the retrieved documents
         """
-        # Create a retriever interface from the vector store
-        retriever: VectorStoreRetriever = vectorstore.as_retriever()
-
-        # Perform an asynchronous similarity search
-        results: List[Document] = await retriever.ainvoke(query)
+        # Perform an asynchronous search, reusing the embedding of a query asked before.
+        # With a budget, extra chunks fill the room freed by merging and deduplication.
+        k: int = RETRIEVAL_K * PACKING_CANDIDATES_FACTOR if context_token_budget > 0 else RETRIEVAL_K
+        results: List[Document] = await aretrieve(vectorstore, query, k=k, **(retrieval_args or {}))
 
         if results:
             print("Retrieval completed!")
 
-        # Concatenate the content of all retrieved documents
-        return "\n\n".join(doc.page_content for doc in results)
+        # Merge overlapping chunks, drop near-duplicates and keep the best spans within the budget
+        return SPAN_SEPARATOR.join(doc.page_content for doc in pack_context(results, context_token_budget))
@@ -1,15 +1,12 @@
-import json
+import asyncio
 import logging
-import os
-from datetime import datetime
 from typing import Any
 from typing import Dict
 
 from neuro_san.interfaces.coded_tool import CodedTool
 
-from coded_tools.kwik_agents.list_topics import LONG_TERM_MEMORY_FILE
-from coded_tools.kwik_agents.list_topics import MEMORY_DATA_STRUCTURE
-from coded_tools.kwik_agents.list_topics import MEMORY_FILE_PATH
+from coded_tools.kwik_agents.topic_memory_store import MEMORY_DATA_STRUCTURE
+from coded_tools.kwik_agents.topic_memory_store import get_topic_memory
 
 
 class CommitToMemory(CodedTool):
@@ -49,12 +46,7 @@ class CommitToMemory(CodedTool):
                 a text string an error message in the format:
                 "Error: <error message>"
         """
-        self.topic_memory = sly_data.get(MEMORY_DATA_STRUCTURE, None)
-        if not self.topic_memory:
-            if LONG_TERM_MEMORY_FILE:
-                self.read_memory_from_file()
-            else:
-                self.topic_memory = {}
+        self.topic_memory = get_topic_memory(sly_data)
         the_new_fact: str = args.get("new_fact", "")
         if the_new_fact == "":
             return "Error: No new_fact provided."
@@ -68,41 +60,28 @@ class CommitToMemory(CodedTool):
         logger.info("Topic: %s", str(the_topic))
         the_memory_str = self.add_memory(the_topic, the_new_fact)
         logger.info("Memory on this topic: \n %s", str(the_memory_str))
-        sly_data[MEMORY_DATA_STRUCTURE] = self.topic_memory
+        # Publish the topics committed to in this session, which agents may pass upstream,
+        # rather than the whole long term memory
+        sly_data.setdefault(MEMORY_DATA_STRUCTURE, {})[the_topic] = the_memory_str
+        if not self.topic_memory.write_behind:
+            # Else the new fact is embedded, and its topic compacted, once written in the background
+            self.topic_memory.maintain([the_topic])
         logger.info(">>>>>>>>>>>>>>>>>>>DONE !!!>>>>>>>>>>>>>>>>>>")
         return the_memory_str
 
     async def async_invoke(self, args: Dict[str, Any], sly_data: Dict[str, Any]) -> str:
         """
-        Delegates to the synchronous invoke method for now.
+        Delegates to the synchronous invoke method. Without write-behind, committing embeds the new fact and may
+        compact its topic with the summarizer, so invoke then runs in a thread not to block the event loop.
         """
-        return self.invoke(args, sly_data)
-
-    def write_memory_to_file(self):
-        """
-        Writes the topic memory dictionary to a JSON file.
-        """
-        file_path = MEMORY_FILE_PATH + MEMORY_DATA_STRUCTURE + ".json"
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w", encoding="utf-8") as file:
-            file.write(json.dumps(self.topic_memory, indent=2))
-
-    def read_memory_from_file(self):
-        """
-        Reads the topic memory dictionary from a JSON file if it exists.
-        Otherwise initializes an empty dictionary.
-        """
-        file_path = MEMORY_FILE_PATH + MEMORY_DATA_STRUCTURE + ".json"
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as file:
-                content = file.read()
-                self.topic_memory = json.loads(content) if content else {}
-        else:
-            self.topic_memory = {}
+        if get_topic_memory(sly_data).write_behind:
+            return self.invoke(args, sly_data)
+        return await asyncio.to_thread(self.invoke, args, sly_data)
 
     def add_memory(self, topic: str, new_fact: str) -> str:
         """
-        Adds a new fact to memory and saves the memory dictionary to a JSON file.
+        Adds a new time stamped fact to memory. In long term memory, only the new fact is written,
+        in the background with write-behind.
 
         Parameters:
         - topic (str): A topic to store the memory under.
@@ -111,15 +90,4 @@ class CommitToMemory(CodedTool):
         Returns:
         - str: The updated memory string for the given topic.
         """
-
-        time_stamp = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
-
-        if topic not in self.topic_memory or not self.topic_memory[topic]:
-            self.topic_memory[topic] = time_stamp + new_fact
-        else:
-            self.topic_memory[topic] = self.topic_memory[topic] + "\n" + time_stamp + new_fact
-
-        if LONG_TERM_MEMORY_FILE:
-            self.write_memory_to_file()
-
-        return self.topic_memory[topic]
+        return self.topic_memory.add_fact(topic, new_fact)
@@ -1,14 +1,11 @@
-import json
 import logging
-import os
 from typing import Any
 from typing import Dict
+from typing import List
 
 from neuro_san.interfaces.coded_tool import CodedTool
 
-LONG_TERM_MEMORY_FILE = True  # Store and read memory from file
-MEMORY_FILE_PATH = "./"
-MEMORY_DATA_STRUCTURE = "TopicMemory"
+from coded_tools.kwik_agents.topic_memory_store import get_topic_memory
 
 
 class ListTopics(CodedTool):
@@ -48,18 +45,15 @@ class ListTopics(CodedTool):
                 a text string an error message in the format:
                 "Error: <error message>"
         """
-        self.topic_memory = sly_data.get(MEMORY_DATA_STRUCTURE, None)
-        if not self.topic_memory:
-            if LONG_TERM_MEMORY_FILE:
-                self.read_memory_from_file()
-            else:
-                return "NO TOPICS YET!"
+        self.topic_memory = get_topic_memory(sly_data)
+        topics: List[str] = self.topic_memory.topics()
+        if not topics:
+            return "NO TOPICS YET!"
 
         logger = logging.getLogger(self.__class__.__name__)
         logger.info(">>>>>>>>>>>>>>>>>>>ListTopics>>>>>>>>>>>>>>>>>>")
-        topics_str = self.get_memory_topics()
+        topics_str = str(topics)
         logger.info("The resulting list of topics: \n %s", str(topics_str))
-        sly_data[MEMORY_DATA_STRUCTURE] = self.topic_memory
         logger.info(">>>>>>>>>>>>>>>>>>>DONE !!!>>>>>>>>>>>>>>>>>>")
         return topics_str
 
@@ -68,25 +62,3 @@ class ListTopics(CodedTool):
         Delegates to the synchronous invoke method for now.
         """
         return self.invoke(args, sly_data)
-
-    def read_memory_from_file(self):
-        """
-        Reads the topic memory dictionary from a JSON file if it exists.
-        Otherwise initializes an empty dictionary.
-        """
-        file_path = MEMORY_FILE_PATH + MEMORY_DATA_STRUCTURE + ".json"
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as file:
-                content = file.read()
-                self.topic_memory = json.loads(content) if content else {}
-        else:
-            self.topic_memory = {}
-
-    def get_memory_topics(self) -> str:
-        """
-        Retrieves the full list of memory topics.
-
-        Returns:
-        - list: A sorted list of all memory topics.
-        """
-        return str(sorted(list(self.topic_memory.keys())))
@@ -1,10 +1,15 @@
+import asyncio
 import logging
 from typing import Any
 from typing import Dict
+from typing import List
+from typing import Tuple
 
 from neuro_san.interfaces.coded_tool import CodedTool
 
-from coded_tools.kwik_agents.list_topics import MEMORY_DATA_STRUCTURE
+from coded_tools.kwik_agents.topic_memory_store import DEFAULT_RECALL_K
+from coded_tools.kwik_agents.topic_memory_store import get_topic_memory
+from coded_tools.kwik_agents.topic_memory_store import memory_embeddings
 
 
 class RecallMemory(CodedTool):
@@ -22,7 +27,9 @@ class RecallMemory(CodedTool):
                 by the calling agent.  This dictionary is to be treated as read-only.
 
                 The argument dictionary expects the following keys:
-                    "app_name" the name of the One Cognizant app for which the URL is needed.
+                    "query" what to recall; the facts most relevant to it are recalled across all topics.
+                    "k" the number of facts to recall for a query, 5 by default.
+                    "topic" the topic to recall all facts of, when there is no query.
 
         :param sly_data: A dictionary whose keys are defined by the agent hierarchy,
                 but whose values are meant to be kept out of the chat stream.
@@ -44,27 +51,37 @@ class RecallMemory(CodedTool):
                 a text string an error message in the format:
                 "Error: <error message>"
         """
-        self.topic_memory = sly_data.get(MEMORY_DATA_STRUCTURE, None)
-        if not self.topic_memory:
+        self.topic_memory = get_topic_memory(sly_data)
+        if self.topic_memory.is_empty():
             return "NO TOPICS YET!"
+        the_query: str = args.get("query", "")
         the_topic: str = args.get("topic", "")
-        if the_topic == "":
-            return "Error: No topic provided."
+        if the_query == "" and the_topic == "":
+            return "Error: No query or topic provided."
 
         logger = logging.getLogger(self.__class__.__name__)
         logger.info(">>>>>>>>>>>>>>>>>>>RecallMemory>>>>>>>>>>>>>>>>>>")
+        if the_query != "":
+            logger.info("Query: %s", str(the_query))
+            try:
+                the_memory_str = self.recall_relevant_memory(the_query, int(args.get("k", DEFAULT_RECALL_K)))
+            except Exception as exception:  # pylint: disable=broad-exception-caught
+                return f"Error: {exception}"
+            logger.info("Memories relevant to this query: \n %s", str(the_memory_str))
+            logger.info(">>>>>>>>>>>>>>>>>>>DONE !!!>>>>>>>>>>>>>>>>>>")
+            return the_memory_str
         logger.info("Topic: %s", str(the_topic))
         the_memory_str = self.recall_memory(the_topic)
         logger.info("Memories on this topic: \n %s", str(the_memory_str))
-        sly_data[MEMORY_DATA_STRUCTURE] = self.topic_memory
         logger.info(">>>>>>>>>>>>>>>>>>>DONE !!!>>>>>>>>>>>>>>>>>>")
         return the_memory_str
 
     async def async_invoke(self, args: Dict[str, Any], sly_data: Dict[str, Any]) -> str:
         """
-        Delegates to the synchronous invoke method for now.
+        Runs the synchronous invoke method in a thread, since semantic recall may embed pending facts
+        and the query with the embedding model, which must not block the event loop.
         """
-        return self.invoke(args, sly_data)
+        return await asyncio.to_thread(self.invoke, args, sly_data)
 
     def recall_memory(self, topic: str) -> str:
         """
@@ -76,6 +93,21 @@ class RecallMemory(CodedTool):
         Returns:
         - str: The list of memories related to the topic, or an empty string if the topic doesn't exist.
         """
-        if topic in self.topic_memory:
-            return self.topic_memory[topic]
-        return "NO RELATED MEMORIES!"
+        memory: str = self.topic_memory.recall(topic)
+        return memory if memory else "NO RELATED MEMORIES!"
+
+    def recall_relevant_memory(self, query: str, k: int) -> str:
+        """
+        Recall the facts most relevant to this query from memory, across all topics.
+
+        Parameters:
+        - query (str): What to recall.
+        - k (int): The number of facts to recall.
+
+        Returns:
+        - str: The time stamped facts with their topic, most relevant first.
+        """
+        facts: List[Tuple[str, str, str]] = self.topic_memory.search(memory_embeddings(), query, k)
+        if not facts:
+            return "NO RELATED MEMORIES!"
+        return "\n".join(f"[{stamp}] ({topic}) {fact}" for stamp, topic, fact in facts)
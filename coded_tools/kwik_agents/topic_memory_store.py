@@ -0,0 +1,931 @@
+"""Persistent, indexed storage of the topic memory of the kwik agents"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import argparse
+import atexit
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from abc import ABC
+from abc import abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_openai import ChatOpenAI
+from langchain_openai import OpenAIEmbeddings
+
+from coded_tools.rag_index.query_cache import embedding_model_name
+
+LONG_TERM_MEMORY_FILE = True  # Store and read memory from file
+MEMORY_FILE_PATH = "./"
+MEMORY_DATA_STRUCTURE = "TopicMemory"
+
+# Database holding the long term memory. The JSON file of earlier versions is imported into it when it is created.
+MEMORY_STORE_FILE = MEMORY_FILE_PATH + MEMORY_DATA_STRUCTURE + ".sqlite"
+LEGACY_MEMORY_FILE = MEMORY_FILE_PATH + MEMORY_DATA_STRUCTURE + ".json"
+
+# Keys of the sly data naming the memory shard of a session, the first one present is used, e.g. {"user_id": "bill"}.
+# Every shard is a database of its own, so the memories of users do not mix and their writes do not contend.
+# Sessions without any of these keys share the MEMORY_STORE_FILE memory.
+MEMORY_SHARD_KEYS = ["user_id", "session_id"]
+MEMORY_SHARDS_DIR = MEMORY_FILE_PATH + MEMORY_DATA_STRUCTURE
+
+# Maximum number of databases kept open by a process, the least recently used are closed beyond it
+MAX_OPEN_MEMORY_STORES = 128
+
+# Seconds a write waits for the writes of other processes to the same database
+MEMORY_BUSY_TIMEOUT = 30.0
+
+# Commits are buffered in memory and written to the database by a background thread, so that they do not wait for
+# the database. The buffered facts of a database are written once MEMORY_FLUSH_SIZE of them are buffered,
+# MEMORY_FLUSH_INTERVAL seconds after the first of them was, and when the process exits. Until then, they are visible
+# to the sessions of this process only.
+WRITE_BEHIND_MEMORY = True
+MEMORY_FLUSH_SIZE = 32
+MEMORY_FLUSH_INTERVAL = 1.0
+
+# Durability of the writes, the SQLite synchronous level: "NORMAL" survives crashes of the process,
+# "FULL" also survives losses of power by syncing every write to disk, and "OFF" leaves syncing to the OS
+MEMORY_SYNCHRONOUS = "NORMAL"
+SYNCHRONOUS_LEVELS = ["OFF", "NORMAL", "FULL", "EXTRA"]
+
+# Embed committed facts, so that RecallMemory can retrieve the facts relevant to a query across all topics
+SEMANTIC_MEMORY = True
+
+# Number of facts returned by a semantic recall
+DEFAULT_RECALL_K = 5
+
+# Number of facts embedded per request when catching up with facts committed without an embedding
+EMBEDDING_BATCH_SIZE = 64
+
+# Number of most recent facts of a topic kept as they were committed. Older facts are folded into the summary of
+# the topic, and recalling a topic returns its summary followed by these facts, however long the memory has grown.
+RECENT_FACTS_WINDOW = 50
+
+# Number of facts beyond the window that trigger folding them into the summary, so that the summary of a topic
+# is rewritten once every COMPACTION_BATCH commits rather than on every commit
+COMPACTION_BATCH = 25
+
+# Maximum length of the summary of a topic, in characters
+MAX_SUMMARY_CHARS = 4000
+
+# Summarizer folding older facts into topic summaries: "llm" or "truncate", see SUMMARIZERS
+MEMORY_SUMMARIZER = "llm"
+SUMMARY_MODEL = "gpt-4o"
+
+SUMMARY_PROMPT = """You maintain the long term memory of an assistant about the topic: {topic}
+Rewrite the current summary of the topic to include the new facts, in at most {max_chars} characters.
+Keep every fact that could be useful later, with its date when it matters, and let newer facts replace
+older ones they contradict. Answer with the summary only.
+
+Current summary:
+{summary}
+
+New facts, oldest first:
+{facts}
+"""
+
+# Format of the time stamps of the facts
+TIME_STAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# A fact in the memory string of a topic: "[<time stamp>] <fact>"
+FACT_LINE_PATTERN = r"^\[([^\]]*)\] (.*)$"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS topics (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS facts (
+    id INTEGER PRIMARY KEY,
+    topic_id INTEGER NOT NULL REFERENCES topics(id),
+    time_stamp TEXT NOT NULL,
+    fact TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS facts_by_topic ON facts (topic_id, id);
+CREATE TABLE IF NOT EXISTS topic_summaries (
+    topic_id INTEGER PRIMARY KEY REFERENCES topics(id),
+    summary TEXT NOT NULL,
+    time_stamp TEXT NOT NULL,
+    folded_facts INTEGER NOT NULL,
+    folded_bytes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fact_embeddings (
+    model TEXT NOT NULL,
+    fact_id INTEGER NOT NULL REFERENCES facts(id),
+    vector BLOB NOT NULL,
+    PRIMARY KEY (model, fact_id)
+);
+"""
+
+
+def memory_embeddings() -> Embeddings:
+    """
+    :return: Embeddings of the facts and of the recall queries
+    """
+    return OpenAIEmbeddings()
+
+
+def time_stamp() -> str:
+    """
+    :return: Time stamp of a fact committed now
+    """
+    return datetime.now().strftime(TIME_STAMP_FORMAT)
+
+
+def format_facts(facts: List[Tuple[str, str]]) -> str:
+    """
+    :param facts: List of (time stamp, fact) tuples, oldest first
+    :return: The memory string of a topic, one "[<time stamp>] <fact>" line per fact
+    """
+    return "\n".join(f"[{stamp}] {fact}" for stamp, fact in facts)
+
+
+def format_memory(summary: Optional[Tuple[str, str, int]], facts: List[Tuple[str, str]]) -> str:
+    """
+    :param summary: Optional (summary, time stamp of the last folded fact, number of folded facts) of a topic
+    :param facts: List of (time stamp, fact) tuples of the recent facts of the topic, oldest first
+    :return: The memory string of the topic: a line with the summary of the older facts, if any,
+        followed by the recent facts
+    """
+    lines: List[str] = []
+    if summary:
+        lines.append(f"[{summary[1]}] Summary of {summary[2]} earlier facts: {summary[0]}")
+    if facts:
+        lines.append(format_facts(facts))
+    return "\n".join(lines)
+
+
+def parse_facts(memory: str) -> List[Tuple[str, str]]:
+    """
+    :param memory: Memory string of a topic, as returned by format_facts()
+    :return: List of (time stamp, fact) tuples. Lines that do not start with a time stamp
+        continue the fact of the previous line.
+    """
+    facts: List[Tuple[str, str]] = []
+    for line in memory.split("\n"):
+        match = re.match(FACT_LINE_PATTERN, line)
+        if match:
+            facts.append((match.group(1), match.group(2)))
+        elif facts:
+            facts[-1] = (facts[-1][0], f"{facts[-1][1]}\n{line}")
+        elif line:
+            facts.append(("", line))
+    return facts
+
+
+class Summarizer(ABC):  # pylint: disable=too-few-public-methods
+    """
+    Folds the older facts of a topic into its summary.
+    """
+
+    @abstractmethod
+    def summarize(self, topic: str, summary: Optional[str], facts: List[Tuple[str, str]]) -> str:
+        """
+        :param topic: Topic of the facts
+        :param summary: Current summary of the topic, None if there is none yet
+        :param facts: List of (time stamp, fact) tuples to fold into the summary, oldest first
+        :return: The new summary of the topic, of at most MAX_SUMMARY_CHARS characters
+        """
+
+
+class TruncatingSummarizer(Summarizer):  # pylint: disable=too-few-public-methods
+    """
+    Deterministic summarizer that needs no model: the summary is a single line of the entries of the current summary
+    followed by the time stamped facts, separated by " | ", from which the oldest entries are dropped to keep it
+    within MAX_SUMMARY_CHARS characters.
+    """
+
+    SEPARATOR = " | "
+
+    def summarize(self, topic: str, summary: Optional[str], facts: List[Tuple[str, str]]) -> str:
+        entries: List[str] = summary.split(self.SEPARATOR) if summary else []
+        entries.extend(f"[{stamp}] {fact}".replace("\n", " ") for stamp, fact in facts)
+        length: int = sum(len(entry) for entry in entries) + len(self.SEPARATOR) * (len(entries) - 1)
+        dropped: int = 0
+        while len(entries) - dropped > 1 and length > MAX_SUMMARY_CHARS:
+            length -= len(entries[dropped]) + len(self.SEPARATOR)
+            dropped += 1
+        return self.SEPARATOR.join(entries[dropped:])[-MAX_SUMMARY_CHARS:]
+
+
+class LlmSummarizer(Summarizer):  # pylint: disable=too-few-public-methods
+    """
+    Summarizer asking an LLM to rewrite the summary of a topic with the new facts.
+    """
+
+    def __init__(self, llm: BaseChatModel = None):
+        """
+        Constructor
+
+        :param llm: Chat model writing the summaries, SUMMARY_MODEL of OpenAI by default
+        """
+        self.llm: BaseChatModel = llm or ChatOpenAI(model=SUMMARY_MODEL, temperature=0)
+
+    def summarize(self, topic: str, summary: Optional[str], facts: List[Tuple[str, str]]) -> str:
+        prompt: str = SUMMARY_PROMPT.format(
+            topic=topic, max_chars=MAX_SUMMARY_CHARS, summary=summary or "(none)", facts=format_facts(facts)
+        )
+        return str(self.llm.invoke(prompt).content).strip()[:MAX_SUMMARY_CHARS]
+
+
+SUMMARIZERS: Dict[str, type] = {"llm": LlmSummarizer, "truncate": TruncatingSummarizer}
+
+
+def memory_summarizer() -> Summarizer:
+    """
+    :return: The MEMORY_SUMMARIZER summarizer
+    """
+    return SUMMARIZERS[MEMORY_SUMMARIZER]()
+
+
+class TopicMemoryStore:
+    """
+    Long term topic memory in a SQLite database.
+
+    Topics are kept in a table with a unique index on their name, so a topic is found in O(log n),
+    and every fact is a row of its own, indexed by topic. Committing a fact inserts one row instead of
+    rewriting the whole memory, and recalling a topic reads the facts of that topic only.
+
+    Facts are embedded in the order they were committed, so the facts still to embed are those after the last
+    embedded one, found in O(log n). Their embeddings are kept in the database and, for searching, in an in-memory
+    matrix that is extended with the embeddings added since the previous search, by this or any other process.
+    Only the RECENT_FACTS_WINDOW most recent facts of a topic are kept as they were committed: compacting a topic
+    folds the older ones into its summary and deletes them, so both the database and the memory string returned
+    for a topic stay bounded.
+
+    Every write is a transaction that takes the write lock of the database up front, so the writes of the threads
+    and processes sharing a database are serialized by SQLite, a write waits up to MEMORY_BUSY_TIMEOUT for the others,
+    and a write is either committed whole or not at all. Readers are not blocked by the writer.
+
+    With write-behind, committed facts are appended to a buffer that WRITE_BEHIND_FLUSHER writes to the database
+    in batches, so committing costs the same whatever the size of the memory. Recalling a topic and listing topics
+    include the buffered facts, and the operations working on the database, such as searching or compacting,
+    flush the buffer first. The store is thread-safe.
+    """
+
+    def __init__(self, path: str, legacy_path: str = None, write_behind: bool = False):
+        """
+        Constructor
+
+        :param path: Path of the database file, ":memory:" for a store that is not persisted
+        :param legacy_path: Optional JSON file of topic memory strings imported when the database is created
+        :param write_behind: True to buffer the committed facts and write them in the background
+        :raises ValueError: If MEMORY_SYNCHRONOUS is not a SQLite synchronous level
+        """
+        if MEMORY_SYNCHRONOUS.upper() not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"MEMORY_SYNCHRONOUS must be one of {SYNCHRONOUS_LEVELS}, not {MEMORY_SYNCHRONOUS}")
+        self.path: str = path
+        self.write_behind: bool = write_behind
+        self.lock = threading.Lock()
+        # List of (topic, time stamp, fact) tuples committed but not written to the database yet, oldest first
+        self.buffer: List[Tuple[str, str, str]] = []
+        # Maps embedding model to {"ids": <fact ids>, "matrix": <normalized embeddings>} of the embedded facts
+        self.vectors: Dict[str, Dict[str, np.ndarray]] = {}
+        created: bool = path == ":memory:" or not os.path.exists(path)
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(
+            path, timeout=MEMORY_BUSY_TIMEOUT, check_same_thread=False, isolation_level=None
+        )
+        if path != ":memory:":
+            # Readers do not block the writer, and commits do not wait for a checkpoint
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(f"PRAGMA synchronous={MEMORY_SYNCHRONOUS.upper()}")
+        self.connection.executescript(SCHEMA)
+        if created and legacy_path and os.path.exists(legacy_path):
+            # Another process creating the database at the same time may have imported it already
+            self.import_json(legacy_path, only_if_empty=True)
+
+    def import_json(self, legacy_path: str, only_if_empty: bool = False):
+        """
+        Import the topic memory of a JSON file mapping topics to memory strings.
+
+        :param legacy_path: Path of the JSON file
+        :param only_if_empty: True to import only into a store without topics
+        """
+        with open(legacy_path, "r", encoding="utf-8") as file:
+            content: str = file.read()
+        memory: Dict[str, str] = json.loads(content) if content else {}
+        with self.lock, self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            if only_if_empty and self.connection.execute("SELECT 1 FROM topics LIMIT 1").fetchone():
+                return
+            for topic, topic_memory in memory.items():
+                topic_id: int = self._topic_id(topic)
+                self.connection.executemany(
+                    "INSERT INTO facts (topic_id, time_stamp, fact) VALUES (?, ?, ?)",
+                    [(topic_id, stamp, fact) for stamp, fact in parse_facts(topic_memory or "")],
+                )
+        logging.getLogger(self.__class__.__name__).info(
+            "Imported %d topics from %s into %s", len(memory), legacy_path, self.path
+        )
+
+    def add_fact(self, topic: str, fact: str, stamp: str = None) -> str:
+        """
+        :param topic: Topic to store the fact under
+        :param fact: The new fact to remember
+        :param stamp: Time stamp of the fact, now by default
+        :return: The memory string of the topic, including the new fact
+        """
+        if not self.write_behind:
+            with self.lock, self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                topic_id: int = self._topic_id(topic)
+                self.connection.execute(
+                    "INSERT INTO facts (topic_id, time_stamp, fact) VALUES (?, ?, ?)",
+                    (topic_id, stamp or time_stamp(), fact),
+                )
+                return self._memory(topic_id)
+        with self.lock:
+            self.buffer.append((topic, stamp or time_stamp(), fact))
+            full: bool = len(self.buffer) >= MEMORY_FLUSH_SIZE
+            memory: str = self._memory(self._existing_topic_id(topic), topic)
+        WRITE_BEHIND_FLUSHER.schedule(self, full)
+        return memory
+
+    def flush(self) -> List[str]:
+        """
+        Write the buffered facts to the database, in a single transaction.
+
+        :return: The topics of the facts written
+        """
+        with self.lock:
+            if not self.buffer:
+                return []
+            with self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                topic_ids: Dict[str, int] = {}
+                for topic, _, _ in self.buffer:
+                    if topic not in topic_ids:
+                        topic_ids[topic] = self._topic_id(topic)
+                self.connection.executemany(
+                    "INSERT INTO facts (topic_id, time_stamp, fact) VALUES (?, ?, ?)",
+                    [(topic_ids[topic], stamp, fact) for topic, stamp, fact in self.buffer],
+                )
+            self.buffer = []
+            return list(topic_ids)
+
+    def maintain(self, topics: List[str]):
+        """
+        Embed the facts not embedded yet if SEMANTIC_MEMORY is set, and compact the given topics if they need it.
+        Failures are logged, and the facts and topics are processed again the next time.
+
+        :param topics: Topics facts were just committed to
+        """
+        logger = logging.getLogger(self.__class__.__name__)
+        if SEMANTIC_MEMORY:
+            try:
+                self.embed_pending(memory_embeddings())
+            except Exception as exception:  # pylint: disable=broad-exception-caught
+                logger.warning("Could not embed the new facts of %s: %s", self.path, exception)
+        for topic in topics:
+            try:
+                if self.needs_compaction(topic):
+                    folded: int = self.compact(topic, memory_summarizer())
+                    logger.info("Folded %d facts into the summary of %s", folded, topic)
+            except Exception as exception:  # pylint: disable=broad-exception-caught
+                logger.warning("Could not compact the memory of %s: %s", topic, exception)
+
+    def recall(self, topic: str) -> Optional[str]:
+        """
+        :param topic: Topic to retrieve the facts of
+        :return: The memory string of the topic: its summary, if any, and its RECENT_FACTS_WINDOW most recent facts,
+            or None if there is no such topic
+        """
+        with self.lock:
+            topic_id: Optional[int] = self._existing_topic_id(topic)
+            if topic_id is None and all(buffered[0] != topic for buffered in self.buffer):
+                return None
+            return self._memory(topic_id, topic)
+
+    def needs_compaction(self, topic: str) -> bool:
+        """
+        :param topic: Topic to check
+        :return: True if the topic has more than COMPACTION_BATCH facts beyond its RECENT_FACTS_WINDOW most recent ones
+        """
+        self.flush()
+        with self.lock:
+            return bool(
+                self.connection.execute(
+                    "SELECT 1 FROM facts JOIN topics ON topics.id = facts.topic_id WHERE topics.name = ? "
+                    "ORDER BY facts.id DESC LIMIT 1 OFFSET ?",
+                    (topic, RECENT_FACTS_WINDOW + COMPACTION_BATCH),
+                ).fetchone()
+            )
+
+    def compact(self, topic: str, summarizer: Summarizer) -> int:
+        """
+        Fold the facts of a topic older than its RECENT_FACTS_WINDOW most recent ones into its summary,
+        and delete them. The summarizer is called outside of any transaction, and the result is dropped
+        if another thread or process compacted the topic in the meantime.
+
+        :param topic: Topic to compact
+        :param summarizer: Summarizer folding the facts into the summary
+        :return: Number of facts folded into the summary
+        """
+        self.flush()
+        with self.lock:
+            topic_row: Optional[Tuple[Any, ...]] = self.connection.execute(
+                "SELECT id FROM topics WHERE name = ?", (topic,)
+            ).fetchone()
+            if topic_row is None:
+                return 0
+            topic_id: int = topic_row[0]
+            summary: Optional[Tuple[str, str, int, int]] = self._summary(topic_id)
+            older: List[Tuple[int, str, str]] = self.connection.execute(
+                "SELECT id, time_stamp, fact FROM facts WHERE topic_id = ? ORDER BY id DESC LIMIT -1 OFFSET ?",
+                (topic_id, RECENT_FACTS_WINDOW),
+            ).fetchall()[::-1]
+        if not older:
+            return 0
+        new_summary: str = summarizer.summarize(topic, summary[0] if summary else None, [row[1:] for row in older])
+        new_summary = new_summary[:MAX_SUMMARY_CHARS]
+        with self.lock, self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            if self._summary(topic_id) != summary:
+                return 0
+            last_id: int = older[-1][0]
+            self.connection.execute(
+                "DELETE FROM fact_embeddings WHERE fact_id IN (SELECT id FROM facts WHERE topic_id = ? AND id <= ?)",
+                (topic_id, last_id),
+            )
+            self.connection.execute("DELETE FROM facts WHERE topic_id = ? AND id <= ?", (topic_id, last_id))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO topic_summaries (topic_id, summary, time_stamp, folded_facts, folded_bytes) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    topic_id,
+                    new_summary,
+                    older[-1][1],
+                    (summary[2] if summary else 0) + len(older),
+                    (summary[3] if summary else 0) + sum(len(fact.encode("utf-8")) for _, _, fact in older),
+                ),
+            )
+            # The embeddings of the folded facts are gone
+            self.vectors.clear()
+        return len(older)
+
+    def compact_all(self, summarizer: Summarizer) -> Dict[str, int]:
+        """
+        Compact every topic with more facts than RECENT_FACTS_WINDOW.
+
+        :param summarizer: Summarizer folding the facts into the summaries
+        :return: Dictionary mapping the compacted topics to the number of facts folded into their summary
+        """
+        self.flush()
+        with self.lock:
+            topics: List[str] = [
+                row[0]
+                for row in self.connection.execute(
+                    "SELECT topics.name FROM topics JOIN facts ON facts.topic_id = topics.id "
+                    "GROUP BY topics.id HAVING COUNT(*) > ?",
+                    (RECENT_FACTS_WINDOW,),
+                )
+            ]
+        folded: Dict[str, int] = {topic: self.compact(topic, summarizer) for topic in topics}
+        return {topic: count for topic, count in folded.items() if count}
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        :return: Size statistics of the memory: numbers of topics, facts and summaries, bytes of the facts kept
+            and of the summaries, number and bytes of the facts folded into summaries, the largest number of facts
+            kept for a topic, and the size of the database file. Buffered facts are counted once written.
+        """
+        self.flush()
+        with self.lock:
+            topics: int = self.connection.execute("SELECT COUNT(*) FROM topics").fetchone()[0]
+            facts, fact_bytes, max_topic_facts = self.connection.execute(
+                "SELECT COALESCE(SUM(count), 0), COALESCE(SUM(bytes), 0), COALESCE(MAX(count), 0) FROM ("
+                "SELECT COUNT(*) AS count, SUM(LENGTH(CAST(fact AS BLOB))) AS bytes FROM facts GROUP BY topic_id)"
+            ).fetchone()
+            summaries, summary_bytes, folded_facts, folded_bytes = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(summary AS BLOB))), 0), "
+                "COALESCE(SUM(folded_facts), 0), COALESCE(SUM(folded_bytes), 0) FROM topic_summaries"
+            ).fetchone()
+            page_count: int = self.connection.execute("PRAGMA page_count").fetchone()[0]
+            page_size: int = self.connection.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            "topics": topics,
+            "facts": facts,
+            "fact_bytes": fact_bytes,
+            "max_topic_facts": max_topic_facts,
+            "summaries": summaries,
+            "summary_bytes": summary_bytes,
+            "folded_facts": folded_facts,
+            "folded_bytes": folded_bytes,
+            "database_bytes": page_count * page_size,
+        }
+
+    def topics(self) -> List[str]:
+        """
+        :return: The sorted list of all topics
+        """
+        with self.lock:
+            topics: List[str] = [row[0] for row in self.connection.execute("SELECT name FROM topics")]
+            return sorted(set(topics).union(topic for topic, _, _ in self.buffer))
+
+    def is_empty(self) -> bool:
+        """
+        :return: True if there are no topics yet
+        """
+        with self.lock:
+            return not self.buffer and self.connection.execute("SELECT 1 FROM topics LIMIT 1").fetchone() is None
+
+    def embed_pending(self, embeddings: Embeddings) -> int:
+        """
+        Embed the facts committed since the last embedded one, in batches of EMBEDDING_BATCH_SIZE.
+        Right after a commit, that is the new fact only.
+
+        :param embeddings: Embeddings of the facts
+        :return: Number of facts embedded
+        """
+        self.flush()
+        model: str = embedding_model_name(embeddings)
+        embedded: int = 0
+        while True:
+            with self.lock:
+                pending: List[Tuple[int, str, str]] = self.connection.execute(
+                    "SELECT facts.id, topics.name, facts.fact FROM facts JOIN topics ON topics.id = facts.topic_id "
+                    "WHERE facts.id > (SELECT COALESCE(MAX(fact_id), 0) FROM fact_embeddings WHERE model = ?) "
+                    "ORDER BY facts.id LIMIT ?",
+                    (model, EMBEDDING_BATCH_SIZE),
+                ).fetchall()
+            if not pending:
+                return embedded
+            vectors: List[List[float]] = embeddings.embed_documents([f"{topic}: {fact}" for _, topic, fact in pending])
+            with self.lock, self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO fact_embeddings (model, fact_id, vector) VALUES (?, ?, ?)",
+                    [
+                        (model, fact_id, np.asarray(vector, dtype=np.float32).tobytes())
+                        for (fact_id, _, _), vector in zip(pending, vectors)
+                    ],
+                )
+            embedded += len(pending)
+
+    def search(self, embeddings: Embeddings, query: str, k: int = DEFAULT_RECALL_K) -> List[Tuple[str, str, str]]:
+        """
+        :param embeddings: Embeddings of the facts and of the query
+        :param query: What to recall
+        :param k: Number of facts to return
+        :return: List of (time stamp, topic, fact) tuples of the k facts most similar to the query,
+            across all topics, most similar first
+        """
+        self.embed_pending(embeddings)
+        model: str = embedding_model_name(embeddings)
+        query_vector: np.ndarray = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+        query_vector /= max(float(np.linalg.norm(query_vector)), 1e-12)
+        with self.lock:
+            while True:
+                vectors: Dict[str, np.ndarray] = self._refresh_vectors(model)
+                if len(vectors["ids"]) == 0 or k <= 0:
+                    return []
+                scores: np.ndarray = vectors["matrix"] @ query_vector
+                top: np.ndarray = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+                ranked_ids: List[int] = [int(vectors["ids"][row]) for row in top[np.argsort(-scores[top])]]
+                rows: Dict[int, Tuple[str, str, str]] = {
+                    row[0]: row[1:]
+                    for row in self.connection.execute(
+                        "SELECT facts.id, facts.time_stamp, topics.name, facts.fact FROM facts JOIN topics "
+                        f"ON topics.id = facts.topic_id WHERE facts.id IN ({','.join('?' * len(ranked_ids))})",
+                        ranked_ids,
+                    )
+                }
+                if len(rows) == len(ranked_ids):
+                    return [rows[fact_id] for fact_id in ranked_ids]
+                # Facts were folded into summaries by another process: reload the embeddings left
+                self.vectors.pop(model)
+
+    def close(self):
+        """
+        Write the buffered facts and close the database.
+        """
+        self.flush()
+        with self.lock:
+            self.connection.close()
+
+    def _refresh_vectors(self, model: str) -> Dict[str, np.ndarray]:
+        vectors: Dict[str, np.ndarray] = self.vectors.setdefault(
+            model, {"ids": np.zeros(0, dtype=np.int64), "matrix": np.zeros((0, 0), dtype=np.float32)}
+        )
+        last_id: int = int(vectors["ids"][-1]) if len(vectors["ids"]) else 0
+        rows: List[Tuple[int, bytes]] = self.connection.execute(
+            "SELECT fact_id, vector FROM fact_embeddings WHERE model = ? AND fact_id > ? ORDER BY fact_id",
+            (model, last_id),
+        ).fetchall()
+        if rows:
+            matrix: np.ndarray = np.stack([np.frombuffer(vector, dtype=np.float32) for _, vector in rows])
+            matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            vectors["ids"] = np.concatenate([vectors["ids"], np.array([fact_id for fact_id, _ in rows], np.int64)])
+            vectors["matrix"] = np.vstack([vectors["matrix"], matrix]) if len(vectors["matrix"]) else matrix
+        return vectors
+
+    def _topic_id(self, topic: str) -> int:
+        self.connection.execute("INSERT OR IGNORE INTO topics (name) VALUES (?)", (topic,))
+        return self.connection.execute("SELECT id FROM topics WHERE name = ?", (topic,)).fetchone()[0]
+
+    def _summary(self, topic_id: int) -> Optional[Tuple[str, str, int, int]]:
+        return self.connection.execute(
+            "SELECT summary, time_stamp, folded_facts, folded_bytes FROM topic_summaries WHERE topic_id = ?",
+            (topic_id,),
+        ).fetchone()
+
+    def _existing_topic_id(self, topic: str) -> Optional[int]:
+        row: Optional[Tuple[Any, ...]] = self.connection.execute(
+            "SELECT id FROM topics WHERE name = ?", (topic,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _memory(self, topic_id: Optional[int], topic: str = None) -> str:
+        facts: List[Tuple[str, str]] = []
+        summary: Optional[Tuple[str, str, int, int]] = None
+        if topic_id is not None:
+            facts = self.connection.execute(
+                "SELECT time_stamp, fact FROM (SELECT id, time_stamp, fact FROM facts WHERE topic_id = ? "
+                "ORDER BY id DESC LIMIT ?) ORDER BY id",
+                (topic_id, RECENT_FACTS_WINDOW),
+            ).fetchall()
+            summary = self._summary(topic_id)
+        if topic is not None:
+            facts.extend((stamp, fact) for buffered, stamp, fact in self.buffer if buffered == topic)
+        return format_memory(summary[:3] if summary else None, facts[-RECENT_FACTS_WINDOW:])
+
+
+class SlyDataTopicMemory:
+    """
+    Topic memory kept in the sly data of a session only, as a dictionary mapping topics to memory strings,
+    with the same interface as TopicMemoryStore.
+    """
+
+    def __init__(self, sly_data: Dict[str, Any]):
+        """
+        Constructor
+
+        :param sly_data: Sly data of the session, holding the memory under MEMORY_DATA_STRUCTURE
+        """
+        self.topic_memory: Dict[str, str] = sly_data.setdefault(MEMORY_DATA_STRUCTURE, {})
+        self.write_behind: bool = False
+
+    def add_fact(self, topic: str, fact: str, stamp: str = None) -> str:
+        """
+        :param topic: Topic to store the fact under
+        :param fact: The new fact to remember
+        :param stamp: Time stamp of the fact, now by default
+        :return: The memory string of the topic, including the new fact
+        """
+        line: str = format_facts([(stamp or time_stamp(), fact)])
+        previous: str = self.topic_memory.get(topic)
+        self.topic_memory[topic] = f"{previous}\n{line}" if previous else line
+        return self.topic_memory[topic]
+
+    def recall(self, topic: str) -> Optional[str]:
+        """
+        :param topic: Topic to retrieve the facts of
+        :return: The memory string of the topic, or None if there is no such topic
+        """
+        return self.topic_memory.get(topic)
+
+    def topics(self) -> List[str]:
+        """
+        :return: The sorted list of all topics
+        """
+        return sorted(self.topic_memory)
+
+    def is_empty(self) -> bool:
+        """
+        :return: True if there are no topics yet
+        """
+        return not self.topic_memory
+
+    def embed_pending(self, embeddings: Embeddings) -> int:  # pylint: disable=unused-argument
+        """
+        The facts of the session are not embedded.
+
+        :param embeddings: Embeddings of the facts
+        :return: 0
+        """
+        return 0
+
+    def maintain(self, topics: List[str]):
+        """
+        The memory of a session is neither embedded nor compacted.
+
+        :param topics: Topics facts were just committed to
+        """
+
+    def needs_compaction(self, topic: str) -> bool:  # pylint: disable=unused-argument
+        """
+        The memory of a session lasts as long as the session, and is not compacted.
+
+        :param topic: Topic to check
+        :return: False
+        """
+        return False
+
+    def search(self, embeddings: Embeddings, query: str, k: int = DEFAULT_RECALL_K) -> List[Tuple[str, str, str]]:
+        """
+        :raises ValueError: Always, semantic recall needs the long term memory
+        """
+        raise ValueError("Semantic recall needs the long term memory (LONG_TERM_MEMORY_FILE)")
+
+
+class WriteBehindFlusher:
+    """
+    Background thread writing the buffered facts of the stores of this process to their databases,
+    then embedding and compacting them.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.condition = threading.Condition()
+        # Maps stores with buffered facts to (time their oldest buffered fact was, True to write them now)
+        self.dirty: Dict[TopicMemoryStore, Tuple[float, bool]] = {}
+        # Stores being written by the flusher thread
+        self.flushing: List[TopicMemoryStore] = []
+        self.thread: Optional[threading.Thread] = None
+
+    def schedule(self, store: TopicMemoryStore, now: bool = False):
+        """
+        :param store: Store with buffered facts, written MEMORY_FLUSH_INTERVAL seconds after the first of them
+        :param now: True to write them now
+        """
+        with self.condition:
+            since, already_now = self.dirty.get(store, (time.monotonic(), False))
+            self.dirty[store] = (since, already_now or now)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name="WriteBehindFlusher", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def run(self):
+        """
+        Write the buffered facts of the stores when they are due.
+        """
+        while True:
+            with self.condition:
+                due: List[TopicMemoryStore] = self._due()
+                while not due:
+                    deadline: float = min(since for since, _ in self.dirty.values()) if self.dirty else 0
+                    self.condition.wait(deadline + MEMORY_FLUSH_INTERVAL - time.monotonic() if self.dirty else None)
+                    due = self._due()
+                for store in due:
+                    del self.dirty[store]
+                self.flushing = due
+            for store in due:
+                try:
+                    store.maintain(store.flush())
+                except Exception as exception:  # pylint: disable=broad-exception-caught
+                    logging.getLogger(self.__class__.__name__).warning(
+                        "Could not write the buffered facts of %s: %s", store.path, exception
+                    )
+                    self.schedule(store)
+            with self.condition:
+                self.flushing = []
+
+    def flush_all(self):
+        """
+        Write the buffered facts of all stores now, as when the process exits.
+        Stores the flusher thread is writing are waited for.
+        """
+        with self.condition:
+            stores: List[TopicMemoryStore] = list(self.dirty) + self.flushing
+            self.dirty.clear()
+        for store in stores:
+            store.flush()
+
+    def _due(self) -> List[TopicMemoryStore]:
+        now: float = time.monotonic()
+        return [
+            store for store, (since, urgent) in self.dirty.items() if urgent or now - since >= MEMORY_FLUSH_INTERVAL
+        ]
+
+
+# Flusher of the buffered facts of all stores of this process
+WRITE_BEHIND_FLUSHER = WriteBehindFlusher()
+atexit.register(WRITE_BEHIND_FLUSHER.flush_all)
+
+# Stores opened by this process, by path, shared by all sessions, least recently used first
+TOPIC_MEMORY_STORES: Dict[str, TopicMemoryStore] = OrderedDict()
+TOPIC_MEMORY_STORES_LOCK = threading.Lock()
+# All the stores of this process still in use, including those evicted from TOPIC_MEMORY_STORES, so that
+# a database is never opened twice by the process while a session, or the flusher, is using it
+LIVE_TOPIC_MEMORY_STORES: Dict[str, TopicMemoryStore] = weakref.WeakValueDictionary()
+
+
+def get_topic_memory_store(path: str = MEMORY_STORE_FILE, legacy_path: str = LEGACY_MEMORY_FILE) -> TopicMemoryStore:
+    """
+    :param path: Path of the database file
+    :param legacy_path: JSON file of earlier versions imported when the database is created
+    :return: The store of this process for the database file
+    """
+    key: str = os.path.abspath(path)
+    with TOPIC_MEMORY_STORES_LOCK:
+        if key in TOPIC_MEMORY_STORES:
+            TOPIC_MEMORY_STORES.move_to_end(key)
+        else:
+            store: Optional[TopicMemoryStore] = LIVE_TOPIC_MEMORY_STORES.get(key)
+            if store is None:
+                store = TopicMemoryStore(path, legacy_path, WRITE_BEHIND_MEMORY)
+                LIVE_TOPIC_MEMORY_STORES[key] = store
+            TOPIC_MEMORY_STORES[key] = store
+            # Evicted stores are not closed here, as sessions may still be using them: their connection is
+            # closed when the last session using them, and the flusher writing their buffered facts, are done.
+            while len(TOPIC_MEMORY_STORES) > max(MAX_OPEN_MEMORY_STORES, 1):
+                TOPIC_MEMORY_STORES.popitem(last=False)
+        return TOPIC_MEMORY_STORES[key]
+
+
+def memory_shard_path(sly_data: Dict[str, Any]) -> Optional[str]:
+    """
+    :param sly_data: Sly data of the session
+    :return: Path of the database of the memory shard named by the first MEMORY_SHARD_KEYS key of the sly data,
+        or None if there is none. The file name is the ID made safe for file systems, followed by a hash of the ID
+        so that IDs made the same do not share a shard.
+    """
+    for key in MEMORY_SHARD_KEYS:
+        shard_id: Any = sly_data.get(key)
+        if shard_id is None or str(shard_id) == "":
+            continue
+        name: str = re.sub(r"[^A-Za-z0-9_-]+", "_", str(shard_id))[:64]
+        digest: str = hashlib.sha256(str(shard_id).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(MEMORY_SHARDS_DIR, key, f"{name}-{digest}.sqlite")
+    return None
+
+
+def get_topic_memory(sly_data: Dict[str, Any]):
+    """
+    :param sly_data: Sly data of the session
+    :return: The long term memory store of the shard of the session if LONG_TERM_MEMORY_FILE is set,
+        else the memory of the session
+    """
+    if not LONG_TERM_MEMORY_FILE:
+        return SlyDataTopicMemory(sly_data)
+    shard_path: Optional[str] = memory_shard_path(sly_data)
+    if shard_path:
+        return get_topic_memory_store(shard_path, None)
+    return get_topic_memory_store(MEMORY_STORE_FILE, LEGACY_MEMORY_FILE)
+
+
+def memory_store_paths() -> List[str]:
+    """
+    :return: Paths of the existing databases: the shared memory and the shards
+    """
+    paths: List[str] = [MEMORY_STORE_FILE] if os.path.exists(MEMORY_STORE_FILE) else []
+    return paths + sorted(glob.glob(os.path.join(MEMORY_SHARDS_DIR, "*", "*.sqlite")))
+
+
+def main():
+    """
+    Compact the long term memories, or report their size statistics.
+
+    Examples, from the directory the agents run in:
+        python -m coded_tools.kwik_agents.topic_memory_store stats
+        python -m coded_tools.kwik_agents.topic_memory_store compact --summarizer truncate
+    """
+    parser = argparse.ArgumentParser(description="Compact the topic memories of the kwik agents")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("paths", nargs="*", help="databases to process, the shared memory and all shards by default")
+    parser.add_argument("--summarizer", choices=sorted(SUMMARIZERS), default=MEMORY_SUMMARIZER)
+    args = parser.parse_args()
+
+    result: Dict[str, Any] = {}
+    summarizer: Optional[Summarizer] = SUMMARIZERS[args.summarizer]() if args.command == "compact" else None
+    for path in args.paths or memory_store_paths():
+        store = TopicMemoryStore(path)
+        result[path] = {"folded": store.compact_all(summarizer)} if summarizer else {}
+        result[path]["stats"] = store.stats()
+        store.close()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
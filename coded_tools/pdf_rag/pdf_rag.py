@@ -11,24 +11,48 @@
 #
 # END COPYRIGHT
 
+import asyncio
 import os
-import re
 from typing import Any
 from typing import Dict
 from typing import List
 
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain_community.vectorstores import InMemoryVectorStore
 from langchain_core.documents import Document
-from langchain_core.vectorstores.base import VectorStoreRetriever
 from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_text_splitters import TextSplitter
 from neuro_san.interfaces.coded_tool import CodedTool
 
-INVALID_PATH_PATTERN = r"[<>:\"|?*\x00-\x1F]"
-
-
-class PdfRag(CodedTool):
+from coded_tools.rag_index.batch_embedder import EMBEDDING_ARGS
+from coded_tools.rag_index.batch_embedder import BatchEmbedder
+from coded_tools.rag_index.chunking import chunking_settings
+from coded_tools.rag_index.chunking import make_text_splitter
+from coded_tools.rag_index.context_packing import DEFAULT_CONTEXT_TOKEN_BUDGET
+from coded_tools.rag_index.context_packing import PACKING_CANDIDATES_FACTOR
+from coded_tools.rag_index.context_packing import SPAN_SEPARATOR
+from coded_tools.rag_index.context_packing import pack_context
+from coded_tools.rag_index.hybrid_search import aretrieve
+from coded_tools.rag_index.hybrid_search import retrieval_kwargs
+from coded_tools.rag_index.incremental_index import IncrementalIndex
+from coded_tools.rag_index.index_cache import DEFAULT_INDEX_CACHE_DIR
+from coded_tools.rag_index.index_cache import IndexCache
+from coded_tools.rag_index.index_cache import content_key
+from coded_tools.rag_index.index_cache import read_source_bytes
+from coded_tools.rag_index.index_store import DEFAULT_INDEX_NAMESPACE
+from coded_tools.rag_index.index_store import INDEX_STORE
+from coded_tools.rag_index.index_store import QuotaExceededError
+from coded_tools.rag_index.index_store import resolve_vector_store_path
+from coded_tools.rag_index.ingestion import IngestionPipeline
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+from coded_tools.rag_index.numpy_vector_store import load_vector_store
+from coded_tools.rag_index.pdf_loader import ParallelPdfLoader
+from coded_tools.rag_index.registry import VECTOR_STORE_REGISTRY
+from coded_tools.rag_index.registry import registry_key
+
+# Number of chunks retrieved per query
+RETRIEVAL_K = 4
+
+
+class PdfRag(CodedTool):  # pylint: disable=too-many-instance-attributes
     """
     CodedTool implementation which provides a way to do RAG on pdf files
     """
@@ -36,6 +60,14 @@ class PdfRag(CodedTool):
     def __init__(self):
         self.save_vector_store: bool = False
         self.abs_vector_store_path: str = None
+        self.index_namespace: str = DEFAULT_INDEX_NAMESPACE
+        self.use_index_cache: bool = True
+        self.index_cache_dir: str = DEFAULT_INDEX_CACHE_DIR
+        self.incremental_index: bool = False
+        self.index_cache: IndexCache = None
+        self.embedding_args: Dict[str, Any] = {}
+        # Settings for splitting documents into chunks. These are part of the index cache key.
+        self.splitter_settings: Dict[str, Any] = chunking_settings()
 
     async def async_invoke(self, args: Dict[str, Any], sly_data: Dict[str, Any]) -> str:
         """
@@ -44,8 +76,33 @@ class PdfRag(CodedTool):
         :param args: Dictionary containing:
           "query": search string
           "urls": list of pdf files
-          "save_vector_store": save to JSON file if True
-          "vector_store_path": relative path to this file
+          "save_vector_store": save to vector_store_path if True
+          "vector_store_path": directory of the saved vector store, absolute or relative to this file,
+            or name of the vector store within its namespace when "index_namespace" is set
+          "index_namespace": tenant or agent network whose namespace of the index store holds the vector store,
+            within the quotas of the namespace (default RAG_INDEX_NAMESPACE, or "" for an unmanaged vector store)
+          "use_index_cache": reuse embedded chunks of unchanged pdf files (default True)
+          "index_cache_dir": directory of the content-addressed index cache
+          "incremental_index": keep the vector store at vector_store_path up to date
+            by re-embedding only added or changed pdf files (default True for managed vector stores, else False)
+          "share_vector_store": reuse the vector store built for the same pdf files and settings
+            by any session of this process (default True)
+          "embedding_batch_size", "embedding_concurrency", "embedding_tokens_per_minute",
+          "embedding_checkpoint_dir": override the defaults of the batched embedding stage
+          "chunking_profile": name of a chunking profile ("default", "compact" or "structured"), or a dictionary
+            of "chunk_size", "chunk_overlap", "splitter" and "structure" settings overriding those of the profile
+            named under "profile". Defaults to RAG_CHUNKING_PROFILE, or "default".
+          "semantic_cache_threshold": cosine similarity above which the results of a previous, similar
+            query are reused (default RAG_SEMANTIC_CACHE_THRESHOLD, 0 to always search)
+          "retrieval_mode": rank chunks by embedding similarity ("vector"), by BM25 keyword score ("keyword")
+            or by both fused by reciprocal rank ("hybrid"). Defaults to RAG_RETRIEVAL_MODE, or "vector".
+          "ann_index": "ivf" to search vector stores of at least RAG_ANN_MIN_CHUNKS chunks with an approximate
+            nearest neighbour index, "exact" to scan all chunks (default RAG_ANN_INDEX, or "exact")
+          "ann_n_probe": number of index lists probed per query, trading latency for recall
+            (default RAG_ANN_N_PROBE, or 32)
+          "context_token_budget": maximum number of tokens of the returned context. Overlapping chunks of a page
+            are always merged and near-duplicates dropped; with a budget, the best spans that fit are returned.
+            Defaults to RAG_CONTEXT_TOKEN_BUDGET, or 0 for no limit.
 
         :param sly_data: A dictionary whose keys are defined by the agent
             hierarchy, but whose values are meant to be kept out of the
@@ -67,39 +124,110 @@ class PdfRag(CodedTool):
         query: str = args.get("query", "")
         urls: List[str] = args.get("urls", [])
 
-        # Save the generated vector store as a JSON file if True
+        # Save the generated vector store to vector_store_path if True
         self.save_vector_store = args.get("save_vector_store", False)
 
         vector_store_path: str = args.get("vector_store_path", "")
 
-        if vector_store_path:
-            # Check for obviously invalid characters in filenames (basic check)
-            if re.search(INVALID_PATH_PATTERN, vector_store_path):
-                raise ValueError(f"Invalid vector_store_path: '{vector_store_path}'")
+        # Reuse the embeddings of pdf files whose content has been indexed before
+        self.use_index_cache = args.get("use_index_cache", True)
+        self.index_cache_dir = args.get("index_cache_dir", DEFAULT_INDEX_CACHE_DIR)
 
-            # Check file extension
-            if not vector_store_path.endswith(".json"):
-                raise ValueError(f"vector_store_path must be a .json file, got: '{vector_store_path}'")
+        # Tenant or agent network owning the vector store. Its persisted vector stores are kept in the
+        # directory of the namespace in the index store, within its quotas.
+        self.index_namespace = args.get("index_namespace", DEFAULT_INDEX_NAMESPACE)
 
-            if os.path.isabs(vector_store_path):
-                # It's already an absolute path — use it directly
-                self.abs_vector_store_path = vector_store_path
-            else:
-                # Combine to relative path to base path to make absolute path
-                base_path: str = os.path.dirname(__file__)
-                self.abs_vector_store_path = os.path.abspath(os.path.join(base_path, vector_store_path))
+        # Update the vector store at vector_store_path in place instead of loading it as-is.
+        # Managed vector stores are kept up to date by default, since they are loaded again after eviction.
+        self.incremental_index = args.get("incremental_index", bool(self.index_namespace and vector_store_path))
+
+        # Batch size, concurrency and rate limit of the embedding requests
+        self.embedding_args = {arg: value for arg, value in args.items() if arg in EMBEDDING_ARGS}
+
+        if vector_store_path:
+            self.abs_vector_store_path = resolve_vector_store_path(
+                vector_store_path, self.index_namespace, os.path.dirname(__file__)
+            )
 
         # Validate presence of required inputs
         if not query:
             return "Error: No query provided."
         if not urls:
             return "Error: No urls provided"
+        try:
+            retrieval_args: Dict[str, Any] = retrieval_kwargs(args)
+            self.splitter_settings = chunking_settings(args.get("chunking_profile"))
+        except ValueError as error:
+            return f"Error: {error}"
+
+        # Build the vector store, or share the one built by another session for the same pdf files and settings
+        try:
+            if args.get("share_vector_store", True):
+                vectorstore: NumpyVectorStore = await VECTOR_STORE_REGISTRY.get_or_build(
+                    self.vector_store_key(urls),
+                    lambda: self.generate_vector_store(urls),
+                    version=self.files_stamp(urls),
+                    namespace=self.index_namespace or None,
+                    namespace_max_bytes=self.namespace_memory_bytes(),
+                )
+            else:
+                vectorstore: NumpyVectorStore = await self.generate_vector_store(urls)
+        except QuotaExceededError as error:
+            return f"Error: {error}"
+        if self.index_namespace and self.abs_vector_store_path:
+            INDEX_STORE.record_access(self.abs_vector_store_path)
+        return await self.query_vectorstore(
+            vectorstore, query, retrieval_args, args.get("context_token_budget", DEFAULT_CONTEXT_TOKEN_BUDGET)
+        )
 
-        # Build the vector store and run the query
-        vectorstore: InMemoryVectorStore = await self.generate_vector_store(urls)
-        return await self.query_vectorstore(vectorstore, query)
+    def vector_store_key(self, urls: List[str]) -> str:
+        """
+        :param urls: List of pdf files
+        :return: Key of the vector store for these pdf files and the current settings in the shared registry
+        """
+        return registry_key(
+            "pdf_rag",
+            urls,
+            self.splitter_settings,
+            OpenAIEmbeddings().model,
+            self.abs_vector_store_path,
+            self.incremental_index,
+            self.index_namespace,
+        )
 
-    async def generate_vector_store(self, urls: List[str]) -> InMemoryVectorStore:
+    def namespace_memory_bytes(self) -> int:
+        """
+        :return: Share of the shared registry the namespace of the vector store may use, 0 for no limit
+        """
+        return INDEX_STORE.quota(self.index_namespace)["memory_bytes"] if self.index_namespace else 0
+
+    def check_quota(self, vectorstore: NumpyVectorStore):
+        """
+        :param vectorstore: Vector store about to be saved to abs_vector_store_path
+        :raises QuotaExceededError: If saving it would take the namespace of a managed vector store over its quotas
+        """
+        if self.index_namespace:
+            INDEX_STORE.check_quota(
+                self.index_namespace, self.abs_vector_store_path, len(vectorstore), vectorstore.nbytes
+            )
+
+    @staticmethod
+    def files_stamp(urls: List[str]) -> str:
+        """
+        :param urls: List of pdf files
+        :return: Size and modification time of the local pdf files, so that a shared vector store is rebuilt
+            as soon as one of them changes. Remote files are refreshed when the shared store expires.
+        """
+        stamps: List[str] = []
+        for url in urls:
+            try:
+                stat = os.stat(os.path.expanduser(url))
+                stamps.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+            except OSError:
+                stamps.append("")
+        return "|".join(stamps)
+
+    async def generate_vector_store(self, urls: List[str]) -> NumpyVectorStore:
         """
         Asynchronously loads web documents from given URLs, split them into
         chunks, and build an in-memory vector store using OpenAI embeddings
@@ -110,62 +238,249 @@ class PdfRag(CodedTool):
         """
 
         # If vector store file path is provided (abs_vector_store_path is not None), try to load vector store first.
-        if self.abs_vector_store_path:
+        if self.abs_vector_store_path and not self.incremental_index:
             try:
-                vectorstore = InMemoryVectorStore.load(path=self.abs_vector_store_path, embedding=OpenAIEmbeddings())
+                vectorstore = load_vector_store(self.abs_vector_store_path, OpenAIEmbeddings())
                 print(f"Loaded vector store from: {self.abs_vector_store_path}")
                 return vectorstore
             except FileNotFoundError:
                 print(f"Vector store not found. Creating from PDF: {urls}")
 
-        docs: List[Document] = []
-        for url in urls:
-            try:
-                loader = PyMuPDFLoader(file_path=url)
-                doc: List[Document] = await loader.aload()
-                docs.extend(doc)
-                print(f"Successfully load pdf file from {url}")
-            except FileNotFoundError:
-                print(f"File not found: {url}")
-            except ValueError as e:
-                print(f"Invalid file path or unsupported input: {url} – {e}")
-
-        # Split documents into smaller chunks for better embedding and
-        # retrieval
-        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=100, chunk_overlap=50)
-        doc_chunks: List[Document] = text_splitter.split_documents(docs)
-
-        # Create an in-memory vector store with embeddings
-        vectorstore: InMemoryVectorStore = await InMemoryVectorStore.afrom_documents(
-            documents=doc_chunks,
-            collection_name="rag-in-memory",
-            embedding=OpenAIEmbeddings(),
+        embeddings = BatchEmbedder.from_args(OpenAIEmbeddings(), self.embedding_args)
+        text_splitter: TextSplitter = make_text_splitter(self.splitter_settings)
+        self.index_cache = None
+        if self.use_index_cache:
+            self.index_cache = IndexCache(
+                cache_dir=self.index_cache_dir,
+                splitter_settings=self.splitter_settings,
+                embedding_model=embeddings.model,
+            )
+            os.makedirs(self.index_cache.cache_dir, exist_ok=True)
+
+        if self.incremental_index and self.abs_vector_store_path:
+            return await self.update_incremental_index(urls, text_splitter, embeddings)
+
+        # Create an in-memory vector store and fill it file by file,
+        # so that only the files missing from the index cache get embedded.
+        file_stores: Dict[str, NumpyVectorStore] = await self.generate_file_vector_stores(
+            await self.read_sources(urls), text_splitter, embeddings
         )
+        vectorstore = NumpyVectorStore(embedding=embeddings)
+        for url in urls:
+            if url in file_stores:
+                vectorstore.add_store(file_stores[url])
 
         if self.save_vector_store and self.abs_vector_store_path:
+            self.check_quota(vectorstore)
             os.makedirs(os.path.dirname(self.abs_vector_store_path), exist_ok=True)
-            vectorstore.dump(path=self.abs_vector_store_path)
+            vectorstore.dump(self.abs_vector_store_path)
             print(f"Vector store saved to: {self.abs_vector_store_path}")
 
         return vectorstore
 
-    async def query_vectorstore(self, vectorstore: InMemoryVectorStore, query: str) -> str:
+    async def update_incremental_index(
+        self, urls: List[str], text_splitter: TextSplitter, embeddings: BatchEmbedder
+    ) -> NumpyVectorStore:
+        """
+        Bring the persisted vector store at abs_vector_store_path up to date with the given pdf files.
+        Files are versioned by a hash of their content, so only added or changed files are
+        embedded again and the chunks of files no longer listed are deleted.
+
+        :param urls: List of URLs of the pdf files that should make up the index
+        :param text_splitter: Splitter used to chunk the pages of new or changed files
+        :param embeddings: Embeddings used for the chunks
+        :return: In-memory vector store containing the embedded chunks of all files
+        """
+        index = IncrementalIndex(self.abs_vector_store_path, embeddings)
+        if index.load():
+            print(f"Loaded vector store from: {self.abs_vector_store_path}")
+
+        versions: Dict[str, str] = {}
+        contents: Dict[str, bytes] = await self.read_sources(urls)
+        for url in urls:
+            if url in contents:
+                versions[url] = content_key(contents[url], self.splitter_settings, embeddings.model)
+            elif url in index.sources:
+                # Keep what was indexed before rather than dropping a file that is only temporarily unreachable
+                versions[url] = index.sources[url]["version"]
+
+        diff: Dict[str, List[str]] = index.diff(versions)
+        index.remove_sources(diff["removed"])
+        stale: List[str] = diff["added"] + diff["changed"]
+        file_stores: Dict[str, NumpyVectorStore] = await self.generate_file_vector_stores(
+            {url: contents[url] for url in stale}, text_splitter, embeddings
+        )
+        for url in stale:
+            if url in file_stores:
+                index.put_source(url, versions[url], file_stores[url])
+        print(
+            f"Incremental index update: {len(diff['added'])} added, {len(diff['changed'])} changed, "
+            f"{len(diff['removed'])} removed, {len(diff['unchanged'])} unchanged"
+        )
+
+        if diff["added"] or diff["changed"] or diff["removed"]:
+            self.check_quota(index.vectorstore)
+            index.save()
+            print(f"Vector store saved to: {self.abs_vector_store_path}")
+
+        return index.vectorstore
+
+    async def read_sources(self, urls: List[str]) -> Dict[str, bytes]:
+        """
+        Read the raw bytes of all pdf files concurrently.
+
+        :param urls: List of URLs or paths of the pdf files
+        :return: Mapping of URL to content for the files that could be read.
+            Files that could not be read are reported and left out.
+        """
+        results: List[Any] = await asyncio.gather(
+            *[asyncio.to_thread(read_source_bytes, url) for url in urls], return_exceptions=True
+        )
+        contents: Dict[str, bytes] = {}
+        for url, result in zip(urls, results):
+            if isinstance(result, FileNotFoundError):
+                print(f"File not found: {url}")
+            elif isinstance(result, (ValueError, OSError)):
+                print(f"Invalid file path or unsupported input: {url} – {result}")
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                contents[url] = result
+        return contents
+
+    async def generate_file_vector_stores(
+        self,
+        contents: Dict[str, bytes],
+        text_splitter: TextSplitter,
+        embeddings: BatchEmbedder,
+    ) -> Dict[str, NumpyVectorStore]:
+        """
+        Build one vector store per pdf file, loading the files already embedded with the same
+        settings from the index cache. The other files are parsed in parallel in a process pool.
+        Their pages are streamed through an IngestionPipeline as they are parsed, so chunks are
+        embedded in batches while the files are still being parsed, and memory is bounded by
+        the batch settings rather than by the size of the files.
+
+        :param contents: Mapping of URL to raw bytes of the pdf files
+        :param text_splitter: Splitter used to chunk the pages of the files
+        :param embeddings: Embeddings used for the chunks
+        :return: Mapping of URL to the vector store holding the embedded chunks of that one file.
+            Files that could not be parsed are reported and left out.
+        """
+        index_cache: IndexCache = self.index_cache
+        file_stores: Dict[str, NumpyVectorStore] = {}
+        keys: Dict[str, str] = {}
+        to_parse: Dict[str, bytes] = {}
+        for url, content in contents.items():
+            if index_cache is not None:
+                keys[url] = index_cache.content_key(content)
+                file_store: NumpyVectorStore = index_cache.load(keys[url], embeddings)
+                if file_store is not None:
+                    print(f"Loaded cached index of pdf file {url}")
+                    file_stores[url] = file_store
+                    continue
+            to_parse[url] = content
+
+        pipelines: Dict[str, IngestionPipeline] = {}
+        flushes: Dict[str, asyncio.Task] = {}
+        completed: bool = False
+        try:
+            async for event in ParallelPdfLoader().astream(to_parse):
+                url: str = event["source"]
+                if event["error"] is not None:
+                    print(f"Invalid file path or unsupported input: {url} – {event['error']}")
+                    if url in pipelines:
+                        pipelines.pop(url).cancel()
+                    continue
+                if url not in pipelines:
+                    pipelines[url] = IngestionPipeline(NumpyVectorStore(embedding=embeddings), text_splitter)
+                # Split the pages into smaller chunks for better embedding and retrieval, and embed them in batches
+                await pipelines[url].aadd_pages(event["pages"])
+                if event["done"]:
+                    print(f"Successfully load pdf file from {url}")
+                    flushes[url] = asyncio.create_task(pipelines[url].aflush())
+            completed = True
+        finally:
+            if not completed:
+                await self.acancel_ingestion(pipelines, flushes)
+
+        file_stores.update(await self.acollect_file_stores(pipelines, flushes, keys))
+        return file_stores
+
+    @staticmethod
+    async def acancel_ingestion(pipelines: Dict[str, IngestionPipeline], flushes: Dict[str, asyncio.Task]):
+        """
+        Stop the embedding of the files being ingested, so that no batch or flush is left running unobserved
+        when the ingestion fails.
+
+        :param pipelines: Mapping of URL to the ingestion pipeline of each file
+        :param flushes: Mapping of URL to the flush task of each file fully parsed
+        """
+        for url, pipeline in pipelines.items():
+            if url in flushes:
+                flushes[url].cancel()
+            else:
+                pipeline.cancel()
+        await asyncio.gather(*flushes.values(), return_exceptions=True)
+
+    async def acollect_file_stores(
+        self,
+        pipelines: Dict[str, IngestionPipeline],
+        flushes: Dict[str, asyncio.Task],
+        keys: Dict[str, str],
+    ) -> Dict[str, NumpyVectorStore]:
+        """
+        Wait for the flushes of all files, saving the vector store of every file embedded successfully
+        to the index cache, even if others failed.
+
+        :param pipelines: Mapping of URL to the ingestion pipeline of each file
+        :param flushes: Mapping of URL to the flush task of each file fully parsed
+        :param keys: Mapping of URL to the index cache key of each file
+        :return: Mapping of URL to the vector store of each file
+        :raises BaseException: The first error of the flushes that failed, once the others are saved
+        """
+        index_cache: IndexCache = self.index_cache
+        file_stores: Dict[str, NumpyVectorStore] = {}
+        results: List[Any] = await asyncio.gather(*flushes.values(), return_exceptions=True)
+        errors: List[BaseException] = []
+        for url, result in zip(flushes, results):
+            if isinstance(result, BaseException):
+                print(f"Failed to embed pdf file {url} – {result}")
+                errors.append(result)
+                continue
+            file_stores[url] = pipelines[url].vectorstore
+            if index_cache is not None:
+                index_cache.save(keys[url], file_stores[url])
+        if errors:
+            # The files embedded successfully are saved to the index cache, so only the failed ones are redone
+            raise errors[0]
+        return file_stores
+
+    async def query_vectorstore(
+        self,
+        vectorstore: NumpyVectorStore,
+        query: str,
+        retrieval_args: Dict[str, Any] = None,
+        context_token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET,
+    ) -> str:
         """
         Query the given vector store using the provided query string
-        and return the combined content of retrieved documents.
+        and return the retrieved documents, with overlapping chunks merged and duplicates removed.
 
         :param vectorstore: The in-memory vector store to query
         :param query: The user query to search for relevant documents
+        :param retrieval_args: Retrieval mode, semantic cache threshold and approximate index settings,
+            as keyword arguments of aretrieve()
+        :param context_token_budget: Maximum number of tokens of the returned text, 0 for no limit
         :return: Concatenated text content of the retrieved documents
         """
-        # Create a retriever interface from the vector store
-        retriever: VectorStoreRetriever = vectorstore.as_retriever()
-
-        # Perform an asynchronous similarity search
-        results: List[Document] = await retriever.ainvoke(query)
+        # Perform an asynchronous search, reusing the embedding of a query asked before.
+        # With a budget, extra chunks fill the room freed by merging and deduplication.
+        k: int = RETRIEVAL_K * PACKING_CANDIDATES_FACTOR if context_token_budget > 0 else RETRIEVAL_K
+        results: List[Document] = await aretrieve(vectorstore, query, k=k, **(retrieval_args or {}))
 
         if results:
             print("Retrieval completed!")
 
-        # Concatenate the content of all retrieved documents
-        return "\n\n".join(doc.page_content for doc in results)
+        # Merge overlapping chunks, drop near-duplicates and keep the best spans within the budget
+        return SPAN_SEPARATOR.join(doc.page_content for doc in pack_context(results, context_token_budget))
@@ -0,0 +1,164 @@
+"""Benchmark of the approximate nearest neighbour index against exact search"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import argparse
+import json
+import time
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+
+import numpy as np
+
+from coded_tools.rag_index.ann_index import IVFIndex
+from coded_tools.rag_index.ann_index import top_k
+
+
+def synthetic_corpus(chunks: int, dimension: int, topics: int, seed: int) -> np.ndarray:
+    """
+    :param chunks: Number of embeddings
+    :param dimension: Embedding dimension
+    :param topics: Number of topic centres the embeddings are scattered around, like chunks of related documents
+    :param seed: Random seed
+    :return: float32 matrix of unit-length embeddings
+    """
+    generator = np.random.default_rng(seed)
+    centres: np.ndarray = generator.standard_normal((topics, dimension), dtype=np.float32)
+    matrix = np.empty((chunks, dimension), dtype=np.float32)
+    block: int = 65536
+    for start in range(0, chunks, block):
+        size: int = min(block, chunks - start)
+        matrix[start : start + size] = centres[generator.integers(0, topics, size)]
+        matrix[start : start + size] += 0.7 * generator.standard_normal((size, dimension), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix
+
+
+def time_queries(search: Callable[[np.ndarray], np.ndarray], queries: np.ndarray) -> Dict[str, Any]:
+    """
+    :param search: Function returning the rows found for a query
+    :param queries: Query embeddings
+    :return: Dictionary with the rows found per query and the p50 and p99 latency in milliseconds
+    """
+    found: List[np.ndarray] = []
+    latencies: List[float] = []
+    for query in queries:
+        start: float = time.perf_counter()
+        found.append(search(query))
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return {
+        "found": found,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def benchmark(  # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+    chunks: int, dimension: int, queries: int, k: int, n_probes: List[int], n_lists: int = 0, seed: int = 0
+) -> Dict[str, Any]:
+    """
+    :param chunks: Number of embeddings in the corpus
+    :param dimension: Embedding dimension
+    :param queries: Number of queries
+    :param k: Number of results per query
+    :param n_probes: Numbers of probed lists to measure
+    :param n_lists: Number of inverted lists, 0 for the default of the index
+    :param seed: Random seed
+    :return: Dictionary with the build time, the exact search latencies and,
+        for every n_probe, the recall@k and latencies of the approximate search
+    """
+    matrix: np.ndarray = synthetic_corpus(chunks, dimension, max(16, chunks // 500), seed)
+    # Queries are perturbed corpus embeddings, so that they have close neighbours like real questions
+    generator = np.random.default_rng(seed + 1)
+    query_matrix: np.ndarray = matrix[generator.integers(0, chunks, queries)]
+    query_matrix = query_matrix + 0.3 * generator.standard_normal(query_matrix.shape, dtype=np.float32)
+    query_matrix /= np.linalg.norm(query_matrix, axis=1, keepdims=True)
+
+    start: float = time.perf_counter()
+    index: IVFIndex = IVFIndex.build(matrix, n_lists)
+    build_seconds: float = time.perf_counter() - start
+
+    exact: Dict[str, Any] = time_queries(lambda query: top_k(matrix @ query, k), query_matrix)
+    result: Dict[str, Any] = {
+        "chunks": chunks,
+        "dimension": dimension,
+        "k": k,
+        "lists": len(index.centroids),
+        "build_seconds": build_seconds,
+        "exact": {"p50_ms": exact["p50_ms"], "p99_ms": exact["p99_ms"]},
+        "ivf": [],
+    }
+    for n_probe in n_probes:
+        approximate: Dict[str, Any] = time_queries(
+            lambda query, n_probe=n_probe: index.search(matrix, query, k, n_probe)[0], query_matrix
+        )
+        recall: float = float(
+            np.mean(
+                [
+                    len(np.intersect1d(truth, found)) / len(truth)
+                    for truth, found in zip(exact["found"], approximate["found"])
+                ]
+            )
+        )
+        result["ivf"].append(
+            {
+                "n_probe": n_probe,
+                f"recall@{k}": recall,
+                "p50_ms": approximate["p50_ms"],
+                "p99_ms": approximate["p99_ms"],
+            }
+        )
+    return result
+
+
+def main():
+    """
+    Run the benchmark for each corpus size and print a table, or JSON with --json.
+
+    Example, from the repository root:
+        python -m coded_tools.rag_index.ann_benchmark --chunks 10000 100000 1000000 --n-probe 8 16 32
+    """
+    parser = argparse.ArgumentParser(description="Compare the IVF index of the RAG vector stores with exact search")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10000, 100000], help="corpus sizes")
+    parser.add_argument("--dimension", type=int, default=256, help="embedding dimension")
+    parser.add_argument("--queries", type=int, default=200, help="number of queries per corpus")
+    parser.add_argument("--k", type=int, default=10, help="results per query")
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[4, 8, 16, 32], help="probed lists to measure")
+    parser.add_argument("--n-lists", type=int, default=0, help="inverted lists, 0 for the index default")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results: List[Dict[str, Any]] = []
+    for chunks in args.chunks:
+        result: Dict[str, Any] = benchmark(
+            chunks, args.dimension, args.queries, args.k, args.n_probe, args.n_lists, args.seed
+        )
+        results.append(result)
+        if not args.json:
+            print(
+                f"{chunks} chunks, {result['lists']} lists, built in {result['build_seconds']:.1f}s, "
+                f"exact p50 {result['exact']['p50_ms']:.2f}ms p99 {result['exact']['p99_ms']:.2f}ms"
+            )
+            for row in result["ivf"]:
+                print(
+                    f"  n_probe {row['n_probe']:>4}: recall@{args.k} {row[f'recall@{args.k}']:.3f}, "
+                    f"p50 {row['p50_ms']:.2f}ms, p99 {row['p99_ms']:.2f}ms"
+                )
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
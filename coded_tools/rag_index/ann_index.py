@@ -0,0 +1,207 @@
+"""Approximate nearest neighbour indexes over the embedding matrix of a vector store"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import math
+import os
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+from typing import Type
+
+import numpy as np
+
+# Kind of approximate index used by the RAG tools, "exact" to always scan all chunks
+DEFAULT_ANN_INDEX: str = os.getenv("RAG_ANN_INDEX", "exact")
+
+# Stores with fewer chunks are always scanned exactly, which is faster than probing an index at that size
+ANN_MIN_CHUNKS: int = int(os.getenv("RAG_ANN_MIN_CHUNKS", "10000"))
+
+# Number of inverted lists probed per query. More lists give better recall at a higher latency.
+DEFAULT_ANN_N_PROBE: int = int(os.getenv("RAG_ANN_N_PROBE", "32"))
+
+# Number of inverted lists, 0 to choose it from the number of chunks
+DEFAULT_ANN_N_LISTS: int = int(os.getenv("RAG_ANN_N_LISTS", "0"))
+
+# Average number of rows per list when the number of lists is chosen from the number of chunks.
+# Fixing the list size keeps the rows scored per query, and so the query latency, flat as the store grows.
+ROWS_PER_LIST: int = 256
+
+# The index is rebuilt once chunks appended after it was built exceed this fraction of the indexed chunks
+ANN_MAX_UNINDEXED_FRACTION: float = 0.1
+
+# K-means training settings: iterations, and training rows sampled per list
+KMEANS_ITERATIONS: int = 10
+KMEANS_SAMPLES_PER_LIST: int = 32
+
+# Rows multiplied with the centroids at once when assigning rows to lists
+ASSIGN_BLOCK_ROWS: int = 8192
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    :param scores: 1D array of scores
+    :param k: Number of positions to return
+    :return: Positions of the k highest scores, best first
+    """
+    if k < len(scores):
+        positions = np.argpartition(-scores, k - 1)[:k]
+    else:
+        positions = np.arange(len(scores))
+    return positions[np.argsort(-scores[positions], kind="stable")]
+
+
+class IVFIndex:
+    """
+    Inverted file index: the unit-length rows of the embedding matrix are clustered by spherical
+    k-means, and a query only scores the centroids and the rows of the n_probe clusters whose
+    centroids are closest to it. By default lists hold about ROWS_PER_LIST rows each, with at least
+    sqrt(n) lists, so a query scores about n_probe * ROWS_PER_LIST rows whatever the size of the store.
+
+    The index covers the first count rows of the matrix it was built for. Rows appended later are
+    scored exactly on every query, until there are enough of them for the store to rebuild the index.
+    All data are NumPy arrays, so the index is saved next to the embeddings and memory-mapped with them.
+    """
+
+    kind: str = "ivf"
+    # Names of the arrays returned by arrays()
+    array_names: Tuple[str, ...] = ("centroids", "offsets", "rows")
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray):
+        """
+        Constructor
+
+        :param centroids: float32 array of unit-length cluster centroids, one per list
+        :param offsets: int64 array of length len(centroids) + 1 with the start of every list in rows
+        :param rows: int32 array of the matrix rows, grouped by list
+        """
+        self.centroids: np.ndarray = centroids
+        self.offsets: np.ndarray = offsets
+        self.rows: np.ndarray = rows
+
+    @property
+    def count(self) -> int:
+        """
+        :return: Number of matrix rows covered by the index
+        """
+        return len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        :return: Number of bytes held by the index arrays
+        """
+        return sum(int(array.nbytes) for array in self.arrays().values())
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """
+        :return: The arrays making up the index, by name
+        """
+        return {name: getattr(self, name) for name in self.array_names}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "IVFIndex":
+        """
+        :param arrays: Arrays as returned by arrays(), possibly memory-mapped
+        :return: The index made of these arrays
+        """
+        return cls(*(arrays[name] for name in cls.array_names))
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, n_lists: int = DEFAULT_ANN_N_LISTS, seed: int = 0) -> "IVFIndex":
+        """
+        :param matrix: float32 matrix with unit-length rows
+        :param n_lists: Number of inverted lists, 0 to choose it from the number of rows
+        :param seed: Seed of the random sampling, so that builds are reproducible
+        :return: Index of all rows of the matrix
+        """
+        count: int = len(matrix)
+        n_lists = n_lists or max(int(math.sqrt(count)), count // ROWS_PER_LIST)
+        n_lists = min(max(1, n_lists), max(1, count))
+        generator = np.random.default_rng(seed)
+
+        centroids: np.ndarray = cls.train_centroids(matrix, n_lists, generator)
+
+        # Assign every row to its closest centroid
+        assignment = np.empty(count, dtype=np.int32)
+        for start in range(0, count, ASSIGN_BLOCK_ROWS):
+            block: np.ndarray = np.asarray(matrix[start : start + ASSIGN_BLOCK_ROWS])
+            assignment[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        order: np.ndarray = np.argsort(assignment, kind="stable").astype(np.int32)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=n_lists))
+        return cls(centroids, offsets, order)
+
+    @staticmethod
+    def train_centroids(matrix: np.ndarray, n_lists: int, generator: np.random.Generator) -> np.ndarray:
+        """
+        :param matrix: float32 matrix with unit-length rows
+        :param n_lists: Number of centroids
+        :param generator: Random generator sampling the training rows
+        :return: Unit-length centroids found by spherical k-means on a sample of the rows
+        """
+        count: int = len(matrix)
+        sample_size: int = min(count, n_lists * KMEANS_SAMPLES_PER_LIST)
+        sample: np.ndarray = np.asarray(matrix[np.sort(generator.choice(count, sample_size, replace=False))])
+        centroids: np.ndarray = sample[generator.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            assignment: np.ndarray = np.argmax(sample @ centroids.T, axis=1)
+            order: np.ndarray = np.argsort(assignment, kind="stable")
+            sizes: np.ndarray = np.bincount(assignment, minlength=n_lists)
+            filled: np.ndarray = np.flatnonzero(sizes)
+            # Lists that lost all their rows restart from a random row
+            sums: np.ndarray = sample[generator.choice(sample_size, n_lists)]
+            sums[filled] = np.add.reduceat(sample[order], (np.cumsum(sizes) - sizes)[filled], axis=0)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0.0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+        return centroids
+
+    def search(
+        self, matrix: np.ndarray, query: np.ndarray, k: int, n_probe: int = DEFAULT_ANN_N_PROBE
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :param matrix: The matrix the index was built for, possibly with rows appended since
+        :param query: Unit-length query embedding
+        :param k: Number of rows to return
+        :param n_probe: Number of lists to score
+        :return: Tuple of the rows of the k best candidates, best first, and their cosine similarities
+        """
+        lists: np.ndarray = top_k(self.centroids @ query, max(1, min(n_probe, len(self.centroids))))
+        candidates: np.ndarray = np.concatenate(
+            [self.rows[self.offsets[index] : self.offsets[index + 1]] for index in lists]
+            + [np.arange(self.count, len(matrix), dtype=np.int32)]
+        )
+        if len(candidates) == 0:
+            return candidates, np.zeros(0, dtype=np.float32)
+        # Reading the candidate rows in order keeps the reads of a memory-mapped matrix sequential
+        candidates.sort()
+        scores: np.ndarray = matrix[candidates] @ query
+        best: np.ndarray = top_k(scores, k)
+        return candidates[best], scores[best]
+
+
+# Approximate index kinds by name, for new kinds such as HNSW to plug into
+ANN_INDEXES: Dict[str, Type[IVFIndex]] = {IVFIndex.kind: IVFIndex}
+
+
+def ann_index_class(kind: Optional[str]) -> Optional[Type[IVFIndex]]:
+    """
+    :param kind: Name of an index kind, or "exact" or None for exact search
+    :return: The index class of that kind, or None for exact search
+    :raises ValueError: If the kind is unknown
+    """
+    if kind in (None, "", "exact"):
+        return None
+    if kind not in ANN_INDEXES:
+        raise ValueError(f"Unknown ANN index {kind!r}, expected 'exact' or one of {', '.join(ANN_INDEXES)}")
+    return ANN_INDEXES[kind]
@@ -0,0 +1,364 @@
+"""Batched, concurrent and rate-limited embedding of document chunks for the RAG tools"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from coded_tools.rag_index.index_cache import DEFAULT_INDEX_CACHE_DIR
+
+# Defaults for the embedding stage, overridable per call through the tool args
+DEFAULT_EMBEDDING_BATCH_SIZE: int = int(os.getenv("RAG_EMBEDDING_BATCH_SIZE", "128"))
+DEFAULT_EMBEDDING_CONCURRENCY: int = int(os.getenv("RAG_EMBEDDING_CONCURRENCY", "4"))
+# 0 disables the tokens-per-minute budget
+DEFAULT_EMBEDDING_TOKENS_PER_MINUTE: int = int(os.getenv("RAG_EMBEDDING_TOKENS_PER_MINUTE", "0"))
+DEFAULT_EMBEDDING_CHECKPOINT_DIR: str = os.getenv(
+    "RAG_EMBEDDING_CHECKPOINT_DIR", os.path.join(DEFAULT_INDEX_CACHE_DIR, "embedding_checkpoints")
+)
+
+# Retry policy for throttled or failed embedding requests
+MAX_RETRIES: int = 6
+INITIAL_BACKOFF_SECONDS: float = 1.0
+MAX_BACKOFF_SECONDS: float = 60.0
+
+# HTTP statuses and exception class names of the embedding clients that are worth retrying
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+RETRYABLE_ERROR_NAMES = ("RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError")
+
+# Map of tool arg name to BatchEmbedder constructor parameter
+EMBEDDING_ARGS: Dict[str, str] = {
+    "embedding_batch_size": "batch_size",
+    "embedding_concurrency": "max_concurrency",
+    "embedding_tokens_per_minute": "tokens_per_minute",
+    "embedding_checkpoint_dir": "checkpoint_dir",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    :param text: Text to embed
+    :return: Rough token count of the text, about four characters per token for English text
+    """
+    return len(text) // 4 + 1
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    :param error: Exception raised by an embedding request
+    :return: True if the request was throttled or failed transiently and should be retried
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES:
+        return True
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def retry_delay(error: BaseException, attempt: int) -> float:
+    """
+    :param error: Exception raised by an embedding request
+    :param attempt: Number of the retry, starting at 0
+    :return: Seconds to wait before retrying: the Retry-After the provider asked for if any,
+        in seconds or as an HTTP date, otherwise an exponential backoff with jitter
+    """
+    response: Any = getattr(error, "response", None)
+    headers: Any = getattr(response, "headers", None) or {}
+    retry_after: Any = headers.get("retry-after")
+    try:
+        return min(max(float(retry_after), 0.0), MAX_BACKOFF_SECONDS)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return min(max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0), MAX_BACKOFF_SECONDS)
+    except (TypeError, ValueError, AttributeError):
+        backoff: float = min(INITIAL_BACKOFF_SECONDS * 2**attempt, MAX_BACKOFF_SECONDS)
+        return backoff * (0.5 + random.random() / 2)
+
+
+class TokenRateLimiter:  # pylint: disable=too-few-public-methods
+    """
+    Tokens-per-minute budget shared by all embedding requests of the process to the same model.
+
+    Callers reserve the tokens of a request and are told how long to wait before sending it.
+    Reservations may overdraw the budget, in which case the wait covers the debt, so the limiter
+    works the same from any thread or event loop.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        """
+        Constructor
+
+        :param tokens_per_minute: Number of tokens that may be sent per minute
+        """
+        self.tokens_per_minute: int = tokens_per_minute
+        self.available: float = float(tokens_per_minute)
+        self.updated: float = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        """
+        :param tokens: Number of tokens about to be sent
+        :return: Seconds to wait before sending them
+        """
+        with self.lock:
+            now: float = time.monotonic()
+            refill: float = (now - self.updated) * self.tokens_per_minute / 60.0
+            self.available = min(float(self.tokens_per_minute), self.available + refill)
+            self.updated = now
+            self.available -= tokens
+            return max(0.0, -self.available) * 60.0 / self.tokens_per_minute
+
+
+# Rate limiters by model name and budget
+RATE_LIMITERS: Dict[str, TokenRateLimiter] = {}
+RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def rate_limiter_for(model: str, tokens_per_minute: int) -> TokenRateLimiter:
+    """
+    :param model: Name of the embedding model
+    :param tokens_per_minute: Number of tokens that may be sent per minute
+    :return: The limiter of the process for that model and budget
+    """
+    with RATE_LIMITERS_LOCK:
+        key: str = f"{model}:{tokens_per_minute}"
+        if key not in RATE_LIMITERS:
+            RATE_LIMITERS[key] = TokenRateLimiter(tokens_per_minute)
+        return RATE_LIMITERS[key]
+
+
+class BatchEmbedder(Embeddings):
+    """
+    Embeddings wrapper that embeds documents in batches of batch_size texts,
+    with up to max_concurrency batches in flight, under an optional tokens-per-minute budget.
+    Throttled and transiently failing batches are retried with backoff.
+
+    With a checkpoint directory, every completed batch is written to disk as soon as it is done,
+    keyed by the model and the texts of the batch. If indexing is interrupted, embedding the same
+    texts again loads the completed batches and only sends the missing ones. The checkpoints are
+    deleted once all batches are done.
+
+    Queries are passed through to the wrapped embeddings.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        embedding: Embeddings,
+        batch_size: int = DEFAULT_EMBEDDING_BATCH_SIZE,
+        max_concurrency: int = DEFAULT_EMBEDDING_CONCURRENCY,
+        tokens_per_minute: int = DEFAULT_EMBEDDING_TOKENS_PER_MINUTE,
+        checkpoint_dir: Optional[str] = DEFAULT_EMBEDDING_CHECKPOINT_DIR,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        """
+        Constructor
+
+        :param embedding: Embeddings used to embed each batch
+        :param batch_size: Number of texts sent per request
+        :param max_concurrency: Number of requests in flight at the same time
+        :param tokens_per_minute: Token budget per minute across the process for this model, 0 for none
+        :param checkpoint_dir: Directory to checkpoint completed batches in, None to disable
+        :param count_tokens: Function returning the number of tokens of a text
+        """
+        self.embedding: Embeddings = embedding
+        self.batch_size: int = max(1, int(batch_size))
+        self.max_concurrency: int = max(1, int(max_concurrency))
+        self.checkpoint_dir: Optional[str] = checkpoint_dir
+        self.count_tokens: Callable[[str], int] = count_tokens
+        self.rate_limiter: Optional[TokenRateLimiter] = None
+        if tokens_per_minute and int(tokens_per_minute) > 0:
+            self.rate_limiter = rate_limiter_for(self.model, int(tokens_per_minute))
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    @classmethod
+    def from_args(cls, embedding: Embeddings, args: Dict[str, Any]) -> "BatchEmbedder":
+        """
+        :param embedding: Embeddings used to embed each batch
+        :param args: Tool args, of which "embedding_batch_size", "embedding_concurrency",
+            "embedding_tokens_per_minute" and "embedding_checkpoint_dir" override the defaults
+        :return: A new BatchEmbedder
+        """
+        settings: Dict[str, Any] = {param: args[arg] for arg, param in EMBEDDING_ARGS.items() if arg in args}
+        return cls(embedding, **settings)
+
+    @property
+    def model(self) -> str:
+        """
+        :return: Name of the wrapped embedding model
+        """
+        return str(getattr(self.embedding, "model", type(self.embedding).__name__))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embedding.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embedding.aembed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches: List[List[str]] = self.batches(texts)
+        checkpoints: List[Optional[str]] = self.checkpoint_paths(batches)
+        results: List[np.ndarray] = []
+        for index, batch in enumerate(batches):
+            vectors: Optional[np.ndarray] = self.load_batch(checkpoints[index])
+            attempt: int = 0
+            while vectors is None:
+                if self.rate_limiter is not None:
+                    time.sleep(self.rate_limiter.reserve(sum(self.count_tokens(text) for text in batch)))
+                try:
+                    vectors = np.asarray(self.embedding.embed_documents(batch), dtype=np.float32)
+                except Exception as error:  # pylint: disable=broad-exception-caught
+                    time.sleep(self.backoff(error, attempt, index))
+                    attempt += 1
+            self.save_batch(checkpoints[index], vectors)
+            results.append(vectors)
+        self.remove_checkpoints(checkpoints)
+        return self.concatenate(results)
+
+    async def aembed_documents(self, texts: List[str], keep_checkpoints: bool = False) -> List[List[float]]:
+        """
+        :param texts: Texts to embed
+        :param keep_checkpoints: Checkpoint the batches even if there is only one, and leave the checkpoints
+            in place for the caller to remove with remove_checkpoints() once its whole job is done
+        :return: One embedding per text
+        """
+        batches: List[List[str]] = self.batches(texts)
+        checkpoints: List[Optional[str]] = self.checkpoint_paths(batches, keep_checkpoints)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed_batch(index: int, batch: List[str]) -> np.ndarray:
+            vectors: Optional[np.ndarray] = self.load_batch(checkpoints[index])
+            attempt: int = 0
+            delay: float = 0.0
+            while vectors is None:
+                async with semaphore:
+                    if self.rate_limiter is not None:
+                        await asyncio.sleep(self.rate_limiter.reserve(sum(self.count_tokens(text) for text in batch)))
+                    try:
+                        vectors = np.asarray(await self.embedding.aembed_documents(batch), dtype=np.float32)
+                    except Exception as error:  # pylint: disable=broad-exception-caught
+                        delay: float = self.backoff(error, attempt, index)
+                        attempt += 1
+                if vectors is None:
+                    # Back off outside the semaphore so other batches keep going
+                    await asyncio.sleep(delay)
+            self.save_batch(checkpoints[index], vectors)
+            return vectors
+
+        results: List[np.ndarray] = await asyncio.gather(
+            *[embed_batch(index, batch) for index, batch in enumerate(batches)]
+        )
+        if not keep_checkpoints:
+            self.remove_checkpoints(checkpoints)
+        return self.concatenate(results)
+
+    def batches(self, texts: List[str]) -> List[List[str]]:
+        """
+        :param texts: Texts to embed
+        :return: The texts split into batches of at most batch_size texts
+        """
+        return [texts[start : start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+
+    def backoff(self, error: Exception, attempt: int, index: int) -> float:
+        """
+        :param error: Exception raised while embedding a batch
+        :param attempt: Number of retries of this batch so far
+        :param index: Index of the batch
+        :return: Seconds to wait before retrying the batch
+        :raises Exception: The error itself if it is not retryable or the batch ran out of retries
+        """
+        if not is_retryable(error) or attempt >= MAX_RETRIES:
+            raise error
+        delay: float = retry_delay(error, attempt)
+        self.logger.warning("Embedding batch %d failed (%s), retrying in %.1f seconds", index, error, delay)
+        return delay
+
+    def checkpoint_paths(self, batches: List[List[str]], keep_checkpoints: bool = False) -> List[Optional[str]]:
+        """
+        :param batches: Batches of texts to embed
+        :param keep_checkpoints: Checkpoint even a single batch
+        :return: Checkpoint file of each batch, keyed by the model and the texts of the batch,
+            or None for every batch if checkpointing is disabled or not worth it for a single batch
+        """
+        if not self.checkpoint_dir or (len(batches) <= 1 and not keep_checkpoints):
+            return [None] * len(batches)
+        checkpoint_dir: str = os.path.abspath(os.path.expanduser(self.checkpoint_dir))
+        paths: List[Optional[str]] = []
+        for batch in batches:
+            digest = hashlib.sha256(self.model.encode("utf-8"))
+            for text in batch:
+                digest.update(hashlib.sha256(text.encode("utf-8")).digest())
+            paths.append(os.path.join(checkpoint_dir, f"{digest.hexdigest()}.npy"))
+        return paths
+
+    def load_batch(self, path: Optional[str]) -> Optional[np.ndarray]:
+        """
+        :param path: Checkpoint file of the batch or None
+        :return: The vectors of the batch if it was completed before, otherwise None
+        """
+        if path is None:
+            return None
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            return None
+
+    def save_batch(self, path: Optional[str], vectors: np.ndarray):
+        """
+        Write the vectors of a completed batch to its checkpoint file.
+        The file is moved into place only once it is complete.
+
+        :param path: Checkpoint file of the batch or None
+        :param vectors: Vectors of the batch
+        """
+        if path is None:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path: str = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+        np.save(tmp_path, vectors)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def remove_checkpoints(paths: List[Optional[str]]):
+        """
+        :param paths: Checkpoint files of batches that are no longer needed
+        """
+        for path in paths:
+            if path is not None:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def concatenate(results: List[np.ndarray]) -> List[List[float]]:
+        """
+        :param results: Vectors of every batch, in order
+        :return: Vectors of all texts
+        """
+        if not results:
+            return []
+        return np.concatenate(results).tolist()
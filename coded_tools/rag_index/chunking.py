@@ -0,0 +1,104 @@
+"""Chunking profiles of the RAG tools"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import os
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Union
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_text_splitters import TextSplitter
+
+from coded_tools.rag_index.batch_embedder import estimate_tokens
+
+# Named chunking settings. The settings of a profile are part of the index cache keys and index versions,
+# so changing them re-embeds the sources indexed with them. "default" keeps the settings the tools always used.
+CHUNKING_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Small chunks with a 50% overlap, which embeds most of the text twice
+    "default": {"splitter": "tiktoken", "chunk_size": 100, "chunk_overlap": 50},
+    # Larger chunks with a 10% overlap, about a third of the embeddings of "default"
+    "compact": {"splitter": "tiktoken", "chunk_size": 300, "chunk_overlap": 30},
+    # Chunks split at headings and page breaks first, so that a chunk rarely spans two sections
+    "structured": {"splitter": "tiktoken", "chunk_size": 200, "chunk_overlap": 20, "structure": True},
+}
+
+# Profile used when a tool call does not name one
+DEFAULT_CHUNKING_PROFILE: str = os.getenv("RAG_CHUNKING_PROFILE", "default")
+
+# Keys of the chunking settings, for validating profiles given as dictionaries
+CHUNKING_SETTINGS_KEYS = ("profile", "splitter", "chunk_size", "chunk_overlap", "structure")
+
+# How chunk sizes are measured: in tiktoken tokens, in characters, or in tokens estimated from the characters,
+# which needs no tokenizer download
+LENGTH_FUNCTIONS: Dict[str, Callable[[str], int]] = {"characters": len, "estimate": estimate_tokens}
+SPLITTERS = ("tiktoken", *LENGTH_FUNCTIONS)
+
+# Regular expressions of the split points tried in turn by structure-aware profiles: page breaks,
+# markdown headings, numbered headings such as "3.2 Pricing", paragraphs, lines, sentences and words
+STRUCTURE_SEPARATORS: List[str] = [
+    r"\f",
+    r"\n(?=#{1,6} )",
+    r"\n(?=\d+(?:\.\d+)*\.? +[A-Z])",
+    r"\n\n",
+    r"\n",
+    r"(?<=[.!?]) ",
+    r" ",
+    "",
+]
+
+
+def chunking_settings(profile: Union[str, Dict[str, Any], None] = None) -> Dict[str, Any]:
+    """
+    :param profile: Name of one of CHUNKING_PROFILES, or a dictionary of settings overriding those of the
+        profile it names under "profile" (default DEFAULT_CHUNKING_PROFILE), or None for DEFAULT_CHUNKING_PROFILE
+    :return: Chunking settings with the "splitter", "chunk_size", "chunk_overlap" and, if set, "structure" keys
+    :raises ValueError: If the profile or one of its settings is unknown or invalid
+    """
+    overrides: Dict[str, Any] = {}
+    if isinstance(profile, dict):
+        unknown: List[str] = [key for key in profile if key not in CHUNKING_SETTINGS_KEYS]
+        if unknown:
+            raise ValueError(f"Unknown chunking settings {', '.join(unknown)}")
+        overrides = {key: value for key, value in profile.items() if key != "profile"}
+        profile = profile.get("profile")
+    name: str = profile or DEFAULT_CHUNKING_PROFILE
+    if name not in CHUNKING_PROFILES:
+        raise ValueError(f"Unknown chunking_profile {name!r}, expected one of {', '.join(CHUNKING_PROFILES)}")
+
+    settings: Dict[str, Any] = {**CHUNKING_PROFILES[name], **overrides}
+    if not settings.get("structure", False):
+        # Left out rather than False, so that the settings of "default" match those of earlier index versions
+        settings.pop("structure", None)
+    if settings["splitter"] not in SPLITTERS:
+        raise ValueError(f"Unknown splitter {settings['splitter']!r}, expected one of {', '.join(SPLITTERS)}")
+    if not 0 <= int(settings["chunk_overlap"]) < int(settings["chunk_size"]):
+        raise ValueError("chunk_overlap must be at least 0 and smaller than chunk_size")
+    return settings
+
+
+def make_text_splitter(settings: Dict[str, Any]) -> TextSplitter:
+    """
+    :param settings: Chunking settings as returned by chunking_settings()
+    :return: Text splitter with these settings
+    """
+    kwargs: Dict[str, Any] = {
+        "chunk_size": int(settings["chunk_size"]),
+        "chunk_overlap": int(settings["chunk_overlap"]),
+    }
+    if settings.get("structure", False):
+        kwargs.update(separators=STRUCTURE_SEPARATORS, is_separator_regex=True, keep_separator="start")
+    if settings["splitter"] == "tiktoken":
+        return RecursiveCharacterTextSplitter.from_tiktoken_encoder(**kwargs)
+    return RecursiveCharacterTextSplitter(length_function=LENGTH_FUNCTIONS[settings["splitter"]], **kwargs)
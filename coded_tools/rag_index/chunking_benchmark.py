@@ -0,0 +1,335 @@
+"""Benchmark of the chunking profiles of the RAG tools on a fixed corpus and question set"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Union
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from coded_tools.rag_index.batch_embedder import BatchEmbedder
+from coded_tools.rag_index.batch_embedder import estimate_tokens
+from coded_tools.rag_index.chunking import CHUNKING_PROFILES
+from coded_tools.rag_index.chunking import SPLITTERS
+from coded_tools.rag_index.chunking import chunking_settings
+from coded_tools.rag_index.chunking import make_text_splitter
+from coded_tools.rag_index.context_packing import SPAN_SEPARATOR
+from coded_tools.rag_index.context_packing import pack_context
+from coded_tools.rag_index.hybrid_search import RETRIEVAL_MODES
+from coded_tools.rag_index.hybrid_search import aretrieve
+from coded_tools.rag_index.ingestion import IngestionPipeline
+from coded_tools.rag_index.keyword_index import tokenize
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+from coded_tools.rag_index.pdf_loader import count_pdf_pages
+from coded_tools.rag_index.pdf_loader import parse_pdf_pages
+from coded_tools.rag_index.query_cache import QueryCache
+
+# Files of a corpus directory that are benchmarked. Text files are indexed as one page each.
+TEXT_EXTENSIONS = (".txt", ".md")
+PDF_EXTENSIONS = (".pdf",)
+
+# Number of chunks retrieved per question, as in the RAG tools
+BENCHMARK_K: int = 4
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic embeddings that need no model or network: every token of a text is hashed
+    into one of dimension buckets with a random sign, and the bucket counts are normalized.
+    Texts sharing words get similar embeddings, which makes retrieval hit rates comparable
+    between chunking profiles, although not with those of a real embedding model.
+    """
+
+    model: str = "hashing"
+
+    def __init__(self, dimension: int = 256):
+        """
+        Constructor
+
+        :param dimension: Number of hash buckets, the length of every embedding
+        """
+        self.dimension: int = dimension
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in tokenize(text):
+            digest: int = zlib.crc32(token.encode("utf-8"))
+            vector[digest % self.dimension] += 1.0 if digest & 0x80000000 else -1.0
+        norm: float = float(np.linalg.norm(vector))
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+class CountingEmbeddings(Embeddings):
+    """
+    Embeddings wrapper counting the embedding requests, texts and estimated tokens sent to the wrapped embeddings
+    """
+
+    def __init__(self, embedding: Embeddings):
+        """
+        Constructor
+
+        :param embedding: Embeddings to count the requests of
+        """
+        self.embedding: Embeddings = embedding
+        self.model: str = str(getattr(embedding, "model", type(embedding).__name__))
+        self.requests: int = 0
+        self.texts: int = 0
+        self.tokens: int = 0
+        self.lock = threading.Lock()
+
+    def count(self, texts: List[str]):
+        """
+        :param texts: Texts of one embedding request
+        """
+        with self.lock:
+            self.requests += 1
+            self.texts += len(texts)
+            self.tokens += sum(estimate_tokens(text) for text in texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self.count([text])
+        return self.embedding.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        self.count([text])
+        return await self.embedding.aembed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.count(texts)
+        return self.embedding.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.count(texts)
+        return await self.embedding.aembed_documents(texts)
+
+
+def load_corpus(path: str) -> List[Document]:
+    """
+    :param path: A text or pdf file, or a directory searched recursively for them
+    :return: Pages of the files, in file name order
+    """
+    files: List[str] = [path]
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    pages: List[Document] = []
+    for file in files:
+        extension: str = os.path.splitext(file)[1].lower()
+        if extension in PDF_EXTENSIONS:
+            pages.extend(parse_pdf_pages(file, file, 0, count_pdf_pages(file)))
+        elif extension in TEXT_EXTENSIONS:
+            with open(file, "r", encoding="utf-8") as text_file:
+                pages.append(Document(page_content=text_file.read(), metadata={"source": file, "page": 0}))
+    return pages
+
+
+def load_questions(path: str) -> List[Dict[str, str]]:
+    """
+    :param path: JSON file with a list of {"question": ..., "answer": ...} objects, or a JSON lines file of them.
+        The answer is a passage of the corpus that the retrieved context must contain.
+    :return: The questions
+    :raises ValueError: If a question or its answer is missing
+    """
+    with open(path, "r", encoding="utf-8") as questions_file:
+        text: str = questions_file.read()
+    try:
+        questions: List[Dict[str, str]] = json.loads(text)
+    except json.JSONDecodeError:
+        questions = [json.loads(line) for line in text.splitlines() if line.strip()]
+    for question in questions:
+        if not question.get("question") or not question.get("answer"):
+            raise ValueError(f"Question without 'question' or 'answer' in {path}: {question}")
+    return questions
+
+
+def normalize(text: str) -> str:
+    """
+    :param text: Passage or context
+    :return: Lower-cased text with runs of whitespace replaced by one space, so that line breaks
+        introduced by splitting or parsing do not hide a passage
+    """
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def directory_size(path: str) -> int:
+    """
+    :param path: Directory
+    :return: Total size in bytes of the files in the directory
+    """
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+async def abenchmark_profile(  # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+    pages: List[Document],
+    questions: List[Dict[str, str]],
+    settings: Dict[str, Any],
+    embedding: Embeddings,
+    k: int = BENCHMARK_K,
+    mode: str = "vector",
+) -> Dict[str, Any]:
+    """
+    :param pages: Pages of the corpus
+    :param questions: Questions with the passage their answer is in
+    :param settings: Chunking settings as returned by chunking_settings()
+    :param embedding: Embeddings of the chunks and questions
+    :param k: Number of chunks retrieved per question
+    :param mode: Retrieval mode, one of RETRIEVAL_MODES
+    :return: Dictionary with the number of chunks, the saved index size in bytes, the build time,
+        the embedding requests, texts and estimated tokens of the build, the hit rate, which is the
+        share of questions whose merged context contains the answer, and the mean context tokens
+    """
+    counter = CountingEmbeddings(embedding)
+    vectorstore = NumpyVectorStore(embedding=BatchEmbedder(counter, checkpoint_dir=None))
+    start: float = time.perf_counter()
+    pipeline: IngestionPipeline = await IngestionPipeline(vectorstore, make_text_splitter(settings)).aingest(pages)
+    build_seconds: float = time.perf_counter() - start
+    result: Dict[str, Any] = {
+        "settings": settings,
+        "chunks": pipeline.chunk_count,
+        "build_seconds": build_seconds,
+        "embedding_requests": counter.requests,
+        "embedded_texts": counter.texts,
+        "embedded_tokens": counter.tokens,
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        vectorstore.dump(os.path.join(directory, "vector_store"))
+        result["index_bytes"] = directory_size(directory)
+
+    hits: int = 0
+    context_tokens: int = 0
+    cache = QueryCache()
+    for question in questions:
+        documents: List[Document] = await aretrieve(
+            vectorstore, question["question"], k=k, mode=mode, semantic_threshold=0.0, cache=cache
+        )
+        context: str = SPAN_SEPARATOR.join(document.page_content for document in pack_context(documents))
+        hits += normalize(question["answer"]) in normalize(context)
+        context_tokens += estimate_tokens(context)
+    result["hit_rate"] = hits / len(questions) if questions else 0.0
+    result["mean_context_tokens"] = context_tokens / len(questions) if questions else 0.0
+    return result
+
+
+def benchmark(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    corpus: str,
+    questions: str,
+    profiles: List[Union[str, Dict[str, Any]]],
+    embedding: Optional[Embeddings] = None,
+    k: int = BENCHMARK_K,
+    mode: str = "vector",
+    splitter: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    :param corpus: Text or pdf file, or directory of them
+    :param questions: File of questions as read by load_questions()
+    :param profiles: Names of chunking profiles, or dictionaries of chunking settings
+    :param embedding: Embeddings of the chunks and questions, HashingEmbeddings by default
+    :param k: Number of chunks retrieved per question
+    :param mode: Retrieval mode, one of RETRIEVAL_MODES
+    :param splitter: Length function to use instead of the one of every profile, such as "estimate"
+        to measure tiktoken profiles without downloading the tokenizer
+    :return: One result of abenchmark_profile() per profile, with the profile under "profile"
+    """
+    pages: List[Document] = load_corpus(corpus)
+    question_list: List[Dict[str, str]] = load_questions(questions)
+    embedding = embedding or HashingEmbeddings()
+
+    async def run() -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        for profile in profiles:
+            settings: Dict[str, Any] = chunking_settings(profile)
+            if splitter:
+                settings["splitter"] = splitter
+            result: Dict[str, Any] = await abenchmark_profile(pages, question_list, settings, embedding, k, mode)
+            results.append({"profile": profile, **result})
+        return results
+
+    return asyncio.run(run())
+
+
+def parse_profile(profile: str) -> Union[str, Dict[str, Any]]:
+    """
+    :param profile: Name of a chunking profile, or a JSON object of chunking settings
+    :return: The name, or the settings as a dictionary
+    """
+    return json.loads(profile) if profile.lstrip().startswith("{") else profile
+
+
+def main():
+    """
+    Run the benchmark for each chunking profile and print a table, or JSON with --json.
+
+    Example, from the repository root, without network access:
+        python -m coded_tools.rag_index.chunking_benchmark --corpus docs/ --questions questions.json \\
+            --splitter estimate --profiles default compact structured '{"profile": "compact", "chunk_size": 500}'
+    """
+    parser = argparse.ArgumentParser(description="Compare the chunking profiles of the RAG tools on a corpus")
+    parser.add_argument("--corpus", required=True, help="text or pdf file, or directory of them")
+    parser.add_argument("--questions", required=True, help="JSON file of question and answer passage objects")
+    parser.add_argument(
+        "--profiles", nargs="+", default=list(CHUNKING_PROFILES), help="profile names or JSON objects of settings"
+    )
+    parser.add_argument("--k", type=int, default=BENCHMARK_K, help="chunks retrieved per question")
+    parser.add_argument("--mode", choices=RETRIEVAL_MODES, default="vector", help="retrieval mode")
+    parser.add_argument("--splitter", choices=SPLITTERS, help="length function overriding that of the profiles")
+    parser.add_argument(
+        "--embeddings",
+        choices=("hashing", "openai"),
+        default="hashing",
+        help="offline hashing embeddings, or OpenAI embeddings, which need OPENAI_API_KEY",
+    )
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    embedding: Embeddings = HashingEmbeddings()
+    if args.embeddings == "openai":
+        embedding = OpenAIEmbeddings()
+    results: List[Dict[str, Any]] = benchmark(
+        args.corpus,
+        args.questions,
+        [parse_profile(profile) for profile in args.profiles],
+        embedding,
+        args.k,
+        args.mode,
+        args.splitter,
+    )
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(
+            f"{json.dumps(result['profile'])}: {result['chunks']} chunks, {result['index_bytes'] / 1024:.0f} KiB, "
+            f"built in {result['build_seconds']:.2f}s with {result['embedding_requests']} embedding requests "
+            f"({result['embedded_tokens']} tokens), hit rate {result['hit_rate']:.2f}, "
+            f"{result['mean_context_tokens']:.0f} context tokens per question"
+        )
+
+
+if __name__ == "__main__":
+    main()
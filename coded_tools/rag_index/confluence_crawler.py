@@ -0,0 +1,359 @@
+"""Concurrent crawler of confluence pages and attachments"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from typing import Any
+from typing import AsyncIterator
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+import requests
+from atlassian.rest_client import AtlassianRestAPI
+from langchain_community.document_loaders.confluence import ConfluenceLoader
+from langchain_core.documents import Document
+from requests.adapters import HTTPAdapter
+
+from coded_tools.rag_index.batch_embedder import MAX_RETRIES
+from coded_tools.rag_index.batch_embedder import RETRYABLE_STATUS_CODES
+from coded_tools.rag_index.batch_embedder import retry_delay
+from coded_tools.rag_index.index_cache import DEFAULT_INDEX_CACHE_DIR
+from coded_tools.rag_index.registry import registry_key
+
+# Maximum number of confluence requests in flight, overridable per call through the tool args
+DEFAULT_CRAWL_CONCURRENCY: int = int(os.getenv("RAG_CRAWL_CONCURRENCY", "8"))
+
+# Directory of the checkpoints of unfinished crawls
+DEFAULT_CRAWL_CHECKPOINT_DIR: str = os.getenv(
+    "RAG_CRAWL_CHECKPOINT_DIR", os.path.join(DEFAULT_INDEX_CACHE_DIR, "crawl_checkpoints")
+)
+
+# Map of tool arg name to ConfluenceCrawler constructor parameter
+CRAWL_ARGS: Dict[str, str] = {
+    "crawl_concurrency": "max_concurrency",
+    "crawl_checkpoint_dir": "checkpoint_dir",
+}
+
+# ConfluenceLoader arguments selecting pages rather than determining their content
+PAGE_SELECTION_ARGS = ("space_key", "page_ids", "label", "cql", "max_pages", "limit")
+
+# Pages fetched at once per allowed request in flight. Pages wait on their attachments,
+# so more pages than requests keep the request slots busy.
+PAGES_PER_REQUEST_SLOT: int = 2
+
+# Attachment media types and the ConfluenceLoader methods extracting their text, with whether they take ocr_languages
+ATTACHMENT_PROCESSORS: Dict[str, Tuple[str, bool]] = {
+    "application/pdf": ("process_pdf", True),
+    "image/png": ("process_image", True),
+    "image/jpg": ("process_image", True),
+    "image/jpeg": ("process_image", True),
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ("process_doc", False),
+    "application/vnd.ms-excel": ("process_xls", False),
+    "image/svg+xml": ("process_svg", True),
+}
+
+
+def page_version(page: Dict[str, Any]) -> str:
+    """
+    :param page: Page as returned by the confluence API with the "version" expanded
+    :return: Version string made of the confluence version number and its last-modified time
+    """
+    version: Dict[str, Any] = page.get("version", {})
+    return f"{version.get('number', '')}@{version.get('when', '')}"
+
+
+def is_retryable_request(error: BaseException) -> bool:
+    """
+    :param error: Exception raised by a confluence request
+    :return: True if the request was throttled or failed transiently and should be retried
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    response: Any = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+class ConfluenceCrawler:  # pylint: disable=too-many-instance-attributes
+    """
+    Fetches confluence pages and their attachments concurrently, with at most max_concurrency
+    requests in flight, and yields the documents of the pages as they complete, so that they
+    can be split and embedded while the crawl goes on.
+
+    ConfluenceLoader fetches pages one after the other. The crawler fetches the same documents,
+    built by the same ConfluenceLoader methods, through the confluence client of a ConfluenceLoader.
+
+    Throttled requests are retried after the Retry-After delay the server asked for, and the whole
+    crawl pauses for that delay, since confluence rate limits the user rather than the request.
+    With a checkpoint directory, every completed page is appended to a checkpoint file of the crawl.
+    Running the same crawl again after an interruption yields the checkpointed pages without fetching
+    them. The checkpoint is removed once the crawl completes.
+    """
+
+    def __init__(
+        self,
+        confluence_loader_args: Dict[str, Any],
+        max_concurrency: int = DEFAULT_CRAWL_CONCURRENCY,
+        checkpoint_dir: Optional[str] = DEFAULT_CRAWL_CHECKPOINT_DIR,
+    ):
+        """
+        Constructor
+
+        :param confluence_loader_args: Dictionary of arguments for ConfluenceLoader containing a confluence URL
+        :param max_concurrency: Maximum number of confluence requests in flight
+        :param checkpoint_dir: Directory to checkpoint completed pages in, None to disable
+        """
+        self.confluence_loader_args: Dict[str, Any] = confluence_loader_args
+        loader_args: Dict[str, Any] = dict(confluence_loader_args)
+        if "retry_with_header" in inspect.signature(AtlassianRestAPI.__init__).parameters:
+            # The confluence client otherwise sleeps through a Retry-After in the thread of the throttled
+            # request only, while the other requests of the crawl keep going
+            loader_args["confluence_kwargs"] = {
+                "retry_with_header": False,
+                **(confluence_loader_args.get("confluence_kwargs") or {}),
+            }
+        self.loader = ConfluenceLoader(**loader_args)
+        self.max_concurrency: int = max(1, int(max_concurrency))
+        self.checkpoint_dir: Optional[str] = checkpoint_dir
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.resume_at: float = 0.0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        # The default connection pool of a requests session keeps 10 connections per host
+        if self.max_concurrency > 10:
+            adapter = HTTPAdapter(pool_connections=self.max_concurrency, pool_maxsize=self.max_concurrency)
+            self.loader.confluence.session.mount("https://", adapter)
+            self.loader.confluence.session.mount("http://", adapter)
+
+    @classmethod
+    def from_args(cls, confluence_loader_args: Dict[str, Any], args: Dict[str, Any]) -> "ConfluenceCrawler":
+        """
+        :param confluence_loader_args: Dictionary of arguments for ConfluenceLoader containing a confluence URL
+        :param args: Tool args, of which "crawl_concurrency" and "crawl_checkpoint_dir" override the defaults
+        :return: ConfluenceCrawler with these settings
+        """
+        settings: Dict[str, Any] = {param: args[arg] for arg, param in CRAWL_ARGS.items() if arg in args}
+        return cls(confluence_loader_args, **settings)
+
+    async def call(self, function: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking confluence request in a thread of the crawl, within the in-flight limit,
+        retrying it if it is throttled or fails transiently.
+
+        :param function: Function making the request
+        :param args: Positional arguments of the function
+        :param kwargs: Keyword arguments of the function
+        :return: What the function returns
+        """
+        attempt: int = 0
+        while True:
+            async with self.semaphore:
+                # Checked once a slot is taken, since the crawl may have been paused while waiting for it
+                pause: float = self.resume_at - time.monotonic()
+                while pause > 0:
+                    await asyncio.sleep(pause)
+                    pause = self.resume_at - time.monotonic()
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(
+                        self.executor, functools.partial(function, *args, **kwargs)
+                    )
+                except Exception as error:  # pylint: disable=broad-exception-caught
+                    if attempt >= MAX_RETRIES or not is_retryable_request(error):
+                        raise
+                    delay: float = retry_delay(error, attempt)
+                    if getattr(getattr(error, "response", None), "status_code", None) == 429:
+                        # Hold back every request of the crawl, not only this one
+                        self.resume_at = max(self.resume_at, time.monotonic() + delay)
+                    self.logger.warning("Confluence request failed (%s), retrying in %.1fs", error, delay)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def fetch_page(self, page_id: str) -> Tuple[str, List[Document]]:
+        """
+        :param page_id: Id of a page
+        :return: Tuple of the page id and the documents of the page, none if the page is restricted
+            and restricted content is not included
+        """
+        loader: ConfluenceLoader = self.loader
+        expand: str = ",".join(
+            [loader.content_format.value, "version", *(["metadata.labels"] if loader.include_labels else [])]
+        )
+        page: Dict[str, Any] = await self.call(loader.confluence.get_page_by_id, page_id=page_id, expand=expand)
+        if not loader.include_restricted_content and not await self.call(loader.is_public_page, page):
+            return page_id, []
+
+        attachment_texts: List[Optional[str]] = []
+        if loader.include_attachments:
+            attachments: List[Dict[str, Any]] = (
+                await self.call(loader.confluence.get_attachments_from_content, page_id)
+            )["results"]
+            attachment_texts = await asyncio.gather(
+                *(self.fetch_attachment_text(attachment) for attachment in attachments)
+            )
+
+        document: Document = await self.call(
+            loader.process_page,
+            page,
+            False,
+            loader.include_comments,
+            loader.include_labels,
+            loader.content_format,
+            loader.ocr_languages,
+            loader.keep_markdown_format,
+            keep_newlines=loader.keep_newlines,
+        )
+        document.page_content += "".join(text for text in attachment_texts if text)
+        return page_id, [document]
+
+    async def fetch_attachment_text(self, attachment: Dict[str, Any]) -> Optional[str]:
+        """
+        :param attachment: Attachment as returned by the confluence API
+        :return: Title and text of the attachment as ConfluenceLoader extracts it,
+            or None if the attachment is filtered out, of an unsupported type, or not found
+        """
+        loader: ConfluenceLoader = self.loader
+        if loader.attachment_filter_func and not loader.attachment_filter_func(attachment):
+            return None
+        processor: Optional[Tuple[str, bool]] = ATTACHMENT_PROCESSORS.get(attachment["metadata"]["mediaType"])
+        if processor is None:
+            return None
+        method_name, takes_ocr_languages = processor
+        link: str = loader.base_url + attachment["_links"]["download"]
+        args: List[Any] = [link, loader.ocr_languages] if takes_ocr_languages else [link]
+        try:
+            return attachment["title"] + await self.call(getattr(loader, method_name), *args)
+        except requests.HTTPError as http_error:
+            if http_error.response is not None and http_error.response.status_code == 404:
+                self.logger.warning("Attachment not found at %s", link)
+                return None
+            raise
+
+    def checkpoint_path(self, versions: Dict[str, str]) -> Optional[str]:
+        """
+        :param versions: Dictionary mapping the ids of the crawled pages to their versions
+        :return: Path of the checkpoint file of the crawl, or None if checkpointing is disabled
+        """
+        if not self.checkpoint_dir:
+            return None
+        content_args: Dict[str, Any] = {
+            arg: value for arg, value in self.confluence_loader_args.items() if arg not in PAGE_SELECTION_ARGS
+        }
+        name: str = registry_key("confluence_crawl", content_args, versions)
+        return os.path.join(os.path.abspath(os.path.expanduser(self.checkpoint_dir)), f"{name}.jsonl")
+
+    @staticmethod
+    def load_checkpoint(path: Optional[str]) -> Dict[str, List[Document]]:
+        """
+        :param path: Path of the checkpoint file of a crawl, or None
+        :return: Dictionary mapping the ids of the pages completed by an earlier run of the crawl
+            to their documents. A line cut short by the interruption is ignored.
+        """
+        pages: Dict[str, List[Document]] = {}
+        if not path or not os.path.exists(path):
+            return pages
+        with open(path, "r", encoding="utf-8") as checkpoint_file:
+            for line in checkpoint_file:
+                try:
+                    entry: Dict[str, Any] = json.loads(line)
+                except ValueError:
+                    continue
+                pages[entry["id"]] = [Document(**document) for document in entry["documents"]]
+        return pages
+
+    @staticmethod
+    def save_checkpoint_entry(checkpoint_file: Any, page_id: str, documents: List[Document]):
+        """
+        Append a completed page to the checkpoint file of a crawl.
+
+        :param checkpoint_file: Checkpoint file open for appending
+        :param page_id: Id of the page
+        :param documents: Documents of the page
+        """
+        entry: Dict[str, Any] = {
+            "id": page_id,
+            "documents": [
+                {"page_content": document.page_content, "metadata": document.metadata} for document in documents
+            ],
+        }
+        checkpoint_file.write(json.dumps(entry, default=str) + "\n")
+        checkpoint_file.flush()
+
+    async def afetch_pages(self, page_ids: List[str]) -> AsyncIterator[Tuple[str, List[Document]]]:
+        """
+        :param page_ids: Ids of the pages to fetch
+        :return: Async iterator of tuples of a page id and the documents of the page, in the order
+            the pages complete. Only a bounded number of pages are fetched ahead of the consumer.
+        """
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        # Threads of its own, since the default executor of the event loop may have fewer than max_concurrency
+        self.executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="confluence-crawl")
+        remaining = iter(page_ids)
+        pending: Set[asyncio.Task] = set()
+        try:
+            while True:
+                for page_id in remaining:
+                    pending.add(asyncio.create_task(self.fetch_page(page_id)))
+                    if len(pending) >= self.max_concurrency * PAGES_PER_REQUEST_SLOT:
+                        break
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def acrawl(self, versions: Dict[str, str]) -> AsyncIterator[Document]:
+        """
+        :param versions: Dictionary mapping the ids of the pages to crawl to their versions,
+            as returned by ConfluenceRag.get_page_versions(). The versions identify the crawl for checkpointing.
+        :return: Async iterator of the documents of the pages, in the order the pages complete
+        """
+        path: Optional[str] = self.checkpoint_path(versions)
+        checkpointed: Dict[str, List[Document]] = self.load_checkpoint(path)
+        if checkpointed:
+            print(f"Resuming the confluence crawl with {len(checkpointed)} pages from its checkpoint")
+        for documents in checkpointed.values():
+            for document in documents:
+                yield document
+
+        page_ids: List[str] = [page_id for page_id in versions if page_id not in checkpointed]
+        if not path:
+            async with aclosing(self.afetch_pages(page_ids)) as pages:
+                async for _, documents in pages:
+                    for document in documents:
+                        yield document
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as checkpoint_file:
+            async with aclosing(self.afetch_pages(page_ids)) as pages:
+                async for page_id, documents in pages:
+                    self.save_checkpoint_entry(checkpoint_file, page_id, documents)
+                    for document in documents:
+                        yield document
+        # The crawl completed, so there is nothing left to resume
+        os.remove(path)
@@ -0,0 +1,182 @@
+"""Assembly of retrieved chunks into a compact, token-budgeted context"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import os
+import re
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from langchain_core.documents import Document
+
+from coded_tools.rag_index.batch_embedder import estimate_tokens
+
+# Token budget of the context returned by the RAG tools, 0 for no limit
+DEFAULT_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "0"))
+
+# Chunks retrieved per requested chunk when packing into a budget, since merging and deduplication free up room
+PACKING_CANDIDATES_FACTOR: int = 2
+
+# Shortest overlap, in characters, between the end of one chunk and the start of another for them to be merged
+MIN_OVERLAP_CHARS: int = 20
+
+# Jaccard similarity of word trigrams above which two spans count as the same text
+NEAR_DUPLICATE_THRESHOLD: float = 0.9
+
+# Separator between the spans of a context
+SPAN_SEPARATOR: str = "\n\n"
+
+
+def span_key(document: Document) -> Tuple[str, str]:
+    """
+    :param document: Retrieved chunk
+    :return: Source and page of the chunk. Only chunks of the same page are merged.
+    """
+    metadata: Dict[str, Any] = document.metadata
+    return str(metadata.get("source", metadata.get("id", ""))), str(metadata.get("page", ""))
+
+
+def merge_overlapping(first: str, second: str) -> Optional[str]:
+    """
+    :param first: Text of a chunk
+    :param second: Text of a chunk that may continue the first one
+    :return: The contiguous text of both if the second is contained in the first or starts with
+        an end of the first of at least MIN_OVERLAP_CHARS characters, otherwise None
+    """
+    if second in first:
+        return first
+    probe: str = second[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return None
+    start: int = first.find(probe, max(0, len(first) - len(second)))
+    while start != -1:
+        if second.startswith(first[start:]):
+            return first[:start] + second
+        start = first.find(probe, start + 1)
+    return None
+
+
+def shingles(text: str) -> Set[Tuple[str, ...]]:
+    """
+    :param text: Text of a span
+    :return: Set of the lower-cased word trigrams of the text, or of its words if it is shorter
+    """
+    words: List[str] = re.findall(r"\w+", text.lower())
+    if len(words) < 3:
+        return {tuple(words)}
+    return {tuple(words[index : index + 3]) for index in range(len(words) - 2)}
+
+
+def is_near_duplicate(text: str, kept: List[Tuple[str, Set[Tuple[str, ...]]]]) -> bool:
+    """
+    :param text: Text of a span
+    :param kept: Texts and shingles of the spans kept so far
+    :return: True if the text is contained in a kept span or nearly the same as one
+    """
+    text_shingles: Set[Tuple[str, ...]] = shingles(text)
+    for kept_text, kept_shingles in kept:
+        if text in kept_text:
+            return True
+        union: int = len(text_shingles | kept_shingles)
+        if union and len(text_shingles & kept_shingles) / union >= NEAR_DUPLICATE_THRESHOLD:
+            return True
+    return False
+
+
+def merge_chunks(documents: List[Document]) -> List[Document]:
+    """
+    :param documents: Retrieved chunks, best first
+    :return: Contiguous spans of the chunks, best first. Overlapping or adjacent chunks of the same page
+        become one span, ranked by its best chunk, with its metadata and the number of merged chunks.
+    """
+    spans: List[Document] = []
+    for document in documents:
+        key: Tuple[str, str] = span_key(document)
+        merged: Optional[Document] = None
+        for span in spans:
+            if span_key(span) != key:
+                continue
+            text: Optional[str] = merge_overlapping(span.page_content, document.page_content)
+            if text is None:
+                text = merge_overlapping(document.page_content, span.page_content)
+            if text is not None:
+                span.page_content = text
+                span.metadata["merged_chunks"] += 1
+                merged = span
+                break
+        if merged is None:
+            spans.append(
+                Document(page_content=document.page_content, metadata={**document.metadata, "merged_chunks": 1})
+            )
+            continue
+
+        # The new chunk may bridge the gap between this span and a lower ranked span of the same page
+        for span in list(spans):
+            if span is merged or span_key(span) != key:
+                continue
+            text = merge_overlapping(merged.page_content, span.page_content) or merge_overlapping(
+                span.page_content, merged.page_content
+            )
+            if text is not None:
+                merged.page_content = text
+                merged.metadata["merged_chunks"] += span.metadata["merged_chunks"]
+                spans.remove(span)
+    return spans
+
+
+def pack_context(
+    documents: List[Document],
+    token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+) -> List[Document]:
+    """
+    Turn retrieved chunks into the spans to put into a prompt: overlapping chunks of the same page
+    are merged, near-identical spans are dropped and the remaining spans are packed into the token
+    budget, best first. A span that does not fit is skipped in favour of smaller, lower ranked ones.
+    If not even the best span fits, it is cut to the budget.
+
+    :param documents: Retrieved chunks, best first
+    :param token_budget: Maximum number of tokens of all spans and separators, 0 for no limit
+    :param count_tokens: Function returning the number of tokens of a text
+    :return: Spans, best first
+    """
+    kept: List[Tuple[str, Set[Tuple[str, ...]]]] = []
+    spans: List[Document] = []
+    for span in merge_chunks(documents):
+        if not is_near_duplicate(span.page_content, kept):
+            kept.append((span.page_content, shingles(span.page_content)))
+            spans.append(span)
+    if token_budget <= 0:
+        return spans
+
+    packed: List[Document] = []
+    used: int = 0
+    separator_tokens: int = count_tokens(SPAN_SEPARATOR) if spans else 0
+    for span in spans:
+        tokens: int = count_tokens(span.page_content) + (separator_tokens if packed else 0)
+        if used + tokens <= token_budget:
+            packed.append(span)
+            used += tokens
+    if not packed and spans:
+        span: Document = spans[0]
+        text: str = span.page_content
+        # Cut by the character share of the budget, then trim until the count fits
+        text = text[: max(1, len(text) * token_budget // max(1, count_tokens(text)))]
+        while len(text) > 1 and count_tokens(text) > token_budget:
+            text = text[: int(len(text) * 0.9)]
+        packed.append(Document(page_content=text, metadata={**span.metadata, "truncated": True}))
+    return packed
@@ -0,0 +1,148 @@
+"""Disk cache of remote sources of the RAG tools, revalidated with conditional requests"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+import requests
+
+# Response headers kept with a cached body, and the request headers they are sent back in to revalidate it
+VALIDATORS: Dict[str, str] = {"ETag": "If-None-Match", "Last-Modified": "If-Modified-Since"}
+
+# Errors meaning the source could not be reached, for which the cached copy is used
+OFFLINE_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+class FetchCache:
+    """
+    Cache of the bodies of remote documents, each stored on disk next to a JSON file with its
+    validators (ETag and Last-Modified), its sha256 digest and when it was fetched.
+
+    A cached URL is revalidated with a conditional request: a 304 response returns the cached body
+    without downloading it again. When the server cannot be reached or fails, the cached body is
+    returned, so the tools keep working offline. Entries are written atomically, so concurrent
+    fetches of the same URL from several threads or processes never see a partial body.
+
+    Other data derived from remote sources, such as loaded pages, can be kept with save() and load()
+    under keys of their own, with whatever version metadata the caller needs to check.
+    """
+
+    def __init__(self, cache_dir: Optional[str], timeout: float = 60):
+        """
+        Constructor
+
+        :param cache_dir: Directory of the cached entries, None or "" to always download
+        :param timeout: Timeout in seconds of the requests
+        """
+        self.cache_dir: Optional[str] = os.path.abspath(cache_dir) if cache_dir else None
+        self.timeout: float = timeout
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def entry_paths(self, key: str) -> Tuple[str, str]:
+        """
+        :param key: URL or other key of an entry
+        :return: Paths of the body and of the metadata of the entry
+        """
+        name: str = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.body"), os.path.join(self.cache_dir, f"{name}.json")
+
+    def load(self, key: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        """
+        :param key: URL or other key of an entry
+        :return: Tuple of the cached body and its metadata, or None if the key is not cached
+            or its body does not match the digest it was saved with
+        """
+        if not self.cache_dir:
+            return None
+        body_path, metadata_path = self.entry_paths(key)
+        try:
+            with open(metadata_path, "r", encoding="utf-8") as metadata_file:
+                metadata: Dict[str, Any] = json.load(metadata_file)
+            with open(body_path, "rb") as body_file:
+                content: bytes = body_file.read()
+        except (OSError, ValueError):
+            return None
+        if hashlib.sha256(content).hexdigest() != metadata.get("sha256"):
+            return None
+        return content, metadata
+
+    def save(self, key: str, content: bytes, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        :param key: URL or other key of an entry
+        :param content: Body to cache
+        :param metadata: JSON-serializable metadata to keep with the body
+        :return: The metadata as saved, with the "key", "sha256" and "fetched" time added
+        """
+        metadata = {**metadata, "key": key, "sha256": hashlib.sha256(content).hexdigest(), "fetched": time.time()}
+        if not self.cache_dir:
+            return metadata
+        os.makedirs(self.cache_dir, exist_ok=True)
+        body_path, metadata_path = self.entry_paths(key)
+        suffix: str = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        # The body is replaced first, and a reader pairing the old metadata with it fails the digest check
+        with open(body_path + suffix, "wb") as body_file:
+            body_file.write(content)
+        os.replace(body_path + suffix, body_path)
+        with open(metadata_path + suffix, "w", encoding="utf-8") as metadata_file:
+            json.dump(metadata, metadata_file)
+        os.replace(metadata_path + suffix, metadata_path)
+        return metadata
+
+    def fetch(self, url: str) -> Dict[str, Any]:
+        """
+        :param url: http(s) URL of a document
+        :return: Dictionary with the "content" of the document and its "status": "downloaded",
+            "not_modified" if the cached body was still current, or "offline" if the cached body
+            was returned because the server could not be reached or failed
+        :raises ValueError: If the server answers with a client error, or with a server error
+            for a URL that is not cached
+        :raises requests.exceptions.RequestException: If the server cannot be reached and the URL is not cached
+        """
+        cached: Optional[Tuple[bytes, Dict[str, Any]]] = self.load(url)
+        headers: Dict[str, str] = {}
+        if cached is not None:
+            headers = {
+                request_header: cached[1][header]
+                for header, request_header in VALIDATORS.items()
+                if cached[1].get(header)
+            }
+
+        try:
+            response = requests.get(url, headers=headers, timeout=self.timeout)
+        except OFFLINE_ERRORS as error:
+            if cached is None:
+                raise
+            self.logger.warning("Cannot reach %s, using the copy cached at %s: %s", url, cached[1]["fetched"], error)
+            return {"content": cached[0], "status": "offline"}
+
+        if response.status_code == 304 and cached is not None:
+            return {"content": cached[0], "status": "not_modified"}
+        if response.status_code >= 500 and cached is not None:
+            self.logger.warning("%s returned status code %d, using the cached copy", url, response.status_code)
+            return {"content": cached[0], "status": "offline"}
+        if response.status_code != 200:
+            raise ValueError(f"Check the url of your file; returned status code {response.status_code}")
+
+        validators: Dict[str, str] = {
+            header: response.headers[header] for header in VALIDATORS if header in response.headers
+        }
+        self.save(url, response.content, {"url": url, **validators})
+        return {"content": response.content, "status": "downloaded"}
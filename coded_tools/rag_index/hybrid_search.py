@@ -0,0 +1,147 @@
+"""Vector, keyword and hybrid retrieval over a NumpyVectorStore"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import asyncio
+import os
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from coded_tools.rag_index.ann_index import DEFAULT_ANN_INDEX
+from coded_tools.rag_index.ann_index import DEFAULT_ANN_N_PROBE
+from coded_tools.rag_index.ann_index import ann_index_class
+from coded_tools.rag_index.keyword_index import KeywordIndex
+from coded_tools.rag_index.keyword_index import is_identifier_query
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+from coded_tools.rag_index.query_cache import DEFAULT_SEMANTIC_CACHE_THRESHOLD
+from coded_tools.rag_index.query_cache import QUERY_CACHE
+from coded_tools.rag_index.query_cache import QueryCache
+
+# "vector" ranks chunks by embedding similarity, "keyword" by BM25 and "hybrid" fuses both rankings
+RETRIEVAL_MODES: Tuple[str, ...] = ("vector", "keyword", "hybrid")
+DEFAULT_RETRIEVAL_MODE: str = os.getenv("RAG_RETRIEVAL_MODE", "vector")
+
+# Rank offset of reciprocal-rank fusion. Larger values flatten the advantage of the top ranks.
+RRF_K: int = 60
+
+# Number of candidates taken from each ranking per requested chunk, and at least
+CANDIDATES_PER_RESULT: int = 5
+MIN_CANDIDATES: int = 20
+
+# Maps the retrieval arguments of the RAG tools to the parameters of aretrieve()
+RETRIEVAL_ARGS: Dict[str, str] = {
+    "retrieval_mode": "mode",
+    "semantic_cache_threshold": "semantic_threshold",
+    "ann_index": "ann_index",
+    "ann_n_probe": "n_probe",
+}
+
+
+def retrieval_kwargs(args: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    :param args: Arguments of a RAG tool call
+    :return: The retrieval arguments among them, as keyword arguments of aretrieve()
+    :raises ValueError: If the retrieval mode or the approximate index kind is unknown
+    """
+    kwargs: Dict[str, Any] = {param: args[arg] for arg, param in RETRIEVAL_ARGS.items() if arg in args}
+    if kwargs.get("mode", DEFAULT_RETRIEVAL_MODE) not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval_mode {kwargs['mode']!r}, expected one of {', '.join(RETRIEVAL_MODES)}")
+    ann_index_class(kwargs.get("ann_index", DEFAULT_ANN_INDEX))
+    return kwargs
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int, rrf_k: int = RRF_K) -> List[int]:
+    """
+    :param rankings: Rankings of chunk rows, best first
+    :param k: Number of rows to return
+    :param rrf_k: Rank offset added to every rank
+    :return: Up to k rows ordered by the sum of 1 / (rrf_k + rank) over the rankings they appear in.
+        Ties keep the order in which rows first appear in the rankings.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(fused, key=lambda row: -fused[row])[:k]
+
+
+async def aretrieve(  # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+    vectorstore: NumpyVectorStore,
+    query: str,
+    k: int = 4,
+    mode: str = DEFAULT_RETRIEVAL_MODE,
+    semantic_threshold: float = DEFAULT_SEMANTIC_CACHE_THRESHOLD,
+    ann_index: Optional[str] = DEFAULT_ANN_INDEX,
+    n_probe: int = DEFAULT_ANN_N_PROBE,
+    cache: QueryCache = QUERY_CACHE,
+) -> List[Document]:
+    """
+    Retrieve the chunks most relevant to a query.
+
+    In "hybrid" mode the vector ranking and the BM25 ranking of the keyword index are fused
+    by reciprocal-rank fusion, so exact matches of part numbers, policy codes and acronyms
+    are found even when their embeddings are not close to the query. A query made only of
+    identifiers that the keyword index matches is answered from the keyword index alone,
+    without embedding the query.
+
+    :param vectorstore: Vector store to search
+    :param query: Query string
+    :param k: Number of chunks to return
+    :param mode: One of RETRIEVAL_MODES
+    :param semantic_threshold: Cosine similarity above which the cached results of a previous
+        query are returned, 0 to always search
+    :param ann_index: Kind of approximate nearest neighbour index for the vector search, "exact" to scan all chunks
+    :param n_probe: Number of inverted lists an approximate search probes
+    :param cache: Cache of query embeddings and results
+    :return: Up to k documents, best first
+    :raises ValueError: If the mode or the approximate index kind is unknown
+    """
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode {mode!r}, expected one of {', '.join(RETRIEVAL_MODES)}")
+    if mode != "keyword":
+        # Building the approximate index of a large store takes a while, so it is not done on the event loop
+        await asyncio.to_thread(vectorstore.get_ann_index, ann_index)
+    if mode == "vector":
+        return await cache.asimilarity_search(
+            vectorstore, query, k=k, semantic_threshold=semantic_threshold, ann_index=ann_index, n_probe=n_probe
+        )
+    if len(vectorstore) == 0 or k <= 0:
+        return []
+
+    candidates: int = max(k * CANDIDATES_PER_RESULT, MIN_CANDIDATES)
+    # The keyword index is built on first use, which is not done on the event loop either
+    keyword_index: KeywordIndex = await asyncio.to_thread(getattr, vectorstore, "keyword_index")
+    keyword_hits: List[Tuple[int, float]] = keyword_index.search(query, candidates)
+    if mode == "keyword" or (keyword_hits and is_identifier_query(query)):
+        return [vectorstore.get_document(row) for row, _ in keyword_hits[:k]]
+
+    vector: np.ndarray = await cache.aembed_query(vectorstore.embedding, query)
+    if semantic_threshold > 0:
+        cached: Optional[List[Document]] = cache.lookup(
+            vectorstore.version, vector, k, semantic_threshold, mode, ann_index, n_probe
+        )
+        if cached is not None:
+            return cached
+
+    vector_rows, _ = vectorstore.top_rows_by_vector(vector, candidates, ann_index, n_probe)
+    rows: List[int] = reciprocal_rank_fusion([vector_rows.tolist(), [row for row, _ in keyword_hits]], k)
+    results: List[Document] = [vectorstore.get_document(row) for row in rows]
+    if semantic_threshold > 0:
+        cache.store(vectorstore.version, vector, k, results, mode, ann_index, n_probe)
+    return results
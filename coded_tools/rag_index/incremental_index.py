@@ -0,0 +1,167 @@
+"""Persisted vector store that can be updated one source document at a time"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import json
+import os
+from typing import Any
+from typing import AsyncIterable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Union
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import TextSplitter
+
+from coded_tools.rag_index.ingestion import IngestionPipeline
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+from coded_tools.rag_index.numpy_vector_store import load_vector_store
+
+
+class IncrementalIndex:
+    """
+    Vector store persisted together with a manifest that records, for every source
+    document, the version that was indexed and the ids of the chunks it produced.
+
+    Callers describe the current document set as a mapping of source id to version
+    (a content hash, a page version, a last-modified stamp ...). diff() compares that
+    mapping with the manifest, so only the chunks of added or changed sources need to
+    be embedded, and the chunks of removed sources are deleted.
+    """
+
+    def __init__(self, path: str, embedding: Embeddings):
+        """
+        Constructor
+
+        :param path: Directory of the persisted vector store.
+            The manifest is kept next to it with a ".manifest.json" suffix.
+        :param embedding: Embeddings used for the vector store
+        """
+        self.path: str = path
+        self.manifest_path: str = f"{path}.manifest.json"
+        self.vectorstore = NumpyVectorStore(embedding=embedding)
+        # Maps source id to {"version": <version>, "ids": [<chunk id>, ...]}
+        self.sources: Dict[str, Dict[str, Any]] = {}
+
+    def load(self) -> bool:
+        """
+        Load the persisted vector store and its manifest.
+        An index without a manifest cannot be diffed, so it is ignored and rebuilt.
+
+        :return: True if a persisted index was loaded, False if starting empty
+        """
+        if not os.path.exists(self.manifest_path):
+            return False
+        try:
+            self.vectorstore = load_vector_store(self.path, self.vectorstore.embedding)
+        except FileNotFoundError:
+            return False
+        with open(self.manifest_path, "r", encoding="utf-8") as file:
+            self.sources = json.load(file).get("sources", {})
+        return True
+
+    def save(self):
+        """
+        Persist the vector store and its manifest.
+        Both are written to temporary locations first and then moved into place.
+        """
+        directory: str = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.vectorstore.dump(self.path)
+
+        tmp_manifest_path: str = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_manifest_path, "w", encoding="utf-8") as file:
+            json.dump({"sources": self.sources}, file)
+        os.replace(tmp_manifest_path, self.manifest_path)
+
+    def diff(self, versions: Dict[str, str]) -> Dict[str, List[str]]:
+        """
+        Compare the current document set with what is in the index.
+
+        :param versions: Mapping of source id to the current version of that source
+        :return: Dictionary with lists of source ids under the keys
+            "added", "changed", "removed" and "unchanged"
+        """
+        result: Dict[str, List[str]] = {"added": [], "changed": [], "removed": [], "unchanged": []}
+        for source_id, version in versions.items():
+            indexed: Dict[str, Any] = self.sources.get(source_id)
+            if indexed is None:
+                result["added"].append(source_id)
+            elif indexed.get("version") != version:
+                result["changed"].append(source_id)
+            else:
+                result["unchanged"].append(source_id)
+        result["removed"] = [source_id for source_id in self.sources if source_id not in versions]
+        return result
+
+    def remove_source(self, source_id: str):
+        """
+        Delete all chunks of a source from the index.
+
+        :param source_id: Id of the source to remove
+        """
+        self.remove_sources([source_id])
+
+    def remove_sources(self, source_ids: List[str]):
+        """
+        Delete all chunks of several sources from the index in one pass.
+
+        :param source_ids: Ids of the sources to remove
+        """
+        chunk_ids: List[str] = []
+        for source_id in source_ids:
+            indexed: Dict[str, Any] = self.sources.pop(source_id, None)
+            if indexed:
+                chunk_ids.extend(indexed.get("ids") or [])
+        if chunk_ids:
+            self.vectorstore.delete(ids=chunk_ids)
+
+    def put_source(self, source_id: str, version: str, source_store: NumpyVectorStore):
+        """
+        Replace the chunks of a source with already embedded chunks.
+
+        :param source_id: Id of the source
+        :param version: Version of the source the chunks were produced from
+        :param source_store: Vector store holding the embedded chunks of this one source
+        """
+        self.remove_source(source_id)
+        self.sources[source_id] = {"version": version, "ids": self.vectorstore.add_store(source_store)}
+
+    async def aput_pages(
+        self,
+        pages: Union[AsyncIterable[Document], Iterable[Document]],
+        text_splitter: TextSplitter,
+        versions: Dict[str, str],
+        source_key: str = "source",
+    ):
+        """
+        Replace the chunks of several sources at once, streaming their pages through an IngestionPipeline.
+
+        :param pages: Sync or async iterable of the pages of the sources to replace
+        :param text_splitter: Splitter used to chunk the pages
+        :param versions: Mapping of source id to version for every source being replaced.
+            Sources listed here without any page are recorded with no chunks,
+            so that they are not fetched again until their version changes.
+        :param source_key: Metadata key of a page holding its source id
+        """
+        self.remove_sources(list(versions))
+        pipeline = IngestionPipeline(self.vectorstore, text_splitter, source_key=source_key)
+        await pipeline.aingest(pages)
+        # Pages of sources that were not listed replace what was indexed for those sources too
+        self.remove_sources([source_id for source_id in pipeline.ids_by_source if source_id not in versions])
+        ids_by_source: Dict[str, List[str]] = {source_id: [] for source_id in versions}
+        ids_by_source.update(pipeline.ids_by_source)
+        for source_id, ids in ids_by_source.items():
+            self.sources[source_id] = {"version": versions.get(source_id), "ids": ids}
@@ -0,0 +1,138 @@
+"""Content-addressed on-disk cache of embedded document chunks for the RAG tools"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import hashlib
+import json
+import logging
+import os
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+from langchain_core.embeddings import Embeddings
+
+from coded_tools.rag_index.fetch_cache import FetchCache
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+
+# Directory where cached index entries are kept unless the caller says otherwise
+DEFAULT_INDEX_CACHE_DIR: str = os.getenv("RAG_INDEX_CACHE_DIR", "./rag_index_cache")
+
+# Timeout in seconds when downloading a remote source to compute its content key
+DOWNLOAD_TIMEOUT_SECONDS: int = 60
+
+# Directory of the cached remote sources, "" to download them on every read
+DEFAULT_FETCH_CACHE_DIR: str = os.getenv("RAG_FETCH_CACHE_DIR", os.path.join(DEFAULT_INDEX_CACHE_DIR, "fetch"))
+
+# Cache of the remote sources, shared by the tools so that a source is revalidated rather than downloaded again
+FETCH_CACHE = FetchCache(DEFAULT_FETCH_CACHE_DIR, DOWNLOAD_TIMEOUT_SECONDS)
+
+
+def read_source_bytes(path_or_url: str) -> bytes:
+    """
+    Read the raw bytes of a local file or of a document behind an http(s) URL.
+    Remote documents are kept in FETCH_CACHE, and only downloaded again once they changed.
+
+    :param path_or_url: Local file path or http(s) URL
+    :return: The raw content of the source
+    :raises FileNotFoundError: If a local path does not exist
+    :raises ValueError: If the source is neither a file nor a reachable URL
+    :raises requests.exceptions.RequestException: If a URL that is not cached cannot be reached
+    """
+    expanded: str = os.path.expanduser(path_or_url)
+    if os.path.isfile(expanded):
+        with open(expanded, "rb") as file:
+            return file.read()
+
+    if path_or_url.startswith(("http://", "https://")):
+        return FETCH_CACHE.fetch(path_or_url)["content"]
+
+    raise FileNotFoundError(path_or_url)
+
+
+def content_key(content: bytes, splitter_settings: Dict[str, Any], embedding_model: str) -> str:
+    """
+    :param content: Raw bytes of a source document
+    :param splitter_settings: Settings of the text splitter used to chunk the source
+    :param embedding_model: Name of the embedding model used to embed the chunks
+    :return: Hex digest identifying the embedded chunks of that content
+    """
+    digest = hashlib.sha256()
+    digest.update(content)
+    digest.update(json.dumps(splitter_settings, sort_keys=True).encode("utf-8"))
+    digest.update(embedding_model.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class IndexCache:
+    """
+    On-disk cache of per-source vector stores.
+
+    Each entry holds the embedded chunks of exactly one source document and is keyed by a
+    hash of the source bytes, the text splitter settings and the embedding model.
+    Changing any of those yields a new key, so stale entries are never returned and
+    unchanged sources in a multi-document set are never re-embedded.
+    """
+
+    def __init__(self, cache_dir: str, splitter_settings: Dict[str, Any], embedding_model: str):
+        """
+        Constructor
+
+        :param cache_dir: Directory in which cache entries are stored
+        :param splitter_settings: Settings of the text splitter used to chunk the sources
+        :param embedding_model: Name of the embedding model used to embed the chunks
+        """
+        self.cache_dir: str = os.path.abspath(os.path.expanduser(cache_dir))
+        self.splitter_settings: Dict[str, Any] = splitter_settings
+        self.embedding_model: str = embedding_model
+
+    def content_key(self, content: bytes) -> str:
+        """
+        :param content: Raw bytes of a source document
+        :return: Hex digest identifying the embedded chunks of that content under
+            the current splitter settings and embedding model
+        """
+        return content_key(content, self.splitter_settings, self.embedding_model)
+
+    def entry_path(self, key: str) -> str:
+        """
+        :param key: Content key as returned by content_key()
+        :return: Absolute path of the cache entry directory for that key
+        """
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key: str, embedding: Embeddings) -> Optional[NumpyVectorStore]:
+        """
+        :param key: Content key as returned by content_key()
+        :param embedding: Embeddings to attach to the loaded vector store
+        :return: The cached vector store for the key, or None on a cache miss
+        """
+        path: str = self.entry_path(key)
+        if not os.path.isdir(path):
+            return None
+        try:
+            return NumpyVectorStore.load(path, embedding)
+        except (ValueError, OSError) as error:
+            # A truncated or otherwise unreadable entry is treated as a miss and rebuilt.
+            logging.getLogger(self.__class__.__name__).warning("Ignoring unreadable cache entry %s: %s", path, error)
+            return None
+
+    def save(self, key: str, vectorstore: NumpyVectorStore):
+        """
+        Store the vector store of a single source under its content key.
+        NumpyVectorStore.dump() moves the entry into place only once it is complete,
+        so concurrent readers never see a partially written entry.
+
+        :param key: Content key as returned by content_key()
+        :param vectorstore: Vector store holding the embedded chunks of one source
+        """
+        vectorstore.dump(self.entry_path(key))
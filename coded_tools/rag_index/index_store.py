@@ -0,0 +1,394 @@
+"""Multi-tenant store of the persisted vector stores of the RAG tools, with per-namespace quotas"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from coded_tools.rag_index.index_cache import DEFAULT_INDEX_CACHE_DIR
+from coded_tools.rag_index.numpy_vector_store import HEADER_FILE
+
+# Root directory of the managed vector stores, with one sub-directory per namespace
+DEFAULT_INDEX_STORE_DIR: str = os.getenv("RAG_INDEX_STORE_DIR", os.path.join(DEFAULT_INDEX_CACHE_DIR, "stores"))
+
+# Namespace of the tools that are not given an "index_namespace" arg. "" keeps vector_store_path unmanaged,
+# absolute or relative to the tool module.
+DEFAULT_INDEX_NAMESPACE: str = os.getenv("RAG_INDEX_NAMESPACE", "")
+
+# Default quotas of a namespace: bytes and chunks of its persisted vector stores, and bytes of its vector stores
+# kept in memory by the shared registry. 0 for no limit other than the size of the registry itself.
+DEFAULT_NAMESPACE_QUOTAS: Dict[str, int] = {
+    "max_bytes": int(os.getenv("RAG_NAMESPACE_MAX_BYTES", str(1024 * 1024 * 1024))),
+    "max_chunks": int(os.getenv("RAG_NAMESPACE_MAX_CHUNKS", "0")),
+    "memory_bytes": int(os.getenv("RAG_NAMESPACE_MEMORY_BYTES", "0")),
+}
+
+# JSON file mapping namespaces to the quotas overriding the defaults, such as {"team-a": {"max_bytes": 5000000000}}
+DEFAULT_QUOTAS_FILE: str = os.getenv("RAG_NAMESPACE_QUOTAS_FILE", "")
+
+# Characters that are not valid in a vector store path
+INVALID_PATH_PATTERN = r"[<>:\"|?*\x00-\x1F]"
+
+# Namespaces and index names are single path components, so that no index can be placed outside its namespace
+NAME_PATTERN = r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$"
+
+# Suffix of the file whose modification time is the last access time of an index
+ACCESS_FILE_SUFFIX = ".access"
+
+# Files next to an index that belong to it, such as the manifest of an incremental index
+INDEX_FILE_SUFFIXES = (".manifest.json", ACCESS_FILE_SUFFIX)
+
+# Seconds within which repeated accesses to an index are recorded once
+ACCESS_RESOLUTION_SECONDS: float = 60.0
+
+
+class QuotaExceededError(ValueError):
+    """
+    Raised when saving a vector store would take its namespace over one of its quotas.
+    """
+
+
+def validate_name(name: str, kind: str = "name") -> str:
+    """
+    :param name: Namespace or index name
+    :param kind: What the name is, for the error message
+    :return: The name
+    :raises ValueError: If the name is not a single path component of letters, digits, "_", "." and "-"
+    """
+    if not isinstance(name, str) or not re.match(NAME_PATTERN, name) or name.endswith(INDEX_FILE_SUFFIXES):
+        raise ValueError(f"Invalid index {kind}: '{name}'")
+    return name
+
+
+def resolve_vector_store_path(vector_store_path: str, namespace: str, base_path: str) -> str:
+    """
+    :param vector_store_path: "vector_store_path" arg of a RAG tool. Vector stores are saved as directories.
+        A ".json" suffix is accepted for existing configurations, and a JSON vector store found there
+        is converted on first load.
+    :param namespace: Namespace of a managed vector store, in which vector_store_path is the name of the vector
+        store, or "" for a vector store path that is absolute or relative to base_path
+    :param base_path: Directory relative paths of unmanaged vector stores are relative to
+    :return: Absolute path of the directory of the vector store
+    :raises ValueError: If the path has invalid characters, or a managed vector store is not a plain name
+    """
+    # Check for obviously invalid characters in filenames (basic check)
+    if re.search(INVALID_PATH_PATTERN, vector_store_path):
+        raise ValueError(f"Invalid vector_store_path: '{vector_store_path}'")
+    if vector_store_path.endswith(".json"):
+        vector_store_path = vector_store_path[: -len(".json")]
+    if namespace:
+        # Managed vector stores are named within their namespace and cannot be placed outside of it
+        return INDEX_STORE.index_path(namespace, vector_store_path)
+    return os.path.abspath(os.path.join(base_path, os.path.expanduser(vector_store_path)))
+
+
+def directory_bytes(path: str) -> int:
+    """
+    :param path: Directory or file
+    :return: Total size in bytes of the files under the path, 0 if it does not exist
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+class IndexStore:
+    """
+    Store of named vector stores grouped in namespaces, one per tenant or agent network.
+
+    A namespace is a directory under the root of the store, and its vector stores can only be placed in it.
+    The bytes and chunks of the vector stores of a namespace are accounted on disk and checked against its
+    quotas before every save. The last access of every index is recorded, so that cold indexes can be listed
+    and pruned. The store only manages files; the vector stores kept in memory are those of the shared
+    registry, which evicts the least recently used ones of a namespace beyond its "memory_bytes" quota,
+    to be loaded again from this store on their next request.
+    """
+
+    def __init__(
+        self,
+        root_dir: str = DEFAULT_INDEX_STORE_DIR,
+        default_quotas: Dict[str, int] = None,
+        quotas: Dict[str, Dict[str, int]] = None,
+    ):
+        """
+        Constructor
+
+        :param root_dir: Directory holding one sub-directory per namespace
+        :param default_quotas: Quotas of the namespaces that quotas does not list, DEFAULT_NAMESPACE_QUOTAS if None
+        :param quotas: Dictionary mapping namespaces to quotas overriding the defaults
+        """
+        self.root_dir: str = os.path.abspath(os.path.expanduser(root_dir))
+        self.default_quotas: Dict[str, int] = dict(default_quotas or DEFAULT_NAMESPACE_QUOTAS)
+        self.quotas: Dict[str, Dict[str, int]] = quotas or {}
+        self.lock = threading.Lock()
+        # Maps index path to the time its last access was recorded by this process
+        self.recorded_accesses: Dict[str, float] = {}
+
+    @classmethod
+    def from_quotas_file(cls, root_dir: str = DEFAULT_INDEX_STORE_DIR, quotas_file: str = DEFAULT_QUOTAS_FILE):
+        """
+        :param root_dir: Directory holding one sub-directory per namespace
+        :param quotas_file: JSON file mapping namespaces to their quotas, "" for the defaults only
+        :return: A store with the quotas of the file
+        """
+        quotas: Dict[str, Dict[str, int]] = {}
+        if quotas_file:
+            with open(quotas_file, "r", encoding="utf-8") as file:
+                quotas = json.load(file)
+        return cls(root_dir, quotas=quotas)
+
+    def quota(self, namespace: str) -> Dict[str, int]:
+        """
+        :param namespace: Namespace
+        :return: Dictionary with the "max_bytes", "max_chunks" and "memory_bytes" quotas of the namespace
+        """
+        return {**self.default_quotas, **self.quotas.get(validate_name(namespace, "namespace"), {})}
+
+    def index_path(self, namespace: str, name: str) -> str:
+        """
+        :param namespace: Namespace of the index
+        :param name: Name of the index within its namespace. A ".json" suffix is ignored.
+        :return: Absolute path of the directory of the index
+        :raises ValueError: If the namespace or the name is not a valid single path component
+        """
+        if isinstance(name, str) and name.endswith(".json"):
+            name = name[: -len(".json")]
+        return os.path.join(self.root_dir, validate_name(namespace, "namespace"), validate_name(name))
+
+    def usage(self, namespace: str, exclude: str = None) -> Dict[str, int]:
+        """
+        :param namespace: Namespace
+        :param exclude: Path of an index to leave out, such as the one about to be replaced
+        :return: Dictionary with the total "bytes" and "chunks" of the persisted indexes of the namespace
+        """
+        bytes_total: int = 0
+        chunks_total: int = 0
+        for index in self.list_indexes(namespace):
+            if index["path"] != exclude:
+                bytes_total += index["bytes"]
+                chunks_total += index["chunks"]
+        return {"bytes": bytes_total, "chunks": chunks_total}
+
+    def check_quota(self, namespace: str, path: str, chunks: int, nbytes: int):
+        """
+        Check that saving a vector store keeps its namespace within its quotas.
+
+        :param namespace: Namespace of the index
+        :param path: Path of the index as returned by index_path(). Its current size does not count,
+            since the saved vector store replaces it.
+        :param chunks: Number of chunks of the vector store to save
+        :param nbytes: Approximate size in bytes of the vector store to save
+        :raises QuotaExceededError: If the namespace would exceed its bytes or chunks quota
+        """
+        quota: Dict[str, int] = self.quota(namespace)
+        with self.lock:
+            usage: Dict[str, int] = self.usage(namespace, exclude=path)
+        if quota["max_bytes"] and usage["bytes"] + nbytes > quota["max_bytes"]:
+            raise QuotaExceededError(
+                f"Saving {nbytes} bytes to index '{os.path.basename(path)}' would take namespace '{namespace}' "
+                f"over its quota of {quota['max_bytes']} bytes ({usage['bytes']} used by its other indexes)"
+            )
+        if quota["max_chunks"] and usage["chunks"] + chunks > quota["max_chunks"]:
+            raise QuotaExceededError(
+                f"Saving {chunks} chunks to index '{os.path.basename(path)}' would take namespace '{namespace}' "
+                f"over its quota of {quota['max_chunks']} chunks ({usage['chunks']} used by its other indexes)"
+            )
+
+    def record_access(self, path: str):
+        """
+        Record an access to an index, at most once per ACCESS_RESOLUTION_SECONDS.
+
+        :param path: Path of the index as returned by index_path()
+        """
+        now: float = time.time()
+        with self.lock:
+            if now - self.recorded_accesses.get(path, 0.0) < ACCESS_RESOLUTION_SECONDS:
+                return
+            self.recorded_accesses[path] = now
+        access_path: str = f"{path}{ACCESS_FILE_SUFFIX}"
+        try:
+            os.makedirs(os.path.dirname(access_path), exist_ok=True)
+            with open(access_path, "a", encoding="utf-8"):
+                pass
+            os.utime(access_path, (now, now))
+        except OSError:
+            # Access times only inform listing and pruning, they must never fail a query
+            pass
+
+    def list_indexes(self, namespace: str = None) -> List[Dict[str, Any]]:
+        """
+        :param namespace: Namespace to list, None for all of them
+        :return: One dictionary per index with its "namespace", "name", "path", "bytes" on disk, "chunks"
+            and "last_access" time in seconds since the epoch, least recently accessed first
+        """
+        namespaces: List[str] = [validate_name(namespace, "namespace")] if namespace is not None else []
+        if namespace is None and os.path.isdir(self.root_dir):
+            namespaces = sorted(name for name in os.listdir(self.root_dir) if re.match(NAME_PATTERN, name))
+        indexes: List[Dict[str, Any]] = []
+        for namespace_name in namespaces:
+            namespace_dir: str = os.path.join(self.root_dir, namespace_name)
+            if not os.path.isdir(namespace_dir):
+                continue
+            for name in sorted(os.listdir(namespace_dir)):
+                path: str = os.path.join(namespace_dir, name)
+                if not os.path.isfile(os.path.join(path, HEADER_FILE)):
+                    continue
+                indexes.append(
+                    {
+                        "namespace": namespace_name,
+                        "name": name,
+                        "path": path,
+                        "bytes": sum(directory_bytes(f"{path}{suffix}") for suffix in ("", *INDEX_FILE_SUFFIXES)),
+                        "chunks": self.chunk_count(path),
+                        "last_access": self.last_access(path),
+                    }
+                )
+        return sorted(indexes, key=lambda index: index["last_access"])
+
+    @staticmethod
+    def chunk_count(path: str) -> int:
+        """
+        :param path: Directory of a vector store
+        :return: Number of chunks recorded in the header of the vector store, 0 if it cannot be read
+        """
+        try:
+            with open(os.path.join(path, HEADER_FILE), "r", encoding="utf-8") as file:
+                return int(json.load(file).get("count", 0))
+        except (OSError, ValueError):
+            return 0
+
+    @staticmethod
+    def last_access(path: str) -> float:
+        """
+        :param path: Directory of a vector store
+        :return: Time of the last recorded access, or of the last save if none was recorded
+        """
+        for candidate in (f"{path}{ACCESS_FILE_SUFFIX}", os.path.join(path, HEADER_FILE)):
+            try:
+                return os.path.getmtime(candidate)
+            except OSError:
+                continue
+        return 0.0
+
+    def delete(self, namespace: str, name: str) -> bool:
+        """
+        Delete an index and the files that belong to it.
+        Vector stores already loaded from it keep working until they are evicted from memory.
+
+        :param namespace: Namespace of the index
+        :param name: Name of the index
+        :return: True if there was an index to delete
+        """
+        path: str = self.index_path(namespace, name)
+        existed: bool = os.path.isdir(path)
+        shutil.rmtree(path, ignore_errors=True)
+        for suffix in INDEX_FILE_SUFFIXES:
+            if os.path.exists(f"{path}{suffix}"):
+                os.remove(f"{path}{suffix}")
+        with self.lock:
+            self.recorded_accesses.pop(path, None)
+        return existed
+
+    def prune(self, max_idle_seconds: float, namespace: str = None) -> List[Dict[str, Any]]:
+        """
+        Delete the indexes that have not been accessed for a while.
+
+        :param max_idle_seconds: Seconds since the last access after which an index is deleted
+        :param namespace: Namespace to prune, None for all of them
+        :return: The deleted indexes, as listed by list_indexes()
+        """
+        cutoff: float = time.time() - max_idle_seconds
+        pruned: List[Dict[str, Any]] = []
+        for index in self.list_indexes(namespace):
+            if index["last_access"] < cutoff:
+                self.delete(index["namespace"], index["name"])
+                pruned.append(index)
+        return pruned
+
+    def report(self, namespace: str = None) -> Dict[str, Any]:
+        """
+        :param namespace: Namespace to report on, None for all of them
+        :return: Admin listing: per namespace, its quotas, its usage and its indexes with their size, chunks
+            and last access time, least recently accessed first
+        """
+        namespaces: Dict[str, Dict[str, Any]] = {}
+        for index in self.list_indexes(namespace):
+            entry: Dict[str, Any] = namespaces.setdefault(
+                index["namespace"],
+                {"quota": self.quota(index["namespace"]), "usage": {"bytes": 0, "chunks": 0}, "indexes": []},
+            )
+            entry["usage"]["bytes"] += index["bytes"]
+            entry["usage"]["chunks"] += index["chunks"]
+            entry["indexes"].append(
+                {
+                    "name": index["name"],
+                    "bytes": index["bytes"],
+                    "chunks": index["chunks"],
+                    "last_access": datetime.fromtimestamp(index["last_access"], timezone.utc).isoformat(),
+                }
+            )
+        return {"root_dir": self.root_dir, "namespaces": namespaces}
+
+
+# Store shared by all RAG tool invocations in this process
+INDEX_STORE = IndexStore.from_quotas_file()
+
+
+def main():
+    """
+    List, delete or prune the indexes of the store.
+
+    Examples, from the repository root:
+        python -m coded_tools.rag_index.index_store list
+        python -m coded_tools.rag_index.index_store list --namespace team-a
+        python -m coded_tools.rag_index.index_store delete team-a confluence_vector_store
+        python -m coded_tools.rag_index.index_store prune --max-idle-days 30
+    """
+    parser = argparse.ArgumentParser(description="Administer the managed vector stores of the RAG tools")
+    parser.add_argument("--root-dir", default=DEFAULT_INDEX_STORE_DIR, help="root directory of the store")
+    parser.add_argument("--quotas-file", default=DEFAULT_QUOTAS_FILE, help="JSON file of per-namespace quotas")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_command = commands.add_parser("list", help="list the indexes with their size and last access time")
+    list_command.add_argument("--namespace", help="namespace to list, all of them by default")
+    delete_command = commands.add_parser("delete", help="delete an index")
+    delete_command.add_argument("namespace")
+    delete_command.add_argument("name")
+    prune_command = commands.add_parser("prune", help="delete the indexes not accessed for a while")
+    prune_command.add_argument("--max-idle-days", type=float, required=True)
+    prune_command.add_argument("--namespace", help="namespace to prune, all of them by default")
+    args = parser.parse_args()
+
+    store: IndexStore = IndexStore.from_quotas_file(args.root_dir, args.quotas_file)
+    result: Optional[Dict[str, Any]] = None
+    if args.command == "list":
+        result = store.report(args.namespace)
+    elif args.command == "delete":
+        result = {"deleted": store.delete(args.namespace, args.name)}
+    else:
+        pruned: List[Dict[str, Any]] = store.prune(args.max_idle_days * 24 * 3600, args.namespace)
+        result = {"pruned": [{key: index[key] for key in ("namespace", "name", "bytes")} for index in pruned]}
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Streaming ingestion of document pages into a vector store in bounded memory"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import asyncio
+import uuid
+from typing import AsyncIterable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Union
+
+from langchain_core.documents import Document
+from langchain_text_splitters import TextSplitter
+
+from coded_tools.rag_index.batch_embedder import DEFAULT_EMBEDDING_BATCH_SIZE
+from coded_tools.rag_index.batch_embedder import DEFAULT_EMBEDDING_CONCURRENCY
+from coded_tools.rag_index.batch_embedder import BatchEmbedder
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+
+
+class IngestionPipeline:  # pylint: disable=too-many-instance-attributes
+    """
+    Splits pages into chunks as they arrive, embeds the chunks in batches and appends them to a
+    vector store, so that neither all pages nor all chunks of a document are held at once.
+
+    At most batch_size chunks wait to be embedded and at most max_in_flight batches are being
+    embedded at any time. Adding pages waits while that many batches are in flight, which slows
+    down the page source instead of buffering its pages, so peak memory is set by the batch
+    settings rather than by the size of the document. Both default to the batch size and
+    concurrency of the BatchEmbedder of the vector store.
+
+    When the store embeds with a BatchEmbedder that checkpoints, the checkpoints of completed
+    batches are kept until the whole document is ingested, so a failed ingestion resumes
+    without embedding those batches again.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        vectorstore: NumpyVectorStore,
+        text_splitter: TextSplitter,
+        source_key: str = "source",
+        batch_size: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+    ):
+        """
+        Constructor
+
+        :param vectorstore: Vector store the chunks are appended to
+        :param text_splitter: Splitter used to chunk the pages
+        :param source_key: Metadata key of a page holding its source id, used to group the chunk ids
+        :param batch_size: Number of chunks embedded per batch
+        :param max_in_flight: Number of batches being embedded at the same time
+        """
+        embedding = vectorstore.embedding
+        self.vectorstore: NumpyVectorStore = vectorstore
+        self.text_splitter: TextSplitter = text_splitter
+        self.source_key: str = source_key
+        self.batch_size: int = batch_size or getattr(embedding, "batch_size", DEFAULT_EMBEDDING_BATCH_SIZE)
+        self.max_in_flight: int = max_in_flight or getattr(embedding, "max_concurrency", DEFAULT_EMBEDDING_CONCURRENCY)
+        self.pending: List[Document] = []
+        self.tasks: Set[asyncio.Task] = set()
+        self.checkpoints: List[Optional[str]] = []
+        # Maps source id to the ids of its chunks that were added
+        self.ids_by_source: Dict[str, List[str]] = {}
+        self.page_count: int = 0
+        self.chunk_count: int = 0
+
+    async def aingest(self, pages: Union[AsyncIterable[Document], Iterable[Document]]) -> "IngestionPipeline":
+        """
+        Ingest all pages of a page source, consuming it lazily.
+
+        :param pages: Sync or async iterable of pages, such as the lazy_load() or alazy_load()
+            of a langchain document loader
+        :return: This pipeline, with ids_by_source filled in
+        """
+        try:
+            if hasattr(pages, "__aiter__"):
+                async for page in pages:
+                    await self.aadd_pages([page])
+            else:
+                for page in pages:
+                    await self.aadd_pages([page])
+            await self.aflush()
+        except BaseException:
+            self.cancel()
+            raise
+        return self
+
+    async def aadd_pages(self, pages: List[Document]):
+        """
+        Split pages and send the full batches of chunks to be embedded.
+        Waits while max_in_flight batches are being embedded.
+
+        :param pages: Pages to add
+        """
+        self.page_count += len(pages)
+        self.pending.extend(await asyncio.to_thread(self.text_splitter.split_documents, pages))
+        while len(self.pending) >= self.batch_size:
+            batch: List[Document] = self.pending[: self.batch_size]
+            self.pending = self.pending[self.batch_size :]
+            await self.submit(batch)
+
+    async def aflush(self):
+        """
+        Embed the remaining chunks and wait until all chunks are in the vector store.
+        """
+        if self.pending:
+            batch: List[Document] = self.pending
+            self.pending = []
+            await self.submit(batch)
+        if self.tasks:
+            tasks: Set[asyncio.Task] = self.tasks
+            self.tasks = set()
+            await asyncio.gather(*tasks)
+        BatchEmbedder.remove_checkpoints(self.checkpoints)
+        self.checkpoints = []
+
+    def cancel(self):
+        """
+        Stop embedding the batches in flight, for example because the page source failed.
+        """
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = set()
+
+    async def submit(self, batch: List[Document]):
+        """
+        Start embedding a batch of chunks once fewer than max_in_flight batches are in flight.
+
+        :param batch: Chunks to embed
+        """
+        while len(self.tasks) >= self.max_in_flight:
+            done, self.tasks = await asyncio.wait(self.tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                # Raise the error of a failed batch
+                task.result()
+
+        ids: List[str] = [str(uuid.uuid4()) for _ in batch]
+        for chunk, chunk_id in zip(batch, ids):
+            self.ids_by_source.setdefault(str(chunk.metadata.get(self.source_key)), []).append(chunk_id)
+        self.chunk_count += len(batch)
+        self.tasks.add(asyncio.create_task(self.embed(batch, ids)))
+
+    async def embed(self, batch: List[Document], ids: List[str]):
+        """
+        Embed a batch of chunks and append it to the vector store.
+
+        :param batch: Chunks to embed
+        :param ids: Ids to give the chunks
+        """
+        texts: List[str] = [chunk.page_content for chunk in batch]
+        embedding = self.vectorstore.embedding
+        if isinstance(embedding, BatchEmbedder):
+            self.checkpoints.extend(embedding.checkpoint_paths(embedding.batches(texts), keep_checkpoints=True))
+            vectors: List[List[float]] = await embedding.aembed_documents(texts, keep_checkpoints=True)
+        else:
+            vectors: List[List[float]] = await embedding.aembed_documents(texts)
+        self.vectorstore.add_vectors(vectors, texts, [chunk.metadata for chunk in batch], ids)
@@ -0,0 +1,194 @@
+"""Compact BM25 inverted index over the chunk texts of a vector store"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import re
+from collections import Counter
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Tuple
+
+import numpy as np
+
+# Words, numbers and identifiers such as "PN-4471", "v2.1" or "policy_code", which are kept whole
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+
+# Identifier tokens: containing a digit or a separator, or an acronym of at least two capitals
+IDENTIFIER_PATTERN = re.compile(r"(?=.*\d)\w+(?:[-./]\w+)*|\w+(?:[-./]\w+)+|[A-Z][A-Z0-9]+")
+
+# Queries of at most this many identifier tokens are answered from the keyword index alone
+MAX_IDENTIFIER_QUERY_TOKENS: int = 3
+
+# BM25 term frequency saturation and document length normalization
+BM25_K1: float = 1.2
+BM25_B: float = 0.75
+
+# Names of the arrays of a keyword index, as returned by KeywordIndex.arrays()
+KEYWORD_INDEX_ARRAYS: Tuple[str, ...] = ("terms", "offsets", "rows", "freqs", "lengths")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    :param text: Chunk text or query
+    :return: Lower-cased tokens of the text. Compound identifiers such as "PN-4471"
+        are returned whole and also as their parts, so "pn-4471" and "4471" both match.
+    """
+    tokens: List[str] = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token: str = match.group()
+        tokens.append(token)
+        parts: List[str] = re.split(r"[-./]", token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+def is_identifier_query(query: str) -> bool:
+    """
+    :param query: Query string
+    :return: True if the query only consists of a few identifiers, such as part numbers,
+        policy codes or acronyms, for which an exact keyword match beats a semantic search
+    """
+    words: List[str] = query.split()
+    if not words or len(words) > MAX_IDENTIFIER_QUERY_TOKENS:
+        return False
+    return all(IDENTIFIER_PATTERN.fullmatch(word.strip("\"'()[],;:?!")) for word in words)
+
+
+class KeywordIndex:
+    """
+    Inverted index scoring chunks with BM25.
+
+    The postings of all terms are stored in compressed sparse row layout: the sorted term
+    array, the offset of each term's postings, and the row and term frequency of every posting,
+    plus the token count of every chunk. These are plain NumPy arrays, so an index can be
+    saved next to the embeddings of a store and memory-mapped together with them.
+    Terms are looked up by binary search, without building a dictionary on load.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, terms: np.ndarray, offsets: np.ndarray, rows: np.ndarray, freqs: np.ndarray, lengths: np.ndarray
+    ):
+        """
+        Constructor
+
+        :param terms: Sorted unicode array of the indexed terms
+        :param offsets: int64 array of length len(terms) + 1 with the start of the postings of each term
+        :param rows: int32 array with the chunk row of every posting
+        :param freqs: float32 array with the term frequency of every posting
+        :param lengths: float32 array with the token count of every chunk
+        """
+        self.terms: np.ndarray = terms
+        self.offsets: np.ndarray = offsets
+        self.rows: np.ndarray = rows
+        self.freqs: np.ndarray = freqs
+        self.lengths: np.ndarray = lengths
+        self.average_length: float = float(lengths.mean()) if len(lengths) else 0.0
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "KeywordIndex":
+        """
+        :param texts: Chunk texts in row order
+        :return: Keyword index of the texts
+        """
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths: List[int] = []
+        for row, text in enumerate(texts):
+            counts: Counter = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((row, count))
+
+        terms: List[str] = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms], dtype=np.int64)
+        pairs: List[Tuple[int, int]] = [pair for term in terms for pair in postings[term]]
+        return cls(
+            np.array(terms, dtype=np.str_) if terms else np.zeros(0, dtype="<U1"),
+            offsets,
+            np.array([row for row, _ in pairs], dtype=np.int32),
+            np.array([count for _, count in pairs], dtype=np.float32),
+            np.array(lengths, dtype=np.float32),
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "KeywordIndex":
+        """
+        :param arrays: Arrays as returned by arrays(), possibly memory-mapped
+        :return: The keyword index made of these arrays
+        """
+        return cls(*(arrays[name] for name in KEYWORD_INDEX_ARRAYS))
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """
+        :return: The arrays making up the index, by the names in KEYWORD_INDEX_ARRAYS
+        """
+        return {name: getattr(self, name) for name in KEYWORD_INDEX_ARRAYS}
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        :return: Number of bytes held by the index arrays
+        """
+        return sum(int(array.nbytes) for array in self.arrays().values())
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :param term: Lower-cased term
+        :return: Tuple of the rows of the chunks containing the term and the term frequency in each
+        """
+        position: int = int(np.searchsorted(self.terms, term))
+        if position >= len(self.terms) or self.terms[position] != term:
+            return self.rows[:0], self.freqs[:0]
+        start: int = int(self.offsets[position])
+        end: int = int(self.offsets[position + 1])
+        return self.rows[start:end], self.freqs[start:end]
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        :param query: Query string
+        :return: BM25 score of every chunk for the query, in row order. Chunks without any query term score 0.
+        """
+        scores = np.zeros(len(self.lengths), dtype=np.float32)
+        if len(self.lengths) == 0:
+            return scores
+        for term in set(tokenize(query)):
+            rows, freqs = self.postings(term)
+            if len(rows) == 0:
+                continue
+            document_frequency: int = len(rows)
+            idf: float = float(
+                np.log(1.0 + (len(self.lengths) - document_frequency + 0.5) / (document_frequency + 0.5))
+            )
+            norms = BM25_K1 * (1.0 - BM25_B + BM25_B * self.lengths[rows] / max(self.average_length, 1e-9))
+            # Every row appears at most once in the postings of a term
+            scores[rows] += idf * freqs * (BM25_K1 + 1.0) / (freqs + norms)
+        return scores
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """
+        :param query: Query string
+        :param k: Number of chunks to return
+        :return: Up to k (row, BM25 score) tuples of chunks containing a query term, best first
+        """
+        scores: np.ndarray = self.scores(query)
+        matches: np.ndarray = np.flatnonzero(scores > 0.0)
+        if k <= 0 or len(matches) == 0:
+            return []
+        if k < len(matches):
+            matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+        matches = matches[np.lexsort((matches, -scores[matches]))]
+        return [(int(row), float(scores[row])) for row in matches]
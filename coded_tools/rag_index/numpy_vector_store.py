@@ -0,0 +1,653 @@
+"""Vector store backed by a memory-mapped float32 NumPy matrix"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore
+from langchain_core.vectorstores import VectorStore
+
+from coded_tools.rag_index.ann_index import ANN_INDEXES
+from coded_tools.rag_index.ann_index import ANN_MAX_UNINDEXED_FRACTION
+from coded_tools.rag_index.ann_index import ANN_MIN_CHUNKS
+from coded_tools.rag_index.ann_index import DEFAULT_ANN_INDEX
+from coded_tools.rag_index.ann_index import DEFAULT_ANN_N_PROBE
+from coded_tools.rag_index.ann_index import IVFIndex
+from coded_tools.rag_index.ann_index import ann_index_class
+from coded_tools.rag_index.ann_index import top_k
+from coded_tools.rag_index.keyword_index import KEYWORD_INDEX_ARRAYS
+from coded_tools.rag_index.keyword_index import KeywordIndex
+
+# Version of the on-disk layout written by NumpyVectorStore.dump()
+STORE_FORMAT_VERSION = 1
+
+# File names inside a store directory
+HEADER_FILE = "store.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+IDS_FILE = "ids.npy"
+TEXTS_FILE = "texts.npy"
+METADATA_FILE = "metadata.npy"
+OFFSETS_FILE = "offsets.npy"
+# Arrays of the keyword index, by their name in KEYWORD_INDEX_ARRAYS
+KEYWORD_INDEX_FILES: Dict[str, str] = {name: f"keyword_{name}.npy" for name in KEYWORD_INDEX_ARRAYS}
+# Prefix of the files of the approximate nearest neighbour index
+ANN_FILE_PREFIX = "ann_"
+
+
+class StringColumn(Sequence[str]):
+    """
+    Read-only sequence of strings stored as one utf-8 byte blob plus an array of offsets.
+    Both arrays can be memory-mapped, so strings are only decoded when they are accessed.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        """
+        Constructor
+
+        :param blob: uint8 array holding all strings back to back
+        :param offsets: int64 array of length n + 1 with the start of every string and the end of the last one
+        """
+        self.blob: np.ndarray = blob
+        self.offsets: np.ndarray = offsets
+
+    @staticmethod
+    def encode(strings: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :param strings: Strings to pack
+        :return: A tuple of the uint8 blob and the int64 offsets of the packed strings
+        """
+        encoded: List[bytes] = [string.encode("utf-8") for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(item) for item in encoded], dtype=np.int64)
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return blob, offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        start: int = int(self.offsets[index])
+        end: int = int(self.offsets[index + 1])
+        return self.blob[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+class NumpyVectorStore(VectorStore):  # pylint: disable=too-many-public-methods,too-many-instance-attributes
+    """
+    VectorStore keeping all embeddings in a single float32 matrix with L2-normalized rows,
+    so a similarity search is one matrix-vector product followed by a top-k selection.
+
+    dump() writes a directory with the matrix as a .npy file and the chunk ids, texts and
+    metadata as packed utf-8 columns. load() memory-maps those files: cold-loading does not
+    parse or copy the data, and server worker processes loading the same store share its pages.
+    A loaded store is copied into memory only when it is modified.
+
+    A BM25 keyword index over the chunk texts is built when it is first needed. Once built, it is
+    written by dump() next to the embeddings and memory-mapped by load() too.
+
+    Searches scan all rows unless an approximate nearest neighbour index kind is requested and the
+    store has at least ANN_MIN_CHUNKS chunks. The index is then built on first use, kept up to
+    date as chunks are appended, and persisted by dump() like the keyword index.
+    """
+
+    def __init__(self, embedding: Embeddings):
+        """
+        Constructor
+
+        :param embedding: Embeddings used to embed added texts and queries
+        """
+        self.embedding: Embeddings = embedding
+        self.matrix: np.ndarray = np.zeros((0, 0), dtype=np.float32)
+        # Over-allocated array of which the matrix is a view, to make appends cheap
+        self.buffer: np.ndarray = self.matrix
+        self.ids: Sequence[str] = []
+        self.texts: Sequence[str] = []
+        # Metadata is kept as JSON strings so it can be stored in a StringColumn
+        self.metadatas: Sequence[str] = []
+        self.id_to_row: Optional[Dict[str, int]] = {}
+        # Changes whenever chunks are added or deleted and is persisted by dump(),
+        # so results cached for one version of the store are never served for another
+        self.version: str = uuid.uuid4().hex
+        # Keyword index and the store version it was built for
+        self._keyword_index: Optional[Tuple[str, KeywordIndex]] = None
+        # Approximate nearest neighbour index of the first ann_index.count rows
+        self.ann_index: Optional[IVFIndex] = None
+        self.ann_lock = threading.Lock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        :return: Approximate number of bytes held by the store
+        """
+        total: int = int(self.buffer.nbytes)
+        for column in (self.ids, self.texts, self.metadatas):
+            if isinstance(column, StringColumn):
+                total += int(column.blob.nbytes + column.offsets.nbytes)
+            else:
+                total += sum(len(item) for item in column)
+        if self._keyword_index is not None:
+            total += self._keyword_index[1].nbytes
+        if self.ann_index is not None:
+            total += self.ann_index.nbytes
+        return total
+
+    @property
+    def keyword_index(self) -> KeywordIndex:
+        """
+        :return: BM25 index of the chunk texts, built on first use after any change to the store
+        """
+        keyword_index: Optional[Tuple[str, KeywordIndex]] = self._keyword_index
+        if keyword_index is None or keyword_index[0] != self.version:
+            keyword_index = (self.version, KeywordIndex.build(self.texts))
+            self._keyword_index = keyword_index
+        return keyword_index[1]
+
+    def get_ann_index(self, kind: Optional[str] = DEFAULT_ANN_INDEX) -> Optional[IVFIndex]:
+        """
+        :param kind: Kind of approximate index, such as "ivf", or "exact" or None for none
+        :return: The approximate index of that kind, built or rebuilt if needed,
+            or None if the kind is "exact" or the store is too small to benefit from an index
+        :raises ValueError: If the kind is unknown
+        """
+        index_class = ann_index_class(kind)
+        if index_class is None or len(self.ids) < ANN_MIN_CHUNKS:
+            return None
+        with self.ann_lock:
+            index: Optional[IVFIndex] = self.ann_index
+            if (
+                not isinstance(index, index_class)
+                or len(self.ids) < index.count
+                or len(self.ids) - index.count > ANN_MAX_UNINDEXED_FRACTION * index.count
+            ):
+                index = index_class.build(self.matrix)
+                self.ann_index = index
+            return index
+
+    def top_rows_by_vector(
+        self, embedding: Sequence[float], k: int, ann_index: Optional[str] = None, n_probe: int = DEFAULT_ANN_N_PROBE
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :param embedding: Query embedding
+        :param k: Number of rows to return
+        :param ann_index: Kind of approximate index to search, None or "exact" to scan all rows
+        :param n_probe: Number of inverted lists an approximate search probes
+        :return: Tuple of the rows of the k chunks most similar to the query, best first, and their cosine similarities
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        norm: float = float(np.linalg.norm(query))
+        if norm > 0.0:
+            query = query / norm
+        index: Optional[IVFIndex] = self.get_ann_index(ann_index)
+        if index is not None:
+            return index.search(self.matrix, query, k, n_probe)
+        scores: np.ndarray = self.matrix @ query
+        rows: np.ndarray = top_k(scores, k)
+        return rows, scores[rows]
+
+    def _materialize(self):
+        """
+        Copy memory-mapped data into regular memory before it gets modified.
+        """
+        if isinstance(self.ids, StringColumn):
+            self.matrix = np.array(self.matrix, dtype=np.float32)
+            self.ids = list(self.ids)
+            self.texts = list(self.texts)
+            self.metadatas = list(self.metadatas)
+            self.buffer = self.matrix
+
+    def _append_rows(self, rows: np.ndarray):
+        """
+        Append rows to the matrix. The matrix is a view of a larger buffer whose
+        capacity doubles when it runs out, so appending in batches stays linear.
+
+        :param rows: Normalized float32 rows to append
+        """
+        count: int = len(self.ids)
+        if count == 0:
+            self.buffer = rows.copy()
+        elif self.buffer.shape[0] < count + rows.shape[0]:
+            capacity: int = max(2 * self.buffer.shape[0], count + rows.shape[0])
+            buffer = np.empty((capacity, rows.shape[1]), dtype=np.float32)
+            buffer[:count] = self.matrix
+            self.buffer = buffer
+        if count:
+            self.buffer[count : count + rows.shape[0]] = rows
+        self.matrix = self.buffer[: count + rows.shape[0]]
+
+    def _row_of(self, chunk_id: str) -> Optional[int]:
+        """
+        :param chunk_id: Id of a chunk
+        :return: Row of the chunk in the matrix, or None if the id is unknown
+        """
+        if self.id_to_row is None:
+            # Built lazily after a load, since most loaded stores are only queried
+            self.id_to_row = {value: row for row, value in enumerate(self.ids)}
+        return self.id_to_row.get(chunk_id)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """
+        :param vectors: 2D float array
+        :return: Rows scaled to unit length. All-zero rows are left as they are.
+        """
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0.0] = 1.0
+        return (vectors / norms).astype(np.float32, copy=False)
+
+    def add_vectors(
+        self,
+        vectors: Sequence[Sequence[float]],
+        texts: Sequence[str],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        ids: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        """
+        Add chunks whose embeddings were already computed.
+        Chunks with an id that is already in the store replace the existing chunk.
+
+        :param vectors: One embedding per text
+        :param texts: Chunk texts
+        :param metadatas: Optional metadata dictionary per text
+        :param ids: Optional id per text. Random ids are generated if not given.
+        :return: The ids of the added chunks
+        """
+        if not texts:
+            return []
+        ids = [chunk_id or str(uuid.uuid4()) for chunk_id in ids] if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        self.delete([chunk_id for chunk_id in ids if self._row_of(chunk_id) is not None])
+
+        rows = self._normalize(np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1))
+        self._materialize()
+        self._append_rows(rows)
+        start: int = len(self.ids)
+        self.ids.extend(ids)
+        self.texts.extend(texts)
+        self.metadatas.extend(json.dumps(metadata) for metadata in metadatas)
+        for offset, chunk_id in enumerate(ids):
+            self.id_to_row[chunk_id] = start + offset
+        self.version = uuid.uuid4().hex
+        return list(ids)
+
+    def add_store(self, other: "NumpyVectorStore") -> List[str]:
+        """
+        Copy all chunks of another store into this one without embedding them again.
+
+        :param other: Store to copy from
+        :return: The ids of the copied chunks
+        """
+        if len(other) == 0:
+            return []
+        return self.add_vectors(
+            other.matrix, list(other.texts), [json.loads(metadata) for metadata in other.metadatas], list(other.ids)
+        )
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_vectors(self.embedding.embed_documents(texts), texts, metadatas, ids)
+
+    async def aadd_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_vectors(await self.embedding.aembed_documents(texts), texts, metadatas, ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return True
+        rows: List[int] = [row for row in (self._row_of(chunk_id) for chunk_id in ids) if row is not None]
+        if not rows:
+            return True
+        self._materialize()
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[rows] = False
+        self.matrix = self.matrix[keep]
+        self.buffer = self.matrix
+        self.ids = [value for value, kept in zip(self.ids, keep) if kept]
+        self.texts = [value for value, kept in zip(self.texts, keep) if kept]
+        self.metadatas = [value for value, kept in zip(self.metadatas, keep) if kept]
+        self.id_to_row = {value: row for row, value in enumerate(self.ids)}
+        self.version = uuid.uuid4().hex
+        # Rows moved, so the approximate index is rebuilt when it is next needed
+        self.ann_index = None
+        return True
+
+    def get_document(self, row: int) -> Document:
+        """
+        :param row: Row of a chunk in the matrix
+        :return: The chunk as a Document
+        """
+        return Document(id=self.ids[row], page_content=self.texts[row], metadata=json.loads(self.metadatas[row]))
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        rows = (self._row_of(chunk_id) for chunk_id in ids)
+        return [self.get_document(row) for row in rows if row is not None]
+
+    def scores_by_vector(self, embedding: Sequence[float]) -> np.ndarray:
+        """
+        :param embedding: Query embedding
+        :return: Cosine similarity of the query with every chunk, in row order
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        norm: float = float(np.linalg.norm(query))
+        if norm > 0.0:
+            query = query / norm
+        return self.matrix @ query
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def similarity_search_with_score_by_vector(  # pylint: disable=unused-argument
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Callable[[Document], bool]] = None,  # pylint: disable=redefined-builtin
+        ann_index: Optional[str] = None,
+        n_probe: int = DEFAULT_ANN_N_PROBE,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """
+        :param embedding: Query embedding
+        :param k: Number of chunks to return
+        :param filter: Optional predicate a chunk must satisfy to be returned. Filtered searches scan all rows.
+        :param ann_index: Kind of approximate index to search, None or "exact" to scan all rows
+        :param n_probe: Number of inverted lists an approximate search probes
+        :return: Up to k (document, cosine similarity) tuples, best first
+        """
+        count: int = len(self.ids)
+        if count == 0 or k <= 0:
+            return []
+
+        if filter is None:
+            rows, scores = self.top_rows_by_vector(embedding, k, ann_index, n_probe)
+            return [(self.get_document(int(row)), float(score)) for row, score in zip(rows, scores)]
+
+        scores: np.ndarray = self.scores_by_vector(embedding)
+
+        results: List[Tuple[Document, float]] = []
+        for row in np.argsort(-scores):
+            document: Document = self.get_document(int(row))
+            if filter(document):
+                results.append((document, float(scores[row])))
+                if len(results) == k:
+                    break
+        return results
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    # pylint: disable-next=arguments-differ
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, **kwargs)
+
+    # pylint: disable-next=arguments-differ
+    async def asimilarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding: List[float] = await self.embedding.aembed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in await self.asimilarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Scores are cosine similarities already
+        return lambda score: score
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(embedding=embedding)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+    @classmethod
+    async def afrom_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(embedding=embedding)
+        await store.aadd_texts(texts, metadatas, ids=ids)
+        return store
+
+    @classmethod
+    def from_in_memory_store(cls, store: Dict[str, Dict[str, Any]], embedding: Embeddings) -> "NumpyVectorStore":
+        """
+        Convert the contents of a langchain InMemoryVectorStore without embedding them again.
+
+        :param store: The "store" dictionary of an InMemoryVectorStore
+        :param embedding: Embeddings used for queries and new texts
+        :return: A NumpyVectorStore holding the same chunks
+        """
+        numpy_store = cls(embedding=embedding)
+        entries: List[Dict[str, Any]] = list(store.values())
+        numpy_store.add_vectors(
+            [entry["vector"] for entry in entries],
+            [entry["text"] for entry in entries],
+            [entry.get("metadata") or {} for entry in entries],
+            [entry["id"] for entry in entries],
+        )
+        return numpy_store
+
+    def dump(self, path: str):
+        """
+        Write the store to a directory. The directory is written next to its final
+        location and then swapped in, so readers never see a partially written store.
+
+        :param path: Directory to write the store to
+        """
+        path = os.path.abspath(path)
+        tmp_path: str = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        count: int = len(self.ids)
+        dimension: int = int(self.matrix.shape[1]) if count else 0
+        np.save(os.path.join(tmp_path, EMBEDDINGS_FILE), np.ascontiguousarray(self.matrix, dtype=np.float32))
+        offsets: List[np.ndarray] = []
+        for file_name, column in ((IDS_FILE, self.ids), (TEXTS_FILE, self.texts), (METADATA_FILE, self.metadatas)):
+            blob, column_offsets = StringColumn.encode(column)
+            np.save(os.path.join(tmp_path, file_name), blob)
+            offsets.append(column_offsets)
+        np.save(os.path.join(tmp_path, OFFSETS_FILE), np.stack(offsets))
+        ann_index: Optional[IVFIndex] = self._dump_search_indexes(tmp_path)
+        with open(os.path.join(tmp_path, HEADER_FILE), "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "format": STORE_FORMAT_VERSION,
+                    "count": count,
+                    "dimension": dimension,
+                    "version": self.version,
+                    "ann_index": ann_index.kind if ann_index is not None else None,
+                },
+                file,
+            )
+
+        old_path: str = f"{path}.{os.getpid()}.old"
+        if os.path.isdir(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str, embedding: Embeddings, mmap: bool = True) -> "NumpyVectorStore":
+        """
+        Load a store written by dump().
+
+        :param path: Directory the store was written to
+        :param embedding: Embeddings used for queries and new texts
+        :param mmap: Memory-map the files rather than reading them into memory
+        :return: The loaded store
+        :raises FileNotFoundError: If there is no store at the path
+        :raises ValueError: If the store was written in an unknown format
+        """
+        with open(os.path.join(path, HEADER_FILE), "r", encoding="utf-8") as file:
+            header: Dict[str, Any] = json.load(file)
+        if header.get("format") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector store format {header.get('format')} in {path}")
+
+        mmap_mode: Optional[str] = "r" if mmap else None
+        store = cls(embedding=embedding)
+        store.matrix = load_array(os.path.join(path, EMBEDDINGS_FILE), mmap_mode)
+        store.buffer = store.matrix
+        offsets: np.ndarray = load_array(os.path.join(path, OFFSETS_FILE), mmap_mode)
+        columns: List[StringColumn] = []
+        for index, file_name in enumerate((IDS_FILE, TEXTS_FILE, METADATA_FILE)):
+            columns.append(StringColumn(load_array(os.path.join(path, file_name), mmap_mode), offsets[index]))
+        store.ids, store.texts, store.metadatas = columns
+        store.id_to_row = None
+        store.version = header.get("version") or store.version
+        store._load_search_indexes(path, header.get("ann_index"), mmap_mode)
+        return store
+
+    def _dump_search_indexes(self, path: str) -> Optional[IVFIndex]:
+        """
+        Write the keyword index and the approximate nearest neighbour index next to the embeddings.
+        The keyword index is only written if it was already built for the current chunks, so dumping a
+        store searched by vector only does not build it, and load() leaves it to be built on first use.
+
+        :param path: Directory the store is being written to
+        :return: The approximate index written, or None if there is none
+        """
+        keyword_index: Optional[Tuple[str, KeywordIndex]] = self._keyword_index
+        if keyword_index is not None and keyword_index[0] == self.version:
+            for name, array in keyword_index[1].arrays().items():
+                np.save(os.path.join(path, KEYWORD_INDEX_FILES[name]), array)
+        ann_index: Optional[IVFIndex] = self.get_ann_index(
+            self.ann_index.kind if self.ann_index is not None else DEFAULT_ANN_INDEX
+        )
+        if ann_index is not None:
+            for name, array in ann_index.arrays().items():
+                np.save(os.path.join(path, f"{ANN_FILE_PREFIX}{name}.npy"), array)
+        return ann_index
+
+    def _load_search_indexes(self, path: str, ann_kind: Optional[str], mmap_mode: Optional[str]):
+        """
+        Load the keyword index and the approximate nearest neighbour index written by dump().
+        Stores dumped before these indexes existed build them when they are first needed.
+
+        :param path: Directory the store was written to
+        :param ann_kind: Kind of the approximate index recorded in the header, or None if there is none
+        :param mmap_mode: Memory-map mode passed to numpy, or None to read the files into memory
+        """
+        if all(os.path.exists(os.path.join(path, file_name)) for file_name in KEYWORD_INDEX_FILES.values()):
+            arrays: Dict[str, np.ndarray] = {
+                name: load_array(os.path.join(path, file_name), mmap_mode)
+                for name, file_name in KEYWORD_INDEX_FILES.items()
+            }
+            self._keyword_index = (self.version, KeywordIndex.from_arrays(arrays))
+        if ann_kind in ANN_INDEXES:
+            ann_class = ANN_INDEXES[ann_kind]
+            self.ann_index = ann_class.from_arrays(
+                {
+                    name: load_array(os.path.join(path, f"{ANN_FILE_PREFIX}{name}.npy"), mmap_mode)
+                    for name in ann_class.array_names
+                }
+            )
+
+
+def load_array(path: str, mmap_mode: Optional[str]) -> np.ndarray:
+    """
+    :param path: Path of a .npy file
+    :param mmap_mode: Memory-map mode passed to numpy, or None to read the file into memory
+    :return: The array in the file. Empty arrays cannot be memory-mapped and are always read.
+    """
+    try:
+        return np.load(path, mmap_mode=mmap_mode)
+    except ValueError:
+        if mmap_mode is None:
+            raise
+        return np.load(path)
+
+
+def load_vector_store(path: str, embedding: Embeddings) -> NumpyVectorStore:
+    """
+    Load a store written by NumpyVectorStore.dump(). If there is none, but there is a
+    JSON file written by the langchain InMemoryVectorStore at the same path plus ".json",
+    that file is converted once, without embedding anything again, and replaced by the new format.
+
+    :param path: Directory of the store
+    :param embedding: Embeddings used for queries and new texts
+    :return: The loaded store
+    :raises FileNotFoundError: If there is no store in either format
+    """
+    if os.path.isdir(path):
+        return NumpyVectorStore.load(path, embedding)
+
+    legacy_path: str = f"{path}.json"
+    if not os.path.isfile(legacy_path):
+        raise FileNotFoundError(path)
+    in_memory_store = InMemoryVectorStore.load(path=legacy_path, embedding=embedding)
+    store = NumpyVectorStore.from_in_memory_store(in_memory_store.store, embedding)
+    store.dump(path)
+    os.remove(legacy_path)
+    return store
@@ -0,0 +1,206 @@
+"""Parallel parsing of pdf files in a process pool, streaming pages as they are parsed"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+from typing import AsyncIterator
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+import pymupdf
+from langchain_core.documents import Document
+
+# Number of worker processes parsing pdf files. Defaults to the number of cores.
+# 1 parses in a thread of the calling process instead.
+DEFAULT_PDF_WORKERS: int = int(os.getenv("RAG_PDF_WORKERS", "0")) or os.cpu_count() or 1
+
+# Number of pages parsed per task, so that the pages of a large file are parsed in parallel too
+PAGES_PER_TASK: int = 16
+
+# Process pools by number of workers, shared by all calls in this process
+PROCESS_POOLS: Dict[int, ProcessPoolExecutor] = {}
+PROCESS_POOLS_LOCK = threading.Lock()
+
+
+def parse_pdf_pages(path: str, source: str, start: int, stop: int) -> List[Document]:
+    """
+    Parse a range of pages of a pdf file. Runs in a worker process.
+
+    :param path: Local path of the pdf file
+    :param source: URL or path to record as the source of the pages
+    :param start: Index of the first page to parse
+    :param stop: Index after the last page to parse
+    :return: One Document per page, with the same metadata as PyMuPDFLoader
+    """
+    with pymupdf.open(path) as pdf:
+        pdf_metadata: Dict[str, Any] = pdf.metadata or {}  # pylint: disable=no-member
+        metadata: Dict[str, Any] = {
+            key: value for key, value in pdf_metadata.items() if isinstance(value, (str, int, float))
+        }
+        metadata["creationdate"] = metadata.get("creationDate", "")
+        metadata["moddate"] = metadata.get("modDate", "")
+        metadata.update({"source": source, "file_path": source, "total_pages": pdf.page_count})
+        return [
+            Document(page_content=pdf[page].get_text().strip(), metadata={**metadata, "page": page})
+            for page in range(start, min(stop, pdf.page_count))
+        ]
+
+
+def count_pdf_pages(path: str) -> int:
+    """
+    :param path: Local path of the pdf file
+    :return: Number of pages of the file
+    """
+    with pymupdf.open(path) as pdf:
+        return pdf.page_count
+
+
+def write_pdf(path: str, content: bytes) -> int:
+    """
+    :param path: Local path to write the pdf file to
+    :param content: Raw bytes of the file
+    :return: Number of pages of the file
+    """
+    with open(path, "wb") as file:
+        file.write(content)
+    return count_pdf_pages(path)
+
+
+def get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    :param max_workers: Number of worker processes
+    :return: The process pool of this process with that many workers, created on first use.
+        Workers are spawned rather than forked, since the server process runs several threads.
+    """
+    with PROCESS_POOLS_LOCK:
+        pool: ProcessPoolExecutor = PROCESS_POOLS.get(max_workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            PROCESS_POOLS[max_workers] = pool
+        return pool
+
+
+def discard_process_pool(max_workers: int, pool: Executor):
+    """
+    Forget a pool whose worker died, so the next call starts a new one.
+
+    :param max_workers: Number of worker processes of the pool
+    :param pool: The broken pool
+    """
+    with PROCESS_POOLS_LOCK:
+        if PROCESS_POOLS.get(max_workers) is pool:
+            del PROCESS_POOLS[max_workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ParallelPdfLoader:
+    """
+    Loads several pdf files at once. Every file is cut into ranges of pages_per_task pages and
+    the ranges are parsed concurrently in a pool of max_workers processes, so parsing uses all
+    cores. Pages are handed to the caller range by range as soon as they are parsed, rather than
+    after all files are loaded, and a file that cannot be parsed is reported on its own without
+    affecting the others.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_PDF_WORKERS, pages_per_task: int = PAGES_PER_TASK):
+        """
+        Constructor
+
+        :param max_workers: Number of worker processes, 1 to parse in a thread of this process
+        :param pages_per_task: Number of pages parsed per task
+        """
+        self.max_workers: int = max(1, max_workers)
+        self.pages_per_task: int = max(1, pages_per_task)
+        self.pool: Executor = None
+
+    async def astream(self, contents: Dict[str, bytes]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Parse pdf files and yield their pages as they become available.
+
+        :param contents: Mapping of the URL or path of each file to its raw bytes
+        :return: Async iterator of dictionaries with the keys:
+            "source": URL or path of the file,
+            "pages": list of Documents of newly parsed pages, in page order within the list,
+            "done": True once all pages of the file have been yielded,
+            "error": the exception if the file could not be parsed, otherwise None
+        """
+        if not contents:
+            return
+
+        self.pool = get_process_pool(self.max_workers) if self.max_workers > 1 else None
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Maps each parsing task to the file and first page it parses
+            ranges: Dict[asyncio.Future, Tuple[str, int]] = {}
+            for index, (source, content) in enumerate(contents.items()):
+                try:
+                    ranges.update(await self.submit(os.path.join(temp_dir, f"{index}.pdf"), source, content))
+                except Exception as error:  # pylint: disable=broad-exception-caught
+                    yield {"source": source, "pages": [], "done": True, "error": error}
+
+            async for event in self.collect(ranges):
+                yield event
+
+    async def submit(self, path: str, source: str, content: bytes) -> Dict[asyncio.Future, Tuple[str, int]]:
+        """
+        Write a pdf file to disk and submit the parsing of its page ranges.
+        Workers read the file from disk, so its bytes are not pickled once per page range.
+        The file is written and its pages counted in a thread, not to block the event loop on large files.
+
+        :param path: Local path to write the file to
+        :param source: URL or path of the file
+        :param content: Raw bytes of the file
+        :return: Mapping of each parsing task to the file and first page it parses
+        """
+        page_count: int = await asyncio.to_thread(write_pdf, path, content)
+        loop = asyncio.get_running_loop()
+        ranges: Dict[asyncio.Future, Tuple[str, int]] = {}
+        for start in range(0, page_count, self.pages_per_task) or [0]:
+            stop: int = start + self.pages_per_task
+            ranges[loop.run_in_executor(self.pool, parse_pdf_pages, path, source, start, stop)] = (source, start)
+        return ranges
+
+    async def collect(self, ranges: Dict[asyncio.Future, Tuple[str, int]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        :param ranges: Mapping of each parsing task to the file and first page it parses
+        :return: Async iterator of the events described in astream(), as the tasks complete
+        """
+        remaining: Dict[str, int] = {}
+        for source, _ in ranges.values():
+            remaining[source] = remaining.get(source, 0) + 1
+        failed: Dict[str, Exception] = {}
+
+        pending = set(ranges)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=lambda done_task: ranges[done_task]):
+                source, _ = ranges[task]
+                if source in failed:
+                    continue
+                try:
+                    pages: List[Document] = task.result()
+                except Exception as error:  # pylint: disable=broad-exception-caught
+                    if isinstance(error, BrokenProcessPool):
+                        discard_process_pool(self.max_workers, self.pool)
+                    failed[source] = error
+                    yield {"source": source, "pages": [], "done": True, "error": error}
+                    continue
+                remaining[source] -= 1
+                yield {"source": source, "pages": pages, "done": remaining[source] == 0, "error": None}
@@ -0,0 +1,252 @@
+"""Background pre-warming of the vector stores of the RAG tools of the served agent networks"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import runpy
+import sys
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from pyhocon import ConfigFactory
+from pyhocon import ConfigTree
+
+from coded_tools.rag_index.registry import DEFAULT_REGISTRY_TTL_SECONDS
+from coded_tools.rag_index.registry import VECTOR_STORE_REGISTRY
+from coded_tools.rag_index.registry import refreshing_entries
+
+# Manifest listing the agent network files to serve, and the toolbox declaring shared tools
+DEFAULT_MANIFEST_FILE: str = os.getenv("AGENT_MANIFEST_FILE", os.path.join("registries", "manifest.hocon"))
+DEFAULT_TOOLBOX_INFO_FILE: str = os.getenv("AGENT_TOOLBOX_INFO_FILE", os.path.join("toolbox", "toolbox_info.hocon"))
+
+# Package the "class" of coded tools is resolved in, as by the server
+TOOL_PACKAGE: str = os.path.basename(os.path.normpath(os.getenv("AGENT_TOOL_PATH", "coded_tools")))
+
+# Coded tool classes, as written in the agent network files, whose vector stores are pre-warmed.
+# They are run once with their configured args, which registers their vector stores in VECTOR_STORE_REGISTRY.
+PREWARMED_TOOL_CLASSES = ("pdf_rag.PdfRag", "rag.Rag", "confluence_rag.ConfluenceRag")
+
+# Query of the pre-warming runs. Running a query also builds the keyword and approximate indexes a query needs.
+PREWARM_QUERY: str = "warm-up"
+
+# Seconds between refreshes of the pre-warmed stores, 0 to warm them once. Refreshing more often than
+# the registry TTL keeps the stores from expiring, so queries never wait for a rebuild.
+DEFAULT_PREWARM_INTERVAL_SECONDS: float = float(
+    os.getenv("RAG_PREWARM_INTERVAL_SECONDS", str(DEFAULT_REGISTRY_TTL_SECONDS / 2))
+)
+
+
+def enabled_networks(manifest_file: str = DEFAULT_MANIFEST_FILE) -> List[str]:
+    """
+    :param manifest_file: Manifest mapping agent network files to whether they are served
+    :return: Paths of the served agent network files, in manifest order
+    """
+    manifest: ConfigTree = ConfigFactory.parse_file(manifest_file)
+    directory: str = os.path.dirname(manifest_file)
+    return [os.path.join(directory, name.strip('"')) for name, enabled in manifest.items() if enabled is True]
+
+
+def prewarm_targets(
+    manifest_file: str = DEFAULT_MANIFEST_FILE, toolbox_info_file: str = DEFAULT_TOOLBOX_INFO_FILE
+) -> List[Dict[str, Any]]:
+    """
+    :param manifest_file: Manifest mapping agent network files to whether they are served
+    :param toolbox_info_file: Toolbox file declaring the tools referenced by "toolbox" in agent networks
+    :return: One dictionary per pre-warmed tool of the served networks, with the "network" file name,
+        the tool "name", its "class" and its configured "args"
+    """
+    toolbox: ConfigTree = ConfigTree()
+    if os.path.exists(toolbox_info_file):
+        toolbox = ConfigFactory.parse_file(toolbox_info_file)
+    targets: List[Dict[str, Any]] = []
+    for network_file in enabled_networks(manifest_file):
+        for tool in ConfigFactory.parse_file(network_file).get("tools", []):
+            declaration: ConfigTree = toolbox.get(tool.get("toolbox"), ConfigTree()) if "toolbox" in tool else tool
+            class_name: Optional[str] = declaration.get("class", None)
+            if class_name not in PREWARMED_TOOL_CLASSES:
+                continue
+            args: Dict[str, Any] = {**declaration.get("args", {}), **tool.get("args", {})}
+            targets.append(
+                {
+                    "network": os.path.basename(network_file),
+                    "name": tool.get("name"),
+                    "class": class_name,
+                    "args": json.loads(json.dumps(args)),
+                }
+            )
+    return targets
+
+
+def resolve_tool_class(network: str, class_name: str) -> type:
+    """
+    :param network: File name of the agent network declaring the tool
+    :param class_name: "<module>.<class>" of the tool, relative to TOOL_PACKAGE/<network> or TOOL_PACKAGE
+    :return: The tool class
+    :raises ImportError: If the module is found in neither package
+    """
+    module_name, _, name = class_name.rpartition(".")
+    network_package: str = f"{TOOL_PACKAGE}.{os.path.splitext(network)[0]}"
+    for package in (network_package, TOOL_PACKAGE):
+        try:
+            return getattr(importlib.import_module(f"{package}.{module_name}"), name)
+        except ModuleNotFoundError as error:
+            if not f"{package}.{module_name}".startswith(str(error.name)):
+                raise
+    raise ImportError(f"Cannot find {class_name} in {network_package} or {TOOL_PACKAGE}")
+
+
+async def aprewarm(targets: List[Dict[str, Any]], refresh: bool = False) -> List[Dict[str, Any]]:
+    """
+    Build or load the vector stores of the targets and register them in VECTOR_STORE_REGISTRY,
+    where the tools find them on the first user query.
+
+    :param targets: Tools as returned by prewarm_targets()
+    :param refresh: Rebuild the stores even if they are registered and fresh. Queries keep
+        being served the registered stores while they are rebuilt.
+    :return: One dictionary per target with its "network", "name", the "seconds" it took,
+        and the "error" it failed with, if any
+    """
+    results: List[Dict[str, Any]] = []
+    for target in targets:
+        result: Dict[str, Any] = {"network": target["network"], "name": target["name"], "error": None}
+        start: float = time.perf_counter()
+        try:
+            tool: Any = resolve_tool_class(target["network"], target["class"])()
+            if refresh:
+                with refreshing_entries():
+                    await tool.async_invoke({**target["args"], "query": PREWARM_QUERY}, {})
+            else:
+                await tool.async_invoke({**target["args"], "query": PREWARM_QUERY}, {})
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            result["error"] = f"{type(error).__name__}: {error}"
+        result["seconds"] = time.perf_counter() - start
+        results.append(result)
+    return results
+
+
+class PrewarmService:
+    """
+    Warms the vector stores of the RAG tools of the served agent networks in a background thread
+    at server start, then refreshes them every interval_seconds. The manifest is read again on
+    every run, so networks enabled while the server runs are warmed on the next refresh.
+    """
+
+    def __init__(
+        self,
+        manifest_file: str = DEFAULT_MANIFEST_FILE,
+        toolbox_info_file: str = DEFAULT_TOOLBOX_INFO_FILE,
+        interval_seconds: float = DEFAULT_PREWARM_INTERVAL_SECONDS,
+    ):
+        """
+        Constructor
+
+        :param manifest_file: Manifest mapping agent network files to whether they are served
+        :param toolbox_info_file: Toolbox file declaring the tools referenced by "toolbox" in agent networks
+        :param interval_seconds: Seconds between refreshes, 0 to warm the stores once
+        """
+        self.manifest_file: str = manifest_file
+        self.toolbox_info_file: str = toolbox_info_file
+        self.interval_seconds: float = interval_seconds
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.last_results: List[Dict[str, Any]] = []
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def start(self) -> "PrewarmService":
+        """
+        Start warming in a daemon thread, so that it never delays or blocks the server shutdown.
+
+        :return: This service
+        """
+        self.thread = threading.Thread(target=self.run, name="rag-prewarm", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop refreshing once the current run is done.
+        """
+        self.stopped.set()
+
+    def run(self):
+        """
+        Warm the stores, then refresh them every interval_seconds until stopped.
+        """
+        refresh: bool = False
+        while not self.stopped.is_set():
+            try:
+                targets: List[Dict[str, Any]] = prewarm_targets(self.manifest_file, self.toolbox_info_file)
+                self.last_results = asyncio.run(aprewarm(targets, refresh))
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                self.logger.error("Cannot read the agent networks to pre-warm: %s", error)
+                self.last_results = []
+            for result in self.last_results:
+                if result["error"]:
+                    self.logger.error(
+                        "Pre-warming %s of %s failed: %s", result["name"], result["network"], result["error"]
+                    )
+                else:
+                    self.logger.info(
+                        "Pre-warmed %s of %s in %.1fs", result["name"], result["network"], result["seconds"]
+                    )
+            if self.interval_seconds <= 0:
+                return
+            refresh = True
+            self.stopped.wait(self.interval_seconds)
+
+
+def main():
+    """
+    Warm the vector stores of the RAG tools of the served agent networks once and print the results,
+    or with --serve, start the warming in the background and run the neuro-san server in this process,
+    so that the server finds the stores in its registry. Arguments after "--" are passed to the server.
+
+    Examples, from the repository root:
+        python -m coded_tools.rag_index.prewarm
+        python -m coded_tools.rag_index.prewarm --serve -- --port 30011 --http_port 8080
+    """
+    parser = argparse.ArgumentParser(description="Pre-warm the vector stores of the RAG tools")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_FILE, help="agent network manifest")
+    parser.add_argument("--toolbox-info", default=DEFAULT_TOOLBOX_INFO_FILE, help="toolbox info file")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_PREWARM_INTERVAL_SECONDS,
+        help="seconds between refreshes with --serve",
+    )
+    parser.add_argument("--serve", action="store_true", help="run the neuro-san server with background warming")
+    parser.add_argument("server_args", nargs=argparse.REMAINDER, help="arguments of the neuro-san server")
+    args = parser.parse_args()
+
+    if not args.serve:
+        results: List[Dict[str, Any]] = asyncio.run(aprewarm(prewarm_targets(args.manifest, args.toolbox_info)))
+        print(json.dumps({"results": results, "registry": VECTOR_STORE_REGISTRY.stats()}, indent=2))
+        return
+
+    logging.basicConfig(level=logging.INFO)
+    PrewarmService(args.manifest, args.toolbox_info, args.interval).start()
+    server_args: List[str] = args.server_args[1:] if args.server_args[:1] == ["--"] else args.server_args
+    sys.argv = ["neuro_san.service.agent_main_loop", *server_args]
+    runpy.run_module("neuro_san.service.agent_main_loop", run_name="__main__", alter_sys=True)
+
+
+if __name__ == "__main__":
+    main()
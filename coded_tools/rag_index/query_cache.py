@@ -0,0 +1,276 @@
+"""Query embedding cache and semantic retrieval result cache for the RAG tools"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections import deque
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from coded_tools.rag_index.ann_index import DEFAULT_ANN_N_PROBE
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+
+# Number of query embeddings kept by the exact-match cache
+DEFAULT_QUERY_EMBEDDING_CACHE_SIZE: int = int(os.getenv("RAG_QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+
+# Cosine similarity above which a query is answered with the results of a previous query.
+# 0 disables the semantic result cache unless a tool call asks for it.
+DEFAULT_SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("RAG_SEMANTIC_CACHE_THRESHOLD", "0"))
+
+# Number of retrieval results kept by the semantic cache and how long they stay valid
+DEFAULT_SEMANTIC_CACHE_SIZE: int = int(os.getenv("RAG_SEMANTIC_CACHE_SIZE", "1024"))
+DEFAULT_SEMANTIC_CACHE_TTL_SECONDS: float = float(os.getenv("RAG_SEMANTIC_CACHE_TTL_SECONDS", "300"))
+
+
+def normalize_query(query: str) -> str:
+    """
+    :param query: Query string as issued by an agent
+    :return: The query with surrounding whitespace removed and inner whitespace collapsed
+    """
+    return " ".join(query.split())
+
+
+def embedding_model_name(embedding: Embeddings) -> str:
+    """
+    :param embedding: Embeddings of a vector store
+    :return: Name identifying the model, so that embeddings of different models are never mixed up
+    """
+    return f"{type(embedding).__name__}:{getattr(embedding, 'model', '')}"
+
+
+class QueryCache:  # pylint: disable=too-many-instance-attributes
+    """
+    Two-level cache in front of the vector store similarity search.
+
+    The first level maps the exact query text and embedding model to the query embedding, so
+    re-issued queries are not sent to the embedding provider again.
+
+    The optional second level keeps the results of recent searches per vector store version.
+    A query whose embedding is within a cosine similarity threshold of a cached query on the
+    same version of the same store, searched with the same settings, gets the cached results
+    without searching. Any change to
+    the store gives it a new version, so results of an older index are never returned, and
+    entries expire after ttl_seconds.
+
+    The cache is thread-safe and meant to be shared by all sessions of the process.
+    """
+
+    def __init__(
+        self,
+        max_embeddings: int = DEFAULT_QUERY_EMBEDDING_CACHE_SIZE,
+        max_results: int = DEFAULT_SEMANTIC_CACHE_SIZE,
+        ttl_seconds: float = DEFAULT_SEMANTIC_CACHE_TTL_SECONDS,
+    ):
+        """
+        Constructor
+
+        :param max_embeddings: Number of query embeddings to keep
+        :param max_results: Number of search results to keep
+        :param ttl_seconds: Seconds a search result stays valid, 0 for no expiry
+        """
+        self.max_embeddings: int = max_embeddings
+        self.max_results: int = max_results
+        self.ttl_seconds: float = ttl_seconds
+        self.lock = threading.Lock()
+        # Maps (model, query) to the normalized query embedding, least recently used first
+        self.embeddings: OrderedDict[Tuple[str, str], np.ndarray] = OrderedDict()
+        # Maps store version to a list of
+        # {"version", "embedding", "k", "mode", "ann_index", "n_probe", "results", "created"} entries
+        self.results: Dict[str, List[Dict[str, Any]]] = {}
+        # The same entries, oldest first
+        self.result_order: deque = deque()
+        self.counters: Dict[str, int] = {"embedding_hits": 0, "embedding_misses": 0, "result_hits": 0}
+
+    async def aembed_query(self, embedding: Embeddings, query: str) -> np.ndarray:
+        """
+        :param embedding: Embeddings to embed the query with on a cache miss
+        :param query: Query string
+        :return: Unit-length embedding of the query
+        """
+        key: Tuple[str, str] = (embedding_model_name(embedding), normalize_query(query))
+        with self.lock:
+            vector: np.ndarray = self.embeddings.get(key)
+            if vector is not None:
+                self.embeddings.move_to_end(key)
+                self.counters["embedding_hits"] += 1
+                return vector
+            self.counters["embedding_misses"] += 1
+
+        vector = np.asarray(await embedding.aembed_query(key[1]), dtype=np.float32)
+        norm: float = float(np.linalg.norm(vector))
+        if norm > 0.0:
+            vector = vector / norm
+        vector.setflags(write=False)
+
+        with self.lock:
+            self.embeddings[key] = vector
+            self.embeddings.move_to_end(key)
+            while len(self.embeddings) > self.max_embeddings:
+                self.embeddings.popitem(last=False)
+        return vector
+
+    async def asimilarity_search(
+        self,
+        vectorstore: NumpyVectorStore,
+        query: str,
+        k: int = 4,
+        semantic_threshold: float = DEFAULT_SEMANTIC_CACHE_THRESHOLD,
+        **search_kwargs: Any,
+    ) -> List[Document]:
+        """
+        :param vectorstore: Vector store to search
+        :param query: Query string
+        :param k: Number of chunks to return
+        :param semantic_threshold: Cosine similarity above which the cached results of a previous
+            query are returned, 0 to always search
+        :param search_kwargs: Further arguments of the similarity search, such as the approximate index settings.
+            Searches with a filter are never cached.
+        :return: Up to k documents most similar to the query, best first
+        """
+        vector: np.ndarray = await self.aembed_query(vectorstore.embedding, query)
+        if semantic_threshold <= 0 or search_kwargs.get("filter") is not None:
+            return vectorstore.similarity_search_by_vector(vector, k=k, **search_kwargs)
+
+        ann_index: Optional[str] = search_kwargs.get("ann_index")
+        n_probe: int = search_kwargs.get("n_probe", DEFAULT_ANN_N_PROBE)
+        cached: Optional[List[Document]] = self.lookup(
+            vectorstore.version, vector, k, semantic_threshold, ann_index=ann_index, n_probe=n_probe
+        )
+        if cached is not None:
+            return cached
+
+        results: List[Document] = vectorstore.similarity_search_by_vector(vector, k=k, **search_kwargs)
+        self.store(vectorstore.version, vector, k, results, ann_index=ann_index, n_probe=n_probe)
+        return list(results)
+
+    def lookup(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        version: str,
+        vector: np.ndarray,
+        k: int,
+        threshold: float,
+        mode: str = "vector",
+        ann_index: Optional[str] = None,
+        n_probe: int = DEFAULT_ANN_N_PROBE,
+    ) -> Optional[List[Document]]:
+        """
+        :param version: Version of the vector store being searched
+        :param vector: Unit-length query embedding
+        :param k: Number of chunks requested
+        :param threshold: Minimum cosine similarity with a cached query
+        :param mode: Retrieval mode the results were produced by
+        :param ann_index: Kind of approximate index searched, None or "exact" for an exact search
+        :param n_probe: Number of inverted lists an approximate search probes
+        :return: Results of the most similar cached query on that store version with these settings, or None
+        """
+        settings: Tuple[int, str, str, int] = (k, mode, ann_index or "exact", n_probe)
+        now: float = time.monotonic()
+        with self.lock:
+            entries: List[Dict[str, Any]] = self.results.get(version, [])
+            live: List[Dict[str, Any]] = [
+                entry
+                for entry in entries
+                if (entry["k"], entry["mode"], entry["ann_index"], entry["n_probe"]) == settings
+                and not self._expired(entry, now)
+            ]
+            if not live:
+                return None
+            similarities: np.ndarray = np.stack([entry["embedding"] for entry in live]) @ vector
+            best: int = int(np.argmax(similarities))
+            if similarities[best] < threshold:
+                return None
+            self.counters["result_hits"] += 1
+            return list(live[best]["results"])
+
+    def store(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        version: str,
+        vector: np.ndarray,
+        k: int,
+        results: List[Document],
+        mode: str = "vector",
+        ann_index: Optional[str] = None,
+        n_probe: int = DEFAULT_ANN_N_PROBE,
+    ):
+        """
+        Remember the results of a search, evicting the oldest results beyond max_results.
+
+        :param version: Version of the vector store that was searched
+        :param vector: Unit-length query embedding
+        :param k: Number of chunks requested
+        :param results: Documents returned by the search
+        :param mode: Retrieval mode that produced the results
+        :param ann_index: Kind of approximate index searched, None or "exact" for an exact search
+        :param n_probe: Number of inverted lists an approximate search probes
+        """
+        entry: Dict[str, Any] = {
+            "version": version,
+            "embedding": vector,
+            "k": k,
+            "mode": mode,
+            "ann_index": ann_index or "exact",
+            "n_probe": n_probe,
+            "results": list(results),
+            "created": time.monotonic(),
+        }
+        with self.lock:
+            self.results.setdefault(version, []).append(entry)
+            self.result_order.append(entry)
+            while len(self.result_order) > self.max_results:
+                self._remove(self.result_order.popleft())
+
+    def invalidate(self, version: str = None):
+        """
+        Drop the cached results of one store version, or all cached results.
+
+        :param version: Version of the vector store whose results to drop
+        """
+        with self.lock:
+            if version is None:
+                self.results.clear()
+                self.result_order.clear()
+            else:
+                self.results.pop(version, None)
+                self.result_order = deque(entry for entry in self.result_order if entry["version"] != version)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: Dictionary with the number of cached embeddings and results and the hit counters
+        """
+        with self.lock:
+            return {"embeddings": len(self.embeddings), "results": len(self.result_order), **self.counters}
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry["created"] > self.ttl_seconds
+
+    def _remove(self, entry: Dict[str, Any]):
+        entries: List[Dict[str, Any]] = [
+            other for other in self.results.get(entry["version"], []) if other is not entry
+        ]
+        if entries:
+            self.results[entry["version"]] = entries
+        else:
+            self.results.pop(entry["version"], None)
+
+
+# Cache shared by all RAG tool invocations in this process
+QUERY_CACHE = QueryCache()
@@ -0,0 +1,513 @@
+"""Retrieval quality and latency benchmark of the RAG tools"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import argparse
+import asyncio
+import functools
+import html
+import json
+import multiprocessing
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from types import ModuleType
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+from unittest.mock import patch
+
+import numpy as np
+import pymupdf
+
+import coded_tools.agentic_rag.rag as rag_module
+import coded_tools.confluence_rag as confluence_rag_module
+import coded_tools.pdf_rag.pdf_rag as pdf_rag_module
+from coded_tools.rag_index.batch_embedder import BatchEmbedder
+from coded_tools.rag_index.chunking_benchmark import HashingEmbeddings
+from coded_tools.rag_index.chunking_benchmark import directory_size
+from coded_tools.rag_index.chunking_benchmark import load_questions
+from coded_tools.rag_index.chunking_benchmark import normalize
+from coded_tools.rag_index.fetch_cache import FetchCache
+
+# Corpus bundled with the benchmark: markdown documents, rendered to PDF files for the PDF tools and served
+# as confluence pages for ConfluenceRag, and the labelled questions, whose answers appear verbatim in one document
+BENCHMARK_CORPUS_DIR: str = os.path.join(os.path.dirname(__file__), "benchmark_corpus")
+BENCHMARK_QUESTIONS_FILE: str = os.path.join(BENCHMARK_CORPUS_DIR, "questions.jsonl")
+
+# Benchmarked tools and the modules they are defined in
+BENCHMARK_TOOLS: Dict[str, ModuleType] = {
+    "pdf_rag": pdf_rag_module,
+    "rag": rag_module,
+    "confluence_rag": confluence_rag_module,
+}
+
+# Numbers of retrieved chunks recall is reported for
+DEFAULT_RECALL_KS: Tuple[int, ...] = (1, 4, 8)
+
+# Layout of the rendered PDF pages
+PDF_LINE_WIDTH: int = 95
+PDF_LINES_PER_PAGE: int = 50
+PDF_FONT_SIZE: float = 10.0
+
+# Markers of the error messages the tools return instead of raising
+TOOL_ERROR_PREFIXES = ("Error", "❌")
+
+
+def load_corpus_documents(corpus_dir: str = BENCHMARK_CORPUS_DIR) -> Dict[str, str]:
+    """
+    :param corpus_dir: Directory of markdown or text documents
+    :return: Dictionary mapping the file names of the documents to their text, in file name order
+    """
+    documents: Dict[str, str] = {}
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith((".md", ".txt")):
+            with open(os.path.join(corpus_dir, name), "r", encoding="utf-8") as document_file:
+                documents[name] = document_file.read()
+    return documents
+
+
+def render_pdf(texts: List[str], path: str):
+    """
+    Render texts into a PDF file, each text starting on a new page, with deterministic line breaks.
+
+    :param texts: Texts to render
+    :param path: Path of the PDF file to write
+    """
+    pdf = pymupdf.open()
+    for text in texts:
+        lines: List[str] = []
+        for paragraph in text.splitlines():
+            lines.extend(textwrap.wrap(paragraph, PDF_LINE_WIDTH) or [""])
+        for start in range(0, len(lines), PDF_LINES_PER_PAGE):
+            page = pdf.new_page()
+            for index, line in enumerate(lines[start : start + PDF_LINES_PER_PAGE]):
+                page.insert_text((50, 60 + index * PDF_FONT_SIZE * 1.4), line, fontsize=PDF_FONT_SIZE)
+    pdf.save(path)
+    pdf.close()
+
+
+def confluence_pages(documents: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """
+    :param documents: Dictionary mapping document names to their markdown text
+    :return: Dictionary mapping page ids to confluence pages, as returned by the confluence API,
+        one per second-level section of the documents
+    """
+    pages: Dict[str, Dict[str, Any]] = {}
+    for name, text in documents.items():
+        for section in re.split(r"\n(?=## )", text):
+            title, _, body = section.partition("\n")
+            paragraphs: List[str] = [paragraph for paragraph in body.split("\n\n") if paragraph.strip()]
+            if not paragraphs:
+                continue
+            page_id: str = str(len(pages) + 1)
+            pages[page_id] = {
+                "id": page_id,
+                "type": "page",
+                "title": f"{os.path.splitext(name)[0]}: {title.lstrip('# ')}",
+                "status": "current",
+                "version": {"number": 1, "when": "2025-01-01T00:00:00.000Z"},
+                "body": {"storage": {"value": "".join(f"<p>{html.escape(p)}</p>" for p in paragraphs)}},
+                "_links": {"webui": f"/pages/{page_id}"},
+            }
+    return pages
+
+
+class StubConfluenceServer:
+    """
+    Local HTTP server answering the confluence REST requests of ConfluenceRag for a set of pages by id,
+    so that the confluence tool is benchmarked without network access.
+    """
+
+    def __init__(self, pages: Dict[str, Dict[str, Any]]):
+        """
+        Constructor
+
+        :param pages: Dictionary mapping page ids to confluence pages
+        """
+        self.pages: Dict[str, Dict[str, Any]] = pages
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        """
+        :return: Base URL of the running server
+        """
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self) -> "StubConfluenceServer":
+        pages: Dict[str, Dict[str, Any]] = self.pages
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            Serves /rest/api/content/<page id>
+            """
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """
+                Answer a page request.
+                """
+                match = re.match(r"/rest/api/content/(\w+)", self.path)
+                page: Optional[Dict[str, Any]] = pages.get(match.group(1)) if match else None
+                body: bytes = json.dumps(page or {"message": "Not found"}).encode("utf-8")
+                self.send_response(200 if page else 404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                """
+                Keep the benchmark output quiet.
+                """
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    :return: Peak resident set size of this process in bytes, or None where it cannot be measured
+    """
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    max_rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and in bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    """
+    :param seconds: Latencies of the queries in seconds
+    :return: Dictionary with the mean and the 50th, 95th and 99th percentiles in milliseconds
+    """
+    milliseconds = np.asarray(seconds) * 1000.0
+    return {
+        "mean": round(float(milliseconds.mean()), 3),
+        **{f"p{q}": round(float(np.percentile(milliseconds, q)), 3) for q in (50, 95, 99)},
+    }
+
+
+def tool_setup(
+    tool_name: str, documents: Dict[str, str], work_dir: str, stack: ExitStack
+) -> Tuple[Dict[str, Any], str]:
+    """
+    Prepare the sources of a tool and point everything it writes to the work directory.
+
+    :param tool_name: One of BENCHMARK_TOOLS
+    :param documents: Dictionary mapping document names to their markdown text
+    :param work_dir: Directory of the sources, indexes and checkpoints of the run
+    :param stack: Exit stack collecting the patches and servers of the run
+    :return: Tuple of the args of the tool and the directory of the index it builds
+    """
+    checkpoint_dir: str = os.path.join(work_dir, "embedding_checkpoints")
+    if tool_name == "pdf_rag":
+        paths: List[str] = []
+        for name, text in documents.items():
+            paths.append(os.path.join(work_dir, f"{os.path.splitext(name)[0]}.pdf"))
+            render_pdf([text], paths[-1])
+        index_dir: str = os.path.join(work_dir, "index_cache")
+        return {"urls": paths, "index_cache_dir": index_dir, "embedding_checkpoint_dir": checkpoint_dir}, index_dir
+
+    if tool_name == "rag":
+        # Rag indexes the single PDF file of PDF_FILE_URL under INDEX_DIR
+        pdf_path: str = os.path.join(work_dir, "corpus.pdf")
+        render_pdf(list(documents.values()), pdf_path)
+        index_dir = os.path.join(work_dir, "rag_index")
+        stack.enter_context(patch.object(rag_module, "PDF_FILE_URL", pdf_path))
+        stack.enter_context(patch.object(rag_module, "INDEX_DIR", index_dir))
+        stack.enter_context(
+            patch.object(rag_module, "BatchEmbedder", functools.partial(BatchEmbedder, checkpoint_dir=checkpoint_dir))
+        )
+        return {"incremental_index": True}, index_dir
+
+    pages: Dict[str, Dict[str, Any]] = confluence_pages(documents)
+    server: StubConfluenceServer = stack.enter_context(StubConfluenceServer(pages))
+    index_dir = os.path.join(work_dir, "confluence_index")
+    stack.enter_context(
+        patch.object(confluence_rag_module, "FETCH_CACHE", FetchCache(os.path.join(work_dir, "fetch_cache")))
+    )
+    args: Dict[str, Any] = {
+        "url": server.url,
+        "page_ids": list(pages),
+        "username": "benchmark",
+        "api_key": "benchmark",
+        "cloud": False,
+        "include_restricted_content": True,
+        "incremental_index": True,
+        "vector_store_path": index_dir,
+        "crawl_checkpoint_dir": os.path.join(work_dir, "crawl_checkpoints"),
+        "embedding_checkpoint_dir": checkpoint_dir,
+    }
+    return args, index_dir
+
+
+async def ainvoke(tool: Any, args: Dict[str, Any], query: str) -> str:
+    """
+    :param tool: RAG tool
+    :param args: Args of the tool
+    :param query: Question to ask
+    :return: Context retrieved by the tool
+    :raises RuntimeError: If the tool returns an error message
+    """
+    output: str = await tool.async_invoke({**args, "query": query}, {})
+    if output.startswith(TOOL_ERROR_PREFIXES):
+        raise RuntimeError(output)
+    return output
+
+
+async def abenchmark_tool(  # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+    tool_name: str,
+    documents: Dict[str, str],
+    questions: List[Dict[str, str]],
+    work_dir: str,
+    recall_ks: Sequence[int] = DEFAULT_RECALL_KS,
+    chunking_profile: Union[str, Dict[str, Any], None] = None,
+    dimension: int = 256,
+) -> Dict[str, Any]:
+    """
+    Build the index of a tool over the corpus with deterministic local embeddings, then ask it every question.
+
+    :param tool_name: One of BENCHMARK_TOOLS
+    :param documents: Dictionary mapping document names to their markdown text
+    :param questions: Dictionaries with the "question" and its expected "answer"
+    :param work_dir: Empty directory of the sources, indexes and checkpoints of the run
+    :param recall_ks: Numbers of retrieved chunks to report recall for
+    :param chunking_profile: Chunking profile passed to the tool, None for its default
+    :param dimension: Dimension of the embeddings
+    :return: Dictionary with the "build_seconds" of the first query, which builds the index, the "index_bytes"
+        on disk, the "query_ms" latency summary of the questions against the built index, "recall_at_k" for each
+        of recall_ks, the fraction of questions whose answer is in the retrieved context, and "peak_rss_bytes"
+    """
+    module: ModuleType = BENCHMARK_TOOLS[tool_name]
+    with ExitStack() as stack:
+        # The tools print their progress, which would get mixed with the JSON report
+        stack.enter_context(redirect_stdout(sys.stderr))
+        args, index_dir = tool_setup(tool_name, documents, work_dir, stack)
+        if chunking_profile is not None:
+            args["chunking_profile"] = chunking_profile
+        stack.enter_context(
+            patch.object(module, "OpenAIEmbeddings", lambda **_: HashingEmbeddings(dimension))  # noqa: E731
+        )
+        tool: Any = getattr(
+            module, {"pdf_rag": "PdfRag", "rag": "Rag", "confluence_rag": "ConfluenceRag"}[tool_name]
+        )()
+
+        start: float = time.perf_counter()
+        await ainvoke(tool, args, questions[0]["question"])
+        build_seconds: float = time.perf_counter() - start
+
+        latencies: List[float] = []
+        for question in questions:
+            start = time.perf_counter()
+            await ainvoke(tool, args, question["question"])
+            latencies.append(time.perf_counter() - start)
+
+        recall: Dict[str, float] = {}
+        for k in recall_ks:
+            hits: int = 0
+            with patch.object(module, "RETRIEVAL_K", k):
+                for question in questions:
+                    context: str = await ainvoke(tool, args, question["question"])
+                    hits += normalize(question["answer"]) in normalize(context)
+            recall[str(k)] = round(hits / len(questions), 4)
+
+    return {
+        "build_seconds": round(build_seconds, 4),
+        "index_bytes": directory_size(index_dir),
+        "query_ms": latency_summary(latencies),
+        "recall_at_k": recall,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def run_tool_benchmark(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    tool_name: str,
+    corpus_dir: str,
+    questions_file: str,
+    recall_ks: Sequence[int],
+    chunking_profile: Union[str, Dict[str, Any], None],
+    dimension: int,
+) -> Dict[str, Any]:
+    """
+    Benchmark one tool in a temporary work directory. Run in a process of its own, so that the peak RSS
+    and the query embedding cache are those of this tool only.
+
+    :param tool_name: One of BENCHMARK_TOOLS
+    :param corpus_dir: Directory of markdown or text documents
+    :param questions_file: JSON or JSONL file of the labelled questions
+    :param recall_ks: Numbers of retrieved chunks to report recall for
+    :param chunking_profile: Chunking profile passed to the tool, None for its default
+    :param dimension: Dimension of the embeddings
+    :return: Results as returned by abenchmark_tool()
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        return asyncio.run(
+            abenchmark_tool(
+                tool_name,
+                load_corpus_documents(corpus_dir),
+                load_questions(questions_file),
+                work_dir,
+                recall_ks,
+                chunking_profile,
+                dimension,
+            )
+        )
+
+
+def git_commit() -> Optional[str]:
+    """
+    :return: Commit of the working tree the benchmark runs from, or None outside of a git checkout
+    """
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__)
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def benchmark(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    tools: Sequence[str] = tuple(BENCHMARK_TOOLS),
+    corpus_dir: str = BENCHMARK_CORPUS_DIR,
+    questions_file: str = BENCHMARK_QUESTIONS_FILE,
+    recall_ks: Sequence[int] = DEFAULT_RECALL_KS,
+    chunking_profile: Union[str, Dict[str, Any], None] = None,
+    dimension: int = 256,
+    isolate: bool = True,
+) -> Dict[str, Any]:
+    """
+    :param tools: Names of the tools to benchmark, among BENCHMARK_TOOLS
+    :param corpus_dir: Directory of markdown or text documents
+    :param questions_file: JSON or JSONL file of the labelled questions
+    :param recall_ks: Numbers of retrieved chunks to report recall for
+    :param chunking_profile: Chunking profile passed to the tools, None for their default
+    :param dimension: Dimension of the embeddings
+    :param isolate: Benchmark each tool in a process of its own. Without it, the peak RSS is that of the
+        whole run so far, and later tools find the query embeddings of earlier ones cached.
+    :return: Dictionary with the "commit", "python" version and "settings" of the run and the "results" per tool
+    """
+    unknown: List[str] = [tool for tool in tools if tool not in BENCHMARK_TOOLS]
+    if unknown:
+        raise ValueError(f"Unknown tools {', '.join(unknown)}, expected some of {', '.join(BENCHMARK_TOOLS)}")
+    runs: Dict[str, Any] = {}
+    for tool_name in tools:
+        run_args: Tuple[Any, ...] = (tool_name, corpus_dir, questions_file, recall_ks, chunking_profile, dimension)
+        if isolate:
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                runs[tool_name] = pool.submit(run_tool_benchmark, *run_args).result()
+        else:
+            runs[tool_name] = run_tool_benchmark(*run_args)
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            "corpus": os.path.abspath(corpus_dir),
+            "documents": len(load_corpus_documents(corpus_dir)),
+            "questions": len(load_questions(questions_file)),
+            "embeddings": f"hashing-{dimension}",
+            "chunking_profile": chunking_profile,
+            "recall_ks": list(recall_ks),
+        },
+        "results": runs,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    :param baseline: Report of an earlier benchmark() run
+    :param current: Report of this run
+    :return: Dictionary mapping tool and metric, such as "pdf_rag.query_ms.p95", to the baseline
+        and current values and the relative change, for the metrics both reports have
+    """
+
+    def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+        values: Dict[str, float] = {}
+        for key, value in results.items():
+            if isinstance(value, dict):
+                values.update(flatten(value, f"{prefix}{key}."))
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                values[f"{prefix}{key}"] = float(value)
+        return values
+
+    before: Dict[str, float] = flatten(baseline.get("results", {}))
+    after: Dict[str, float] = flatten(current.get("results", {}))
+    return {
+        metric: {
+            "baseline": before[metric],
+            "current": value,
+            "change": round((value - before[metric]) / before[metric], 4) if before[metric] else None,
+        }
+        for metric, value in after.items()
+        if metric in before
+    }
+
+
+def main():
+    """
+    Benchmark the RAG tools on the bundled corpus and print the results as JSON.
+
+    Example, from the repository root:
+        python -m coded_tools.rag_index.rag_benchmark --output benchmark.json
+        python -m coded_tools.rag_index.rag_benchmark --tools pdf_rag --baseline benchmark.json
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the retrieval quality and latency of the RAG tools")
+    parser.add_argument("--tools", nargs="+", default=list(BENCHMARK_TOOLS), choices=list(BENCHMARK_TOOLS))
+    parser.add_argument("--corpus", default=BENCHMARK_CORPUS_DIR, help="directory of markdown or text documents")
+    parser.add_argument("--questions", default=BENCHMARK_QUESTIONS_FILE, help="JSON or JSONL labelled questions")
+    parser.add_argument("--k", type=int, nargs="+", default=list(DEFAULT_RECALL_KS), help="k values of recall@k")
+    parser.add_argument("--chunking-profile", help="chunking profile name or JSON settings passed to the tools")
+    parser.add_argument("--dimension", type=int, default=256, help="dimension of the stub embeddings")
+    parser.add_argument("--output", help="file to write the JSON report to, in addition to printing it")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    args = parser.parse_args()
+
+    chunking_profile: Union[str, Dict[str, Any], None] = args.chunking_profile
+    if chunking_profile and chunking_profile.lstrip().startswith("{"):
+        chunking_profile = json.loads(chunking_profile)
+    report: Dict[str, Any] = benchmark(
+        args.tools, args.corpus, args.questions, args.k, chunking_profile, args.dimension
+    )
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+            report["comparison"] = compare(json.load(baseline_file), report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
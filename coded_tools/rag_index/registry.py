@@ -0,0 +1,250 @@
+"""Process-wide registry of loaded vector stores shared across RAG tool invocations"""
+
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+# END COPYRIGHT
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+
+# Total size in bytes of the vector stores kept by the shared registry
+DEFAULT_REGISTRY_MAX_BYTES: int = int(os.getenv("RAG_REGISTRY_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Seconds after which a shared vector store is rebuilt, so that changed sources are picked up.
+# Rebuilds go through the index cache or the incremental index, so unchanged sources are not re-embedded.
+# 0 keeps entries until they are evicted.
+DEFAULT_REGISTRY_TTL_SECONDS: float = float(os.getenv("RAG_REGISTRY_TTL_SECONDS", "600"))
+
+# Set by refreshing_entries() for the code running in its context
+REFRESHING: contextvars.ContextVar = contextvars.ContextVar("rag_registry_refreshing", default=False)
+
+
+def registry_key(*parts: Any) -> str:
+    """
+    :param parts: JSON-serializable values identifying a vector store,
+        such as the tool name, the source set and the embedding and splitter settings
+    :return: Hex digest to use as registry key. Credentials among the parts never appear in clear.
+    """
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def refreshing_entries() -> Iterator[None]:
+    """
+    Within this context, get_or_build() rebuilds the entries it is asked for even if they are fresh.
+    Other callers keep being served the current entry until the rebuilt one replaces it,
+    so a scheduled refresh never makes a query wait for a build.
+    """
+    token: contextvars.Token = REFRESHING.set(True)
+    try:
+        yield
+    finally:
+        REFRESHING.reset(token)
+
+
+class VectorStoreRegistry:  # pylint: disable=too-many-instance-attributes
+    """
+    Registry of built vector stores keyed by source set and embedding configuration.
+
+    Entries are evicted least recently used first once their total size exceeds max_bytes,
+    or once the entries of a namespace exceed the share of the registry that namespace is given.
+    Concurrent requests for a key that is being built wait for that one build instead of
+    starting their own. The registry is thread-safe and its entries can be awaited from
+    any event loop, since agent sessions may be served on different threads.
+
+    Stores handed out by the registry are shared and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_REGISTRY_MAX_BYTES, ttl_seconds: float = DEFAULT_REGISTRY_TTL_SECONDS):
+        """
+        Constructor
+
+        :param max_bytes: Total size in bytes of the vector stores to keep
+        :param ttl_seconds: Seconds after which an entry is rebuilt on its next request, 0 for never
+        """
+        self.max_bytes: int = max_bytes
+        self.ttl_seconds: float = ttl_seconds
+        self.lock = threading.Lock()
+        # Maps key to {"vectorstore": <store>, "nbytes": <size>, "version": <version>, "namespace": <namespace>,
+        # "created": <time>, "hits": <count>}, least recently used first
+        self.entries: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        self.in_flight: Dict[str, Future] = {}
+        self.total_bytes: int = 0
+        # Maps namespace to the total size in bytes of its entries
+        self.namespace_bytes: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {"hits": 0, "misses": 0, "shared_builds": 0, "evictions": 0, "refreshes": 0}
+
+    async def get_or_build(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        key: str,
+        build: Callable[[], Awaitable[NumpyVectorStore]],
+        version: str = None,
+        namespace: str = None,
+        namespace_max_bytes: int = 0,
+    ) -> NumpyVectorStore:
+        """
+        Return the vector store registered under the key, building it if needed.
+
+        :param key: Registry key as returned by registry_key()
+        :param build: Coroutine function building the vector store on a miss
+        :param version: Optional cheap stamp of the sources, such as file sizes and modification times.
+            An entry registered with a different version is rebuilt.
+        :param namespace: Optional tenant or agent network the vector store is accounted to
+        :param namespace_max_bytes: Total size in bytes of the vector stores of the namespace to keep,
+            beyond which its least recently used ones are evicted first. 0 for no limit other than max_bytes.
+        :return: The shared vector store
+        """
+        refreshing: bool = REFRESHING.get()
+        with self.lock:
+            entry: Dict[str, Any] = self.entries.get(key)
+            if entry is not None and (self._expired(entry) or entry["version"] != version):
+                self._remove(key)
+                entry = None
+            if entry is not None and not refreshing:
+                self.entries.move_to_end(key)
+                entry["hits"] += 1
+                self.counters["hits"] += 1
+                return entry["vectorstore"]
+
+            future: Future = self.in_flight.get(key)
+            is_builder: bool = future is None
+            if is_builder:
+                # A refreshed entry stays in place, serving other callers, until the rebuilt store replaces it
+                future = Future()
+                self.in_flight[key] = future
+                self.counters["refreshes" if entry is not None else "misses"] += 1
+            else:
+                self.counters["shared_builds"] += 1
+
+        if not is_builder:
+            return await asyncio.wrap_future(future)
+
+        try:
+            vectorstore: NumpyVectorStore = await build()
+        except BaseException as exception:
+            with self.lock:
+                self.in_flight.pop(key, None)
+            future.set_exception(exception)
+            raise
+
+        with self.lock:
+            self.in_flight.pop(key, None)
+            self._put(key, vectorstore, version, namespace, namespace_max_bytes)
+        future.set_result(vectorstore)
+        return vectorstore
+
+    def invalidate(self, key: str = None):
+        """
+        Drop one entry, or all entries if no key is given.
+        Callers already holding a dropped store may keep using it.
+
+        :param key: Registry key of the entry to drop
+        """
+        with self.lock:
+            for entry_key in [key] if key is not None else list(self.entries):
+                self._remove(entry_key)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        :return: Dictionary with the entry count, total bytes, byte limit, hit/miss counters
+            and the total bytes of each namespace
+        """
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "in_flight": len(self.in_flight),
+                **self.counters,
+                "namespace_bytes": dict(self.namespace_bytes),
+            }
+
+    def list_entries(self) -> List[Dict[str, Any]]:
+        """
+        :return: One dictionary per entry with its key, namespace, chunk count, size, age and hits,
+            least recently used first
+        """
+        now: float = time.monotonic()
+        with self.lock:
+            return [
+                {
+                    "key": key,
+                    "namespace": entry["namespace"],
+                    "chunks": len(entry["vectorstore"]),
+                    "nbytes": entry["nbytes"],
+                    "age_seconds": now - entry["created"],
+                    "hits": entry["hits"],
+                }
+                for key, entry in self.entries.items()
+            ]
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl_seconds > 0 and time.monotonic() - entry["created"] > self.ttl_seconds
+
+    def _put(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, key: str, vectorstore: NumpyVectorStore, version: str, namespace: str, namespace_max_bytes: int
+    ):
+        # Empty stores usually come from a failed load, which should be retried on the next request.
+        # Stores larger than the whole budget are returned to the caller but not kept.
+        nbytes: int = vectorstore.nbytes
+        if len(vectorstore) == 0 or nbytes > self.max_bytes or 0 < namespace_max_bytes < nbytes:
+            return
+        self._remove(key)
+        self.entries[key] = {
+            "vectorstore": vectorstore,
+            "nbytes": nbytes,
+            "version": version,
+            "namespace": namespace,
+            "created": time.monotonic(),
+            "hits": 0,
+        }
+        self.total_bytes += nbytes
+        if namespace is not None:
+            self.namespace_bytes[namespace] = self.namespace_bytes.get(namespace, 0) + nbytes
+            # A namespace over its share gives up its own coldest stores, never those of other namespaces
+            while namespace_max_bytes and self.namespace_bytes[namespace] > namespace_max_bytes:
+                self._evict(
+                    next(entry_key for entry_key, entry in self.entries.items() if entry["namespace"] == namespace)
+                )
+        while self.total_bytes > self.max_bytes:
+            self._evict(next(iter(self.entries)))
+
+    def _evict(self, key: str):
+        self._remove(key)
+        self.counters["evictions"] += 1
+
+    def _remove(self, key: str):
+        entry: Dict[str, Any] = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry["nbytes"]
+            if entry["namespace"] is not None:
+                self.namespace_bytes[entry["namespace"]] -= entry["nbytes"]
+                if not self.namespace_bytes[entry["namespace"]]:
+                    del self.namespace_bytes[entry["namespace"]]
+
+
+# Registry shared by all RAG tool invocations in this process
+VECTOR_STORE_REGISTRY = VectorStoreRegistry()
@@ -54,6 +54,7 @@ class NeuroSanRunner:
             "neuro_san_web_client_port": int(os.getenv("NEURO_SAN_WEB_CLIENT_PORT", "5003")),
             "thinking_file": os.getenv("THINKING_FILE", self.thinking_file),
             "thinking_dir": os.getenv("THINKING_DIR", self.thinking_dir),
+            "rag_prewarm": os.getenv("RAG_PREWARM", "false").lower() == "true",
             # Ensure all paths are resolved relative to `self.root_dir`
             "agent_manifest_file": os.getenv(
                 "AGENT_MANIFEST_FILE", os.path.join(self.root_dir, "registries", "manifest.hocon")
@@ -133,6 +134,12 @@ class NeuroSanRunner:
         parser.add_argument(
             "--use-flask-web-client", action="store_true", help="Use the flask based neuro-san-web-client"
         )
+        parser.add_argument(
+            "--rag-prewarm",
+            action="store_true",
+            default=self.args["rag_prewarm"],
+            help="Build the vector stores of the RAG tools of the served agent networks at server start",
+        )
 
         args, _ = parser.parse_known_args()
         explicitly_passed_args = {arg for arg in sys.argv[1:] if arg.startswith("--")}
@@ -261,11 +268,15 @@ class NeuroSanRunner:
     def start_neuro_san(self):
         """Start the Neuro SAN server."""
         print("Starting Neuro SAN server...")
+        server_module = ["neuro_san.service.agent_main_loop"]
+        if self.args["rag_prewarm"]:
+            # The pre-warming service runs the server in its own process, where the RAG tools find the warmed stores
+            server_module = ["coded_tools.rag_index.prewarm", "--serve", "--"]
         command = [
             sys.executable,
             "-u",
             "-m",
-            "neuro_san.service.agent_main_loop",
+            *server_module,
             "--port",
             str(self.args["server_grpc_port"]),
             "--http_port",
@@ -0,0 +1,53 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+from typing import Dict
+from typing import List
+
+
+class InMemoryCollection:
+    """
+    The part of a ChromaDB collection used by training.
+    """
+
+    def __init__(self):
+        self.documents: Dict[str, str] = {}
+        self.embeddings: Dict[str, list] = {}
+        self.upserts: int = 0
+        self.fail_deletes: bool = False
+
+    def get(self, include: List[str], ids: List[str] = None, where_document: Dict[str, str] = None):
+        """
+        Returns the ids among the given ones that are stored, or the documents containing a text.
+        """
+        if where_document is None:
+            assert not include
+            return {"ids": [record_id for record_id in ids if record_id in self.documents]}
+        assert include == ["documents"] and ids is None
+        found = {key: value for key, value in self.documents.items() if where_document["$contains"] in value}
+        return {"ids": list(found), "documents": list(found.values())}
+
+    def upsert(self, ids: List[str], documents: List[str], embeddings: List[list]):
+        """
+        Stores documents and their embeddings.
+        """
+        assert len(embeddings) == len(ids)
+        self.upserts += 1
+        self.documents.update(zip(ids, documents))
+        self.embeddings.update(zip(ids, embeddings))
+
+    def delete(self, ids: List[str]):
+        """
+        Deletes documents.
+        """
+        if self.fail_deletes:
+            raise RuntimeError("collection is read only")
+        for record_id in ids:
+            del self.documents[record_id]
+            self.embeddings.pop(record_id, None)
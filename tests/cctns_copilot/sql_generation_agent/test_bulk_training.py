@@ -0,0 +1,122 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+from typing import List
+from unittest import TestCase
+
+from cctns_copilot.sql_generation_agent.bulk_training import bulk_train
+from cctns_copilot.sql_generation_agent.bulk_training import content_id
+from cctns_copilot.sql_generation_agent.bulk_training import training_records
+from coded_tools.rag_index.chunking_benchmark import HashingEmbeddings
+from tests.cctns_copilot.sql_generation_agent.in_memory_collection import InMemoryCollection
+
+GUNTUR = {"question": "How many FIRs were filed in Guntur district?", "sql": "SELECT COUNT(*) FROM FIR_RECORDS"}
+
+
+class TestBulkTraining(TestCase):
+    """
+    Unit tests for the bulk_training module.
+    """
+
+    def setUp(self):
+        self.collections = {kind: InMemoryCollection() for kind in ("sql", "ddl", "documentation")}
+        self.embedded: List[int] = []
+        embeddings = HashingEmbeddings()
+
+        def embed_documents(documents: List[str]) -> List[list]:
+            self.embedded.append(len(documents))
+            return embeddings.embed_documents(documents)
+
+        self.embed_documents = embed_documents
+
+    def test_records(self):
+        """
+        Records have the documents and ids Vanna gives them when training item by item.
+        """
+        records = training_records(dict(GUNTUR, documentation=" FIR means First Information Report. "))
+        self.assertEqual(
+            [
+                (
+                    "sql",
+                    "340a38e9-1602-56e6-922a-d77a20da129a-sql",
+                    '{"question": "How many FIRs were filed in Guntur district?", '
+                    '"sql": "SELECT COUNT(*) FROM FIR_RECORDS"}',
+                ),
+                (
+                    "documentation",
+                    content_id(" FIR means First Information Report. ") + "-doc",
+                    " FIR means First Information Report. ",
+                ),
+            ],
+            records,
+        )
+        # Surrounding whitespace is hashed too, as by vn.train, so the pair trained one by one is recognized
+        records = training_records({"question": GUNTUR["question"] + "\n", "sql": " " + GUNTUR["sql"]})
+        self.assertEqual(
+            content_id(
+                '{"question": "How many FIRs were filed in Guntur district?\\n", '
+                '"sql": " SELECT COUNT(*) FROM FIR_RECORDS"}'
+            )
+            + "-sql",
+            records[0][1],
+        )
+        with self.assertRaises(ValueError):
+            training_records({"question": "How many FIRs?", "sql": " "})
+        with self.assertRaises(ValueError):
+            training_records(GUNTUR, is_valid_sql=lambda sql: sql.startswith("WITH"))
+
+    def test_bulk_train(self):
+        """
+        Items are deduplicated among themselves and against stored records, embedded in batches and written with
+        one upsert per collection.
+        """
+        ddl = "CREATE TABLE FIR_RECORDS (FIR_ID NUMBER, DISTRICT_NAME VARCHAR2(100))"
+        items = [
+            {"question": f"How many FIRs were filed in district {i}?", "sql": f"SELECT {i} FROM DUAL", "ddl": ddl}
+            for i in range(1000)
+        ]
+        counts = bulk_train(
+            self.collections,
+            items + [GUNTUR, GUNTUR, {"sql": "SELECT 1 FROM DUAL"}],
+            self.embed_documents,
+            batch_size=256,
+        )
+        self.assertEqual({"added": 1001, "skipped": 1, "failed": 1}, counts)
+        self.assertEqual(1001, len(self.collections["sql"].documents))
+        self.assertEqual(1, len(self.collections["ddl"].documents))
+        self.assertEqual([256, 256, 256, 233, 1], self.embedded)
+        self.assertEqual(1, self.collections["sql"].upserts)
+
+        self.embedded.clear()
+        counts = bulk_train(
+            self.collections, items[:10] + [dict(GUNTUR, sql="SELECT 2 FROM DUAL")], self.embed_documents
+        )
+        self.assertEqual({"added": 1, "skipped": 10, "failed": 0}, counts)
+        self.assertEqual([1], self.embedded)
+
+    def test_failures(self):
+        """
+        Items whose records could not be embedded or written are reported as failed, the others are still added.
+        """
+
+        def embed_documents(documents: List[str]) -> List[list]:
+            if any("district 1?" in document for document in documents):
+                raise RuntimeError("embedding service unavailable")
+            return self.embed_documents(documents)
+
+        items = [
+            {"question": f"How many FIRs were filed in district {i}?", "sql": f"SELECT {i} FROM DUAL"}
+            for i in range(4)
+        ]
+        counts = bulk_train(self.collections, items, embed_documents, batch_size=2)
+        self.assertEqual({"added": 2, "skipped": 0, "failed": 2}, counts)
+        self.assertEqual(2, len(self.collections["sql"].documents))
+
+        counts = bulk_train(self.collections, items, self.embed_documents)
+        self.assertEqual({"added": 2, "skipped": 2, "failed": 0}, counts)
@@ -0,0 +1,149 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import importlib.util
+import os
+import tempfile
+from typing import Dict
+from typing import List
+from unittest import TestCase
+from unittest import skipUnless
+
+from cctns_copilot.sql_generation_agent.bulk_training import content_id
+from cctns_copilot.sql_generation_agent.schema_training import SchemaFingerprint
+from cctns_copilot.sql_generation_agent.schema_training import schema_documents
+from cctns_copilot.sql_generation_agent.schema_training import train_schema_documents
+from coded_tools.rag_index.chunking_benchmark import HashingEmbeddings
+from tests.cctns_copilot.sql_generation_agent.in_memory_collection import InMemoryCollection
+
+PANDAS_INSTALLED: bool = importlib.util.find_spec("pandas") is not None
+
+
+def table_document(table: str, *columns: str) -> str:
+    """
+    Returns the documentation of a table with VARCHAR2 columns.
+    """
+    return f"Table {table}:\n" + "".join(f"  Column: {column}, Type: VARCHAR2\n" for column in columns)
+
+
+class TestSchemaTraining(TestCase):
+    """
+    Unit tests for the schema_training module.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.fingerprint = SchemaFingerprint(os.path.join(self.directory.name, "chroma", "schema_fingerprint.json"))
+        self.collection = InMemoryCollection()
+        self.collections = {"sql": None, "ddl": None, "documentation": self.collection}
+        self.embedded: List[str] = []
+        embeddings = HashingEmbeddings()
+
+        def embed_documents(documents: List[str]) -> List[list]:
+            self.embedded.extend(documents)
+            return embeddings.embed_documents(documents)
+
+        self.embed_documents = embed_documents
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def train(self, documents: Dict[str, str]) -> Dict[str, int]:
+        """
+        Trains the documentation of the given tables, recording the documents embedded.
+        """
+        self.embedded.clear()
+        return train_schema_documents(self.collections, documents, self.fingerprint, self.embed_documents)
+
+    def test_incremental_training(self):
+        """
+        Each table is trained as its own record, and only changed tables are trained again, the records of changed
+        and dropped tables being deleted.
+        """
+        schema = {f"TABLE_{i}": table_document(f"TABLE_{i}", "ID", "NAME") for i in range(300)}
+        self.assertEqual({"added": 300, "unchanged": 0, "removed": 0, "failed": 0}, self.train(schema))
+        self.assertEqual(sorted(schema.values()), sorted(self.collection.documents.values()))
+
+        self.assertEqual({"added": 0, "unchanged": 300, "removed": 0, "failed": 0}, self.train(schema))
+        self.assertEqual([], self.embedded)
+
+        schema["TABLE_1"] = table_document("TABLE_1", "ID", "NAME", "DISTRICT_ID")
+        del schema["TABLE_2"]
+        schema["FIR_RECORDS"] = table_document("FIR_RECORDS", "FIR_ID")
+        self.assertEqual({"added": 2, "unchanged": 298, "removed": 1, "failed": 0}, self.train(schema))
+        self.assertEqual(sorted([schema["TABLE_1"], schema["FIR_RECORDS"]]), sorted(self.embedded))
+        self.assertEqual(sorted(schema.values()), sorted(self.collection.documents.values()))
+
+    def test_missing_records_are_retrained(self):
+        """
+        Tables whose record is no longer stored are trained again, and deletions that failed are retried.
+        """
+        schema = {"FIR_RECORDS": table_document("FIR_RECORDS", "FIR_ID"), "ARRESTS": table_document("ARRESTS", "ID")}
+        self.train(schema)
+        self.collection.documents.clear()
+        self.assertEqual({"added": 2, "unchanged": 0, "removed": 0, "failed": 0}, self.train(schema))
+
+        self.collection.fail_deletes = True
+        self.train({"FIR_RECORDS": schema["FIR_RECORDS"]})
+        self.assertEqual(2, len(self.collection.documents))
+        self.collection.fail_deletes = False
+        self.assertEqual(
+            {"added": 0, "unchanged": 1, "removed": 1, "failed": 0}, self.train({"FIR_RECORDS": schema["FIR_RECORDS"]})
+        )
+        self.assertEqual([schema["FIR_RECORDS"]], list(self.collection.documents.values()))
+
+    def test_legacy_document_is_deleted(self):
+        """
+        The documentation of the whole schema trained as one item by earlier versions is deleted when the schema is
+        first trained per table, other documentation is kept.
+        """
+        legacy = table_document("FIR_RECORDS", "FIR_ID") + "\n" + table_document("ARRESTS", "ID") + "\n"
+        glossary = "FIR stands for First Information Report.\n  Column: names are upper case."
+        for document in (legacy, glossary):
+            self.collection.documents[content_id(document) + "-doc"] = document
+
+        self.collection.fail_deletes = True
+        schema = {"FIR_RECORDS": table_document("FIR_RECORDS", "FIR_ID")}
+        self.train(schema)
+        self.assertFalse(self.fingerprint.exists())
+        self.collection.fail_deletes = False
+        self.assertEqual({"added": 1, "unchanged": 0, "removed": 0, "failed": 0}, self.train(schema))
+        self.assertEqual(sorted([glossary, schema["FIR_RECORDS"]]), sorted(self.collection.documents.values()))
+        self.assertEqual([], self.embedded)
+
+        # Once the fingerprint exists, documentation in the legacy format is left alone
+        self.collection.documents[content_id(legacy) + "-doc"] = legacy
+        self.assertEqual({"added": 0, "unchanged": 1, "removed": 0, "failed": 0}, self.train(schema))
+        self.assertIn(legacy, self.collection.documents.values())
+
+    @skipUnless(PANDAS_INSTALLED, "pandas is not installed")
+    def test_schema_documents(self):
+        """
+        Each table gets its own documentation, with its columns in column_id order whatever the row order,
+        and the column names of the information schema in any case.
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel,import-error
+
+        df = pd.DataFrame(
+            {
+                "TABLE_NAME": ["FIR_RECORDS", "ARRESTS", "FIR_RECORDS", "FIR_RECORDS"],
+                "COLUMN_NAME": ["DISTRICT_ID", "ARREST_ID", "FIR_ID", "CRIME_TYPE"],
+                "DATA_TYPE": ["NUMBER", "NUMBER", "NUMBER", "VARCHAR2"],
+                "COLUMN_ID": [2, 1, 1, 3],
+            }
+        )
+        self.assertEqual(
+            {
+                "ARRESTS": "Table ARRESTS:\n  Column: ARREST_ID, Type: NUMBER\n",
+                "FIR_RECORDS": "Table FIR_RECORDS:\n  Column: FIR_ID, Type: NUMBER\n"
+                "  Column: DISTRICT_ID, Type: NUMBER\n  Column: CRIME_TYPE, Type: VARCHAR2\n",
+            },
+            schema_documents(df),
+        )
+        self.assertEqual({}, schema_documents(df.iloc[0:0]))
@@ -0,0 +1,74 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import os
+import tempfile
+from typing import List
+from unittest import TestCase
+
+from cctns_copilot.sql_generation_agent.sql_cache import SQLGenerationCache
+from cctns_copilot.sql_generation_agent.sql_cache import TrainingVersion
+from coded_tools.rag_index.chunking_benchmark import HashingEmbeddings
+
+GUNTUR_SQL = "SELECT CRIME_TYPE, COUNT(*) FROM FIR_RECORDS WHERE DISTRICT_NAME = 'Guntur' GROUP BY CRIME_TYPE"
+
+
+class TestSQLGenerationCache(TestCase):
+    """
+    Unit tests for SQLGenerationCache and TrainingVersion classes.
+    """
+
+    def test_exact_match(self):
+        """
+        Questions differing in case, spacing or final punctuation share their SQL, for the same training stamp only,
+        and least recently used questions are evicted first.
+        """
+        cache = SQLGenerationCache(max_entries=2)
+        cache.put("Show total crimes by type for District Guntur?", "v1", GUNTUR_SQL)
+        self.assertEqual(GUNTUR_SQL, cache.get("  show total crimes   by type for district GUNTUR", "v1"))
+        self.assertIsNone(cache.get("Show total crimes by type for District Guntur?", "v2"))
+        self.assertIsNone(cache.get("Show total crimes by type for District Krishna?", "v1"))
+
+        cache.put("q2", "v1", "SELECT 2 FROM DUAL")
+        cache.get("show total crimes by type for district guntur", "v1")
+        cache.put("q3", "v1", "SELECT 3 FROM DUAL")
+        self.assertIsNone(cache.get("q2", "v1"))
+        self.assertEqual({"entries": 2, "hits": 2, "similar_hits": 0, "misses": 3}, cache.stats())
+
+        cache.invalidate()
+        self.assertIsNone(cache.get("q3", "v1"))
+
+    def test_similar_match(self):
+        """
+        Rephrased questions reuse the SQL of a similar cached question, but never when a content word such as
+        the district differs.
+        """
+        embeddings = HashingEmbeddings()
+        cache = SQLGenerationCache(similarity_threshold=0.5, embed=embeddings.embed_query)
+        cache.put("Show total crimes by type for District Guntur", "v1", GUNTUR_SQL)
+        self.assertEqual(GUNTUR_SQL, cache.get("Please list the total crimes by type in district Guntur", "v1"))
+        self.assertIsNone(cache.get("Show total crimes by type for District Krishna", "v1"))
+        self.assertIsNone(cache.get("Please list the total crimes by type in district Guntur", "v2"))
+        self.assertEqual(1, cache.stats()["similar_hits"])
+
+    def test_training_version(self):
+        """
+        The stamp changes when training data is added, including by another process.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = os.path.join(directory, "chroma", "collection.training_version")
+            version = TrainingVersion(path)
+            other = TrainingVersion(path)
+            self.assertEqual("", version.current())
+            stamps: List[str] = [version.bump()]
+            self.assertEqual(stamps[0], other.current())
+            stamps.append(other.bump())
+            self.assertEqual(stamps[1], version.current())
+            self.assertNotEqual(stamps[0], stamps[1])
+            self.assertEqual([os.path.basename(path)], os.listdir(os.path.dirname(path)))
@@ -0,0 +1,369 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from unittest import TestCase
+from unittest.mock import patch
+
+from coded_tools.kwik_agents import topic_memory_store
+from coded_tools.kwik_agents.commit_to_memory import CommitToMemory
+from coded_tools.kwik_agents.list_topics import ListTopics
+from coded_tools.kwik_agents.recall_memory import RecallMemory
+from coded_tools.kwik_agents.topic_memory_store import TopicMemoryStore
+from coded_tools.kwik_agents.topic_memory_store import TruncatingSummarizer
+from coded_tools.rag_index.chunking_benchmark import HashingEmbeddings
+
+
+def commit_facts(path: str, writer: int, count: int) -> int:
+    """
+    Commits facts to a store of its own, as another server process would.
+
+    :param path: Path of the database file
+    :param writer: Number of the writer, part of its facts
+    :param count: Number of facts to commit
+    :return: Number of facts committed
+    """
+    store = TopicMemoryStore(path)
+    for i in range(count):
+        store.add_fact(f"topic {i % 3}", f"fact {i} of writer {writer}")
+    store.close()
+    return count
+
+
+class RacingSummarizer(TruncatingSummarizer):  # pylint: disable=too-few-public-methods
+    """
+    Summarizer during which another process compacts the same topic.
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+
+    def summarize(self, topic: str, summary: Optional[str], facts: List[Tuple[str, str]]) -> str:
+        other = TopicMemoryStore(self.path)
+        other.compact(topic, TruncatingSummarizer())
+        other.close()
+        return super().summarize(topic, summary, facts)
+
+
+class TestTopicMemoryStore(TestCase):
+    """
+    Unit tests for TopicMemoryStore class and the kwik agents tools using it.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = os.path.join(self.directory.name, "memory", "TopicMemory.sqlite")
+
+    def tearDown(self):
+        topic_memory_store.WRITE_BEHIND_FLUSHER.flush_all()
+        for store in list(topic_memory_store.LIVE_TOPIC_MEMORY_STORES.values()):
+            store.close()
+        topic_memory_store.TOPIC_MEMORY_STORES.clear()
+        topic_memory_store.LIVE_TOPIC_MEMORY_STORES.clear()
+        self.directory.cleanup()
+
+    def test_add_and_recall(self):
+        """
+        Facts are recalled by topic in the order they were committed, and persist across reopening the store.
+        """
+        store = TopicMemoryStore(self.path)
+        store.add_fact("pets", "Bill has a dog named Max", stamp="2025-01-01 10:00:00")
+        memory: str = store.add_fact("pets", "Max is a beagle", stamp="2025-01-02 10:00:00")
+        store.add_fact("food", "Bill likes pizza", stamp="2025-01-03 10:00:00")
+        self.assertEqual(
+            "[2025-01-01 10:00:00] Bill has a dog named Max\n[2025-01-02 10:00:00] Max is a beagle", memory
+        )
+        store.close()
+
+        reopened = TopicMemoryStore(self.path)
+        self.assertEqual(["food", "pets"], reopened.topics())
+        self.assertEqual(memory, reopened.recall("pets"))
+        self.assertIsNone(reopened.recall("cars"))
+        reopened.close()
+
+    def test_legacy_json_import(self):
+        """
+        The JSON memory file of earlier versions is imported when the database is created, multi-line facts included.
+        """
+        legacy_path: str = os.path.join(self.directory.name, "TopicMemory.json")
+        legacy: Dict[str, str] = {
+            "pets": "[2025-01-01 10:00:00] Bill has a dog named Max\n[2025-01-02 10:00:00] Max likes:\n- balls",
+            "food": "[2025-01-03 10:00:00] Bill likes pizza",
+        }
+        with open(legacy_path, "w", encoding="utf-8") as legacy_file:
+            json.dump(legacy, legacy_file)
+
+        store = TopicMemoryStore(self.path, legacy_path)
+        self.assertEqual(["food", "pets"], store.topics())
+        self.assertEqual(legacy["pets"], store.recall("pets"))
+        store.add_fact("food", "Bill dislikes olives")
+        store.close()
+
+        # The import happens once, not every time the store is opened
+        reopened = TopicMemoryStore(self.path, legacy_path)
+        self.assertEqual(2, len(reopened.recall("food").split("\n")))
+        reopened.close()
+
+    def test_semantic_recall(self):
+        """
+        Facts are embedded once each, in the order they were committed, including imported facts and those committed
+        while embedding failed, and a query recalls the most relevant facts across all topics.
+        """
+        embeddings = HashingEmbeddings()
+        store = TopicMemoryStore(self.path)
+        store.add_fact("pets", "Bill has a dog named Max", stamp="2025-01-01 10:00:00")
+        store.add_fact("food", "Bill likes pizza with olives", stamp="2025-01-02 10:00:00")
+        self.assertEqual(2, store.embed_pending(embeddings))
+        self.assertEqual(0, store.embed_pending(embeddings))
+        self.assertEqual(
+            [("2025-01-01 10:00:00", "pets", "Bill has a dog named Max")], store.search(embeddings, "Max the dog", 1)
+        )
+
+        # Facts committed since the last search are embedded and searched without reloading the others
+        store.add_fact("cars", "Bill drives a red truck", stamp="2025-01-03 10:00:00")
+        store.add_fact("pets", "Max chases the red truck", stamp="2025-01-04 10:00:00")
+        found = store.search(embeddings, "red truck", 2)
+        self.assertEqual({"cars", "pets"}, {topic for _, topic, _ in found})
+        self.assertEqual(4, len(store.search(embeddings, "Bill", 10)))
+        self.assertEqual([], store.search(embeddings, "Bill", 0))
+        store.close()
+
+    def test_tools(self):
+        """
+        The tools commit, list and recall through the long term store, or through sly data only
+        when LONG_TERM_MEMORY_FILE is off, including through async_invoke. Topics committed to are published
+        in the sly data either way.
+        """
+        sly_data: Dict[str, Any] = {}
+        with patch.object(topic_memory_store, "MEMORY_STORE_FILE", self.path), patch.object(
+            topic_memory_store, "LEGACY_MEMORY_FILE", ""
+        ), patch.object(topic_memory_store, "OpenAIEmbeddings", HashingEmbeddings):
+            self.assertEqual("NO TOPICS YET!", ListTopics().invoke({}, sly_data))
+            CommitToMemory().invoke({"topic": "pets", "new_fact": "Bill has a dog named Max"}, sly_data)
+            self.assertEqual("['pets']", ListTopics().invoke({}, sly_data))
+            self.assertIn("Bill has a dog named Max", RecallMemory().invoke({"topic": "pets"}, {}))
+            self.assertEqual("NO RELATED MEMORIES!", RecallMemory().invoke({"topic": "cars"}, {}))
+            commit = CommitToMemory().async_invoke(
+                {"topic": "food", "new_fact": "Bill likes pizza with olives"}, sly_data
+            )
+            asyncio.run(commit)
+            recalled: str = asyncio.run(RecallMemory().async_invoke({"query": "pizza and olives", "k": 1}, {}))
+            self.assertRegex(recalled, r"^\[[0-9: -]+\] \(food\) Bill likes pizza with olives$")
+        self.assertEqual(["food", "pets"], sorted(sly_data["TopicMemory"]))
+        self.assertTrue(sly_data["TopicMemory"]["food"].endswith("] Bill likes pizza with olives"))
+        store = TopicMemoryStore(self.path)
+        self.assertEqual(["food", "pets"], store.topics())
+        store.close()
+
+        sly_data = {}
+        with patch.object(topic_memory_store, "LONG_TERM_MEMORY_FILE", False):
+            CommitToMemory().invoke({"topic": "food", "new_fact": "Bill likes pizza"}, sly_data)
+            self.assertEqual("['food']", ListTopics().invoke({}, sly_data))
+            self.assertIn("Bill likes pizza", RecallMemory().invoke({"topic": "food"}, sly_data))
+            self.assertEqual("NO TOPICS YET!", RecallMemory().invoke({"topic": "food"}, {}))
+            self.assertTrue(RecallMemory().invoke({"query": "pizza"}, sly_data).startswith("Error:"))
+
+    def test_sharded_memory(self):
+        """
+        Sessions naming a user get the memory shard of that user, and the others share the default memory.
+        """
+        with patch.object(topic_memory_store, "MEMORY_STORE_FILE", self.path), patch.object(
+            topic_memory_store, "MEMORY_SHARDS_DIR", os.path.join(self.directory.name, "shards")
+        ), patch.object(topic_memory_store, "LEGACY_MEMORY_FILE", ""), patch.object(
+            topic_memory_store, "SEMANTIC_MEMORY", False
+        ):
+            CommitToMemory().invoke({"topic": "pets", "new_fact": "Bill has a dog"}, {"user_id": "bill"})
+            CommitToMemory().invoke({"topic": "pets", "new_fact": "Ann has a cat"}, {"user_id": "../ann"})
+            CommitToMemory().invoke({"topic": "food", "new_fact": "Someone likes pizza"}, {})
+
+            self.assertIn("Bill has a dog", RecallMemory().invoke({"topic": "pets"}, {"user_id": "bill"}))
+            self.assertNotIn("Ann", RecallMemory().invoke({"topic": "pets"}, {"user_id": "bill"}))
+            self.assertEqual("['pets']", ListTopics().invoke({}, {"user_id": "../ann"}))
+            self.assertEqual("['food']", ListTopics().invoke({}, {}))
+            self.assertEqual("NO TOPICS YET!", ListTopics().invoke({}, {"session_id": "new session"}))
+
+            shard_path: str = topic_memory_store.memory_shard_path({"user_id": "../ann"})
+            self.assertTrue(os.path.exists(shard_path))
+            self.assertEqual(os.path.join(self.directory.name, "shards", "user_id"), os.path.dirname(shard_path))
+            self.assertNotEqual(shard_path, topic_memory_store.memory_shard_path({"user_id": "_ann"}))
+
+    def test_concurrent_commits(self):
+        """
+        No commit is lost when sessions of several users commit and recall concurrently, nor when
+        processes commit to the same database concurrently.
+        """
+        users: int = 4
+        facts_per_user: int = 50
+
+        def commit(i: int) -> str:
+            sly_data: Dict[str, Any] = {"user_id": f"user {i % users}"}
+            CommitToMemory().invoke({"topic": f"topic {i % 5}", "new_fact": f"fact {i}"}, sly_data)
+            return RecallMemory().invoke({"topic": f"topic {i % 5}"}, sly_data)
+
+        shards_dir: str = os.path.join(self.directory.name, "shards")
+        with patch.object(topic_memory_store, "MEMORY_SHARDS_DIR", shards_dir), patch.object(
+            topic_memory_store, "SEMANTIC_MEMORY", False
+        ), patch.object(topic_memory_store, "MAX_OPEN_MEMORY_STORES", 2):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                recalled: List[str] = list(executor.map(commit, range(users * facts_per_user)))
+            topic_memory_store.WRITE_BEHIND_FLUSHER.flush_all()
+            paths: List[str] = [topic_memory_store.memory_shard_path({"user_id": f"user {u}"}) for u in range(users)]
+        for i, memory in enumerate(recalled):
+            self.assertTrue(any(line.endswith(f"] fact {i}") for line in memory.split("\n")), i)
+        for path in paths:
+            store = TopicMemoryStore(path)
+            self.assertEqual(facts_per_user, sum(len(store.recall(topic).split("\n")) for topic in store.topics()))
+            store.close()
+
+        writers: int = 3
+        with ProcessPoolExecutor(max_workers=writers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            committed: List[int] = list(
+                executor.map(commit_facts, [self.path] * writers, range(writers), [40] * writers)
+            )
+        store = TopicMemoryStore(self.path)
+        memory: str = "\n".join(store.recall(topic) for topic in store.topics())
+        self.assertEqual(sum(committed), len(memory.split("\n")))
+        for writer in range(writers):
+            self.assertIn(f"fact 39 of writer {writer}", memory)
+        store.close()
+
+    def test_compaction(self):
+        """
+        Facts older than the recent window are folded into the summary of their topic once they exceed the
+        compaction batch, recall stays bounded, the size statistics account for the folded facts, and
+        semantic recall only returns the facts kept.
+        """
+        embeddings = HashingEmbeddings()
+        with patch.object(topic_memory_store, "RECENT_FACTS_WINDOW", 3), patch.object(
+            topic_memory_store, "COMPACTION_BATCH", 2
+        ), patch.object(topic_memory_store, "MAX_SUMMARY_CHARS", 120):
+            store = TopicMemoryStore(self.path)
+            for i in range(5):
+                store.add_fact("pets", f"Max ate bone {i}", stamp=f"2025-01-0{i + 1} 10:00:00")
+            store.add_fact("food", "Bill likes pizza", stamp="2025-01-01 11:00:00")
+            store.embed_pending(embeddings)
+            self.assertFalse(store.needs_compaction("pets"))
+            store.add_fact("pets", "Max ate bone 5", stamp="2025-01-06 10:00:00")
+            self.assertTrue(store.needs_compaction("pets"))
+
+            self.assertEqual(3, store.compact("pets", TruncatingSummarizer()))
+            self.assertEqual(
+                "[2025-01-03 10:00:00] Summary of 3 earlier facts: [2025-01-01 10:00:00] Max ate bone 0 | "
+                "[2025-01-02 10:00:00] Max ate bone 1 | [2025-01-03 10:00:00] Max ate bone 2\n"
+                "[2025-01-04 10:00:00] Max ate bone 3\n[2025-01-05 10:00:00] Max ate bone 4\n"
+                "[2025-01-06 10:00:00] Max ate bone 5",
+                store.recall("pets"),
+            )
+            found = store.search(embeddings, "Max ate bone", 10)
+            self.assertEqual(4, len(found))
+            self.assertNotIn("Max ate bone 0", [fact for _, _, fact in found])
+
+            for i in range(6, 100):
+                store.add_fact("pets", f"Max ate bone {i}")
+            self.assertEqual({"pets": 94}, store.compact_all(TruncatingSummarizer()))
+            memory: str = store.recall("pets")
+            lines: List[str] = memory.split("\n")
+            self.assertEqual(4, len(lines))
+            self.assertIn("Summary of 97 earlier facts: ", lines[0])
+            self.assertTrue(lines[0].endswith("] Max ate bone 96"), lines[0])
+            self.assertTrue(lines[-1].endswith("] Max ate bone 99"), lines[-1])
+            self.assertLess(len(memory), 300)
+
+            stats = store.stats()
+            self.assertEqual(2, stats["topics"])
+            self.assertEqual(4, stats["facts"])
+            self.assertEqual(3, stats["max_topic_facts"])
+            self.assertEqual(97, stats["folded_facts"])
+            self.assertLessEqual(stats["summary_bytes"], 120)
+            self.assertGreater(stats["folded_bytes"], stats["summary_bytes"])
+            self.assertGreater(stats["database_bytes"], 0)
+
+            # The summary written by the other process is kept
+            for i in range(6):
+                store.add_fact("food", f"Bill likes dish {i}")
+            self.assertEqual(0, store.compact("food", RacingSummarizer(self.path)))
+            self.assertIn("Summary of 4 earlier facts", store.recall("food"))
+            store.close()
+
+            # Committing compacts the topic once it is over the window by the batch
+            with patch.object(topic_memory_store, "MEMORY_STORE_FILE", self.path), patch.object(
+                topic_memory_store, "LEGACY_MEMORY_FILE", ""
+            ), patch.object(topic_memory_store, "SEMANTIC_MEMORY", False), patch.object(
+                topic_memory_store, "MEMORY_SUMMARIZER", "truncate"
+            ), patch.object(
+                topic_memory_store, "WRITE_BEHIND_MEMORY", False
+            ):
+                for i in range(3):
+                    CommitToMemory().invoke({"topic": "food", "new_fact": f"Bill likes soup {i}"}, {})
+                memory = RecallMemory().invoke({"topic": "food"}, {})
+            self.assertIn("Summary of 7 earlier facts", memory)
+            self.assertEqual(4, len(memory.split("\n")))
+
+    def test_write_behind(self):
+        """
+        With write-behind, committed facts are visible to the process at once, and written to the database
+        once enough of them are buffered, once the oldest has waited long enough, or when the store is closed.
+        """
+
+        def wait_for_facts(facts: int):
+            deadline: float = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                memory: str = "\n".join(reader.recall(topic) for topic in reader.topics())
+                if len(memory.split("\n")) == facts:
+                    return
+                time.sleep(0.01)
+            self.fail(f"{facts} facts were not written")
+
+        with patch.object(topic_memory_store, "MEMORY_FLUSH_SIZE", 3), patch.object(
+            topic_memory_store, "MEMORY_FLUSH_INTERVAL", 60
+        ), patch.object(topic_memory_store, "SEMANTIC_MEMORY", False):
+            store = TopicMemoryStore(self.path, write_behind=True)
+            reader = TopicMemoryStore(self.path)
+            store.add_fact("pets", "Bill has a dog named Max", stamp="2025-01-01 10:00:00")
+            memory: str = store.add_fact("pets", "Max is a beagle", stamp="2025-01-02 10:00:00")
+            self.assertEqual(
+                "[2025-01-01 10:00:00] Bill has a dog named Max\n[2025-01-02 10:00:00] Max is a beagle", memory
+            )
+            self.assertEqual(memory, store.recall("pets"))
+            self.assertEqual(["pets"], store.topics())
+            self.assertFalse(store.is_empty())
+            self.assertTrue(reader.is_empty())
+
+            # Enough facts are buffered
+            store.add_fact("food", "Bill likes pizza")
+            wait_for_facts(3)
+            self.assertEqual(memory, reader.recall("pets"))
+
+            # The oldest buffered fact has waited long enough
+            with patch.object(topic_memory_store, "MEMORY_FLUSH_INTERVAL", 0.05):
+                store.add_fact("food", "Bill likes soup")
+                wait_for_facts(4)
+
+            # The store is closed, or the process exits
+            store.add_fact("food", "Bill likes olives")
+            store.close()
+            other = TopicMemoryStore(os.path.join(self.directory.name, "other.sqlite"), write_behind=True)
+            other.add_fact("cars", "Bill drives a truck")
+            topic_memory_store.WRITE_BEHIND_FLUSHER.flush_all()
+            self.assertEqual([], other.buffer)
+            other.close()
+            wait_for_facts(5)
+            reader.close()
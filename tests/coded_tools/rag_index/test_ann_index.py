@@ -0,0 +1,91 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from coded_tools.rag_index.ann_benchmark import synthetic_corpus
+from coded_tools.rag_index.ann_index import IVFIndex
+from coded_tools.rag_index.ann_index import ann_index_class
+from coded_tools.rag_index.ann_index import top_k
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+
+
+class TestIVFIndex(TestCase):
+    """
+    Unit tests for IVFIndex class and its use by NumpyVectorStore.
+    """
+
+    def setUp(self):
+        self.matrix = synthetic_corpus(4000, 32, 40, seed=0)
+
+    def test_recall_against_exact_search(self):
+        """
+        Probing more lists finds more of the exact nearest neighbours, and probing all lists finds all of them.
+        """
+        index = IVFIndex.build(self.matrix, n_lists=64)
+        self.assertEqual(4000, index.count)
+        self.assertEqual(list(range(4000)), sorted(index.rows.tolist()))
+
+        queries = self.matrix[:50]
+        recalls = []
+        for n_probe in (4, 64):
+            found = 0
+            for query in queries:
+                rows, scores = index.search(self.matrix, query, 10, n_probe)
+                self.assertTrue(np.all(np.diff(scores) <= 0))
+                found += len(np.intersect1d(top_k(self.matrix @ query, 10), rows))
+            recalls.append(found / (10 * len(queries)))
+        self.assertGreater(recalls[0], 0.8)
+        self.assertEqual(1.0, recalls[1])
+
+    def test_unknown_kind(self):
+        """
+        Only known index kinds are accepted.
+        """
+        self.assertIsNone(ann_index_class("exact"))
+        self.assertIs(IVFIndex, ann_index_class("ivf"))
+        with self.assertRaises(ValueError):
+            ann_index_class("hnsw2")
+
+    @patch("coded_tools.rag_index.numpy_vector_store.ANN_MIN_CHUNKS", 1000)
+    def test_vector_store_index(self):
+        """
+        The store builds the index on request, searches appended rows, persists the index and drops it on delete.
+        """
+        store = NumpyVectorStore(embedding=DeterministicFakeEmbedding(size=32))
+        texts = [f"chunk {row}" for row in range(len(self.matrix))]
+        ids = store.add_vectors(self.matrix[:3900], texts[:3900])
+        self.assertIsNone(store.get_ann_index("exact"))
+        index = store.get_ann_index("ivf")
+        self.assertEqual(3900, index.count)
+
+        # Appended rows are scored exactly until the index is rebuilt
+        store.add_vectors(self.matrix[3900:], texts[3900:])
+        self.assertIs(index, store.get_ann_index("ivf"))
+        documents = store.similarity_search_by_vector(self.matrix[3950], k=1, ann_index="ivf", n_probe=1)
+        self.assertEqual("chunk 3950", documents[0].page_content)
+
+        with tempfile.TemporaryDirectory() as store_dir:
+            path = os.path.join(store_dir, "store")
+            store.dump(path)
+            loaded = NumpyVectorStore.load(path, store.embedding)
+            self.assertIsInstance(loaded.ann_index.rows, np.memmap)
+            self.assertEqual(3900, loaded.ann_index.count)
+            documents = loaded.similarity_search_by_vector(self.matrix[7], k=1, ann_index="ivf")
+            self.assertEqual("chunk 7", documents[0].page_content)
+
+        store.delete(ids[:10])
+        self.assertIsNone(store.ann_index)
+        self.assertEqual(3990, store.get_ann_index("ivf").count)
@@ -0,0 +1,118 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import asyncio
+import os
+import tempfile
+from types import SimpleNamespace
+from typing import List
+from unittest import TestCase
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from coded_tools.rag_index.batch_embedder import BatchEmbedder
+from coded_tools.rag_index.batch_embedder import TokenRateLimiter
+
+
+class RateLimitError(Exception):
+    """
+    Stand-in for the throttling error of an embedding client, asking to retry right away.
+    """
+
+    def __init__(self):
+        super().__init__("429 Too Many Requests")
+        self.response = SimpleNamespace(headers={"retry-after": "0"})
+
+
+class FakeEmbedder(DeterministicFakeEmbedding):
+    """
+    Local embedder recording its batches, throttling the first requests and failing on a given text.
+    """
+
+    model: str = "fake"
+    batches: List[List[str]] = []
+    throttled: int = 0
+    fail_on: str = ""
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if self.throttled > 0:
+                self.throttled -= 1
+                raise RateLimitError()
+            if self.fail_on in texts:
+                raise ValueError(f"cannot embed {self.fail_on}")
+            self.batches.append(list(texts))
+            return self.embed_documents(texts)
+        finally:
+            self.in_flight -= 1
+
+
+TEXTS = [f"chunk {index}" for index in range(10)]
+
+
+class TestBatchEmbedder(TestCase):
+    """
+    Unit tests for BatchEmbedder class.
+    """
+
+    def test_batches_run_concurrently_in_order(self):
+        """
+        Texts are embedded in batches of batch_size, at most max_concurrency at a time,
+        and the vectors come back in the order of the texts.
+        """
+        fake = FakeEmbedder(size=8, batches=[])
+        embedder = BatchEmbedder(fake, batch_size=3, max_concurrency=2, checkpoint_dir=None)
+        vectors = asyncio.run(embedder.aembed_documents(TEXTS))
+
+        self.assertEqual([3, 3, 3, 1], sorted((len(batch) for batch in fake.batches), reverse=True))
+        self.assertEqual(2, fake.peak_in_flight)
+        np.testing.assert_allclose(fake.embed_documents(TEXTS), vectors, rtol=1e-6)
+
+    def test_throttled_batches_are_retried(self):
+        """
+        Batches failing with a rate limit error are retried until they succeed.
+        """
+        fake = FakeEmbedder(size=8, batches=[], throttled=3)
+        embedder = BatchEmbedder(fake, batch_size=4, max_concurrency=3, checkpoint_dir=None)
+        vectors = asyncio.run(embedder.aembed_documents(TEXTS))
+        np.testing.assert_allclose(fake.embed_documents(TEXTS), vectors, rtol=1e-6)
+        self.assertEqual(3, len(fake.batches))
+
+    def test_checkpoint_resumes_after_failure(self):
+        """
+        Batches completed before a failure are not embedded again on the next run,
+        and the checkpoint is deleted once all batches are done.
+        """
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            fake = FakeEmbedder(size=8, batches=[], fail_on="chunk 7")
+            embedder = BatchEmbedder(fake, batch_size=3, max_concurrency=1, checkpoint_dir=checkpoint_dir)
+            with self.assertRaises(ValueError):
+                asyncio.run(embedder.aembed_documents(TEXTS))
+            self.assertEqual([TEXTS[0:3], TEXTS[3:6]], fake.batches)
+
+            fake.fail_on = ""
+            fake.batches = []
+            vectors = asyncio.run(embedder.aembed_documents(TEXTS))
+            self.assertEqual([TEXTS[6:9], TEXTS[9:10]], fake.batches)
+            np.testing.assert_allclose(fake.embed_documents(TEXTS), vectors, rtol=1e-6)
+            self.assertEqual([], os.listdir(checkpoint_dir))
+
+    def test_token_rate_limiter(self):
+        """
+        Requests within the budget go right away and the debt beyond it is paid by waiting.
+        """
+        limiter = TokenRateLimiter(tokens_per_minute=600)
+        self.assertEqual(0.0, limiter.reserve(600))
+        self.assertAlmostEqual(3.0, limiter.reserve(30), delta=0.1)
@@ -0,0 +1,93 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from coded_tools.rag_index.chunking import chunking_settings
+from coded_tools.rag_index.chunking import make_text_splitter
+from coded_tools.rag_index.chunking_benchmark import benchmark
+
+
+class TestChunking(TestCase):
+    """
+    Unit tests for the chunking profiles and their benchmark.
+    """
+
+    def test_chunking_settings(self):
+        """
+        Profiles resolve to their settings, dictionaries override them, and invalid settings are rejected.
+        """
+        # The default profile keeps the settings of indexes built before profiles existed
+        self.assertEqual(
+            {"splitter": "tiktoken", "chunk_size": 100, "chunk_overlap": 50}, chunking_settings("default")
+        )
+        self.assertTrue(chunking_settings("structured")["structure"])
+        self.assertEqual(
+            {"splitter": "characters", "chunk_size": 500, "chunk_overlap": 30},
+            chunking_settings({"profile": "compact", "splitter": "characters", "chunk_size": 500}),
+        )
+        self.assertNotIn("structure", chunking_settings({"profile": "structured", "structure": False}))
+        for profile in ("unknown", {"chunk_length": 10}, {"chunk_overlap": 100}, {"splitter": "words"}):
+            with self.assertRaises(ValueError):
+                chunking_settings(profile)
+
+    def test_structured_splitter(self):
+        """
+        Structure-aware profiles split at headings and page breaks before paragraphs and sentences.
+        """
+        splitter = make_text_splitter(
+            chunking_settings({"profile": "structured", "splitter": "characters", "chunk_size": 120})
+        )
+        text = (
+            "# Scope\nThe vendor delivers the goods. More scope text follows here.\n\n"
+            "## Pricing\nPrices are fixed. Payment is due in 30 days.\n"
+            "3.2 Penalties\nLate delivery is charged.\fThe second page starts here."
+        )
+        chunks = splitter.split_text(text)
+        self.assertEqual(
+            [
+                "# Scope\nThe vendor delivers the goods. More scope text follows here.",
+                "## Pricing\nPrices are fixed. Payment is due in 30 days.\n3.2 Penalties\nLate delivery is charged.",
+                "The second page starts here.",
+            ],
+            chunks,
+        )
+
+    def test_benchmark(self):
+        """
+        The benchmark reports the size, cost and hit rate of every profile on a corpus and question set.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            sections = [
+                f"## Section {index}\n" + f"Travel rule {index} covers hotels and meals for trip {index}. " * 20
+                for index in range(10)
+            ]
+            with open(os.path.join(directory, "policy.md"), "w", encoding="utf-8") as corpus_file:
+                corpus_file.write("\n\n".join(sections))
+            questions_path = os.path.join(directory, "questions.jsonl")
+            with open(questions_path, "w", encoding="utf-8") as questions_file:
+                for index in range(10):
+                    question = {"question": f"travel rule {index} trip {index}", "answer": f"travel rule {index}"}
+                    questions_file.write(json.dumps(question) + "\n")
+
+            results = benchmark(directory, questions_path, ["default", "compact"], splitter="estimate")
+
+        self.assertEqual(["default", "compact"], [result["profile"] for result in results])
+        default, compact = results
+        self.assertEqual("estimate", default["settings"]["splitter"])
+        self.assertGreater(default["chunks"], compact["chunks"])
+        self.assertGreater(default["embedded_tokens"], compact["embedded_tokens"])
+        self.assertGreater(default["index_bytes"], compact["index_bytes"])
+        self.assertEqual(default["chunks"], default["embedded_texts"])
+        self.assertGreaterEqual(default["embedding_requests"], 1)
+        self.assertEqual(1.0, compact["hit_rate"])
+        self.assertGreater(compact["mean_context_tokens"], 0)
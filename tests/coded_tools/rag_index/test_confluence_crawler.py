@@ -0,0 +1,170 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+from typing import Dict
+from typing import List
+from unittest import TestCase
+
+from langchain_core.documents import Document
+
+from coded_tools.rag_index.confluence_crawler import ConfluenceCrawler
+
+# Seconds the stub server takes to answer a page request
+PAGE_LATENCY_SECONDS: float = 0.1
+
+
+class StubConfluenceHandler(BaseHTTPRequestHandler):
+    """
+    Serves confluence pages by id, throttling the requests the stub server is told to.
+    """
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Answer a page request, or with 429 and a Retry-After header.
+        """
+        stub = self.server
+        page_id: str = self.path.split("/content/")[1].split("?")[0]
+        with stub.lock:
+            stub.requests.append((page_id, time.monotonic()))
+            stub.in_flight += 1
+            stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+            throttled: bool = page_id in stub.throttled
+            stub.throttled.discard(page_id)
+        time.sleep(PAGE_LATENCY_SECONDS)
+        with stub.lock:
+            stub.in_flight -= 1
+        if throttled:
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.end_headers()
+            return
+        body: bytes = json.dumps(
+            {
+                "id": page_id,
+                "title": f"Page {page_id}",
+                "status": "current",
+                "version": {"number": 1, "when": "2025-01-01T00:00:00.000Z"},
+                "body": {"storage": {"value": f"<p>Content of page {page_id}</p>"}},
+                "_links": {"webui": f"/pages/{page_id}"},
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """
+        Keep the test output quiet.
+        """
+
+
+class TestConfluenceCrawler(TestCase):
+    """
+    Unit tests for ConfluenceCrawler, against a local stub confluence server.
+    """
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubConfluenceHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.throttled = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.loader_args: Dict[str, Any] = {
+            "url": f"http://127.0.0.1:{self.server.server_address[1]}",
+            "username": "user",
+            "api_key": "key",
+            "cloud": False,
+            "include_restricted_content": True,
+        }
+        self.versions: Dict[str, str] = {str(page_id): "1@2025" for page_id in range(1, 17)}
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def crawl(self, crawler: ConfluenceCrawler, stop_after: int = 0) -> List[Document]:
+        """
+        :param crawler: Crawler to run over self.versions
+        :param stop_after: Number of documents after which to stop consuming the crawl, 0 to consume it all
+        :return: Documents yielded by the crawl
+        """
+
+        async def consume() -> List[Document]:
+            documents: List[Document] = []
+            crawl = crawler.acrawl(self.versions)
+            async for document in crawl:
+                documents.append(document)
+                if len(documents) == stop_after:
+                    break
+            await crawl.aclose()
+            return documents
+
+        return asyncio.run(consume())
+
+    def test_concurrent_crawl(self):
+        """
+        Pages are fetched concurrently within the in-flight limit, several times faster than one by one.
+        """
+        start: float = time.monotonic()
+        documents: List[Document] = self.crawl(ConfluenceCrawler(self.loader_args, 8, checkpoint_dir=None))
+        elapsed: float = time.monotonic() - start
+
+        self.assertEqual(sorted(document.metadata["id"] for document in documents), sorted(self.versions))
+        self.assertIn("Content of page 3", next(doc for doc in documents if doc.metadata["id"] == "3").page_content)
+        self.assertLessEqual(self.server.max_in_flight, 8)
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLess(elapsed, len(self.versions) * PAGE_LATENCY_SECONDS / 3)
+
+    def test_retry_after(self):
+        """
+        A throttled request is retried after the Retry-After delay, during which the other requests wait.
+        """
+        self.server.throttled = {"1"}
+        documents: List[Document] = self.crawl(ConfluenceCrawler(self.loader_args, 2, checkpoint_dir=None))
+
+        self.assertEqual(len(documents), len(self.versions))
+        first_attempt, retry = [at for page_id, at in self.server.requests if page_id == "1"]
+        self.assertGreaterEqual(retry - first_attempt, 1.0)
+        throttled_at: float = first_attempt + PAGE_LATENCY_SECONDS
+        self.assertFalse(
+            [at for _, at in self.server.requests if throttled_at + 0.05 < at < throttled_at + 0.95],
+            "no request should be sent while the crawl is paused",
+        )
+
+    def test_resume_from_checkpoint(self):
+        """
+        An interrupted crawl resumes from its checkpoint, fetching only the pages it had not completed,
+        and removes the checkpoint once it completes.
+        """
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            crawler = ConfluenceCrawler(self.loader_args, 2, checkpoint_dir)
+            interrupted: List[Document] = self.crawl(crawler, stop_after=5)
+            self.assertEqual(len(interrupted), 5)
+            self.assertEqual(len(os.listdir(checkpoint_dir)), 1)
+
+            self.server.requests.clear()
+            documents: List[Document] = self.crawl(ConfluenceCrawler(self.loader_args, 2, checkpoint_dir))
+
+            self.assertEqual(sorted(document.metadata["id"] for document in documents), sorted(self.versions))
+            fetched: List[str] = [page_id for page_id, _ in self.server.requests]
+            self.assertFalse(set(fetched) & {document.metadata["id"] for document in interrupted})
+            self.assertEqual(os.listdir(checkpoint_dir), [])
@@ -0,0 +1,89 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+from unittest import TestCase
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from coded_tools.rag_index.batch_embedder import estimate_tokens
+from coded_tools.rag_index.context_packing import merge_overlapping
+from coded_tools.rag_index.context_packing import pack_context
+
+
+class TestContextPacking(TestCase):
+    """
+    Unit tests for the context packing functions.
+    """
+
+    def setUp(self):
+        text = " ".join(
+            f"Sentence {index} explains baggage rule number {index} in some detail." for index in range(60)
+        )
+        splitter = RecursiveCharacterTextSplitter(chunk_size=400, chunk_overlap=200)
+        self.text = text
+        self.chunks = splitter.split_documents([Document(page_content=text, metadata={"source": "a.pdf", "page": 0})])
+
+    def test_merge_overlapping(self):
+        """
+        Chunks sharing an end and a start become one text, and unrelated chunks are not merged.
+        """
+        first, second = self.chunks[0].page_content, self.chunks[1].page_content
+        merged = merge_overlapping(first, second)
+        self.assertIn(merged, self.text)
+        self.assertTrue(merged.startswith(first) and merged.endswith(second))
+        self.assertEqual(first, merge_overlapping(first, first[10:50]))
+        self.assertIsNone(merge_overlapping(first, self.chunks[5].page_content))
+
+    def test_overlapping_chunks_become_spans(self):
+        """
+        Overlapping chunks of a page are merged in rank order, even when a later chunk bridges two spans,
+        while chunks of other pages stay apart.
+        """
+        other_page = Document(page_content=self.chunks[12].page_content, metadata={"source": "a.pdf", "page": 1})
+        results = [self.chunks[1], self.chunks[3], self.chunks[9], other_page, self.chunks[2]]
+        spans = pack_context(results)
+        self.assertEqual(3, len(spans))
+        self.assertEqual(3, spans[0].metadata["merged_chunks"])
+        self.assertIn(spans[0].page_content, self.text)
+        self.assertTrue(spans[0].page_content.startswith(self.chunks[1].page_content))
+        self.assertTrue(spans[0].page_content.endswith(self.chunks[3].page_content))
+        self.assertEqual(self.chunks[9].page_content, spans[1].page_content)
+        self.assertEqual(1, spans[2].metadata["page"])
+
+    def test_near_duplicates_dropped(self):
+        """
+        A span that is nearly the same as a better ranked one is dropped.
+        """
+        text = self.chunks[0].page_content
+        results = [
+            Document(page_content=text, metadata={"source": "a.pdf"}),
+            Document(page_content=text.replace("Sentence 1 ", "Sentence  1 "), metadata={"source": "b.pdf"}),
+            Document(page_content="Something else entirely.", metadata={"source": "c.pdf"}),
+        ]
+        self.assertEqual(["a.pdf", "c.pdf"], [span.metadata["source"] for span in pack_context(results)])
+
+    def test_token_budget(self):
+        """
+        Spans are packed best first within the budget, skipping those that do not fit, and the best span is cut
+        if nothing fits.
+        """
+        results = [
+            Document(page_content="a" * 400, metadata={"source": "a"}),
+            Document(page_content="b" * 800, metadata={"source": "b"}),
+            Document(page_content="c" * 200, metadata={"source": "c"}),
+        ]
+        packed = pack_context(results, token_budget=170)
+        self.assertEqual(["a", "c"], [span.metadata["source"] for span in packed])
+        self.assertLessEqual(sum(estimate_tokens(span.page_content) for span in packed) + 1, 170)
+
+        packed = pack_context(results, token_budget=50)
+        self.assertEqual(1, len(packed))
+        self.assertTrue(packed[0].metadata["truncated"])
+        self.assertLessEqual(estimate_tokens(packed[0].page_content), 50)
@@ -0,0 +1,136 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from unittest import TestCase
+
+import requests
+
+from coded_tools.rag_index.fetch_cache import FetchCache
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serves the body of the stub server, honouring the validators it is configured with.
+    """
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Answer with 304 when the request validators match, else with the body.
+        """
+        stub = self.server
+        stub.requests.append(dict(self.headers))
+        if stub.status != 200:
+            self.send_response(stub.status)
+            self.end_headers()
+            return
+        if (stub.etag and self.headers.get("If-None-Match") == stub.etag) or (
+            stub.last_modified and self.headers.get("If-Modified-Since") == stub.last_modified
+        ):
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        if stub.etag:
+            self.send_header("ETag", stub.etag)
+        if stub.last_modified:
+            self.send_header("Last-Modified", stub.last_modified)
+        self.send_header("Content-Length", str(len(stub.body)))
+        self.end_headers()
+        self.wfile.write(stub.body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """
+        Keep the test output quiet.
+        """
+
+
+class TestFetchCache(TestCase):
+    """
+    Unit tests for FetchCache, against a local stub HTTP server.
+    """
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.requests = []
+        self.server.status = 200
+        self.server.body = b"%PDF-1.4 version one"
+        self.server.etag = '"v1"'
+        self.server.last_modified = None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/doc.pdf"
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.cache = FetchCache(self.temp_dir.name, timeout=5)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def test_etag_revalidation(self):
+        """
+        A cached body is revalidated with its ETag and downloaded again only once it changed.
+        """
+        first = self.cache.fetch(self.url)
+        second = self.cache.fetch(self.url)
+        self.assertEqual(first, {"content": b"%PDF-1.4 version one", "status": "downloaded"})
+        self.assertEqual(second, {"content": b"%PDF-1.4 version one", "status": "not_modified"})
+        self.assertNotIn("If-None-Match", self.server.requests[0])
+        self.assertEqual(self.server.requests[1]["If-None-Match"], '"v1"')
+
+        self.server.body = b"%PDF-1.4 version two"
+        self.server.etag = '"v2"'
+        self.assertEqual(self.cache.fetch(self.url), {"content": b"%PDF-1.4 version two", "status": "downloaded"})
+        self.assertEqual(self.cache.fetch(self.url)["status"], "not_modified")
+
+    def test_last_modified_revalidation(self):
+        """
+        Without an ETag, a cached body is revalidated with its Last-Modified time.
+        """
+        self.server.etag = None
+        self.server.last_modified = "Wed, 01 Jan 2025 00:00:00 GMT"
+        self.cache.fetch(self.url)
+        self.assertEqual(self.cache.fetch(self.url)["status"], "not_modified")
+        self.assertEqual(self.server.requests[1]["If-Modified-Since"], "Wed, 01 Jan 2025 00:00:00 GMT")
+
+    def test_offline_and_server_errors(self):
+        """
+        The cached body is returned when the server fails or cannot be reached, and errors are raised
+        for URLs that are not cached or that the server no longer has.
+        """
+        self.cache.fetch(self.url)
+
+        self.server.status = 503
+        self.assertEqual(self.cache.fetch(self.url), {"content": b"%PDF-1.4 version one", "status": "offline"})
+        with self.assertRaises(ValueError):
+            self.cache.fetch(self.url + "?uncached")
+
+        self.server.status = 404
+        with self.assertRaises(ValueError):
+            self.cache.fetch(self.url)
+
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertEqual(self.cache.fetch(self.url), {"content": b"%PDF-1.4 version one", "status": "offline"})
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.cache.fetch(self.url + "?uncached")
+
+    def test_corrupt_entry_is_ignored(self):
+        """
+        An entry whose body does not match its digest is downloaded again.
+        """
+        self.cache.fetch(self.url)
+        body_path, _ = self.cache.entry_paths(self.url)
+        with open(body_path, "wb") as body_file:
+            body_file.write(b"truncated")
+        self.assertIsNone(self.cache.load(self.url))
+        self.assertEqual(self.cache.fetch(self.url), {"content": b"%PDF-1.4 version one", "status": "downloaded"})
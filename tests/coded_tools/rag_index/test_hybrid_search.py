@@ -0,0 +1,82 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import asyncio
+from typing import List
+from unittest import TestCase
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from coded_tools.rag_index.hybrid_search import aretrieve
+from coded_tools.rag_index.hybrid_search import reciprocal_rank_fusion
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+from coded_tools.rag_index.query_cache import QueryCache
+
+
+class CountingEmbedder(DeterministicFakeEmbedding):
+    """
+    Local embedder counting the queries it embeds.
+    """
+
+    model: str = "counting"
+    queries: int = 0
+
+    def embed_query(self, text: str) -> List[float]:
+        self.queries += 1
+        return super().embed_query(text)
+
+
+class TestHybridSearch(TestCase):
+    """
+    Unit tests for hybrid retrieval.
+    """
+
+    def setUp(self):
+        self.embedder = CountingEmbedder(size=16)
+        texts = [f"General text about travel number {index}." for index in range(30)]
+        texts[17] = "Policy code ABC1 covers lost baggage."
+        self.store = NumpyVectorStore.from_texts(texts, self.embedder)
+        self.cache = QueryCache()
+
+    def test_reciprocal_rank_fusion(self):
+        """
+        Rows ranked well by both rankings come first.
+        """
+        self.assertEqual([2, 3, 1], reciprocal_rank_fusion([[1, 2, 3], [2, 3, 4]], 3))
+        self.assertEqual([], reciprocal_rank_fusion([[], []], 3))
+
+    def test_identifier_query_skips_embedding(self):
+        """
+        A query made of identifiers found by the keyword index is answered without embedding it.
+        """
+        results = asyncio.run(aretrieve(self.store, "ABC1", k=4, mode="hybrid", cache=self.cache))
+        self.assertEqual(["Policy code ABC1 covers lost baggage."], [doc.page_content for doc in results])
+        self.assertEqual(0, self.embedder.queries)
+
+        # An identifier nothing matches falls back to the fused ranking
+        results = asyncio.run(aretrieve(self.store, "XYZ9", k=4, mode="hybrid", cache=self.cache))
+        self.assertEqual(4, len(results))
+        self.assertEqual(1, self.embedder.queries)
+
+    def test_hybrid_includes_keyword_match(self):
+        """
+        The fused ranking contains the exact keyword match and fills up with vector hits.
+        """
+        query = "which rule mentions policy code abc1 for luggage"
+        vector_only = asyncio.run(aretrieve(self.store, query, k=4, mode="vector", cache=self.cache))
+        hybrid = asyncio.run(aretrieve(self.store, query, k=4, mode="hybrid", cache=self.cache))
+        self.assertEqual(4, len(hybrid))
+        self.assertEqual("Policy code ABC1 covers lost baggage.", hybrid[0].page_content)
+        self.assertTrue({doc.id for doc in vector_only} & {doc.id for doc in hybrid[1:]})
+
+        keyword = asyncio.run(aretrieve(self.store, query, k=4, mode="keyword", cache=self.cache))
+        self.assertEqual("Policy code ABC1 covers lost baggage.", keyword[0].page_content)
+
+        with self.assertRaises(ValueError):
+            asyncio.run(aretrieve(self.store, query, mode="fuzzy", cache=self.cache))
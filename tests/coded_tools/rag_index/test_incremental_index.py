@@ -0,0 +1,67 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import asyncio
+import os
+import tempfile
+from unittest import TestCase
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from coded_tools.rag_index.incremental_index import IncrementalIndex
+
+
+class TestIncrementalIndex(TestCase):
+    """
+    Unit tests for IncrementalIndex class.
+    """
+
+    def test_diff_and_update(self):
+        """
+        Only added and changed sources are re-embedded, removed sources lose their chunks,
+        and the manifest survives a save and load.
+        """
+        embedding = DeterministicFakeEmbedding(size=8)
+        # Pages are short enough to stay one chunk each
+        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
+        with tempfile.TemporaryDirectory() as index_dir:
+            path = os.path.join(index_dir, "vector_store")
+            index = IncrementalIndex(path, embedding)
+            self.assertFalse(index.load())
+
+            pages = [
+                Document(page_content="page one", metadata={"id": "1"}),
+                Document(page_content="page two", metadata={"id": "2"}),
+                Document(page_content="page two again", metadata={"id": "2"}),
+            ]
+            asyncio.run(index.aput_pages(pages, splitter, {"1": "v1", "2": "v1"}, source_key="id"))
+            index.save()
+            self.assertEqual(3, len(index.vectorstore))
+
+            index = IncrementalIndex(path, embedding)
+            self.assertTrue(index.load())
+            diff = index.diff({"2": "v2", "3": "v1"})
+            self.assertEqual(["3"], diff["added"])
+            self.assertEqual(["2"], diff["changed"])
+            self.assertEqual(["1"], diff["removed"])
+            self.assertEqual([], diff["unchanged"])
+
+            index.remove_source("1")
+            pages = [
+                Document(page_content="page two edited", metadata={"id": "2"}),
+                Document(page_content="page three", metadata={"id": "3"}),
+            ]
+            asyncio.run(index.aput_pages(pages, splitter, {"2": "v2", "3": "v1"}, source_key="id"))
+
+            texts = sorted(index.vectorstore.texts)
+            self.assertEqual(["page three", "page two edited"], texts)
+            self.assertEqual({"2": "v2", "3": "v1"}, {key: value["version"] for key, value in index.sources.items()})
+            self.assertEqual(["2", "3"], index.diff({"2": "v2", "3": "v1"})["unchanged"])
@@ -0,0 +1,59 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import tempfile
+from unittest import TestCase
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from coded_tools.rag_index.index_cache import IndexCache
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+
+SPLITTER_SETTINGS = {"chunk_size": 100, "chunk_overlap": 50}
+
+
+class TestIndexCache(TestCase):
+    """
+    Unit tests for IndexCache class.
+    """
+
+    def test_content_key(self):
+        """
+        The key must change whenever the content, the splitter settings or the embedding model change.
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = IndexCache(cache_dir, SPLITTER_SETTINGS, "model-a")
+            key = cache.content_key(b"pdf bytes")
+            self.assertEqual(key, cache.content_key(b"pdf bytes"))
+            self.assertNotEqual(key, cache.content_key(b"other pdf bytes"))
+
+            other_settings = IndexCache(cache_dir, {"chunk_size": 200, "chunk_overlap": 50}, "model-a")
+            self.assertNotEqual(key, other_settings.content_key(b"pdf bytes"))
+
+            other_model = IndexCache(cache_dir, SPLITTER_SETTINGS, "model-b")
+            self.assertNotEqual(key, other_model.content_key(b"pdf bytes"))
+
+    def test_save_and_load(self):
+        """
+        A saved entry is returned for its key and a missing key is a cache miss.
+        """
+        embedding = DeterministicFakeEmbedding(size=8)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = IndexCache(cache_dir, SPLITTER_SETTINGS, "model-a")
+            key = cache.content_key(b"pdf bytes")
+            self.assertIsNone(cache.load(key, embedding))
+
+            vectorstore = NumpyVectorStore(embedding=embedding)
+            vectorstore.add_documents([Document(page_content="baggage allowance", metadata={"page": 1})])
+            cache.save(key, vectorstore)
+
+            loaded = cache.load(key, embedding)
+            self.assertIsNotNone(loaded)
+            self.assertEqual(["baggage allowance"], list(loaded.texts))
@@ -0,0 +1,132 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import asyncio
+import os
+import tempfile
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+import pymupdf
+
+import coded_tools.pdf_rag.pdf_rag as pdf_rag_module
+from coded_tools.rag_index.chunking_benchmark import HashingEmbeddings
+from coded_tools.rag_index.index_store import IndexStore
+from coded_tools.rag_index.index_store import QuotaExceededError
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+from coded_tools.rag_index.registry import VECTOR_STORE_REGISTRY
+
+
+class TestIndexStore(TestCase):
+    """
+    Unit tests for IndexStore class.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.store = IndexStore(
+            os.path.join(self.directory.name, "stores"),
+            default_quotas={"max_bytes": 0, "max_chunks": 5, "memory_bytes": 0},
+            quotas={"team-b": {"max_chunks": 0}},
+        )
+
+    def tearDown(self):
+        VECTOR_STORE_REGISTRY.invalidate()
+        self.directory.cleanup()
+
+    def save(self, namespace: str, name: str, chunks: int) -> str:
+        """
+        :param namespace: Namespace of the index
+        :param name: Name of the index
+        :param chunks: Number of chunks of the saved vector store
+        :return: Path of the saved index
+        """
+        path: str = self.store.index_path(namespace, name)
+        store = NumpyVectorStore.from_texts([f"{name} {i}" for i in range(chunks)], HashingEmbeddings())
+        self.store.check_quota(namespace, path, len(store), store.nbytes)
+        store.dump(path)
+        return path
+
+    def test_namespaces_are_isolated(self):
+        """
+        Indexes are placed in the directory of their namespace, and names that would escape it are refused.
+        """
+        self.assertEqual(
+            os.path.join(self.store.root_dir, "team-a", "manuals"), self.store.index_path("team-a", "manuals.json")
+        )
+        for namespace, name in [("team-a", "../team-b/manuals"), ("..", "manuals"), ("team-a", "/tmp/x"), ("", "x")]:
+            with self.assertRaises(ValueError):
+                self.store.index_path(namespace, name)
+
+    def test_quotas(self):
+        """
+        A save that would take its namespace over its chunk quota is refused, replacing an index does not count
+        its current size, and namespaces are accounted separately.
+        """
+        self.save("team-a", "manuals", 3)
+        self.save("team-a", "manuals", 4)
+        with self.assertRaises(QuotaExceededError):
+            self.save("team-a", "policies", 2)
+        self.save("team-a", "policies", 1)
+        self.save("team-b", "policies", 50)
+
+        self.assertEqual({"bytes": self.store.usage("team-a")["bytes"], "chunks": 5}, self.store.usage("team-a"))
+        report = self.store.report()
+        self.assertEqual(5, report["namespaces"]["team-a"]["usage"]["chunks"])
+        self.assertEqual(0, report["namespaces"]["team-b"]["quota"]["max_chunks"])
+        self.assertEqual(["manuals", "policies"], sorted(i["name"] for i in report["namespaces"]["team-a"]["indexes"]))
+
+    def test_last_access_and_prune(self):
+        """
+        Indexes are listed least recently accessed first, and pruning deletes the cold ones with their files.
+        """
+        cold: str = self.save("team-a", "cold", 1)
+        warm: str = self.save("team-a", "warm", 1)
+        past: float = time.time() - 3600
+        os.utime(os.path.join(cold, "store.json"), (past, past))
+        self.store.record_access(warm)
+
+        self.assertEqual(["cold", "warm"], [index["name"] for index in self.store.list_indexes("team-a")])
+        pruned = self.store.prune(600)
+        self.assertEqual(["cold"], [index["name"] for index in pruned])
+        self.assertFalse(os.path.exists(cold))
+        self.assertEqual(["warm"], [index["name"] for index in self.store.list_indexes()])
+        self.assertTrue(os.path.exists(f"{warm}.access"))
+
+    def test_managed_pdf_rag(self):
+        """
+        PdfRag keeps the vector store of a namespace in the store, accounts it to the namespace in the shared
+        registry, and answers with an error once the namespace is over its quota.
+        """
+        pdf_path: str = os.path.join(self.directory.name, "policy.pdf")
+        with pymupdf.open() as pdf:
+            pdf.new_page().insert_text((72, 72), "Baggage policy ABC-1 allows two bags.")
+            pdf.save(pdf_path)
+        args = {
+            "query": "baggage",
+            "urls": [pdf_path],
+            "index_namespace": "team-a",
+            "vector_store_path": "baggage",
+            "use_index_cache": False,
+            "chunking_profile": {"splitter": "characters", "chunk_size": 200, "chunk_overlap": 20},
+            "embedding_checkpoint_dir": os.path.join(self.directory.name, "checkpoints"),
+        }
+        with patch.object(pdf_rag_module, "OpenAIEmbeddings", HashingEmbeddings), patch.object(
+            pdf_rag_module, "INDEX_STORE", self.store
+        ), patch("coded_tools.rag_index.index_store.INDEX_STORE", self.store):
+            self.assertIn("ABC-1", asyncio.run(pdf_rag_module.PdfRag().async_invoke(args, {})))
+            self.assertEqual(["baggage"], [index["name"] for index in self.store.list_indexes("team-a")])
+            self.assertTrue(os.path.exists(os.path.join(self.store.root_dir, "team-a", "baggage.manifest.json")))
+            self.assertIn("team-a", VECTOR_STORE_REGISTRY.stats()["namespace_bytes"])
+
+            self.store.quotas["team-a"] = {"max_chunks": 0, "max_bytes": 1}
+            output: str = asyncio.run(pdf_rag_module.PdfRag().async_invoke({**args, "vector_store_path": "other"}, {}))
+            self.assertTrue(output.startswith("Error:"), output)
+            self.assertIn("quota", output)
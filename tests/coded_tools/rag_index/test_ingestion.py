@@ -0,0 +1,133 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import asyncio
+import os
+import tempfile
+from typing import Iterator
+from typing import List
+from unittest import TestCase
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from coded_tools.rag_index.batch_embedder import BatchEmbedder
+from coded_tools.rag_index.ingestion import IngestionPipeline
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+
+
+class SlowEmbedder(DeterministicFakeEmbedding):
+    """
+    Local embedder counting the batches embedded at the same time and failing on a given text.
+    """
+
+    model: str = "slow"
+    fail_on: str = ""
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if self.fail_on in texts:
+                raise ValueError(f"cannot embed {self.fail_on}")
+            return self.embed_documents(texts)
+        finally:
+            self.in_flight -= 1
+
+
+class TestIngestionPipeline(TestCase):
+    """
+    Unit tests for IngestionPipeline class.
+    """
+
+    def setUp(self):
+        # Pages are short enough to stay one chunk each
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
+
+    @staticmethod
+    def pages(count: int, consumed: List[int] = None) -> Iterator[Document]:
+        """
+        :param count: Number of pages
+        :param consumed: List the index of each page is appended to as it is consumed
+        :return: Lazy iterator of pages from two sources
+        """
+        for index in range(count):
+            if consumed is not None:
+                consumed.append(index)
+            yield Document(page_content=f"page {index}", metadata={"source": f"doc{index % 2}", "page": index})
+
+    def test_batches_and_ids_by_source(self):
+        """
+        All pages end up in the store in order, grouped by source.
+        """
+        vectorstore = NumpyVectorStore(embedding=DeterministicFakeEmbedding(size=8))
+        pipeline = IngestionPipeline(vectorstore, self.splitter, batch_size=3, max_in_flight=1)
+        asyncio.run(pipeline.aingest(self.pages(7)))
+
+        self.assertEqual(7, pipeline.page_count)
+        self.assertEqual(7, pipeline.chunk_count)
+        self.assertEqual([f"page {index}" for index in range(7)], vectorstore.texts)
+        self.assertEqual(4, len(pipeline.ids_by_source["doc0"]))
+        self.assertEqual(3, len(pipeline.ids_by_source["doc1"]))
+        self.assertEqual("doc1", vectorstore.get_by_ids(pipeline.ids_by_source["doc1"][:1])[0].metadata["source"])
+
+    def test_backpressure(self):
+        """
+        No more than max_in_flight batches are embedded at once, and pages are not read far ahead of them.
+        """
+        embedder = SlowEmbedder(size=8)
+        vectorstore = NumpyVectorStore(embedding=embedder)
+        pipeline = IngestionPipeline(vectorstore, self.splitter, batch_size=2, max_in_flight=2)
+        consumed: List[int] = []
+
+        async def ingest():
+            pages = self.pages(40, consumed)
+            for page in pages:
+                await pipeline.aadd_pages([page])
+                # Pages waiting or being embedded never exceed the batches in flight plus one batch
+                self.assertLessEqual(len(consumed) - len(vectorstore), 2 * 2 + 2)
+            await pipeline.aflush()
+
+        asyncio.run(ingest())
+        self.assertEqual(40, len(vectorstore))
+        self.assertEqual(2, embedder.peak_in_flight)
+
+    def test_failure_cancels(self):
+        """
+        A failed batch stops the ingestion.
+        """
+        embedder = SlowEmbedder(size=8, fail_on="page 3")
+        pipeline = IngestionPipeline(NumpyVectorStore(embedding=embedder), self.splitter, batch_size=2)
+        with self.assertRaises(ValueError):
+            asyncio.run(pipeline.aingest(self.pages(20)))
+        self.assertEqual(set(), pipeline.tasks)
+
+    def test_checkpoints_removed_when_done(self):
+        """
+        Batch checkpoints are kept while ingesting and removed once all pages are in the store.
+        """
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            embedder = BatchEmbedder(SlowEmbedder(size=8), batch_size=2, checkpoint_dir=checkpoint_dir)
+            vectorstore = NumpyVectorStore(embedding=embedder)
+            pipeline = IngestionPipeline(vectorstore, self.splitter, batch_size=4)
+
+            async def ingest():
+                for page in self.pages(8):
+                    await pipeline.aadd_pages([page])
+                await asyncio.gather(*pipeline.tasks)
+                self.assertEqual(4, len(os.listdir(checkpoint_dir)))
+                await pipeline.aflush()
+
+            asyncio.run(ingest())
+            self.assertEqual(8, len(vectorstore))
+            self.assertEqual([], os.listdir(checkpoint_dir))
@@ -0,0 +1,80 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from coded_tools.rag_index.keyword_index import KeywordIndex
+from coded_tools.rag_index.keyword_index import is_identifier_query
+from coded_tools.rag_index.keyword_index import tokenize
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+
+TEXTS = [
+    "The baggage policy allows one cabin bag.",
+    "Replacement part PN-4471 fits the left hinge.",
+    "Policy code ABC1 covers lost baggage, see ABC1 annex.",
+    "Nothing relevant here.",
+]
+
+
+class TestKeywordIndex(TestCase):
+    """
+    Unit tests for KeywordIndex class.
+    """
+
+    def test_tokenize_and_identifier_queries(self):
+        """
+        Compound identifiers are kept whole and split, and short identifier queries are recognized.
+        """
+        self.assertEqual(["part", "pn-4471", "pn", "4471"], tokenize("Part PN-4471"))
+        for query in ["ABC1", "PN-4471", "GDPR", "v2.1 ABC1"]:
+            self.assertTrue(is_identifier_query(query), query)
+        for query in ["", "baggage", "what is the baggage policy", "A B C D1"]:
+            self.assertFalse(is_identifier_query(query), query)
+
+    def test_bm25_ranking(self):
+        """
+        Only chunks containing a query term are returned, the more frequent match first.
+        """
+        index = KeywordIndex.build(TEXTS)
+        self.assertEqual(4, len(index))
+        self.assertEqual([2], [row for row, _ in index.search("abc1", 5)])
+        self.assertEqual([1], [row for row, _ in index.search("pn-4471", 5)])
+        self.assertEqual([1], [row for row, _ in index.search("4471", 5)])
+        self.assertEqual([2, 0], [row for row, _ in index.search("baggage ABC1", 5)])
+        self.assertEqual([], index.search("unknown", 5))
+        self.assertEqual([], KeywordIndex.build([]).search("abc1", 5))
+
+    def test_persisted_with_store(self):
+        """
+        The keyword index is dumped with the store once built, memory-mapped on load and rebuilt after a change.
+        """
+        store = NumpyVectorStore.from_texts(TEXTS, DeterministicFakeEmbedding(size=8))
+        with tempfile.TemporaryDirectory() as store_dir:
+            path = os.path.join(store_dir, "store")
+            store.dump(path)
+            self.assertFalse(os.path.exists(os.path.join(path, "keyword_rows.npy")))
+            self.assertIsNone(store._keyword_index)  # pylint: disable=protected-access
+            self.assertEqual(4, len(NumpyVectorStore.load(path, store.embedding).keyword_index))
+
+            expected = store.keyword_index.search("baggage", 5)
+            store.dump(path)
+            self.assertTrue(os.path.exists(os.path.join(path, "keyword_rows.npy")))
+
+            loaded = NumpyVectorStore.load(path, store.embedding)
+            self.assertIsInstance(loaded.keyword_index.rows, np.memmap)
+            self.assertEqual(expected, loaded.keyword_index.search("baggage", 5))
+
+            loaded.add_texts(["More baggage rules."])
+            self.assertEqual(5, len(loaded.keyword_index))
+            self.assertEqual(3, len(loaded.keyword_index.search("baggage", 5)))
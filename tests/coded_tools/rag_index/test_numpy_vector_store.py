@@ -0,0 +1,89 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+from langchain_community.vectorstores import InMemoryVectorStore
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+from coded_tools.rag_index.numpy_vector_store import load_vector_store
+
+TEXTS = ["baggage allowance", "carry on rules", "pet policy", "seat selection"]
+
+
+class TestNumpyVectorStore(TestCase):
+    """
+    Unit tests for NumpyVectorStore class.
+    """
+
+    def test_search_returns_exact_match_first(self):
+        """
+        Querying with the text of a chunk returns that chunk first with a cosine score of 1.
+        """
+        embedding = DeterministicFakeEmbedding(size=16)
+        vectorstore = NumpyVectorStore.from_texts(TEXTS, embedding, metadatas=[{"n": i} for i in range(4)])
+        results = vectorstore.similarity_search_with_score("pet policy", k=2)
+        self.assertEqual(2, len(results))
+        self.assertEqual("pet policy", results[0][0].page_content)
+        self.assertEqual({"n": 2}, results[0][0].metadata)
+        self.assertAlmostEqual(1.0, results[0][1], places=5)
+        self.assertGreaterEqual(results[0][1], results[1][1])
+
+    def test_upsert_and_delete(self):
+        """
+        Adding an existing id replaces its row and deleting ids compacts the store.
+        """
+        embedding = DeterministicFakeEmbedding(size=16)
+        vectorstore = NumpyVectorStore(embedding=embedding)
+        vectorstore.add_texts(TEXTS, ids=["a", "b", "c", "d"])
+        vectorstore.add_texts(["pet policy updated"], ids=["c"])
+        self.assertEqual(4, len(vectorstore))
+        self.assertEqual(["pet policy updated"], [doc.page_content for doc in vectorstore.get_by_ids(["c"])])
+
+        vectorstore.delete(ids=["a", "c"])
+        self.assertEqual(["carry on rules", "seat selection"], list(vectorstore.texts))
+        self.assertEqual("seat selection", vectorstore.similarity_search("seat selection", k=1)[0].page_content)
+
+    def test_dump_and_load_memory_mapped(self):
+        """
+        A dumped store loads with a memory-mapped matrix and can still be extended afterwards.
+        """
+        embedding = DeterministicFakeEmbedding(size=16)
+        vectorstore = NumpyVectorStore.from_texts(TEXTS, embedding)
+        with tempfile.TemporaryDirectory() as store_dir:
+            path = os.path.join(store_dir, "vector_store")
+            vectorstore.dump(path)
+
+            loaded = NumpyVectorStore.load(path, embedding)
+            self.assertIsInstance(loaded.matrix, np.memmap)
+            self.assertEqual(TEXTS, list(loaded.texts))
+            self.assertEqual("carry on rules", loaded.similarity_search("carry on rules", k=1)[0].page_content)
+
+            loaded.add_texts(["meal service"])
+            self.assertEqual(5, len(loaded))
+
+    def test_legacy_json_is_converted(self):
+        """
+        A JSON vector store saved by InMemoryVectorStore is converted on first load.
+        """
+        embedding = DeterministicFakeEmbedding(size=16)
+        legacy = InMemoryVectorStore(embedding=embedding)
+        legacy.add_texts(TEXTS)
+        with tempfile.TemporaryDirectory() as store_dir:
+            path = os.path.join(store_dir, "vector_store")
+            legacy.dump(f"{path}.json")
+
+            loaded = load_vector_store(path, embedding)
+            self.assertEqual(sorted(TEXTS), sorted(loaded.texts))
+            self.assertTrue(os.path.isdir(path))
+            self.assertFalse(os.path.exists(f"{path}.json"))
@@ -0,0 +1,84 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import asyncio
+from typing import Any
+from typing import Dict
+from typing import List
+from unittest import TestCase
+
+import pymupdf
+
+from coded_tools.rag_index.pdf_loader import ParallelPdfLoader
+
+
+def make_pdf(name: str, page_count: int) -> bytes:
+    """
+    :return: Bytes of a pdf file with one line of text per page
+    """
+    with pymupdf.open() as pdf:
+        for page in range(page_count):
+            pdf.new_page().insert_text((72, 72), f"{name} page {page}")
+        return pdf.tobytes()
+
+
+class TestParallelPdfLoader(TestCase):
+    """
+    Unit tests for ParallelPdfLoader class.
+    """
+
+    def stream(self, loader: ParallelPdfLoader, contents: Dict[str, bytes]) -> List[Dict[str, Any]]:
+        """
+        :return: All events of loading the contents
+        """
+
+        async def collect():
+            return [event async for event in loader.astream(contents)]
+
+        return asyncio.run(collect())
+
+    def check_events(self, events: List[Dict[str, Any]]):
+        """
+        All pages of the good files arrive exactly once and the broken file is reported on its own.
+        """
+        pages: Dict[str, List[str]] = {"a.pdf": [], "b.pdf": []}
+        done: List[str] = []
+        errors: List[str] = []
+        for event in events:
+            if event["error"] is not None:
+                errors.append(event["source"])
+                continue
+            pages[event["source"]].extend(page.page_content for page in event["pages"])
+            if event["done"]:
+                done.append(event["source"])
+
+        self.assertEqual(["broken.pdf"], errors)
+        self.assertEqual(["a.pdf", "b.pdf"], sorted(done))
+        self.assertEqual([f"a.pdf page {page}" for page in range(5)], sorted(pages["a.pdf"]))
+        self.assertEqual(["b.pdf page 0"], pages["b.pdf"])
+
+        first_page = next(event["pages"][0] for event in events if event["pages"])
+        self.assertIn(first_page.metadata["source"], ("a.pdf", "b.pdf"))
+        self.assertIn("total_pages", first_page.metadata)
+
+    def test_process_pool(self):
+        """
+        Page ranges are parsed in worker processes.
+        """
+        contents = {"a.pdf": make_pdf("a.pdf", 5), "broken.pdf": b"not a pdf", "b.pdf": make_pdf("b.pdf", 1)}
+        events = self.stream(ParallelPdfLoader(max_workers=2, pages_per_task=2), contents)
+        self.check_events(events)
+        self.assertEqual(5, len(events))
+
+    def test_single_worker(self):
+        """
+        With a single worker, pages are parsed in a thread of this process.
+        """
+        contents = {"a.pdf": make_pdf("a.pdf", 5), "broken.pdf": b"not a pdf", "b.pdf": make_pdf("b.pdf", 1)}
+        self.check_events(self.stream(ParallelPdfLoader(max_workers=1, pages_per_task=16), contents))
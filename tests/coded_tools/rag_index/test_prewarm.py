@@ -0,0 +1,118 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import asyncio
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import pymupdf
+
+from coded_tools.pdf_rag.pdf_rag import PdfRag
+from coded_tools.rag_index.chunking_benchmark import HashingEmbeddings
+from coded_tools.rag_index.prewarm import aprewarm
+from coded_tools.rag_index.prewarm import prewarm_targets
+from coded_tools.rag_index.registry import VECTOR_STORE_REGISTRY
+
+
+class TestPrewarm(TestCase):
+    """
+    Unit tests for the pre-warming of the RAG tools.
+    """
+
+    def setUp(self):
+        VECTOR_STORE_REGISTRY.invalidate()
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        root = self.directory.name
+        pdf_path = os.path.join(root, "policy.pdf")
+        with pymupdf.open() as pdf:
+            pdf.new_page().insert_text((72, 72), "Baggage policy ABC-1 allows two bags.")
+            pdf.save(pdf_path)
+        self.args = {
+            "urls": [pdf_path],
+            "use_index_cache": False,
+            "chunking_profile": {"splitter": "characters", "chunk_size": 200, "chunk_overlap": 20},
+            "embedding_checkpoint_dir": os.path.join(root, "checkpoints"),
+        }
+        networks = {
+            "pdf_rag.hocon": {"tools": [{"name": "rag_retriever", "class": "pdf_rag.PdfRag", "args": self.args}]},
+            "confluence_rag.hocon": {"tools": [{"name": "rag_retriever", "toolbox": "confluence_rag"}]},
+            "music.hocon": {"tools": [{"name": "front_man"}, {"name": "tool", "class": "music.Tool"}]},
+        }
+        for name, network in networks.items():
+            with open(os.path.join(root, name), "w", encoding="utf-8") as network_file:
+                json.dump(network, network_file)
+        self.manifest = os.path.join(root, "manifest.hocon")
+        with open(self.manifest, "w", encoding="utf-8") as manifest_file:
+            manifest_file.write('{\n"pdf_rag.hocon": true,\n"confluence_rag.hocon": true,\n"music.hocon": true,\n}\n')
+        self.toolbox_info = os.path.join(root, "toolbox_info.hocon")
+        with open(self.toolbox_info, "w", encoding="utf-8") as toolbox_file:
+            json.dump(
+                {"confluence_rag": {"class": "confluence_rag.ConfluenceRag", "args": {"page_ids": ["1"]}}},
+                toolbox_file,
+            )
+
+    def tearDown(self):
+        VECTOR_STORE_REGISTRY.invalidate()
+        self.directory.cleanup()
+
+    def test_prewarm_targets(self):
+        """
+        The RAG tools of the served networks are found, whether declared in the network or in the toolbox.
+        """
+        targets = prewarm_targets(self.manifest, self.toolbox_info)
+        self.assertEqual(
+            [("pdf_rag.hocon", "pdf_rag.PdfRag"), ("confluence_rag.hocon", "confluence_rag.ConfluenceRag")],
+            [(target["network"], target["class"]) for target in targets],
+        )
+        self.assertEqual(self.args, targets[0]["args"])
+        self.assertEqual({"page_ids": ["1"]}, targets[1]["args"])
+
+        with open(self.manifest, "w", encoding="utf-8") as manifest_file:
+            manifest_file.write('{"pdf_rag.hocon": false, "confluence_rag.hocon": false}')
+        self.assertEqual([], prewarm_targets(self.manifest, self.toolbox_info))
+
+    @patch("coded_tools.pdf_rag.pdf_rag.OpenAIEmbeddings", HashingEmbeddings)
+    def test_prewarm(self):
+        """
+        Pre-warming registers the vector stores that the first query then finds,
+        and a refresh rebuilds them while the registered ones keep being served.
+        """
+        targets = [
+            target
+            for target in prewarm_targets(self.manifest, self.toolbox_info)
+            if target["class"] == "pdf_rag.PdfRag"
+        ]
+        results = asyncio.run(aprewarm(targets))
+        self.assertIsNone(results[0]["error"])
+        self.assertEqual(1, VECTOR_STORE_REGISTRY.stats()["entries"])
+
+        hits = VECTOR_STORE_REGISTRY.stats()["hits"]
+        answer = asyncio.run(PdfRag().async_invoke({**self.args, "query": "How many bags?"}, {}))
+        self.assertIn("two bags", answer)
+        self.assertEqual(hits + 1, VECTOR_STORE_REGISTRY.stats()["hits"])
+
+        asyncio.run(aprewarm(targets, refresh=True))
+        stats = VECTOR_STORE_REGISTRY.stats()
+        self.assertEqual(1, stats["refreshes"])
+        self.assertEqual(1, stats["entries"])
+
+    def test_prewarm_errors(self):
+        """
+        A tool that cannot be warmed is reported without stopping the others.
+        """
+        targets = [
+            {"network": "missing.hocon", "name": "missing", "class": "missing.Missing", "args": {}},
+            {"network": "pdf_rag.hocon", "name": "rag_retriever", "class": "pdf_rag.NoSuchTool", "args": {}},
+        ]
+        results = asyncio.run(aprewarm(targets))
+        self.assertEqual(2, len(results))
+        self.assertTrue(all(result["error"] for result in results))
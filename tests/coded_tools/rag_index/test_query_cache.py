@@ -0,0 +1,121 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import asyncio
+import time
+from typing import List
+from unittest import TestCase
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+from coded_tools.rag_index.query_cache import QueryCache
+
+TEXTS = ["baggage allowance", "carry on rules", "pet policy", "seat selection"]
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """
+    Fake embedding counting the queries it embeds.
+    """
+
+    queries: List[str] = []
+
+    async def aembed_query(self, text: str) -> List[float]:
+        self.queries.append(text)
+        return self.embed_query(text)
+
+
+class TestQueryCache(TestCase):
+    """
+    Unit tests for QueryCache class.
+    """
+
+    def setUp(self):
+        self.embedding = CountingEmbedding(size=16, queries=[])
+        self.vectorstore = NumpyVectorStore.from_texts(TEXTS, self.embedding)
+
+    def search(self, cache: QueryCache, query: str, threshold: float = 0.0, **search_kwargs) -> List[str]:
+        """
+        :return: Texts returned for the query
+        """
+        results = asyncio.run(
+            cache.asimilarity_search(self.vectorstore, query, k=2, semantic_threshold=threshold, **search_kwargs)
+        )
+        return [doc.page_content for doc in results]
+
+    def test_query_embedding_is_cached(self):
+        """
+        Re-issued queries, also with different whitespace, are embedded once.
+        """
+        cache = QueryCache(max_embeddings=2)
+        first = self.search(cache, "pet policy")
+        self.assertEqual(first, self.search(cache, "  pet   policy "))
+        self.assertEqual(["pet policy"], self.embedding.queries)
+        self.assertEqual("pet policy", first[0])
+
+        self.search(cache, "seat selection")
+        self.search(cache, "carry on rules")
+        self.search(cache, "pet policy")
+        self.assertEqual(4, len(self.embedding.queries))
+
+    def test_semantic_results_are_reused_for_same_index_version(self):
+        """
+        Results are reused for a similar enough query until the vector store changes.
+        """
+        cache = QueryCache()
+        self.search(cache, "pet policy", threshold=0.99)
+        self.vectorstore.texts = ["tampered"] * len(TEXTS)
+        self.assertEqual("pet policy", self.search(cache, "pet policy", threshold=0.99)[0])
+        self.assertEqual(1, cache.stats()["result_hits"])
+
+        self.vectorstore = NumpyVectorStore.from_texts(TEXTS, self.embedding)
+        self.vectorstore.add_texts(["meal service"])
+        self.assertEqual("pet policy", self.search(cache, "pet policy", threshold=0.99)[0])
+        self.assertEqual(1, cache.stats()["result_hits"])
+
+    def test_semantic_results_are_kept_per_search_settings(self):
+        """
+        Results are only reused for searches with the same approximate index settings, and never for filtered ones.
+        """
+        cache = QueryCache()
+        self.search(cache, "pet policy", threshold=0.99)
+        self.search(cache, "pet policy", threshold=0.99, ann_index="ivf", n_probe=1)
+        self.search(cache, "pet policy", threshold=0.99, ann_index="ivf", n_probe=2)
+        self.assertEqual(0, cache.stats()["result_hits"])
+        self.assertEqual(3, cache.stats()["results"])
+
+        self.search(cache, "pet policy", threshold=0.99, ann_index="exact")
+        self.search(cache, "pet policy", threshold=0.99, ann_index="ivf", n_probe=1)
+        self.assertEqual(2, cache.stats()["result_hits"])
+
+        results = self.search(cache, "pet policy", threshold=0.99, filter=lambda doc: doc.page_content != "pet policy")
+        self.assertNotIn("pet policy", results)
+        self.assertEqual(2, cache.stats()["result_hits"])
+
+    def test_semantic_results_expire(self):
+        """
+        Cached results are not returned after their time to live.
+        """
+        cache = QueryCache(ttl_seconds=0.01)
+        self.search(cache, "pet policy", threshold=0.99)
+        time.sleep(0.02)
+        self.search(cache, "pet policy", threshold=0.99)
+        self.assertEqual(0, cache.stats()["result_hits"])
+
+    def test_result_cache_is_bounded(self):
+        """
+        The oldest results are evicted beyond max_results.
+        """
+        cache = QueryCache(max_results=2)
+        for text in TEXTS:
+            self.search(cache, text, threshold=0.99)
+        self.assertEqual(2, cache.stats()["results"])
+        self.search(cache, TEXTS[0], threshold=0.99)
+        self.assertEqual(0, cache.stats()["result_hits"])
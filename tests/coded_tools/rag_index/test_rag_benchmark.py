@@ -0,0 +1,59 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import json
+from typing import Any
+from typing import Dict
+from unittest import TestCase
+
+from coded_tools.rag_index.chunking_benchmark import load_questions
+from coded_tools.rag_index.chunking_benchmark import normalize
+from coded_tools.rag_index.rag_benchmark import BENCHMARK_QUESTIONS_FILE
+from coded_tools.rag_index.rag_benchmark import benchmark
+from coded_tools.rag_index.rag_benchmark import compare
+from coded_tools.rag_index.rag_benchmark import load_corpus_documents
+
+
+class TestRagBenchmark(TestCase):
+    """
+    Unit tests for the RAG tools benchmark, on the bundled corpus.
+    """
+
+    def test_corpus_answers(self):
+        """
+        Every labelled answer appears in the document the question is about.
+        """
+        documents: Dict[str, str] = load_corpus_documents()
+        for question in load_questions(BENCHMARK_QUESTIONS_FILE):
+            self.assertIn(normalize(question["answer"]), normalize(documents[question["source"]]))
+
+    def test_benchmark_report(self):
+        """
+        The report of every tool has its build time, index size, latency percentiles and recall@k,
+        is JSON serializable, and is deterministic in recall.
+        """
+        report: Dict[str, Any] = benchmark(recall_ks=(1, 8), chunking_profile={"splitter": "estimate"}, isolate=False)
+
+        self.assertEqual(set(report["results"]), {"pdf_rag", "rag", "confluence_rag"})
+        for tool_name, results in report["results"].items():
+            self.assertGreater(results["build_seconds"], 0, tool_name)
+            self.assertGreater(results["index_bytes"], 0, tool_name)
+            self.assertLessEqual(results["query_ms"]["p50"], results["query_ms"]["p99"], tool_name)
+            self.assertEqual(set(results["recall_at_k"]), {"1", "8"}, tool_name)
+            self.assertLessEqual(results["recall_at_k"]["1"], results["recall_at_k"]["8"], tool_name)
+            self.assertGreaterEqual(results["recall_at_k"]["8"], 0.8, tool_name)
+        json.dumps(report)
+
+        again: Dict[str, Any] = benchmark(
+            ["pdf_rag"], recall_ks=(1, 8), chunking_profile={"splitter": "estimate"}, isolate=False
+        )
+        comparison: Dict[str, Any] = compare(report, again)
+        self.assertEqual(comparison["pdf_rag.recall_at_k.8"]["change"], 0)
+        self.assertIn("pdf_rag.query_ms.p95", comparison)
+        self.assertNotIn("rag.query_ms.p95", comparison)
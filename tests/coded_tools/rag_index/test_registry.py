@@ -0,0 +1,129 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+import asyncio
+from unittest import TestCase
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from coded_tools.rag_index.numpy_vector_store import NumpyVectorStore
+from coded_tools.rag_index.registry import VectorStoreRegistry
+from coded_tools.rag_index.registry import registry_key
+
+
+class TestVectorStoreRegistry(TestCase):
+    """
+    Unit tests for VectorStoreRegistry class.
+    """
+
+    def setUp(self):
+        self.builds = []
+
+    def builder(self, text: str):
+        """
+        :param text: Text of the single chunk of the built store
+        :return: Coroutine function building a store and recording the build
+        """
+
+        async def build() -> NumpyVectorStore:
+            self.builds.append(text)
+            await asyncio.sleep(0.01)
+            return NumpyVectorStore.from_texts([text], DeterministicFakeEmbedding(size=16))
+
+        return build
+
+    def test_concurrent_requests_share_one_build(self):
+        """
+        Concurrent first requests for a key run a single build and get the same store.
+        """
+        registry = VectorStoreRegistry(max_bytes=1024 * 1024, ttl_seconds=0)
+        key = registry_key("pdf_rag", ["a.pdf"], "model")
+
+        async def request_many():
+            return await asyncio.gather(*[registry.get_or_build(key, self.builder("a")) for _ in range(5)])
+
+        stores = asyncio.run(request_many())
+        self.assertEqual(["a"], self.builds)
+        self.assertTrue(all(store is stores[0] for store in stores))
+
+        asyncio.run(registry.get_or_build(key, self.builder("a")))
+        self.assertEqual(["a"], self.builds)
+        stats = registry.stats()
+        self.assertEqual(1, stats["misses"])
+        self.assertEqual(4, stats["shared_builds"])
+        self.assertEqual(1, stats["hits"])
+
+    def test_lru_eviction_by_bytes(self):
+        """
+        The least recently used store is evicted once the byte budget is exceeded.
+        """
+        probe = NumpyVectorStore.from_texts(["a"], DeterministicFakeEmbedding(size=16))
+        registry = VectorStoreRegistry(max_bytes=2 * probe.nbytes, ttl_seconds=0)
+
+        asyncio.run(registry.get_or_build("a", self.builder("a")))
+        asyncio.run(registry.get_or_build("b", self.builder("b")))
+        asyncio.run(registry.get_or_build("a", self.builder("a")))
+        asyncio.run(registry.get_or_build("c", self.builder("c")))
+
+        self.assertEqual(["a", "c"], [entry["key"] for entry in registry.list_entries()])
+        self.assertLessEqual(registry.stats()["total_bytes"], registry.max_bytes)
+        self.assertEqual(1, registry.stats()["evictions"])
+
+    def test_namespace_share(self):
+        """
+        A namespace over its share of the registry gives up its own least recently used stores only.
+        """
+        probe = NumpyVectorStore.from_texts(["a"], DeterministicFakeEmbedding(size=16))
+        registry = VectorStoreRegistry(max_bytes=10 * probe.nbytes, ttl_seconds=0)
+
+        asyncio.run(registry.get_or_build("other", self.builder("o"), namespace="team-b"))
+        for key in ("a", "b", "c"):
+            asyncio.run(
+                registry.get_or_build(key, self.builder(key), namespace="team-a", namespace_max_bytes=2 * probe.nbytes)
+            )
+
+        self.assertEqual(["other", "b", "c"], [entry["key"] for entry in registry.list_entries()])
+        self.assertEqual({"team-a": 2 * probe.nbytes, "team-b": probe.nbytes}, registry.stats()["namespace_bytes"])
+        registry.invalidate()
+        self.assertEqual({}, registry.stats()["namespace_bytes"])
+
+    def test_failed_build_is_retried(self):
+        """
+        A failing build raises for its caller and is not cached.
+        """
+        registry = VectorStoreRegistry(max_bytes=1024 * 1024, ttl_seconds=0)
+
+        async def failing_build() -> NumpyVectorStore:
+            raise ValueError("unreachable source")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(registry.get_or_build("a", failing_build))
+        asyncio.run(registry.get_or_build("a", self.builder("a")))
+        self.assertEqual(["a"], self.builds)
+        self.assertEqual(0, registry.stats()["in_flight"])
+
+    def test_registry_key(self):
+        """
+        Keys depend on every part and do not contain the parts in clear.
+        """
+        key = registry_key("confluence_rag", {"url": "https://wiki", "api_key": "secret"})
+        self.assertEqual(key, registry_key("confluence_rag", {"api_key": "secret", "url": "https://wiki"}))
+        self.assertNotEqual(key, registry_key("confluence_rag", {"url": "https://wiki", "api_key": "other"}))
+        self.assertNotIn("secret", key)
+
+    def test_changed_version_is_rebuilt(self):
+        """
+        An entry registered with another version of its sources is rebuilt.
+        """
+        registry = VectorStoreRegistry(max_bytes=1024 * 1024, ttl_seconds=0)
+        asyncio.run(registry.get_or_build("a", self.builder("a"), version="1"))
+        asyncio.run(registry.get_or_build("a", self.builder("a"), version="1"))
+        asyncio.run(registry.get_or_build("a", self.builder("a edited"), version="2"))
+        self.assertEqual(["a", "a edited"], self.builds)
+        self.assertEqual(1, registry.stats()["entries"])
@@ -0,0 +1,58 @@
+# Copyright (C) 2023-2025 Cognizant Digital Business, Evolutionary AI.
+# All Rights Reserved.
+# Issued under the Academic Public License.
+#
+# You can be released from the terms, and requirements of the Academic Public
+# License by purchasing a commercial license.
+# Purchase of a commercial license is mandatory for any use of the
+# neuro-san-studio SDK Software in commercial settings.
+#
+from types import SimpleNamespace
+from typing import Any
+from typing import Dict
+from typing import List
+from unittest import TestCase
+
+from coded_tools.confluence_rag import ConfluenceRag
+
+
+class PagedConfluence:  # pylint: disable=too-few-public-methods
+    """
+    Confluence client listing the pages of a space, returning page_size pages even if fewer are requested.
+    """
+
+    def __init__(self, page_count: int, page_size: int):
+        self.pages: List[Dict[str, Any]] = [
+            {"id": str(i), "version": {"number": 1, "when": "2025-01-01T00:00:00.000Z"}} for i in range(page_count)
+        ]
+        self.page_size: int = page_size
+        self.limits: List[int] = []
+
+    def get_all_pages_from_space(self, space: str, start: int, limit: int, **kwargs):
+        """
+        Returns the pages of the space from start, page_size of them when the limit is smaller.
+        """
+        assert (space, kwargs) == ("DEV", {"status": "current", "expand": "version"})
+        self.limits.append(limit)
+        return self.pages[start : start + max(limit, self.page_size)]
+
+
+class TestConfluenceRag(TestCase):
+    """
+    Unit tests for ConfluenceRag class.
+    """
+
+    def test_page_versions_within_max_pages(self):
+        """
+        Page versions are listed for at most max_pages pages, even below the size of a page of results.
+        """
+        confluence = PagedConfluence(page_count=250, page_size=25)
+        loader = SimpleNamespace(confluence=confluence)
+        versions = ConfluenceRag().get_page_versions(loader, {"space_key": "DEV", "max_pages": 10})
+        self.assertEqual([str(i) for i in range(10)], list(versions))
+        self.assertEqual([10], confluence.limits)
+
+        confluence.limits.clear()
+        versions = ConfluenceRag().get_page_versions(loader, {"space_key": "DEV", "max_pages": 120})
+        self.assertEqual(120, len(versions))
+        self.assertEqual([100, 20], confluence.limits)